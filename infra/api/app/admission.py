@@ -0,0 +1,155 @@
+"""
+Admission - controle de admissão do caminho de escrita (/ingest, /ingest/tick)
+- Rate limit por cliente (API key, IP e terminal do User-Agent `PDC/`) com token
+  bucket: um balde de requests/s checado antes de ler o corpo e, opcionalmente,
+  um de linhas/s depois do parse (backfill em loop manda batches grandes).
+- Limite global de escritas simultâneas no banco; quem não consegue vaga dentro
+  de max_wait recebe 429 em vez de segurar conexão/memória esperando.
+Em ambos a API responde 429 com Retry-After; o EA e o edge relay reenfileiram.
+Os baldes são por processo: com WEB_CONCURRENCY=N o limite efetivo é N vezes o configurado.
+"""
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Hashable, Optional, Tuple
+
+DEFAULT_MAX_KEYS = 10000
+
+
+class Throttled(Exception):
+    """Recusa de admissão; retry_after em segundos inteiros (header Retry-After)."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+def ea_metadata(user_agent: Optional[str]) -> Dict[str, str]:
+    """
+    Metadados do User-Agent do DataCollectorPRO (chaves em minúsculas)
+
+    'DataCollectorPRO/PDC/1.65 (Account:12345; Server:Broker-Demo; Build:3850)'
+    -> {'account': '12345', 'server': 'Broker-Demo', 'build': '3850'}
+    """
+    if not user_agent or "PDC/" not in user_agent:
+        return {}
+    parts = user_agent.split("(", 1)
+    if len(parts) < 2:
+        return {}
+    meta = {}
+    for item in parts[1].rstrip(")").split(";"):
+        if ":" in item:
+            key, value = item.split(":", 1)
+            meta[key.strip().lower()] = value.strip()
+    return meta
+
+
+def client_key(api_key: Optional[str], ip: Optional[str], user_agent: Optional[str]) -> Tuple[str, str, str]:
+    """(api key, IP, terminal); terminal = account@server do EA, '-' fora do DataCollectorPRO."""
+    meta = ea_metadata(user_agent)
+    terminal = meta.get('account') or '-'
+    if meta.get('server'):
+        terminal = f"{terminal}@{meta['server']}"
+    return api_key or '-', ip or '-', terminal
+
+
+class TokenBucket:
+    """rate fichas/s até burst; take() devolve 0 se admitiu ou os segundos até haver fichas."""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, cost: float, now: float) -> float:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # batch maior que o burst entra com o balde cheio e deixa saldo negativo (não fica barrado para sempre)
+        need = min(cost, self.burst)
+        if self.tokens >= need:
+            self.tokens -= cost
+            return 0.0
+        return (need - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Token bucket por chave; rate <= 0 desliga
+
+    Args:
+        rate: fichas por segundo por chave (requests ou linhas)
+        burst: capacidade do balde (default: 1 segundo de rate, mínimo 1)
+        max_keys: chaves em memória; as menos usadas saem primeiro
+    """
+
+    def __init__(self, rate: float, burst: float = 0, max_keys: int = DEFAULT_MAX_KEYS):
+        self.rate = rate
+        self.burst = burst if burst > 0 else max(1.0, rate)
+        self.max_keys = max(1, max_keys)
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def check(self, key: Hashable, cost: float = 1, now: Optional[float] = None) -> float:
+        """0 se admitido; senão segundos até a chave ter fichas (nada é consumido)."""
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(cost, now)
+
+
+class ConcurrencyLimiter:
+    """
+    Máximo de escritas simultâneas no banco; limit <= 0 desliga
+
+    Usage:
+        async with limiter.slot():
+            ...  # INSERT/commit
+    """
+
+    def __init__(self, limit: int, max_wait: float = 2.0):
+        self.limit = limit
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        self._sem = asyncio.Semaphore(limit) if limit > 0 else None
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._sem is None:
+            yield
+            return
+        if self._sem.locked():
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._sem.acquire(), self.max_wait)
+            except asyncio.TimeoutError:
+                raise Throttled("database busy", self.max_wait)
+            finally:
+                self.waiting -= 1
+        else:
+            await self._sem.acquire()
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._sem.release()
@@ -0,0 +1,78 @@
+"""
+Candles - leitura das continuous aggregates de candles (migration_003_candles.sql)
+GET /candles lê candles_tick_<tf> (a partir de raw_ticks) ou candles_bar_<tf>
+(a partir de ticks) já agregadas pelo TimescaleDB, em vez de agrupar os ticks
+a cada consulta.
+"""
+import time
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from payload import parse_ts_ms
+
+# timeframe -> duração do bucket em ms
+TIMEFRAMES: Dict[str, int] = {
+    'M1': 60_000,
+    'M5': 5 * 60_000,
+    'M15': 15 * 60_000,
+    'H1': 60 * 60_000,
+    'D1': 24 * 60 * 60_000,
+}
+# 'tick' = raw_ticks (bid), 'bar' = ticks (barras do EA); 'auto' tenta tick e cai para bar
+SOURCES = ('tick', 'bar')
+DEFAULT_BARS = 500
+MAX_LIMIT = 10_000
+
+# nome da view vem de TIMEFRAMES/SOURCES (whitelist), nunca do request
+_QUERY = """
+    SELECT CAST(extract(epoch FROM bucket) * 1000 AS bigint) AS ts,
+           open, high, low, close, volume, ticks
+    FROM {view}
+    WHERE symbol = :symbol
+      AND bucket >= to_timestamp(CAST(:from_ms AS bigint) / 1000.0)
+      AND bucket < to_timestamp(CAST(:to_ms AS bigint) / 1000.0)
+    ORDER BY bucket
+    LIMIT :limit
+"""
+QUERIES = {(source, tf): text(_QUERY.format(view=f"candles_{source}_{tf.lower()}"))
+           for source in SOURCES for tf in TIMEFRAMES}
+
+
+def normalize_timeframe(tf: str) -> str:
+    tf = (tf or '').upper()
+    if tf not in TIMEFRAMES:
+        raise HTTPException(status_code=400, detail=f"invalid tf (use {', '.join(TIMEFRAMES)})")
+    return tf
+
+
+def resolve_range(tf: str, from_: Optional[str], to: Optional[str], now_ms: Optional[int] = None):
+    """from/to (epoch ms ou ISO8601) -> (from_ms, to_ms); padrão são as últimas DEFAULT_BARS barras."""
+    try:
+        to_ms = parse_ts_ms(to) if to is not None else (now_ms if now_ms is not None else int(time.time() * 1000))
+        from_ms = parse_ts_ms(from_) if from_ is not None else to_ms - DEFAULT_BARS * TIMEFRAMES[tf]
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid from/to")
+    if from_ms >= to_ms:
+        raise HTTPException(status_code=400, detail="from must be before to")
+    return from_ms, to_ms
+
+
+async def fetch_candles(conn, source: str, symbol: str, tf: str, from_ms: int, to_ms: int,
+                        limit: int) -> List[dict]:
+    params = {'symbol': symbol, 'from_ms': from_ms, 'to_ms': to_ms, 'limit': limit}
+    return [dict(r) for r in (await conn.execute(QUERIES[(source, tf)], params)).mappings()]
+
+
+async def query_candles(conn, symbol: str, tf: str, from_ms: int, to_ms: int, source: str = 'auto',
+                        limit: int = MAX_LIMIT):
+    """Devolve (source usada, candles em ordem crescente de ts)."""
+    if source != 'auto':
+        if source not in SOURCES:
+            raise HTTPException(status_code=400, detail="invalid source (use auto, tick or bar)")
+        return source, await fetch_candles(conn, source, symbol, tf, from_ms, to_ms, limit)
+    rows = await fetch_candles(conn, 'tick', symbol, tf, from_ms, to_ms, limit)
+    if rows:
+        return 'tick', rows
+    return 'bar', await fetch_candles(conn, 'bar', symbol, tf, from_ms, to_ms, limit)
@@ -0,0 +1,214 @@
+"""
+Columnar - formato colunar compacto para /ingest e /ingest/tick
+Em vez de uma lista de objetos repetindo as chaves a cada tick, o cliente envia
+um array por campo. Negociado pelo Content-Type e opcionalmente comprimido
+(Content-Encoding gzip/zstd). O resultado já sai em colunas no formato de
+ingest_store.ROW_FIELDS, direto para o INSERT set-based (unnest) sem montar
+um dict por linha.
+
+Formato (Content-Type: application/vnd.ea.columnar+json):
+    {
+      "v": 1,
+      "symbols": ["EURUSD", "GBPUSD"],      # dicionário de símbolos
+      "symbol_idx": [0, 0, 1, ...],          # ou "symbol": "EURUSD" para batch de um símbolo
+      "ts0": 1760954400000,                  # ts_ms base
+      "ts_delta": [0, 150, 20, ...],         # deltas em ms (1º relativo a ts0)
+      "timeframe": "M1",                     # escalar ou array
+      "kind": "tick",                        # escalar ou array
+      "open": [...], "high": [...], "low": [...], "close": [...], "volume": [...],
+      "bid": [...], "ask": [...], "last": [...],
+      "flags": [...],                        # ticks: flags do MT5 (escalar ou array)
+      "source": "MT5", "ea_version": "1.65", # ticks: escalar ou array
+      "meta": {...}                          # único para o batch inteiro
+    }
+"""
+import zlib
+from itertools import accumulate
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+
+import payload
+from ingest_store import ROW_FIELDS
+
+try:
+    import numpy as np
+except ImportError:  # opcional: sem numpy decodifica em Python puro
+    np = None
+
+try:
+    import zstandard
+except ImportError:  # opcional: sem zstandard só gzip/deflate
+    zstandard = None
+
+COLUMNAR_CONTENT_TYPE = "application/vnd.ea.columnar+json"
+FLOAT_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'bid', 'ask', 'last')
+MAX_DECOMPRESSED_BYTES = 64 * 1024 * 1024
+
+
+def is_columnar(content_type: Optional[str]) -> bool:
+    return bool(content_type) and content_type.split(';', 1)[0].strip().lower() == COLUMNAR_CONTENT_TYPE
+
+
+def decompress(body: bytes, encoding: Optional[str]) -> bytes:
+    """Descomprime conforme Content-Encoding (gzip, deflate, zstd); identity passa direto."""
+    enc = (encoding or 'identity').strip().lower()
+    try:
+        if enc in ('identity', ''):
+            return body
+        if enc in ('gzip', 'x-gzip', 'deflate'):
+            # limite de saída contra zip bomb
+            wbits = 16 + zlib.MAX_WBITS if enc != 'deflate' else zlib.MAX_WBITS
+            out = zlib.decompressobj(wbits).decompress(body, MAX_DECOMPRESSED_BYTES + 1)
+        elif enc == 'zstd':
+            if zstandard is None:
+                raise HTTPException(status_code=415, detail="zstd not supported")
+            out = zstandard.ZstdDecompressor().decompress(body, max_output_size=MAX_DECOMPRESSED_BYTES)
+        else:
+            raise HTTPException(status_code=415, detail=f"unsupported content-encoding: {enc}")
+    except HTTPException:
+        raise
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid compressed body")
+    if len(out) > MAX_DECOMPRESSED_BYTES:
+        raise HTTPException(status_code=413, detail="decompressed body too large")
+    return out
+
+
+def _scalar_or_column(value, n: int, name: str) -> list:
+    if isinstance(value, list):
+        if len(value) != n:
+            raise ValueError(f"column {name} has {len(value)} values, expected {n}")
+        return value
+    return [value] * n
+
+
+def _text_column(value, n: int, name: str) -> list:
+    # timeframe/kind/source/ea_version vão para colunas text[]: só string ou null
+    col = _scalar_or_column(value, n, name)
+    if not all(v is None or type(v) is str for v in col):
+        raise ValueError(f"column {name} must be strings")
+    return col
+
+
+def _ts_column(data: dict, n: int) -> list:
+    ts0 = payload.parse_ts_ms(data.get('ts0', 0))
+    deltas = data.get('ts_delta')
+    if not isinstance(deltas, list) or len(deltas) != n:
+        raise ValueError("ts_delta must have one value per row")
+    # mesma regra nos dois decoders: só inteiros (numpy truncaria floats e aceitaria bool em silêncio)
+    if not all(type(d) is int for d in deltas):
+        raise ValueError("ts_delta must be integers")
+    if np is not None:
+        if max(map(abs, deltas)) * n >= 1 << 62:
+            raise ValueError("ts out of range")  # cumsum em int64 estouraria
+        ts = (np.cumsum(np.asarray(deltas, dtype=np.int64)) + ts0).tolist()
+    else:
+        ts = [ts0 + t for t in accumulate(deltas)]
+    if min(ts) < payload.MIN_TS_MS or max(ts) >= payload.MAX_TS_MS:
+        raise ValueError("ts out of range")
+    return ts
+
+
+def _float_column(values, n: int, name: str) -> list:
+    if not isinstance(values, list) or len(values) != n:
+        raise ValueError(f"column {name} must have {n} values")
+    if np is not None:
+        arr = np.asarray(values, dtype=np.float64)  # None -> nan
+        out = arr.tolist()
+        if np.isnan(arr).any():
+            out = [None if v != v else v for v in out]
+        return out
+    return [None if v is None else float(v) for v in values]
+
+
+def _symbol_column(data: dict, n: int) -> list:
+    if isinstance(data.get('symbol'), str):
+        return [data['symbol']] * n
+    symbols = data.get('symbols')
+    idx = data.get('symbol_idx')
+    if not isinstance(symbols, list) or not symbols or not all(isinstance(s, str) and s for s in symbols):
+        raise ValueError("symbols dictionary required")
+    if not isinstance(idx, list) or len(idx) != n:
+        raise ValueError("symbol_idx must have one value per row")
+    if np is not None:
+        arr = np.asarray(idx, dtype=np.int64)
+        if n and (arr.min() < 0 or arr.max() >= len(symbols)):
+            raise ValueError("symbol_idx out of range")
+        return np.asarray(symbols, dtype=object)[arr].tolist()
+    k = len(symbols)
+    if not all(type(i) is int and 0 <= i < k for i in idx):
+        raise ValueError("symbol_idx out of range")
+    return [symbols[i] for i in idx]
+
+
+def decode_columns(data) -> Dict[str, list]:
+    """
+    Converte o documento colunar em colunas ROW_FIELDS + 'meta' (e bid/ask/last se presentes)
+
+    Raises:
+        ValueError: colunas de tamanhos diferentes, índices inválidos ou tipos errados
+    """
+    if not isinstance(data, dict):
+        raise ValueError("columnar payload must be an object")
+    if data.get('v', 1) != 1:
+        raise ValueError("unsupported columnar version")
+    deltas = data.get('ts_delta')
+    n = len(deltas) if isinstance(deltas, list) else 0
+    if n == 0:
+        return {f: [] for f in ROW_FIELDS + ('meta',)}
+    cols = {
+        'symbol': _symbol_column(data, n),
+        'ts_ms': _ts_column(data, n),
+        'timeframe': _text_column(data.get('timeframe'), n, 'timeframe'),
+        'kind': _text_column(data.get('kind'), n, 'kind'),
+    }
+    present = [c for c in FLOAT_COLUMNS if data.get(c) is not None]
+    for c in present:
+        cols[c] = _float_column(data[c], n, c)
+    # campos de tick (raw_ticks) só entram se enviados
+    if data.get('flags') is not None:
+        cols['flags'] = _scalar_or_column(data['flags'], n, 'flags')
+    for c in ('source', 'ea_version'):
+        if data.get(c) is not None:
+            cols[c] = _text_column(data[c], n, c)
+    for c in ('open', 'high', 'low', 'close', 'volume'):
+        if c not in cols:
+            cols[c] = [None] * n
+    if 'close' not in present:
+        # barras do MT5 (forex) são formadas pelo bid; last cobre símbolos de bolsa
+        if 'last' in present:
+            cols['close'] = cols['last']
+        elif 'bid' in present:
+            cols['close'] = cols['bid']
+    # meta é um só para o batch: serializa uma vez
+    meta = payload.dumps(data['meta']) if data.get('meta') else '{}'
+    cols['meta'] = [meta] * n
+    return cols
+
+
+def to_rows(cols: Dict[str, list]) -> List[dict]:
+    """Colunas -> linhas (só para caminhos que precisam de dict por item, ex.: INGEST_WRITE_MODE=row)."""
+    names = list(cols)
+    return [dict(zip(names, values)) for values in zip(*(cols[k] for k in names))]
+
+
+def decode(body: bytes, content_encoding: Optional[str] = None) -> Dict[str, list]:
+    """Body HTTP (possivelmente comprimido) -> colunas; erros viram HTTP 400."""
+    raw = decompress(body, content_encoding)
+    try:
+        return decode_columns(payload.loads(raw))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"invalid columnar payload: {e}")
+
+
+def to_items(cols: Dict[str, list]) -> List[dict]:
+    """Colunas -> itens no formato JSON do EA (usado no forward para o servidor remoto)."""
+    items = []
+    for r in to_rows(cols):
+        it = {k: v for k, v in r.items() if k not in ('ts_ms', 'meta') and v is not None}
+        it['ts'] = r['ts_ms']
+        items.append(it)
+    return items
@@ -0,0 +1,201 @@
+"""
+Forwarder - pipeline assíncrono de forward para o servidor remoto
+Tira o httpx.post do caminho da requisição: os itens entram numa fila limitada,
+um worker por endpoint agrupa em micro-batches (tamanho/janela de tempo) e envia
+com um httpx.AsyncClient compartilhado, com retry e backoff exponencial.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+import httpx
+from opentelemetry import trace
+
+log = logging.getLogger("ea-api.forwarder")
+tracer = trace.get_tracer(__name__)
+
+Key = Tuple[str, int]
+# on_sent(endpoint, keys, status_code|None, lag_seconds, batch_size)
+SentHook = Callable[[str, List[Key], Optional[int], float, int], Awaitable[None]]
+# on_confirm(endpoint, keys, status_code|None, latency_seconds)
+ConfirmHook = Callable[[str, List[Key], Optional[int], float], Awaitable[None]]
+
+
+def _is_ok(status: Optional[int]) -> bool:
+    return status is not None and 200 <= status < 400
+
+
+def _retryable(status: Optional[int]) -> bool:
+    # erro de rede, 429 e 5xx valem nova tentativa; demais 4xx não
+    return status is None or status == 429 or status >= 500
+
+
+class ForwardChannel:
+    """
+    Fila + worker de forward para um endpoint remoto
+
+    Args:
+        endpoint: endpoint local de origem ('/ingest', '/ingest/tick'), usado em métricas/audit
+        url: URL remota
+        max_batch: itens por request (1 = envia o objeto sozinho, sem lista)
+        max_wait: janela máxima (s) para completar um batch após o primeiro item
+        queue_size: capacidade da fila; acima disso os itens são descartados
+        max_retries: novas tentativas após a primeira falha
+        backoff: atraso inicial (s) do backoff exponencial
+        backoff_max: teto do atraso entre tentativas
+        confirm_url: URL de confirmação opcional, chamada após forward OK
+    """
+
+    def __init__(self, endpoint: str, url: str, *, max_batch: int = 500, max_wait: float = 0.2,
+                 queue_size: int = 10000, max_retries: int = 3, backoff: float = 0.5,
+                 backoff_max: float = 10.0, confirm_url: Optional[str] = None,
+                 on_sent: Optional[SentHook] = None, on_confirm: Optional[ConfirmHook] = None):
+        self.endpoint = endpoint
+        self.url = url
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.confirm_url = confirm_url
+        self.on_sent = on_sent
+        self.on_confirm = on_confirm
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def depth(self) -> int:
+        return self.queue.qsize()
+
+    def submit(self, entries: List[Tuple[dict, Key]]) -> int:
+        """Enfileira (payload, chave) sem bloquear; devolve quantos foram descartados."""
+        now = time.monotonic()
+        dropped = 0
+        for payload, key in entries:
+            try:
+                self.queue.put_nowait((payload, key, now))
+            except asyncio.QueueFull:
+                dropped += 1
+        if dropped:
+            self.dropped += dropped
+            log.warning("FORWARD %s queue full | dropped=%d | depth=%d", self.endpoint, dropped, self.depth())
+        return dropped
+
+    async def _next_batch(self) -> list:
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _body(self, payloads: list):
+        return payloads[0] if self.max_batch == 1 else payloads
+
+    async def _post(self, client: httpx.AsyncClient, url: str, body, headers: dict) -> Tuple[Optional[int], str]:
+        """POST com retry/backoff; devolve (status_code|None, trecho da resposta)."""
+        delay = self.backoff
+        status, snippet = None, ""
+        for attempt in range(self.max_retries + 1):
+            try:
+                r = await client.post(url, json=body, headers=headers)
+                status, snippet = r.status_code, (r.text[:200] if r.text else "")
+            except Exception as e:
+                status, snippet = None, str(e)
+            if not _retryable(status) or attempt == self.max_retries:
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.backoff_max)
+        return status, snippet
+
+    async def send_batch(self, client: httpx.AsyncClient, headers: dict, batch: list):
+        payloads = [b[0] for b in batch]
+        keys = [b[1] for b in batch]
+        with tracer.start_as_current_span("forward_batch") as span:
+            span.set_attribute("forward.url", self.url)
+            span.set_attribute("forward.items", len(batch))
+            status, snippet = await self._post(client, self.url, self._body(payloads), headers)
+            span.set_attribute("http.status_code", status or 0)
+            span.set_attribute("forward.success", _is_ok(status))
+        # lag: do enfileiramento do item mais antigo até a resposta do remoto
+        lag = time.monotonic() - min(b[2] for b in batch)
+        log.info("FORWARD %s -> %s | sz=%d | status=%s | lag=%.3fs | resp=%s | sample_keys=%s",
+                 self.endpoint, self.url, len(batch), status, lag, snippet, keys[:3])
+        if self.on_sent:
+            await self.on_sent(self.endpoint, keys, status, lag, len(batch))
+        if self.confirm_url and _is_ok(status):
+            await self.confirm(client, headers, keys)
+
+    async def confirm(self, client: httpx.AsyncClient, headers: dict, keys: List[Key]):
+        cstart = time.monotonic()
+        body = {"keys": [{"symbol": s, "ts_ms": t} for s, t in keys]}
+        status, snippet = await self._post(client, self.confirm_url, body, headers)
+        log.info("CONFIRM %s -> %s | status=%s | resp=%s", self.endpoint, self.confirm_url, status, snippet)
+        if self.on_confirm:
+            await self.on_confirm(self.endpoint, keys, status, time.monotonic() - cstart)
+
+    async def run(self, client: httpx.AsyncClient, headers: dict):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self.send_batch(client, headers, batch)
+            except Exception as e:
+                log.warning("FORWARD %s batch failed: %s", self.endpoint, e)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+
+class Forwarder:
+    """Agrupa os canais de forward e o httpx.AsyncClient compartilhado."""
+
+    def __init__(self, token: Optional[str] = None, timeout: float = 5.0, max_connections: int = 20):
+        self.headers = {"Content-Type": "application/json"}
+        if token:
+            self.headers["x-api-key"] = token
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.channels = {}
+        self.client: Optional[httpx.AsyncClient] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def add_channel(self, channel: ForwardChannel) -> ForwardChannel:
+        self.channels[channel.endpoint] = channel
+        return channel
+
+    def submit(self, endpoint: str, entries: List[Tuple[dict, Key]]) -> int:
+        ch = self.channels.get(endpoint)
+        if ch is None or not entries:
+            return 0
+        return ch.submit(entries)
+
+    async def start(self):
+        if not self.channels:
+            return
+        limits = httpx.Limits(max_connections=self.max_connections,
+                              max_keepalive_connections=self.max_connections)
+        self.client = httpx.AsyncClient(timeout=self.timeout, limits=limits)
+        for ch in self.channels.values():
+            self._tasks.append(asyncio.create_task(ch.run(self.client, self.headers), name=f"forward{ch.endpoint}"))
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """Espera a fila esvaziar (até drain_timeout) e encerra workers e client."""
+        if self._tasks:
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*(ch.queue.join() for ch in self.channels.values())), drain_timeout)
+            except asyncio.TimeoutError:
+                log.warning("FORWARD drain timeout | pending=%s",
+                            {ep: ch.depth() for ep, ch in self.channels.items()})
+            for t in self._tasks:
+                t.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = []
+        if self.client:
+            await self.client.aclose()
+            self.client = None
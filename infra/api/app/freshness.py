@@ -0,0 +1,118 @@
+"""
+Freshness Tracker - índice em memória do último dado por símbolo/timeframe
+Atualizado no caminho de escrita (O(1) por item), substitui os scans em ticks
+que alimentavam symbols_active_total e data_age_seconds.
+"""
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from prometheus_client.core import GaugeMetricFamily
+
+
+class FreshnessTracker:
+    """
+    Último ts_ms de dado e horário de recebimento por (symbol, timeframe)
+
+    Usage:
+        tracker.observe("EURUSD", "M1", 1760954400000)
+        tracker.snapshot()  # -> lista ordenada por idade
+    """
+
+    def __init__(self):
+        # (symbol, timeframe) -> [last_ts_ms, last_seen_epoch_s]
+        self._last: Dict[Tuple[str, str], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, symbol: str, timeframe: Optional[str], ts_ms: int, seen_at: Optional[float] = None):
+        key = (symbol, timeframe or 'unknown')
+        seen_at = seen_at if seen_at is not None else time.time()
+        with self._lock:
+            entry = self._last.get(key)
+            if entry is None:
+                self._last[key] = [ts_ms, seen_at]
+            else:
+                if ts_ms > entry[0]:
+                    entry[0] = ts_ms
+                entry[1] = seen_at
+
+    def observe_rows(self, rows: Iterable[dict], seen_at: Optional[float] = None):
+        seen_at = seen_at if seen_at is not None else time.time()
+        for r in rows:
+            self.observe(r['symbol'], r.get('timeframe'), r['ts_ms'], seen_at)
+
+    def observe_columns(self, symbols: Iterable[str], timeframes: Iterable[Optional[str]],
+                        ts_ms: Iterable[int], seen_at: Optional[float] = None):
+        """Mesmo que observe_rows para batches já em colunas (payload colunar)."""
+        seen_at = seen_at if seen_at is not None else time.time()
+        for symbol, timeframe, ts in zip(symbols, timeframes, ts_ms):
+            self.observe(symbol, timeframe, ts, seen_at)
+
+    def seed(self, symbol: str, timeframe: Optional[str], ts_ms: int):
+        """Carga inicial (ex.: do banco no startup) sem sobrescrever dados mais novos."""
+        key = (symbol, timeframe or 'unknown')
+        with self._lock:
+            entry = self._last.get(key)
+            if entry is None:
+                self._last[key] = [ts_ms, ts_ms / 1000.0]
+            elif ts_ms > entry[0]:
+                entry[0] = ts_ms
+
+    def _items(self):
+        with self._lock:
+            return [(k, v[0], v[1]) for k, v in self._last.items()]
+
+    def snapshot(self, now: Optional[float] = None) -> List[dict]:
+        now = now if now is not None else time.time()
+        out = []
+        for (symbol, timeframe), ts_ms, seen_at in self._items():
+            out.append({
+                'symbol': symbol,
+                'timeframe': timeframe,
+                'last_ts_ms': ts_ms,
+                'age_seconds': round(now - ts_ms / 1000.0, 3),
+                'last_seen_seconds': round(now - seen_at, 3),
+            })
+        out.sort(key=lambda x: x['age_seconds'])
+        return out
+
+    def symbol_ages(self, now: Optional[float] = None) -> Dict[str, float]:
+        """Idade do dado mais recente por símbolo (mínimo entre timeframes)."""
+        now = now if now is not None else time.time()
+        ages: Dict[str, float] = {}
+        for (symbol, _), ts_ms, _ in self._items():
+            age = now - ts_ms / 1000.0
+            if symbol not in ages or age < ages[symbol]:
+                ages[symbol] = age
+        return ages
+
+    def active_symbols(self, window_seconds: float = 300, now: Optional[float] = None) -> int:
+        """
+        Símbolos cujo dado mais recente (ts_ms) está nos últimos window_seconds
+
+        Pelo tempo do dado e não do recebimento, como o antigo scan em ticks: reenvio ou
+        backfill de barras antigas não marca o símbolo como ativo.
+        """
+        now = now if now is not None else time.time()
+        return len({k[0] for k, ts_ms, _ in self._items() if now - ts_ms / 1000.0 <= window_seconds})
+
+
+class FreshnessCollector:
+    """Exporta a idade por símbolo e por símbolo/timeframe no momento do scrape."""
+
+    def __init__(self, tracker: FreshnessTracker):
+        self.tracker = tracker
+
+    def collect(self):
+        now = time.time()
+        by_symbol = GaugeMetricFamily('data_age_seconds', 'Age of most recent data point by symbol',
+                                      labels=['symbol'])
+        for symbol, age in self.tracker.symbol_ages(now).items():
+            by_symbol.add_metric([symbol], age)
+        yield by_symbol
+        by_tf = GaugeMetricFamily('data_age_by_timeframe_seconds',
+                                  'Age of most recent data point by symbol and timeframe',
+                                  labels=['symbol', 'timeframe'])
+        for entry in self.tracker.snapshot(now):
+            by_tf.add_metric([entry['symbol'], entry['timeframe']], entry['age_seconds'])
+        yield by_tf
@@ -0,0 +1,140 @@
+"""
+Group Commit - buffer em memória com commit agrupado para o caminho de ticks
+Cada request deixa suas linhas (em colunas) no buffer e aguarda o future do
+flush; um único worker grava tudo em uma transação a cada max_rows linhas ou
+max_delay segundos. A resposta HTTP só sai depois do commit, então a semântica
+de durabilidade é a mesma do INSERT por request, com um fsync para N requests.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ingest_store import duplicate_flags
+
+log = logging.getLogger("ea-api.group_commit")
+
+Key = Tuple[str, int]
+# flush_fn(cols) -> chaves (ex.: (symbol, ts_ms)) realmente inseridas
+FlushFn = Callable[[Dict[str, list]], Awaitable[List[Key]]]
+# on_flush(rows, requests, seconds, ok)
+FlushHook = Callable[[int, int, float, bool], None]
+
+
+class GroupCommitBuffer:
+    """
+    Agrupa submissões concorrentes em um único INSERT/commit
+
+    Args:
+        flush_fn: grava as colunas concatenadas em uma transação e devolve as chaves novas
+        fields: colunas esperadas em cada submissão
+        key_fields: colunas que formam a chave devolvida pelo flush_fn
+        max_rows: linhas que disparam o flush imediatamente
+        max_delay: espera máxima (s) desde a primeira linha pendente
+        on_flush: callback de métricas após cada flush
+    """
+
+    def __init__(self, flush_fn: FlushFn, fields, *, key_fields=('symbol', 'ts_ms'), max_rows: int = 500,
+                 max_delay: float = 0.005, on_flush: Optional[FlushHook] = None):
+        self.flush_fn = flush_fn
+        self.fields = tuple(fields)
+        self.key_fields = tuple(key_fields)
+        self.max_rows = max(1, max_rows)
+        self.max_delay = max_delay
+        self.on_flush = on_flush
+        self._pending: List[Tuple[Dict[str, list], asyncio.Future]] = []
+        self._rows = 0
+        self._first_at = 0.0
+        self._wake = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def pending_rows(self) -> int:
+        return self._rows
+
+    async def submit(self, cols: Dict[str, list]) -> List[bool]:
+        """Enfileira as colunas e aguarda o commit; devolve flags was_duplicate por linha."""
+        n = len(cols[self.fields[0]])
+        if n == 0:
+            return []
+        if not self.running or self._closing:
+            raise RuntimeError("group commit buffer not running")
+        fut = asyncio.get_running_loop().create_future()
+        if not self._pending:
+            self._first_at = time.monotonic()
+        self._pending.append((cols, fut))
+        self._rows += n
+        self._wake.set()
+        if self._rows >= self.max_rows:
+            self._full.set()
+        return await fut
+
+    async def _wait_batch(self):
+        await self._wake.wait()
+        # _full é setado ao atingir max_rows ou no stop(); senão espera o max_delay
+        timeout = self._first_at + self.max_delay - time.monotonic()
+        if self._rows < self.max_rows and not self._closing and timeout > 0:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        batch, self._pending, self._rows = self._pending, [], 0
+        self._wake.clear()
+        self._full.clear()
+        return batch
+
+    async def _flush(self, batch):
+        merged = {f: [v for cols, _ in batch for v in cols[f]] for f in self.fields}
+        rows = len(merged[self.fields[0]])
+        start = time.perf_counter()
+        try:
+            new_keys = await self.flush_fn(merged)
+        except Exception as e:
+            log.error("group commit flush failed | rows=%d | requests=%d | err=%s", rows, len(batch), e)
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            ok = False
+        else:
+            # primeira ocorrência de cada chave nova no flush inteiro conta como inserida
+            flags = duplicate_flags(zip(*(merged[k] for k in self.key_fields)), new_keys)
+            offset = 0
+            for cols, fut in batch:
+                n = len(cols[self.fields[0]])
+                if not fut.done():
+                    fut.set_result(flags[offset:offset + n])
+                offset += n
+            ok = True
+        if self.on_flush:
+            self.on_flush(rows, len(batch), time.perf_counter() - start, ok)
+
+    async def run(self):
+        while not self._closing or self._pending:
+            batch = await self._wait_batch()
+            if batch:
+                await self._flush(batch)
+
+    async def start(self):
+        if not self.running:
+            self._closing = False
+            self._task = asyncio.create_task(self.run(), name="group_commit")
+
+    async def stop(self, timeout: float = 10.0):
+        """Para de aceitar linhas, grava o que estiver pendente e encerra o worker."""
+        if not self._task:
+            return
+        self._closing = True
+        self._wake.set()
+        self._full.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            log.warning("group commit stop timeout | pending_rows=%d", self._rows)
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
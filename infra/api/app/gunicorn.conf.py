@@ -0,0 +1,45 @@
+"""
+Gunicorn - modo multi-processo da API (um UvicornWorker por núcleo)
+
+Uso (no diretório da app, como no Docker):
+    gunicorn -c gunicorn.conf.py main:app
+
+Env:
+    WEB_CONCURRENCY           workers (default: nº de CPUs)
+    PORT                      porta (default 8000)
+    GRACEFUL_TIMEOUT          segundos para drenar requests em andamento no SIGTERM (default 30)
+    PROMETHEUS_MULTIPROC_DIR  arquivos de métricas compartilhados (default /tmp/ea-api-metrics)
+    DB_POOL_BUDGET            conexões da API inteira, divididas entre os workers (ver workers.py)
+"""
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+workers = int(os.getenv("WEB_CONCURRENCY") or multiprocessing.cpu_count())
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+accesslog = None
+
+# Herdados pelos workers (fork): nº de workers para o orçamento do pool e diretório das métricas.
+# O diretório tem que estar no ambiente antes do primeiro import de prometheus_client (inclusive
+# o de workers.py abaixo), senão o processo fica com valores em memória em vez de arquivos.
+os.environ["WEB_CONCURRENCY"] = str(workers)
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/ea-api-metrics")
+
+from workers import clean_multiprocess_dir  # noqa: E402
+
+
+def on_starting(server):
+    clean_multiprocess_dir(os.environ["PROMETHEUS_MULTIPROC_DIR"])
+    server.log.info("multiprocess metrics | dir=%s | workers=%d", os.environ["PROMETHEUS_MULTIPROC_DIR"], workers)
+
+
+def child_exit(server, worker):
+    # gauges "live*" do worker que saiu deixam de contar no /metrics
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,160 @@
+"""
+Ingest Activity - contadores agregados de tentativas/duplicatas e modo do ingest_log
+Em vez de uma linha de ingest_log por item, a API conta em memória tentativas e
+duplicatas por (endpoint, symbol, timeframe, minuto) e grava os contadores
+periodicamente em ingest_activity e duplicate_stats (ver
+infra/sql/migration_002_ingest_activity.sql). O ingest_log por item vira
+opcional: full (todos), sampled (1 a cada N) ou aggregate (nenhum).
+"""
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+INGEST_LOG_MODES = ('full', 'sampled', 'aggregate')
+
+Key = Tuple[str, str, Optional[str], int]  # (endpoint, symbol, timeframe, minuto epoch s)
+
+ACTIVITY_UPSERT = text("""
+    INSERT INTO ingest_activity(endpoint, symbol, timeframe, minute_bucket, attempts, duplicates)
+    SELECT k.endpoint, k.symbol, k.timeframe, to_timestamp(k.minute), k.attempts, k.duplicates
+    FROM unnest(
+        CAST(:endpoint AS text[]), CAST(:symbol AS text[]), CAST(:timeframe AS text[]),
+        CAST(:minute AS bigint[]), CAST(:attempts AS bigint[]), CAST(:duplicates AS bigint[])
+    ) AS k(endpoint, symbol, timeframe, minute, attempts, duplicates)
+    ON CONFLICT (endpoint, symbol, timeframe, minute_bucket) DO UPDATE SET
+        attempts = ingest_activity.attempts + EXCLUDED.attempts,
+        duplicates = ingest_activity.duplicates + EXCLUDED.duplicates
+""")
+
+# duplicate_stats tem timeframe NULL para ticks (UNIQUE não casa NULL), então
+# atualiza o que existe e insere só o que faltou, em um statement
+DUPLICATE_STATS_UPSERT = text("""
+    WITH d AS (
+        SELECT k.endpoint, k.symbol, NULLIF(k.timeframe, '') AS timeframe,
+               date_trunc('hour', to_timestamp(k.minute)) AS hour_bucket, SUM(k.duplicates) AS n
+        FROM unnest(
+            CAST(:endpoint AS text[]), CAST(:symbol AS text[]), CAST(:timeframe AS text[]),
+            CAST(:minute AS bigint[]), CAST(:duplicates AS bigint[])
+        ) AS k(endpoint, symbol, timeframe, minute, duplicates)
+        GROUP BY 1, 2, 3, 4
+        HAVING SUM(k.duplicates) > 0
+    ), upd AS (
+        UPDATE duplicate_stats s
+        SET duplicate_count = s.duplicate_count + d.n, last_seen = now()
+        FROM d
+        WHERE s.endpoint = d.endpoint AND s.symbol = d.symbol
+          AND s.timeframe IS NOT DISTINCT FROM d.timeframe AND s.hour_bucket = d.hour_bucket
+        RETURNING s.endpoint, s.symbol, s.timeframe, s.hour_bucket
+    )
+    INSERT INTO duplicate_stats(endpoint, symbol, timeframe, hour_bucket, duplicate_count, last_seen)
+    SELECT d.endpoint, d.symbol, d.timeframe, d.hour_bucket, d.n, now()
+    FROM d
+    WHERE NOT EXISTS (
+        SELECT 1 FROM upd
+        WHERE upd.endpoint = d.endpoint AND upd.symbol = d.symbol
+          AND upd.timeframe IS NOT DISTINCT FROM d.timeframe AND upd.hour_bucket = d.hour_bucket
+    )
+    ON CONFLICT (endpoint, symbol, timeframe, hour_bucket) DO UPDATE SET
+        duplicate_count = duplicate_stats.duplicate_count + EXCLUDED.duplicate_count,
+        last_seen = now()
+""")
+
+
+class IngestLogPolicy:
+    """
+    Decide quais linhas do batch vão para o ingest_log
+
+    Env:
+        INGEST_LOG_MODE: full | sampled | aggregate (default full)
+        INGEST_LOG_SAMPLE_EVERY: N do modo sampled (1 a cada N itens, default 10)
+    """
+
+    def __init__(self, mode: Optional[str] = None, sample_every: Optional[int] = None):
+        self.mode = (mode or os.getenv("INGEST_LOG_MODE", "full")).lower()
+        if self.mode not in INGEST_LOG_MODES:
+            raise ValueError(f"invalid INGEST_LOG_MODE: {self.mode}")
+        if sample_every is None:
+            sample_every = int(os.getenv("INGEST_LOG_SAMPLE_EVERY", "10"))
+        self.sample_every = max(1, sample_every)
+        self._seen = 0
+        self._lock = threading.Lock()
+
+    def select(self, n: int) -> Optional[List[int]]:
+        """Índices a gravar no ingest_log; None = todas as linhas, [] = nenhuma."""
+        if self.mode == 'full':
+            return None
+        if self.mode == 'aggregate' or n == 0:
+            return []
+        # contador global: 1 a cada N itens entre requests, não 1 por batch
+        with self._lock:
+            start = self._seen
+            self._seen += n
+        first = (-start) % self.sample_every
+        return list(range(first, n, self.sample_every))
+
+
+class ActivityCounters:
+    """Tentativas/duplicatas por (endpoint, symbol, timeframe, minuto) em memória até o próximo flush."""
+
+    def __init__(self):
+        self._counts: Dict[Key, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, symbols, timeframes, dup_flags, now: Optional[float] = None) -> None:
+        """Conta um batch; colunas paralelas (timeframes pode ser None para ticks)."""
+        minute = int((now if now is not None else time.time()) // 60) * 60
+        if timeframes is None:
+            timeframes = [None] * len(symbols)
+        counts = self._counts
+        with self._lock:
+            for symbol, tf, dup in zip(symbols, timeframes, dup_flags):
+                key = (endpoint, symbol, tf, minute)
+                c = counts.get(key)
+                if c is None:
+                    counts[key] = c = [0, 0]
+                c[0] += 1
+                if dup:
+                    c[1] += 1
+
+    def pending(self) -> int:
+        return len(self._counts)
+
+    def drain(self) -> Dict[Key, List[int]]:
+        with self._lock:
+            batch, self._counts = self._counts, {}
+        return batch
+
+    def restore(self, batch: Dict[Key, List[int]]) -> None:
+        """Devolve um batch cujo flush falhou (soma ao que chegou nesse meio tempo)."""
+        with self._lock:
+            for key, (attempts, dups) in batch.items():
+                c = self._counts.setdefault(key, [0, 0])
+                c[0] += attempts
+                c[1] += dups
+
+
+def activity_columns(batch: Dict[Key, List[int]]) -> Dict[str, list]:
+    cols = {'endpoint': [], 'symbol': [], 'timeframe': [], 'minute': [], 'attempts': [], 'duplicates': []}
+    for (endpoint, symbol, tf, minute), (attempts, dups) in batch.items():
+        cols['endpoint'].append(endpoint)
+        cols['symbol'].append(symbol)
+        cols['timeframe'].append(tf or '')
+        cols['minute'].append(minute)
+        cols['attempts'].append(attempts)
+        cols['duplicates'].append(dups)
+    return cols
+
+
+async def flush_activity(conn, batch: Dict[Key, List[int]]) -> int:
+    """Grava os contadores em ingest_activity e duplicate_stats (2 statements); devolve quantas chaves."""
+    if not batch:
+        return 0
+    cols = activity_columns(batch)
+    await conn.execute(ACTIVITY_UPSERT, cols)
+    if any(cols['duplicates']):
+        await conn.execute(DUPLICATE_STATS_UPSERT, {k: cols[k] for k in
+                                                    ('endpoint', 'symbol', 'timeframe', 'minute', 'duplicates')})
+    return len(batch)
@@ -0,0 +1,174 @@
+"""
+Ingest Store - caminho de escrita set-based para ticks/ingest_log
+Grava o batch do EA, já validado por payload.validate_batch, com um número
+constante de statements (unnest de arrays), em vez de 2 INSERTs por item.
+"""
+from typing import Callable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from payload import parse_ts_ms
+
+ROW_FIELDS = ('symbol', 'ts_ms', 'timeframe', 'open', 'high', 'low', 'close', 'volume', 'kind')
+
+TICKS_BULK_INSERT = text("""
+    INSERT INTO ticks(symbol, ts_ms, timeframe, open, high, low, close, volume, kind, meta)
+    SELECT * FROM unnest(
+        CAST(:symbol AS text[]), CAST(:ts_ms AS bigint[]), CAST(:timeframe AS text[]),
+        CAST(:open AS float8[]), CAST(:high AS float8[]), CAST(:low AS float8[]),
+        CAST(:close AS float8[]), CAST(:volume AS float8[]), CAST(:kind AS text[]),
+        CAST(:meta AS jsonb[])
+    )
+    ON CONFLICT (symbol, ts_ms) DO NOTHING
+    RETURNING symbol, ts_ms
+""")
+
+INGEST_LOG_BULK_INSERT = text("""
+    INSERT INTO ingest_log(symbol, ts_ms, timeframe, open, high, low, close, volume, kind, was_duplicate, source_ip, user_agent)
+    SELECT b.*, CAST(:ip AS text), CAST(:ua AS text) FROM unnest(
+        CAST(:symbol AS text[]), CAST(:ts_ms AS bigint[]), CAST(:timeframe AS text[]),
+        CAST(:open AS float8[]), CAST(:high AS float8[]), CAST(:low AS float8[]),
+        CAST(:close AS float8[]), CAST(:volume AS float8[]), CAST(:kind AS text[]),
+        CAST(:was_duplicate AS boolean[])
+    ) AS b
+""")
+
+FORWARD_AUDIT_UPSERT = text("""
+    INSERT INTO forward_audit(symbol, ts_ms, endpoint, status, last_status_code)
+    SELECT DISTINCT k.symbol, k.ts_ms, CAST(:endpoint AS text), CAST(:status AS text), CAST(:code AS int)
+    FROM unnest(CAST(:symbol AS text[]), CAST(:ts_ms AS bigint[])) AS k(symbol, ts_ms)
+    ON CONFLICT (symbol, ts_ms, endpoint)
+    DO UPDATE SET status = EXCLUDED.status, last_status_code = EXCLUDED.last_status_code
+""")
+
+FORWARD_AUDIT_CONFIRM = text("""
+    UPDATE forward_audit f
+    SET status = 'confirmed', confirm_at = now(), last_status_code = CAST(:code AS int)
+    FROM unnest(CAST(:symbol AS text[]), CAST(:ts_ms AS bigint[])) AS k(symbol, ts_ms)
+    WHERE f.symbol = k.symbol AND f.ts_ms = k.ts_ms AND f.endpoint = CAST(:endpoint AS text)
+""")
+
+
+def extract_items(data) -> list:
+    """EA envia {"items": [...]}; aceita também lista pura ou item único."""
+    if isinstance(data, dict):
+        items = data.get('items')
+        return items if isinstance(items, list) else [data]
+    if isinstance(data, list):
+        return data
+    raise HTTPException(status_code=400, detail="invalid payload type")
+
+
+def item_key(it) -> Optional[Tuple[str, int]]:
+    """Chave (symbol, ts_ms) de um item cru do payload, ou None se inválido."""
+    try:
+        symbol = it.get('symbol')
+        return (symbol, parse_ts_ms(it.get('ts'))) if symbol else None
+    except Exception:
+        return None
+
+
+def columns(rows: List[dict], fields) -> dict:
+    """Transpõe linhas em arrays por coluna (parâmetros do unnest)."""
+    return {f: [r[f] for r in rows] for f in fields}
+
+
+def duplicate_flags(keys, new_keys) -> List[bool]:
+    """
+    Marca duplicatas por linha a partir das chaves devolvidas pelo RETURNING
+
+    A primeira ocorrência de cada chave inserida conta como nova; repetições
+    dentro do mesmo batch e chaves que já existiam são duplicatas.
+    """
+    pending = set(new_keys)
+    flags = []
+    for key in keys:
+        if key in pending:
+            pending.discard(key)
+            flags.append(False)
+        else:
+            flags.append(True)
+    return flags
+
+
+async def insert_columns_bulk(conn, cols: dict, source_ip, user_agent,
+                              log_rows: Optional[List[int]] = None) -> List[bool]:
+    """
+    Grava o batch já em colunas (ROW_FIELDS + 'meta') em ticks e ingest_log com 2 statements
+
+    Args:
+        log_rows: índices que vão para o ingest_log (None = todos, [] = nenhum; ver IngestLogPolicy)
+
+    Returns:
+        Flags was_duplicate por linha (mesma ordem das colunas)
+    """
+    new_keys = await insert_ticks_columns(conn, cols)
+    flags = duplicate_flags(zip(cols['symbol'], cols['ts_ms']), new_keys)
+    await insert_log_columns(conn, cols, flags, source_ip, user_agent, log_rows)
+    return flags
+
+
+async def insert_log_columns(conn, cols: dict, flags: List[bool], source_ip, user_agent,
+                             log_rows: Optional[List[int]] = None) -> None:
+    """ingest_log das linhas escolhidas (None = todas, [] = nenhuma) com as flags já calculadas."""
+    if log_rows is None:
+        log_params = {f: cols[f] for f in ROW_FIELDS}
+        log_params['was_duplicate'] = flags
+    elif log_rows:
+        log_params = {f: [cols[f][i] for i in log_rows] for f in ROW_FIELDS}
+        log_params['was_duplicate'] = [flags[i] for i in log_rows]
+    else:
+        return
+    log_params.update({'ip': source_ip, 'ua': user_agent})
+    await conn.execute(INGEST_LOG_BULK_INSERT, log_params)
+
+
+async def insert_batches_bulk(conn, batch, select_log: Callable[[int], Optional[List[int]]]) -> List[List[bool]]:
+    """
+    Várias requests do /ingest na mesma transação (fila do shard_writer): um INSERT em ticks
+    para todas e o ingest_log de cada uma com o IP/User-Agent dela
+
+    Args:
+        batch: [(cols, (source_ip, user_agent)), ...]
+        select_log: IngestLogPolicy.select
+
+    Returns:
+        Flags was_duplicate de cada request (a primeira ocorrência de uma chave no batch é a nova)
+    """
+    merged = {f: [v for cols, _ in batch for v in cols[f]] for f in ROW_FIELDS + ('meta',)}
+    new_keys = await insert_ticks_columns(conn, merged)
+    flags = duplicate_flags(zip(merged['symbol'], merged['ts_ms']), new_keys)
+    out, offset = [], 0
+    for cols, (source_ip, user_agent) in batch:
+        n = len(cols['symbol'])
+        part = flags[offset:offset + n]
+        offset += n
+        await insert_log_columns(conn, cols, part, source_ip, user_agent, select_log(n))
+        out.append(part)
+    return out
+
+
+async def insert_ticks_columns(conn, cols: dict) -> List[Tuple[str, int]]:
+    """Só ticks (caminho do /ingest/tick, sem ingest_log); devolve as chaves realmente inseridas."""
+    params = {f: cols[f] for f in ROW_FIELDS + ('meta',)}
+    return [(r[0], r[1]) for r in await conn.execute(TICKS_BULK_INSERT, params)]
+
+
+def _key_columns(keys) -> dict:
+    return {'symbol': [k[0] for k in keys], 'ts_ms': [k[1] for k in keys]}
+
+
+async def upsert_forward_audit(conn, endpoint: str, keys, status: str, code) -> None:
+    """Registra o resultado do forward para o batch inteiro em um único statement."""
+    params = _key_columns(keys)
+    params.update({'endpoint': endpoint, 'status': status, 'code': code})
+    await conn.execute(FORWARD_AUDIT_UPSERT, params)
+
+
+async def confirm_forward_audit(conn, endpoint: str, keys, code) -> int:
+    """Marca o batch inteiro como 'confirmed' em um único UPDATE; devolve linhas afetadas."""
+    params = _key_columns(keys)
+    params.update({'endpoint': endpoint, 'code': code})
+    result = await conn.execute(FORWARD_AUDIT_CONFIRM, params)
+    return result.rowcount
@@ -0,0 +1,258 @@
+"""
+Lite Analytics - snapshots Parquet dos períodos fechados da API lite e agregações vetorizadas (/analytics/*)
+Com ANALYTICS_MODE=1 a API copia, de tempos em tempos, as linhas de ticks e
+raw_ticks com tempo entre a marca d'água (watermark) e o início do período
+corrente (dia, ou o período de SQLITE_PARTITION) para <dir>/<tabela>/from_<ms>.parquet
+(zstd, em lotes de BATCH_ROWS, memória constante) e avança a marca. Cada rodada
+lê só o intervalo novo; um período já fechado não é relido.
+As consultas (contagem por símbolo, OHLC reamostrado, spread) rodam com
+pyarrow.compute sobre o dataset Parquet, com filtro de símbolo/tempo empurrado
+para a leitura, em vez de varrer o SQLite linha a linha. Ticks gravados depois
+que o período fechou (backfill atrasado) só entram com rebuild().
+"""
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException
+
+from payload import parse_ts_ms
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # opcional: sem pyarrow o modo analítico fica desligado
+    pa = None
+
+log = logging.getLogger("api-lite.analytics")
+
+BATCH_ROWS = 100_000
+MAX_CANDLES = 10_000
+STATE_FILE = 'watermark.json'
+
+# tabela -> (coluna de tempo, colunas e tipos Arrow); mesmas colunas do SQLite
+TABLES = {
+    'ticks': ('ts_ms', (('symbol', 'string'), ('ts_ms', 'int64'), ('timeframe', 'string'), ('open', 'double'),
+                        ('high', 'double'), ('low', 'double'), ('close', 'double'), ('volume', 'double'))),
+    'raw_ticks': ('time_msc', (('symbol', 'string'), ('time_msc', 'int64'), ('bid', 'double'), ('ask', 'double'),
+                               ('last', 'double'), ('volume', 'int64'), ('flags', 'int32'))),
+}
+# 'tick' = raw_ticks (bid), 'bar' = ticks (barras do EA), como no GET /candles da API principal
+SOURCES = {'tick': 'raw_ticks', 'bar': 'ticks'}
+# só barras de base entram no OHLC (M5/H1 enviadas pelo EA contariam em dobro), igual a migration_003_candles.sql
+BASE_TIMEFRAMES = ('M1', 'tick')
+
+
+def available() -> bool:
+    return pa is not None
+
+
+def arrow_schema(table: str):
+    return pa.schema([(name, pa.type_for_alias(t)) for name, t in TABLES[table][1]])
+
+
+def parse_range(from_: Optional[str], to: Optional[str]):
+    """from/to opcionais (epoch ms ou ISO8601) -> (from_ms, to_ms); None = sem limite."""
+    try:
+        from_ms = parse_ts_ms(from_) if from_ is not None else None
+        to_ms = parse_ts_ms(to) if to is not None else None
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid from/to")
+    if from_ms is not None and to_ms is not None and from_ms >= to_ms:
+        raise HTTPException(status_code=400, detail="from must be before to")
+    return from_ms, to_ms
+
+
+def parse_symbols(symbol: Optional[str]) -> Optional[List[str]]:
+    symbols = sorted({s.strip() for s in (symbol or '').split(',') if s.strip()})
+    return symbols or None
+
+
+class Snapshots:
+    """
+    Diretório de snapshots Parquet + marca d'água por tabela
+
+    Usage:
+        snaps = Snapshots(root)
+        snaps.refresh(files_since, closed_until)   # files_since(ms) -> arquivos SQLite com dados >= ms
+        table = snaps.scan('raw_ticks', ['symbol', 'bid', 'ask'], symbols=['EURUSD'])
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    def state(self) -> Dict[str, dict]:
+        try:
+            return json.loads((self.root / STATE_FILE).read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def watermark(self, table: str) -> Optional[int]:
+        return self.state().get(table, {}).get('watermark')
+
+    def _save_state(self, state: Dict[str, dict]):
+        tmp = self.root / (STATE_FILE + '.tmp')
+        tmp.write_text(json.dumps(state, indent=2))
+        os.replace(tmp, self.root / STATE_FILE)
+
+    @staticmethod
+    def _open(path) -> sqlite3.Connection:
+        # somente leitura e fora do LiteDB: a cópia longa não ocupa a thread de escrita (WAL: não bloqueia o escritor)
+        return sqlite3.connect(Path(path).resolve().as_uri() + "?mode=ro", uri=True)
+
+    def refresh(self, files_since: Callable[[int], Sequence], closed_until: int) -> Dict[str, int]:
+        """
+        Copia [watermark, closed_until) de cada tabela para um Parquet novo e avança a marca
+
+        Returns:
+            linhas gravadas por tabela
+        """
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            state = self.state()
+            written = {}
+            for table in TABLES:
+                entry = state.get(table, {})
+                start = entry.get('watermark')
+                if start is not None and start >= closed_until:
+                    continue
+                rows = self._copy(table, files_since(start if start is not None else 0), start, closed_until)
+                state[table] = {
+                    'watermark': closed_until,
+                    'rows': entry.get('rows', 0) + rows,
+                    'files': entry.get('files', 0) + (1 if rows else 0),
+                }
+                # a marca só avança depois do arquivo estar no lugar; arquivo nomeado pelo início = reexecução idempotente
+                self._save_state(state)
+                written[table] = rows
+            return written
+
+    def _copy(self, table: str, files: Sequence, start: Optional[int], end: int) -> int:
+        time_col, columns = TABLES[table]
+        schema = arrow_schema(table)
+        names = ', '.join(name for name, _ in columns)
+        lower = start if start is not None else -(1 << 62)
+        out_dir = self.root / table
+        out_dir.mkdir(parents=True, exist_ok=True)
+        # .tmp fora do diretório do dataset: a leitura nunca vê arquivo pela metade
+        tmp = self.root / f".{table}-{lower}.parquet.tmp"
+        writer, rows = None, 0
+        try:
+            for path in files:
+                if not Path(path).exists():
+                    continue  # partição apagada pela retenção entre a listagem e a leitura
+                conn = self._open(path)
+                try:
+                    cur = conn.execute(f"SELECT {names} FROM {table} WHERE {time_col} >= ? AND {time_col} < ?",
+                                       (lower, end))
+                    while True:
+                        chunk = cur.fetchmany(BATCH_ROWS)
+                        if not chunk:
+                            break
+                        arrays = [pa.array(col, type=field.type) for col, field in zip(zip(*chunk), schema)]
+                        if writer is None:
+                            writer = pq.ParquetWriter(tmp, schema, compression='zstd')
+                        writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+                        rows += len(chunk)
+                finally:
+                    conn.close()
+        except BaseException:
+            if writer is not None:
+                writer.close()
+            tmp.unlink(missing_ok=True)
+            raise
+        if writer is not None:
+            writer.close()
+            os.replace(tmp, out_dir / f"from_{max(lower, 0)}.parquet")
+        if rows:
+            log.info(f"Analytics snapshot: {table} | rows={rows} | until={end}")
+        return rows
+
+    def rebuild(self):
+        """Descarta snapshots e marcas; a próxima refresh() copia tudo de novo."""
+        with self._lock:
+            for table in TABLES:
+                shutil.rmtree(self.root / table, ignore_errors=True)
+            (self.root / STATE_FILE).unlink(missing_ok=True)
+
+    def scan(self, table: str, columns: List[str], symbols: Optional[List[str]] = None,
+             from_ms: Optional[int] = None, to_ms: Optional[int] = None):
+        """Colunas do dataset com filtro de símbolo/tempo aplicado na leitura dos Parquet."""
+        time_col = TABLES[table][0]
+        schema = arrow_schema(table)
+        path = self.root / table
+        files = sorted(str(p) for p in path.glob('*.parquet')) if path.is_dir() else []
+        if not files:
+            return schema.empty_table().select(columns)
+        cond = None
+        for part in (ds.field('symbol').isin(symbols) if symbols else None,
+                     ds.field(time_col) >= from_ms if from_ms is not None else None,
+                     ds.field(time_col) < to_ms if to_ms is not None else None):
+            if part is not None:
+                cond = part if cond is None else cond & part
+        return ds.dataset(files, schema=schema, format='parquet').to_table(columns=columns, filter=cond)
+
+
+def symbol_counts(table, time_col: str) -> List[dict]:
+    """Linhas, primeiro e último timestamp por símbolo (maior contagem primeiro)."""
+    if table.num_rows == 0:
+        return []
+    g = table.group_by('symbol').aggregate([('symbol', 'count'), (time_col, 'min'), (time_col, 'max')])
+    g = g.sort_by([('symbol_count', 'descending'), ('symbol', 'ascending')])
+    return [{"symbol": r['symbol'], "count": r['symbol_count'], "first_ms": r[f'{time_col}_min'],
+             "last_ms": r[f'{time_col}_max']} for r in g.to_pylist()]
+
+
+def resample_ohlc(table, source: str, tf_ms: int, limit: int = MAX_CANDLES) -> List[dict]:
+    """
+    OHLCV por (símbolo, bucket de tf_ms)
+
+    source 'tick': colunas symbol, time_msc, bid, volume (preço = bid)
+    source 'bar': colunas symbol, ts_ms, timeframe, open, high, low, close, volume (só barras de base)
+    """
+    if source == 'tick':
+        time_col = 'time_msc'
+        price = table['bid']
+        o = h = l = c = price
+    else:
+        time_col = 'ts_ms'
+        tf = pc.coalesce(table['timeframe'], pa.scalar('M1'))
+        table = table.filter(pc.is_in(tf, value_set=pa.array(BASE_TIMEFRAMES)))
+        o = pc.coalesce(table['open'], table['close'])
+        h = pc.coalesce(table['high'], table['close'])
+        l = pc.coalesce(table['low'], table['close'])
+        c = pc.coalesce(table['close'], table['open'])
+    if table.num_rows == 0:
+        return []
+    bucket = pc.multiply(pc.divide(table[time_col], tf_ms), tf_ms)
+    work = pa.table({'symbol': table['symbol'], 't': table[time_col], 'bucket': bucket,
+                     'o': o, 'h': h, 'l': l, 'c': c, 'v': pc.cast(table['volume'], pa.float64())})
+    # first/last dependem da ordem: ordena por tempo e agrega sem threads
+    work = work.sort_by([('symbol', 'ascending'), ('t', 'ascending')])
+    g = work.group_by(['symbol', 'bucket'], use_threads=False).aggregate(
+        [('o', 'first'), ('h', 'max'), ('l', 'min'), ('c', 'last'), ('v', 'sum'), ('t', 'count')])
+    g = g.sort_by([('symbol', 'ascending'), ('bucket', 'ascending')]).slice(0, limit)
+    return [{"symbol": r['symbol'], "ts": r['bucket'], "open": r['o_first'], "high": r['h_max'], "low": r['l_min'],
+             "close": r['c_last'], "volume": r['v_sum'], "ticks": r['t_count']} for r in g.to_pylist()]
+
+
+def spread_stats(table) -> List[dict]:
+    """Spread (ask - bid) por símbolo: média, desvio, mínimo, máximo, p50 e p95 (t-digest)."""
+    if table.num_rows == 0:
+        return []
+    work = pa.table({'symbol': table['symbol'], 'spread': pc.subtract(table['ask'], table['bid'])})
+    g = work.group_by('symbol').aggregate([
+        ('spread', 'count'), ('spread', 'mean'), ('spread', 'stddev'), ('spread', 'min'), ('spread', 'max'),
+        ('spread', 'tdigest', pc.TDigestOptions(q=[0.5, 0.95])),
+    ]).sort_by('symbol')
+    return [{"symbol": r['symbol'], "count": r['spread_count'], "mean": r['spread_mean'],
+             "stddev": r['spread_stddev'], "min": r['spread_min'], "max": r['spread_max'],
+             "p50": r['spread_tdigest'][0], "p95": r['spread_tdigest'][1]} for r in g.to_pylist()]
@@ -0,0 +1,142 @@
+"""
+Lite DB - conexões SQLite de longa duração para a API lite (main_lite.py)
+Uma conexão de escrita atrás de um lock, aberta uma vez no startup em modo
+WAL: leitores de fora (exporter, snapshots do lite_analytics) não bloqueiam o
+escritor e o commit não reescreve o journal inteiro. Os statements são
+constantes e ficam no cache de statements preparados da conexão
+(cached_statements) entre requests. O trabalho bloqueante roda fora do event
+loop, em uma thread dedicada (fila implícita do executor de 1 thread).
+"""
+import asyncio
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator, List, Optional, TypeVar
+
+T = TypeVar('T')
+
+log = logging.getLogger("api-lite.db")
+
+DEFAULT_CACHE_MB = 64
+DEFAULT_MMAP_MB = 256
+BUSY_TIMEOUT_MS = 5000
+STATEMENT_CACHE = 256
+
+
+def pragmas(cache_mb: int = DEFAULT_CACHE_MB, mmap_mb: int = DEFAULT_MMAP_MB, schema: Optional[str] = None) -> List[str]:
+    # synchronous=NORMAL em WAL: fsync só no checkpoint; queda de energia perde no máximo os últimos commits
+    # schema: banco anexado (ATTACH); journal/cache/mmap são por banco, temp_store/busy_timeout por conexão
+    prefix = f"{schema}." if schema else ""
+    stmts = [
+        f"PRAGMA {prefix}journal_mode=WAL",
+        f"PRAGMA {prefix}synchronous=NORMAL",
+        f"PRAGMA {prefix}cache_size=-{int(cache_mb) * 1024}",
+        f"PRAGMA {prefix}mmap_size={int(mmap_mb) * 1024 * 1024}",
+    ]
+    if schema is None:
+        stmts += ["PRAGMA temp_store=MEMORY", f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}"]
+    return stmts
+
+
+def connect(path, cache_mb: int = DEFAULT_CACHE_MB, mmap_mb: int = DEFAULT_MMAP_MB) -> sqlite3.Connection:
+    """Conexão configurada; isolation_level=None = transações explícitas (BEGIN/COMMIT)."""
+    conn = sqlite3.connect(str(path), isolation_level=None, check_same_thread=False,
+                           cached_statements=STATEMENT_CACHE)
+    for stmt in pragmas(cache_mb, mmap_mb):
+        conn.execute(stmt)
+    return conn
+
+
+class LiteDB:
+    """
+    Escritor único sobre o arquivo (e as partições anexadas)
+
+    Usage:
+        db = LiteDB(path); db.open()
+        with db.writer() as conn:   # BEGIN IMMEDIATE ... COMMIT (ROLLBACK em exceção)
+            conn.executemany(SQL, rows)
+        n = await db.write(insert_fn, rows)   # a partir do event loop
+        db.attach('p_20250101', other_path)   # na thread de escrita, fora de transação
+    """
+
+    def __init__(self, path, cache_mb: int = DEFAULT_CACHE_MB, mmap_mb: int = DEFAULT_MMAP_MB):
+        self.path = Path(path)
+        self.cache_mb = cache_mb
+        self.mmap_mb = mmap_mb
+        self._writer: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._writer is not None
+
+    def open(self):
+        if self.is_open:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._writer = connect(self.path, self.cache_mb, self.mmap_mb)
+        mode = self._writer.execute("PRAGMA journal_mode").fetchone()[0]
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+        log.info(f"SQLite open: {self.path} | journal={mode} | "
+                 f"cache={self.cache_mb}MB | mmap={self.mmap_mb}MB")
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)  # escritas já enfileiradas terminam antes do checkpoint
+            self._executor = None
+        if self._writer is not None:
+            with self._write_lock:
+                # checkpoint no fechamento (sem schema = todos os bancos anexados): o .db fica completo sem depender do -wal
+                self._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self._writer.close()
+                self._writer = None
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """Conexão de escrita em uma transação; um escritor por vez."""
+        if self._writer is None:
+            raise RuntimeError("database not open")
+        with self._write_lock:
+            conn = self._writer
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def attach(self, schema: str, path):
+        """ATTACH de outro arquivo na conexão de escrita (fora de transação), com os mesmos pragmas."""
+        if self._writer is None:
+            raise RuntimeError("database not open")
+        with self._write_lock:
+            self._writer.execute("ATTACH DATABASE ? AS " + schema, (str(path),))
+            for stmt in pragmas(self.cache_mb, self.mmap_mb, schema):
+                self._writer.execute(stmt)
+
+    def detach(self, schema: str):
+        if self._writer is None:
+            raise RuntimeError("database not open")
+        with self._write_lock:
+            self._writer.execute("DETACH DATABASE " + schema)
+
+    async def call(self, fn: Callable[..., T], *args: Any) -> T:
+        """fn(*args) na thread de escrita, sem transação aberta (fn usa writer()/attach() por conta própria)."""
+        if self._executor is None:
+            raise RuntimeError("database not open")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def write(self, fn: Callable[..., T], *args: Any) -> T:
+        """fn(conn, *args) em uma transação na thread de escrita; requests concorrentes entram em fila."""
+        if self._executor is None:
+            raise RuntimeError("database not open")
+
+        def run():
+            with self.writer() as conn:
+                return fn(conn, *args)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, run)
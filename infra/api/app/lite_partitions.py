@@ -0,0 +1,194 @@
+"""
+Lite Partitions - um arquivo SQLite por dia ou semana para a API lite (SQLITE_PARTITION=day|week)
+Cada linha vai para o arquivo do período do seu timestamp (UTC; semana começa
+na segunda): <dir>/ticks_YYYYMMDD.db com ticks, raw_ticks e row_counts próprios.
+O escritor anexa (ATTACH) o arquivo sob demanda como schema p_YYYYMMDD e mantém
+no máximo max_attached anexados (LRU). O período corrente é pequeno e cabe no
+cache; inserir não paga a B-tree de meses de dados.
+Partições antigas saem inteiras: DETACH + apagar o arquivo, O(1) e sem VACUUM.
+O ea.db principal continua existindo e guarda o que foi gravado antes do modo
+particionado (é lido junto, como a parte mais antiga).
+INSERT OR IGNORE só deduplica dentro de um arquivo: linhas que já estão no ea.db
+principal são filtradas antes (existing_keys), e linhas mais antigas que a
+retenção não são gravadas (cutoff_ms), senão criariam um arquivo já expirado.
+"""
+import logging
+import re
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+log = logging.getLogger("api-lite.partitions")
+
+PERIODS = {'day': 1, 'week': 7}
+# o SQLite aceita 10 bancos anexados por conexão (SQLITE_MAX_ATTACHED padrão)
+MAX_ATTACHED = 8
+PREFIX = 'ticks'
+_KEY = re.compile(r'^' + PREFIX + r'_(\d{8})\.db$')
+
+
+def default_root(db_path) -> Path:
+    """Diretório das partições ao lado do banco principal: data/ea.db -> data/ea-parts/."""
+    db_path = Path(db_path)
+    return db_path.parent / f"{db_path.stem}-parts"
+
+
+def key_start_ms(key: str) -> int:
+    d = datetime.strptime(key, '%Y%m%d').replace(tzinfo=timezone.utc)
+    return int(d.timestamp() * 1000)
+
+
+def period_start(ts_ms: int, period: str = 'day') -> date:
+    d = datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).date()
+    if period == 'week':
+        d -= timedelta(days=d.weekday())
+    return d
+
+
+def period_start_ms(ts_ms: int, period: str = 'day') -> int:
+    """Início (epoch ms, UTC) do dia/semana que contém ts_ms."""
+    return key_start_ms(period_start(ts_ms, period).strftime('%Y%m%d'))
+
+
+def list_keys(root) -> List[str]:
+    """Chaves (YYYYMMDD do início do período) dos arquivos de partição existentes, em ordem."""
+    root = Path(root)
+    if not root.is_dir():
+        return []
+    return sorted(m.group(1) for m in (_KEY.match(p.name) for p in root.iterdir()) if m)
+
+
+def existing_keys(conn, table: str, time_col: str, keys: Sequence[Tuple[str, int]],
+                  schema: str = 'main') -> Set[Tuple[str, int]]:
+    """(symbol, tempo) de keys que já existem em schema.table; uma busca pela PK/UNIQUE por chave."""
+    stmt = f"SELECT 1 FROM {schema}.{table} WHERE symbol = ? AND {time_col} = ?"
+    return {k for k in keys if conn.execute(stmt, k).fetchone() is not None}
+
+
+def partition_files(root, since_ms: Optional[int] = None) -> List[Path]:
+    """
+    Arquivos de partição em ordem de tempo; com since_ms pula os que terminam antes
+    (o fim de uma partição é o início da seguinte, então não depende de day/week)
+    """
+    keys = list_keys(root)
+    files = []
+    for i, key in enumerate(keys):
+        if since_ms is not None and i + 1 < len(keys) and key_start_ms(keys[i + 1]) <= since_ms:
+            continue
+        files.append(Path(root) / f"{PREFIX}_{key}.db")
+    return files
+
+
+class Partitions:
+    """
+    Arquivos por período e o conjunto anexado à conexão de escrita
+
+    Args:
+        root: diretório dos arquivos
+        period: 'day' ou 'week'
+        keep: partições mantidas (a corrente inclusa); 0 = nunca apaga
+        max_attached: arquivos anexados ao escritor ao mesmo tempo
+
+    Usage (na thread de escrita):
+        for key, rows in parts.split(rows, ts_index=1).items():
+            schema, new = parts.attach(db, key, setup)   # setup(schema) cria tabelas/contadores
+            ... INSERT INTO {schema}.ticks ...
+    """
+
+    def __init__(self, root, period: str = 'day', keep: int = 0, max_attached: int = MAX_ATTACHED):
+        if period not in PERIODS:
+            raise ValueError(f"invalid partition period: {period!r} (use {', '.join(PERIODS)})")
+        self.root = Path(root)
+        self.period = period
+        self.keep = max(0, keep)
+        self.max_attached = max(1, max_attached)
+        self._attached: "OrderedDict[str, str]" = OrderedDict()
+
+    def start_of(self, ts_ms: int) -> date:
+        return period_start(ts_ms, self.period)
+
+    def key_of(self, ts_ms: int) -> str:
+        return self.start_of(ts_ms).strftime('%Y%m%d')
+
+    def path(self, key: str) -> Path:
+        return self.root / f"{PREFIX}_{key}.db"
+
+    @staticmethod
+    def schema(key: str) -> str:
+        return f"p_{key}"
+
+    def keys(self) -> List[str]:
+        return list_keys(self.root)
+
+    @property
+    def attached(self) -> List[str]:
+        return list(self._attached)
+
+    def reset(self):
+        """Conexão de escrita reaberta: nada está anexado."""
+        self._attached.clear()
+
+    def split(self, rows: Sequence[tuple], ts_index: int) -> Dict[str, List[tuple]]:
+        """Linhas por partição (ordem original dentro de cada uma, partições em ordem de tempo)."""
+        parts: Dict[str, List[tuple]] = {}
+        for row in rows:
+            parts.setdefault(self.key_of(row[ts_index]), []).append(row)
+        return dict(sorted(parts.items()))
+
+    def _cutoff(self, now_ms: int) -> Optional[date]:
+        if not self.keep:
+            return None
+        return self.start_of(now_ms) - timedelta(days=PERIODS[self.period] * (self.keep - 1))
+
+    def cutoff_ms(self, now_ms: int) -> Optional[int]:
+        """Início (epoch ms) da partição mais antiga mantida; linhas antes disso já estão expiradas. None = sem retenção."""
+        cutoff = self._cutoff(now_ms)
+        return None if cutoff is None else key_start_ms(cutoff.strftime('%Y%m%d'))
+
+    def expired(self, now_ms: int) -> List[str]:
+        """Partições além das keep mais recentes até agora."""
+        cutoff = self._cutoff(now_ms)
+        if cutoff is None:
+            return []
+        return [k for k in self.keys() if k < cutoff.strftime('%Y%m%d')]
+
+    def attach(self, db, key: str, setup: Callable[[str], None]) -> Tuple[str, bool]:
+        """
+        Anexa a partição ao escritor se ainda não estiver (cria o arquivo se preciso)
+
+        Returns:
+            (schema, new_file); setup(schema) roda a cada ATTACH (DDL idempotente + carga dos contadores)
+        """
+        if key in self._attached:
+            self._attached.move_to_end(key)
+            return self._attached[key], False
+        while len(self._attached) >= self.max_attached:
+            old, old_schema = self._attached.popitem(last=False)
+            db.detach(old_schema)
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.path(key)
+        new_file = not path.exists()
+        schema = self.schema(key)
+        db.attach(schema, path)
+        self._attached[key] = schema
+        setup(schema)
+        if new_file:
+            log.info(f"SQLite partition created: {path}")
+        return schema, new_file
+
+    def drop(self, db, key: str) -> bool:
+        """DETACH (se anexada) e apaga o arquivo com -wal/-shm; False se o arquivo estiver em uso."""
+        schema = self._attached.pop(key, None)
+        if schema is not None:
+            db.detach(schema)
+        path = self.path(key)
+        try:
+            for p in (path, path.with_name(path.name + '-wal'), path.with_name(path.name + '-shm')):
+                p.unlink(missing_ok=True)
+        except OSError as e:
+            # Windows: arquivo aberto por outro processo (exporter); tenta de novo na próxima virada
+            log.warning(f"SQLite partition drop failed: {path} | err={e}")
+            return False
+        log.info(f"SQLite partition dropped: {path}")
+        return True
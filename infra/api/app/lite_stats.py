@@ -0,0 +1,150 @@
+"""
+Lite Stats - contadores de linhas por (tabela, símbolo) para o /stats e /health da API lite
+Triggers AFTER INSERT/DELETE em ticks e raw_ticks mantêm a tabela row_counts
+(só contam linhas realmente inseridas, então INSERT OR IGNORE de duplicata não
+conta). A API carrega row_counts em memória no startup e, depois de cada
+escrita, relê só as linhas dos símbolos do batch; /health e /stats respondem
+com o dicionário em memória, sem varrer ticks. rebuild() refaz tudo a partir
+das tabelas (?exact=1).
+Com partições (lite_partitions.py) cada arquivo tem seu row_counts e o
+RowCounts soma as partes; descartar uma partição é drop(part).
+"""
+import heapq
+import logging
+from typing import Dict, Iterable, List, Optional
+
+log = logging.getLogger("api-lite.stats")
+
+TABLES = ('ticks', 'raw_ticks')
+
+COUNTS_TABLE = """
+    CREATE TABLE IF NOT EXISTS {schema}.row_counts (
+        tbl TEXT NOT NULL,
+        symbol TEXT NOT NULL,
+        n INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (tbl, symbol)
+    ) WITHOUT ROWID
+"""
+
+# Trigger de um banco anexado só enxerga o próprio banco: row_counts sem schema no corpo
+TRIGGERS = """
+    CREATE TRIGGER IF NOT EXISTS {schema}.trg_{tbl}_count_ins AFTER INSERT ON {tbl} BEGIN
+        INSERT INTO row_counts(tbl, symbol, n) VALUES ('{tbl}', NEW.symbol, 1)
+        ON CONFLICT(tbl, symbol) DO UPDATE SET n = n + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS {schema}.trg_{tbl}_count_del AFTER DELETE ON {tbl} BEGIN
+        UPDATE row_counts SET n = n - 1 WHERE tbl = '{tbl}' AND symbol = OLD.symbol;
+    END;
+"""
+
+
+def _has_triggers(conn, schema: str) -> bool:
+    row = conn.execute(f"SELECT COUNT(*) FROM {schema}.sqlite_master "
+                       "WHERE type = 'trigger' AND name LIKE 'trg_%_count_ins'")
+    return row.fetchone()[0] == len(TABLES)
+
+
+def install(conn, schema: str = 'main') -> bool:
+    """
+    Cria row_counts e os triggers (na transação do escritor, depois do schema das tabelas)
+
+    Returns:
+        True se os triggers foram criados agora (banco antigo): as contagens são refeitas uma vez
+    """
+    created = not _has_triggers(conn, schema)
+    conn.execute(COUNTS_TABLE.format(schema=schema))
+    for tbl in TABLES:
+        for stmt in TRIGGERS.format(schema=schema, tbl=tbl).split("END;"):
+            if stmt.strip():
+                conn.execute(stmt + "END;")
+    if created:
+        rebuild(conn, schema)
+        if conn.execute(f"SELECT 1 FROM {schema}.row_counts LIMIT 1").fetchone():
+            log.info(f"row_counts rebuilt from existing tables ({schema})")
+    return created
+
+
+def rebuild(conn, schema: str = 'main'):
+    """Recalcula row_counts com um GROUP BY por tabela (O(linhas); startup de banco antigo ou ?exact=1)."""
+    conn.execute(f"DELETE FROM {schema}.row_counts")
+    for tbl in TABLES:
+        conn.execute(f"INSERT INTO {schema}.row_counts(tbl, symbol, n) "
+                     f"SELECT '{tbl}', symbol, COUNT(*) FROM {schema}.{tbl} GROUP BY symbol")
+
+
+class RowCounts:
+    """
+    Espelho em memória de row_counts (soma de uma ou mais partes)
+
+    Usage:
+        counts.load(conn)                       # startup
+        counts.refresh(conn, 'ticks', symbols)  # depois da escrita, na mesma transação
+        counts.total('ticks'); counts.top('ticks', 10)
+        counts.load(conn, schema='p_20250101')  # parte anexada; counts.drop('p_20250101') ao descartar
+    """
+
+    def __init__(self):
+        self._parts: Dict[str, Dict[str, Dict[str, int]]] = {}
+        self._counts: Dict[str, Dict[str, int]] = {tbl: {} for tbl in TABLES}
+
+    def _add(self, tbl: str, symbol: str, delta: int):
+        if not delta:
+            return
+        agg = self._counts.setdefault(tbl, {})
+        n = agg.get(symbol, 0) + delta
+        if n > 0:
+            agg[symbol] = n
+        else:
+            agg.pop(symbol, None)
+
+    def load(self, conn, schema: str = 'main', part: Optional[str] = None):
+        """(Re)carrega a parte inteira a partir de {schema}.row_counts; part default = schema."""
+        fresh: Dict[str, Dict[str, int]] = {tbl: {} for tbl in TABLES}
+        for tbl, symbol, n in conn.execute(f"SELECT tbl, symbol, n FROM {schema}.row_counts WHERE n > 0"):
+            fresh.setdefault(tbl, {})[symbol] = n
+        part = part or schema
+        self.drop(part)
+        self._parts[part] = fresh
+        for tbl, per_symbol in fresh.items():
+            for symbol, n in per_symbol.items():
+                self._add(tbl, symbol, n)
+
+    def drop(self, part: str):
+        for tbl, per_symbol in self._parts.pop(part, {}).items():
+            for symbol, n in per_symbol.items():
+                self._add(tbl, symbol, -n)
+
+    def parts(self) -> List[str]:
+        return sorted(self._parts)
+
+    def refresh(self, conn, tbl: str, symbols: Iterable[str], schema: str = 'main', part: Optional[str] = None):
+        symbols = list(set(symbols))
+        if not symbols:
+            return
+        current = self._parts.setdefault(part or schema, {}).setdefault(tbl, {})
+        found = {}
+        # blocos de 500: limite de parâmetros do SQLite
+        for i in range(0, len(symbols), 500):
+            chunk = symbols[i:i + 500]
+            rows = conn.execute(
+                f"SELECT symbol, n FROM {schema}.row_counts WHERE tbl = ? AND symbol IN ({', '.join('?' * len(chunk))})",
+                [tbl, *chunk])
+            found.update(rows)
+        for symbol in symbols:
+            n = found.get(symbol, 0)
+            self._add(tbl, symbol, n - current.get(symbol, 0))
+            if n > 0:
+                current[symbol] = n
+            else:
+                current.pop(symbol, None)
+
+    def total(self, tbl: str) -> int:
+        return sum(self._counts.get(tbl, {}).values())
+
+    def symbols(self, tbl: str) -> int:
+        return len(self._counts.get(tbl, {}))
+
+    def top(self, tbl: str, k: int = 10) -> List[dict]:
+        # empate desempata pelo nome: ordem estável entre chamadas
+        items = heapq.nsmallest(k, self._counts.get(tbl, {}).items(), key=lambda kv: (-kv[1], kv[0]))
+        return [{"symbol": symbol, "count": n} for symbol, n in items]
@@ -0,0 +1,225 @@
+"""
+Live Feed - fan-out em memória de barras/ticks recém-gravados (WebSocket /ws/live e SSE /live/stream)
+O /ingest e o /ingest/tick publicam as linhas novas (não duplicadas) depois do
+commit; cada assinante tem uma fila limitada por (symbol, canal), onde canal é o
+timeframe da barra (M1, H1, ...) ou 'tick'. Assinante lento não segura o caminho
+de escrita: com a fila cheia, 'coalesce' guarda só o último evento de cada
+(symbol, canal) e 'drop' descarta os mais antigos; o cliente recebe um evento
+`gap` com quantos eventos perdeu.
+"""
+import asyncio
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+POLICIES = ('coalesce', 'drop')
+WILDCARD = '*'
+DEFAULT_QUEUE_SIZE = 1000
+
+BAR_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+TICK_FIELDS = ('bid', 'ask', 'last', 'volume', 'flags')
+
+Topic = Tuple[str, str]  # (symbol, canal)
+# on_drop(n) -> métricas de eventos descartados/coalescidos
+DropHook = Callable[[int], None]
+
+
+def parse_list(value: Optional[str], default: Sequence[str] = (WILDCARD,)) -> List[str]:
+    items = [v.strip() for v in (value or '').split(',') if v.strip()]
+    return items or list(default)
+
+
+def parse_channels(value: Optional[str]) -> List[str]:
+    """'tick,m1' -> ['tick', 'M1'] (timeframes em maiúsculas)."""
+    return [c.lower() if c.lower() == 'tick' else c.upper() for c in parse_list(value)]
+
+
+class Subscriber:
+    """
+    Fila limitada de um cliente
+
+    Args:
+        topics: (symbol, canal) assinados; '*' em qualquer posição casa com tudo
+        max_queue: eventos pendentes antes de aplicar a política
+        policy: 'coalesce' (último por tópico) ou 'drop' (descarta os mais antigos)
+    """
+
+    def __init__(self, topics: Iterable[Topic], max_queue: int = DEFAULT_QUEUE_SIZE, policy: str = 'coalesce'):
+        if policy not in POLICIES:
+            raise ValueError(f"invalid policy (use {', '.join(POLICIES)})")
+        self.topics: Set[Topic] = set(topics)
+        self.max_queue = max(1, max_queue)
+        self.policy = policy
+        self.dropped = 0            # total desde a conexão
+        self._gap = 0               # ainda não avisado ao cliente
+        self._queue: deque = deque()
+        self._latest: "OrderedDict[Topic, dict]" = OrderedDict()  # coalescidos
+        self._ready = asyncio.Event()
+        self.closed = False
+
+    def __len__(self):
+        return len(self._queue) + len(self._latest)
+
+    def offer(self, topic: Topic, event: dict) -> int:
+        """Enfileira sem bloquear; devolve quantos eventos foram descartados/coalescidos."""
+        lost = 0
+        if len(self._queue) < self.max_queue and not self._latest:
+            self._queue.append(event)
+        elif self.policy == 'coalesce':
+            # fila cheia: a partir daqui só o último evento de cada tópico, na ordem de chegada
+            if topic in self._latest:
+                self._latest.move_to_end(topic)
+                lost = 1
+            self._latest[topic] = event
+            if len(self._latest) > self.max_queue:
+                self._latest.popitem(last=False)
+                lost += 1
+        else:
+            self._queue.append(event)
+            if len(self._queue) > self.max_queue:
+                self._queue.popleft()
+                lost = 1
+        if lost:
+            self.dropped += lost
+            self._gap += lost
+        self._ready.set()
+        return lost
+
+    def drain(self) -> List[dict]:
+        """Tudo que está pendente (com o aviso de `gap` na frente, se houve perda)."""
+        out = []
+        if self._gap:
+            out.append({'type': 'gap', 'dropped': self._gap})
+            self._gap = 0
+        out.extend(self._queue)
+        out.extend(self._latest.values())
+        self._queue.clear()
+        self._latest.clear()
+        self._ready.clear()
+        return out
+
+    async def get(self, timeout: Optional[float] = None) -> List[dict]:
+        """Espera eventos (ou o timeout -> lista vazia) e devolve todos os pendentes."""
+        if not len(self) and not self._gap and not self.closed:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        return self.drain()
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+
+class LiveFeed:
+    """
+    Registro de assinantes por tópico e publish O(linhas com assinante)
+
+    Usage:
+        sub = feed.subscribe(['EURUSD'], ['tick', 'M1'])
+        feed.publish_ticks(cols, dup_flags)    # no caminho de escrita, após o commit
+        events = await sub.get(timeout=15)
+        feed.unsubscribe(sub)
+    """
+
+    def __init__(self, max_queue: int = DEFAULT_QUEUE_SIZE, policy: str = 'coalesce',
+                 on_drop: Optional[DropHook] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"invalid policy (use {', '.join(POLICIES)})")
+        self.max_queue = max_queue
+        self.policy = policy
+        self.on_drop = on_drop
+        self.published = 0
+        self._subs: Dict[Topic, Set[Subscriber]] = {}
+        self._symbols: Dict[str, int] = {}  # symbol (ou '*') -> nº de tópicos assinados
+
+    @property
+    def subscribers(self) -> int:
+        return len({s for subs in self._subs.values() for s in subs})
+
+    def subscribe(self, symbols: Iterable[str], channels: Iterable[str], max_queue: Optional[int] = None,
+                  policy: Optional[str] = None) -> Subscriber:
+        channels = list(channels)
+        sub = Subscriber([(s, c) for s in symbols for c in channels], max_queue or self.max_queue,
+                         policy or self.policy)
+        for topic in sub.topics:
+            self._subs.setdefault(topic, set()).add(sub)
+            self._symbols[topic[0]] = self._symbols.get(topic[0], 0) + 1
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        sub.close()
+        for topic in sub.topics:
+            subs = self._subs.get(topic)
+            if subs is not None and sub in subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[topic]
+                self._symbols[topic[0]] -= 1
+                if not self._symbols[topic[0]]:
+                    del self._symbols[topic[0]]
+
+    def close_all(self):
+        """Drain do processo: fecha todos os assinantes (as conexões terminam e chamam unsubscribe)."""
+        for sub in {s for subs in self._subs.values() for s in subs}:
+            sub.close()
+
+    def _targets(self, symbol: str, channel: str) -> Set[Subscriber]:
+        out = set()
+        for topic in ((symbol, channel), (symbol, WILDCARD), (WILDCARD, channel), (WILDCARD, WILDCARD)):
+            subs = self._subs.get(topic)
+            if subs:
+                out |= subs
+        return out
+
+    def _publish(self, rows: Iterable[Tuple[str, str, Callable[[], dict]]]) -> int:
+        lost = delivered = 0
+        for symbol, channel, build in rows:
+            targets = self._targets(symbol, channel)
+            if not targets:
+                continue
+            event = build()
+            for sub in targets:
+                lost += sub.offer((symbol, channel), event)
+            delivered += 1
+        self.published += delivered
+        if lost and self.on_drop:
+            self.on_drop(lost)
+        return delivered
+
+    def _new_rows(self, cols: Dict[str, list], dup_flags: Optional[Sequence[bool]]):
+        """Índices das linhas novas cujo símbolo tem assinante (sem dict por linha no caso comum)."""
+        if not self._symbols:
+            return []
+        wildcard = WILDCARD in self._symbols
+        symbols = cols['symbol']
+        if dup_flags is not None and len(dup_flags) != len(symbols):
+            return []  # flags não alinhadas (ex.: falha parcial no modo row): não dá para saber o que foi gravado
+        return [i for i in range(len(symbols))
+                if (dup_flags is None or not dup_flags[i]) and (wildcard or symbols[i] in self._symbols)]
+
+    def publish_bars(self, cols: Dict[str, list], dup_flags: Optional[Sequence[bool]] = None) -> int:
+        """Barras gravadas em ticks (colunas do ingest_store); canal = timeframe ou 'tick'."""
+        def rows():
+            for i in self._new_rows(cols, dup_flags):
+                symbol, timeframe = cols['symbol'][i], cols['timeframe'][i]
+
+                def build(i=i, symbol=symbol, timeframe=timeframe):
+                    event = {'type': 'bar', 'symbol': symbol, 'timeframe': timeframe, 'ts': cols['ts_ms'][i]}
+                    event.update({f: cols[f][i] for f in BAR_FIELDS if f in cols})
+                    return event
+                yield symbol, timeframe or 'tick', build
+        return self._publish(rows())
+
+    def publish_ticks(self, cols: Dict[str, list], dup_flags: Optional[Sequence[bool]] = None) -> int:
+        """Ticks gravados em raw_ticks (colunas RAW_TICK_FIELDS)."""
+        def rows():
+            for i in self._new_rows(cols, dup_flags):
+                symbol = cols['symbol'][i]
+
+                def build(i=i, symbol=symbol):
+                    event = {'type': 'tick', 'symbol': symbol, 'time_msc': cols['time_msc'][i]}
+                    event.update({f: cols[f][i] for f in TICK_FIELDS if f in cols})
+                    return event
+                yield symbol, 'tick', build
+        return self._publish(rows())
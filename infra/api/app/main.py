@@ -1,13 +1,16 @@
-from fastapi import FastAPI, Request, HTTPException, Response
+from fastapi import FastAPI, Request, HTTPException, Response, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, field_validator
 from typing import List, Optional
-from sqlalchemy import create_engine, text
-import os, json, httpx, time, logging
-from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from contextlib import asynccontextmanager
+import os, sys, time, asyncio, logging, dataclasses
+from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST, REGISTRY
 
 # OpenTelemetry imports
 from opentelemetry import trace
-from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
 from opentelemetry.exporter.jaeger.thrift import JaegerExporter
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
@@ -15,17 +18,124 @@ from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
 from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
 from opentelemetry.sdk.resources import SERVICE_NAME, Resource
 
+# Módulos irmãos importáveis tanto em `uvicorn main:app` (Docker) quanto em `uvicorn app.main:app`
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ingest_store import (ROW_FIELDS, extract_items, columns, insert_columns_bulk,
+                          insert_ticks_columns, insert_batches_bulk, item_key, duplicate_flags,
+                          upsert_forward_audit, confirm_forward_audit)
+import columnar
+from forwarder import Forwarder, ForwardChannel
+from freshness import FreshnessTracker, FreshnessCollector
+from group_commit import GroupCommitBuffer
+from shard_writer import ShardedWriter, ShardsFull
+import admission
+from ingest_activity import ActivityCounters, IngestLogPolicy, flush_activity
+import tick_store
+import candles as candle_store
+import storage_policy
+import tick_reader
+import signal_store
+import live_feed as live
+import workers
+from tracing import TracingOptions, build_provider, optional_span
+import payload as payload_codec
+from payload import parse_ts_ms, validate_batch
+
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql+psycopg2://ea:ea123@db:5432/ea")
 ALLOWED_TOKEN = os.getenv("ALLOWED_TOKEN", "changeme")
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", ALLOWED_TOKEN)  # endpoints /admin/*
+
+# Pool de conexões (por processo)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+# Modo multi-processo (gunicorn.conf.py, ver workers.py): DB_POOL_BUDGET = conexões da API inteira,
+# divididas entre os WEB_CONCURRENCY workers (0 = DB_POOL_SIZE/DB_MAX_OVERFLOW por processo)
+DB_POOL_BUDGET = int(os.getenv("DB_POOL_BUDGET", "0"))
+WEB_WORKERS = workers.worker_count()
+DB_POOL_SIZE, DB_MAX_OVERFLOW = workers.pool_budget(DB_POOL_BUDGET, WEB_WORKERS, DB_POOL_SIZE, DB_MAX_OVERFLOW)
+MULTIPROC_DIR = workers.multiprocess_dir()
+METRICS_SAMPLE_INTERVAL = float(os.getenv("METRICS_SAMPLE_INTERVAL", "5"))
+# Só o worker com este lock roda os refreshers que consultam o banco (gauges SQL e storage)
+LEADER_LOCK_FILE = os.getenv("LEADER_LOCK_FILE") or (
+    os.path.join(MULTIPROC_DIR, "leader.lock") if MULTIPROC_DIR else None)
+
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+def async_database_url(url: str):
+    # Aceita a URL psycopg2 antiga do .env e troca o driver para asyncpg
+    u = make_url(url)
+    if u.drivername in ("postgres", "postgresql", "postgresql+psycopg2"):
+        u = u.set(drivername="postgresql+asyncpg")
+    if u.drivername == "postgresql+asyncpg" and "prepared_statement_cache_size" not in u.query:
+        u = u.update_query_dict({"prepared_statement_cache_size": str(DB_STATEMENT_CACHE_SIZE)})
+    return u
 
-# Instrument SQLAlchemy engine
-SQLAlchemyInstrumentor().instrument(engine=engine)
+
+engine = create_async_engine(
+    async_database_url(DATABASE_URL),
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+)
+
+# Nível/amostragem de tracing (ver tracing.py)
+TRACING = TracingOptions()
+
+# Instrument SQLAlchemy engine (um span por statement)
+if TRACING.db_statements:
+    SQLAlchemyInstrumentor().instrument(engine=engine.sync_engine)
 FWD_ING = os.getenv("FORWARD_INGEST_URL")
 FWD_TICK = os.getenv("FORWARD_TICK_URL")
 FWD_TOKEN = os.getenv("FORWARD_TOKEN")
 FWD_CONFIRM = os.getenv("FORWARD_CONFIRM_URL")
+# Pipeline de forward (ver forwarder.py)
+FWD_MAX_BATCH = int(os.getenv("FORWARD_MAX_BATCH", "500"))
+FWD_TICK_MAX_BATCH = int(os.getenv("FORWARD_TICK_MAX_BATCH", "1"))  # 1 = um tick por POST (contrato atual)
+FWD_MAX_WAIT_MS = int(os.getenv("FORWARD_MAX_WAIT_MS", "200"))
+FWD_QUEUE_SIZE = int(os.getenv("FORWARD_QUEUE_SIZE", "10000"))
+FWD_MAX_RETRIES = int(os.getenv("FORWARD_MAX_RETRIES", "3"))
+FWD_BACKOFF = float(os.getenv("FORWARD_BACKOFF_SECONDS", "0.5"))
+FWD_TIMEOUT = float(os.getenv("FORWARD_TIMEOUT", "5.0"))
+FWD_DRAIN_TIMEOUT = float(os.getenv("FORWARD_DRAIN_TIMEOUT", "10"))
+# Group commit do /ingest/tick (ver group_commit.py): N requests por transação
+TICK_GROUP_COMMIT = os.getenv("TICK_GROUP_COMMIT", "false").lower() in ("1", "true", "yes")
+GROUP_COMMIT_MAX_ROWS = int(os.getenv("GROUP_COMMIT_MAX_ROWS", "500"))
+GROUP_COMMIT_MAX_DELAY_MS = float(os.getenv("GROUP_COMMIT_MAX_DELAY_MS", "5"))
+# Filas de escrita por símbolo do /ingest (ver shard_writer.py): N conexões dedicadas, 0 = desliga
+INGEST_WRITE_SHARDS = int(os.getenv("INGEST_WRITE_SHARDS", "0"))
+SHARD_MAX_ROWS = int(os.getenv("SHARD_MAX_ROWS", "2000"))
+SHARD_QUEUE_ROWS = int(os.getenv("SHARD_QUEUE_ROWS", "20000"))
+# Controle de admissão do /ingest e /ingest/tick (ver admission.py): 0 = desliga
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", "0"))              # requests/s por (api key, IP, terminal)
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "0"))
+RATE_LIMIT_ROWS_PER_SEC = float(os.getenv("RATE_LIMIT_ROWS_PER_SEC", "0"))  # linhas/s por cliente
+RATE_LIMIT_ROWS_BURST = float(os.getenv("RATE_LIMIT_ROWS_BURST", "0"))
+DB_WRITE_CONCURRENCY = int(os.getenv("DB_WRITE_CONCURRENCY", "0"))  # escritas simultâneas no banco (por processo)
+DB_WRITE_MAX_WAIT = float(os.getenv("DB_WRITE_MAX_WAIT", "2"))     # espera por vaga antes do 429
+# Intervalo (s) do refresh das gauges que dependem de SQL
+GAUGE_REFRESH_INTERVAL = float(os.getenv("GAUGE_REFRESH_INTERVAL", "15"))
+# Freshness em memória (ver freshness.py)
+FRESHNESS_ACTIVE_WINDOW = float(os.getenv("FRESHNESS_ACTIVE_WINDOW", "300"))
+FRESHNESS_SEED_HOURS = int(os.getenv("FRESHNESS_SEED_HOURS", "24"))  # 0 = não carrega do banco no startup
+# Contadores agregados de ingestão (ver ingest_activity.py); INGEST_LOG_MODE controla o ingest_log por item
+INGEST_ACTIVITY_FLUSH_INTERVAL = float(os.getenv("INGEST_ACTIVITY_FLUSH_INTERVAL", "10"))
+# Chunking/compressão/retenção das hypertables (ver storage_policy.py) e intervalo das métricas de tamanho
+STORAGE_POLICIES = storage_policy.load_policies()
+STORAGE_STATS_INTERVAL = float(os.getenv("STORAGE_STATS_INTERVAL", "300"))
+# Sinais (ver signal_store.py): long-poll máximo do /signals/next, TTL padrão e sync do cache entre processos
+SIGNAL_LONGPOLL_MAX = float(os.getenv("SIGNAL_LONGPOLL_MAX", "25"))
+SIGNAL_DEFAULT_TTL = int(os.getenv("SIGNAL_DEFAULT_TTL", str(signal_store.DEFAULT_TTL_SEC)))
+SIGNAL_SYNC_INTERVAL = float(os.getenv("SIGNAL_SYNC_INTERVAL", "2"))  # 0 = só o cache local (um processo)
+SIGNAL_SSE_HEARTBEAT = float(os.getenv("SIGNAL_SSE_HEARTBEAT", "15"))
+# Push de barras/ticks gravados (ver live_feed.py): fila por assinante, política com fila cheia, heartbeat
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", str(live.DEFAULT_QUEUE_SIZE)))
+LIVE_POLICY = os.getenv("LIVE_POLICY", "coalesce").lower()
+LIVE_MAX_SUBSCRIBERS = int(os.getenv("LIVE_MAX_SUBSCRIBERS", "500"))
+LIVE_HEARTBEAT = float(os.getenv("LIVE_HEARTBEAT", "15"))
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
 log = logging.getLogger("ea-api")
@@ -43,18 +153,16 @@ resource = Resource(attributes={
     "deployment.environment": os.getenv("ENVIRONMENT", "production")
 })
 
-# Setup tracer provider
-trace.set_tracer_provider(TracerProvider(resource=resource))
-tracer_provider = trace.get_tracer_provider()
-
-# Setup Jaeger exporter
-jaeger_exporter = JaegerExporter(
-    agent_host_name=JAEGER_HOST,
-    agent_port=JAEGER_PORT,
-)
+if TRACING.enabled:
+    # Setup Jaeger exporter
+    jaeger_exporter = JaegerExporter(
+        agent_host_name=JAEGER_HOST,
+        agent_port=JAEGER_PORT,
+    )
 
-# Add span processor
-tracer_provider.add_span_processor(BatchSpanProcessor(jaeger_exporter))
+    # Setup tracer provider (sampler head ou tail-sampling conforme TRACING)
+    trace.set_tracer_provider(build_provider(resource, BatchSpanProcessor(jaeger_exporter), TRACING))
+log.info("tracing | %s", TRACING.as_dict())
 
 # Get tracer
 tracer = trace.get_tracer(__name__)
@@ -62,14 +170,51 @@ tracer = trace.get_tracer(__name__)
 # ============================================
 # FastAPI App
 # ============================================
-app = FastAPI(title="EA Ingest API", version="0.1")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await seed_freshness()
+    await sync_signals()
+    loop = asyncio.get_running_loop()
+    workers.install_drain_handler(lambda: loop.call_soon_threadsafe(begin_drain))
+    if tick_group_commit:
+        await tick_group_commit.start()
+    if ingest_writer:
+        await ingest_writer.start()
+    await forwarder.start()
+    tasks = [asyncio.create_task(gauge_refresher(), name="gauge_refresher"),
+             asyncio.create_task(activity_flusher(), name="activity_flusher"),
+             asyncio.create_task(storage_refresher(), name="storage_refresher")]
+    if SIGNAL_SYNC_INTERVAL > 0:
+        tasks.append(asyncio.create_task(signal_syncer(), name="signal_syncer"))
+    if MULTIPROC_DIR:
+        tasks.append(asyncio.create_task(metrics_sampler(), name="metrics_sampler"))
+    log.info("worker started | pid=%d | workers=%d | pool=%d+%d | multiprocess_metrics=%s",
+             os.getpid(), WEB_WORKERS, DB_POOL_SIZE, DB_MAX_OVERFLOW, bool(MULTIPROC_DIR))
+    if WEB_WORKERS > 1:
+        log.warning("live feed disabled: /ws/live and /live/stream need WEB_CONCURRENCY=1 (workers=%d)", WEB_WORKERS)
+    yield
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if tick_group_commit:
+        await tick_group_commit.stop()
+    if ingest_writer:
+        await ingest_writer.stop()
+    await flush_activity_counters()
+    await forwarder.stop(drain_timeout=FWD_DRAIN_TIMEOUT)
+    leader.release()
+    await engine.dispose()
+
+
+app = FastAPI(title="EA Ingest API", version="0.1", lifespan=lifespan)
 
 # Instrument FastAPI automatically
-FastAPIInstrumentor.instrument_app(app)
+if TRACING.enabled:
+    FastAPIInstrumentor.instrument_app(app)
 
-# Instrument SQLAlchemy (after engine creation, done below)
-# Instrument HTTPX client
-HTTPXClientInstrumentor().instrument()
+# Instrument HTTPX client (forwarder)
+if TRACING.http_client:
+    HTTPXClientInstrumentor().instrument()
 
 
 # --- Models ---
@@ -96,23 +241,22 @@ class IngestItem(BaseModel):
     @classmethod
     def ts_ok(cls, v):
         # Accept ISO8601 or epoch ms
-        if isinstance(v, int):
-            return v
-        if isinstance(v, str):
-            try:
-                # Try ISO8601
-                import dateutil.parser
-                dt = dateutil.parser.isoparse(v)
-                return int(dt.timestamp() * 1000)
-            except Exception:
-                try:
-                    return int(v)
-                except Exception:
-                    raise ValueError("invalid ts format")
-        raise ValueError("invalid ts type")
+        try:
+            return parse_ts_ms(v)
+        except Exception:
+            raise ValueError("invalid ts format")
 
 class AckRequest(BaseModel):
-    keys: List[dict]
+    # Contrato do Executer EA (um ack por request); `keys` mantém o formato antigo em lote
+    id: Optional[str] = None
+    status: Optional[str] = None
+    symbol: Optional[str] = None
+    side: Optional[str] = None
+    mt5_ticket: Optional[int] = None
+    price: Optional[float] = None
+    ts_exec: Optional[str] = None
+    account_id: Optional[int | str] = None
+    keys: List[dict] = []
 
 class FeedbackRequest(BaseModel):
     order_id: str
@@ -120,28 +264,143 @@ class FeedbackRequest(BaseModel):
 
 # --- Endpoints ---
 # --- Signals Endpoints ---
+def require_token(request: Request):
+    if ALLOWED_TOKEN and request.headers.get("x-api-key") != ALLOWED_TOKEN:
+        raise HTTPException(status_code=401, detail="invalid token")
+
+def parse_signal_symbols(symbols: Optional[str], symbol: Optional[str]) -> List[str]:
+    wanted = [s.strip() for s in (symbols or symbol or '').split(',') if s.strip()]
+    if not wanted:
+        raise HTTPException(status_code=400, detail="symbols required")
+    return wanted
+
+@app.post("/signals")
+async def signals_publish(request: Request):
+    """Publica um sinal (ou {"signals": [...]}): grava em signals e troca o cache do (symbol, timeframe)"""
+    require_admin(request)
+    REQ_COUNT.labels('/signals').inc()
+    try:
+        data = payload_codec.loads(await request.body())
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid json")
+    items = data.get('signals', [data]) if isinstance(data, dict) else data
+    try:
+        signals = [signal_store.normalize_signal(it, default_ttl=SIGNAL_DEFAULT_TTL) for it in items]
+    except (ValueError, TypeError, AttributeError) as e:
+        raise HTTPException(status_code=422, detail=f"invalid signal: {e}")
+    async with engine.begin() as conn:
+        inserted = set(await signal_store.insert_signals(conn, signals))
+    # cache só depois do commit: quem está em long-poll nunca vê sinal que não está no banco
+    for s in signals:
+        if s['id'] in inserted and signal_cache.put(s):
+            SIGNAL_EVENTS.labels('published').inc()
+    return {'published': [s['id'] for s in signals if s['id'] in inserted],
+            'duplicates': [s['id'] for s in signals if s['id'] not in inserted]}
+
 @app.get("/signals/next")
-async def signals_next(symbol: str):
-    # Return next signal for symbol (stub)
-    # TODO: Implement actual logic
-    return {"symbol": symbol, "signal": "buy", "ts": int(time.time()*1000)}
+async def signals_next(request: Request, symbols: Optional[str] = None, symbol: Optional[str] = None,
+                       account_id: Optional[str] = None, timeframe: str = signal_store.DEFAULT_TIMEFRAME,
+                       wait: float = Query(0, ge=0, le=SIGNAL_LONGPOLL_MAX)):
+    """
+    Sinais pendentes da conta para os símbolos pedidos, direto do cache (sem SQL)
+
+    wait>0 vira long-poll: responde assim que um sinal novo é publicado ou, sem
+    novidade, com {"signals": []} após `wait` segundos.
+    """
+    require_token(request)
+    REQ_COUNT.labels('/signals/next').inc()
+    wanted = parse_signal_symbols(symbols, symbol)
+    timeframe = timeframe.upper()
+    if wait > 0:
+        found = await signal_cache.wait_pending(account_id, wanted, timeframe, wait)
+    else:
+        found = signal_cache.pending(account_id, wanted, timeframe)
+    now_ms = int(time.time() * 1000)
+    if found:
+        SIGNAL_EVENTS.labels('delivered').inc(len(found))
+    return {'signals': [signal_store.to_public(s, now_ms) for s in found]}
 
 @app.get("/signals/latest")
-async def signals_latest(symbol: str):
-    # Return latest signal for symbol (stub)
-    # TODO: Implement actual logic
-    return {"symbol": symbol, "signal": "sell", "ts": int(time.time()*1000)}
+async def signals_latest(request: Request, symbol: str, timeframe: Optional[str] = None):
+    # Último sinal publicado para o símbolo (mesmo expirado/confirmado), do cache
+    require_token(request)
+    REQ_COUNT.labels('/signals/latest').inc()
+    s = signal_cache.latest(symbol, timeframe)
+    return {'symbol': symbol, 'signal': signal_store.to_public(s) if s else None,
+            'acks': signal_cache.acks(s['id']) if s else {}}
+
+@app.get("/signals/stream")
+async def signals_stream(request: Request, symbols: Optional[str] = None, symbol: Optional[str] = None,
+                         account_id: Optional[str] = None, timeframe: str = signal_store.DEFAULT_TIMEFRAME):
+    # SSE: um evento `signal` por sinal novo pendente para a conta; comentário de keepalive sem novidade
+    require_token(request)
+    REQ_COUNT.labels('/signals/stream').inc()
+    wanted = parse_signal_symbols(symbols, symbol)
+    timeframe = timeframe.upper()
+
+    async def events():
+        sent = {}  # symbol -> último id enviado
+        while not signal_cache.closed and not await request.is_disconnected():
+            version = signal_cache.version
+            now_ms = int(time.time() * 1000)
+            for s in signal_cache.pending(account_id, wanted, timeframe, now_ms):
+                if sent.get(s['symbol']) != s['id']:
+                    sent[s['symbol']] = s['id']
+                    SIGNAL_EVENTS.labels('delivered').inc()
+                    yield f"id: {s['id']}\nevent: signal\ndata: {payload_codec.dumps(signal_store.to_public(s, now_ms))}\n\n"
+            if not await signal_cache.wait_changed(version, SIGNAL_SSE_HEARTBEAT):
+                yield ": keepalive\n\n"
+
+    return StreamingResponse(events(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache'})
 
 @app.post("/signals/ack")
-async def signals_ack(payload: AckRequest):
-    # Mark signals as acknowledged (stub)
-    # TODO: Implement actual logic
-    return {"acknowledged": len(payload.keys)}
+async def signals_ack(request: Request, payload: AckRequest):
+    # Resultado da execução (FILLED/REJECTED) por sinal; tira o sinal da fila da conta
+    require_token(request)
+    REQ_COUNT.labels('/signals/ack').inc()
+    items = payload.keys or [payload.model_dump(exclude={'keys'})]
+    acks = []
+    for it in items:
+        signal_id = it.get('id') or it.get('signal_id')
+        status = str(it.get('status') or 'ACKED').upper()
+        if not signal_id or status not in signal_store.ACK_STATUSES:
+            raise HTTPException(status_code=422, detail="ack requires id and status in " +
+                                ', '.join(signal_store.ACK_STATUSES))
+        try:
+            ticket = signal_store.parse_ticket(it.get('mt5_ticket'))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=422, detail="mt5_ticket must be an integer")
+        try:
+            price = signal_store.parse_price(it.get('price'))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=422, detail="price must be a number")
+        account = it.get('account_id', payload.account_id)
+        acks.append({
+            'signal_id': str(signal_id),
+            'account_id': str(account) if account is not None else None,
+            'status': status,
+            'mt5_ticket': ticket,
+            'price': price,
+            'ts_exec': signal_store.parse_exec_ts(it.get('ts_exec')),
+        })
+    # mesmo (id, conta) repetido no batch é válido (EA reenviando); fica o último
+    acks = signal_store.dedupe_acks(acks)
+    async with engine.begin() as conn:
+        known = set(await signal_store.insert_acks(conn, acks))
+    for a in acks:
+        if a['signal_id'] in known:
+            signal_cache.ack(a['signal_id'], a['account_id'], a['status'])
+            SIGNAL_EVENTS.labels('ack_' + a['status'].lower()).inc()
+        else:
+            SIGNAL_EVENTS.labels('ack_unknown').inc()
+    return {'acknowledged': len(known), 'unknown': sorted({a['signal_id'] for a in acks} - known)}
 
 @app.post("/orders/feedback")
-async def orders_feedback(payload: FeedbackRequest):
-    # Accept feedback for an order (stub)
-    # TODO: Implement actual logic
+async def orders_feedback(request: Request, payload: FeedbackRequest):
+    require_token(request)
+    REQ_COUNT.labels('/orders/feedback').inc()
+    async with engine.begin() as conn:
+        await conn.execute(signal_store.FEEDBACK_INSERT, {'order_id': payload.order_id, 'feedback': payload.feedback})
     return {"order_id": payload.order_id, "status": "feedback received"}
 
 # metrics
@@ -153,86 +412,588 @@ REQ_LAT = Histogram('api_request_latency_seconds', 'API request latency', ['endp
 INGEST_BATCH = Histogram('ingest_batch_size', 'Items per /ingest batch')
 FWD_ITEMS = Counter('forward_items_total', 'Total items forwarded', ['endpoint'])
 CONFIRM_COUNT = Counter('forward_confirm_total', 'Forward confirm attempts', ['endpoint','status'])
-PENDING_FWD = Gauge('pending_forward_total', 'Pending forwards not confirmed')
-PENDING_FWD_5M = Gauge('pending_forward_older_5m_total', 'Pending forwards older than 5 minutes')
+PENDING_FWD = Gauge('pending_forward_total', 'Pending forwards not confirmed', multiprocess_mode='livemax')
+PENDING_FWD_5M = Gauge('pending_forward_older_5m_total', 'Pending forwards older than 5 minutes',
+                       multiprocess_mode='livemax')
 CONFIRM_LAT = Histogram('forward_confirm_latency_seconds', 'Latency between forward and confirm', ['endpoint'])
 # Métricas adicionais para monitoramento avançado
 DUPLICATE_COUNT = Counter('duplicate_inserts_total', 'Total duplicate inserts (ON CONFLICT)')
 API_ERRORS = Counter('api_errors_total', 'API errors by type', ['endpoint', 'error_type'])
-SYMBOLS_ACTIVE = Gauge('symbols_active_total', 'Number of active symbols in last 5m')
-DATA_AGE = Gauge('data_age_seconds', 'Age of most recent data point by symbol', ['symbol'])
+SYMBOLS_ACTIVE = Gauge('symbols_active_total', 'Number of active symbols in last 5m', multiprocess_mode='livemax')
+# Gauges por callback: set_function em um processo; com vários workers, amostradas a cada METRICS_SAMPLE_INTERVAL
+# e agregadas no /metrics conforme o multiprocess_mode (livesum = soma dos workers vivos)
+gauge_sampler = workers.GaugeSampler(bool(MULTIPROC_DIR))
+METRICS_REGISTRY = workers.metrics_registry() or REGISTRY
+# data_age_seconds{symbol} e data_age_by_timeframe_seconds{symbol,timeframe} vêm do tracker em memória
+freshness = FreshnessTracker()
+if MULTIPROC_DIR:
+    # cada worker só vê os próprios requests: o menor age entre os workers é o dado mais recente
+    DATA_AGE = Gauge('data_age_seconds', 'Age of most recent data point by symbol', ['symbol'],
+                     multiprocess_mode='livemin')
+    DATA_AGE_TF = Gauge('data_age_by_timeframe_seconds', 'Age of most recent data point by symbol and timeframe',
+                        ['symbol', 'timeframe'], multiprocess_mode='livemin')
+
+    def _sample_freshness():
+        now = time.time()
+        for symbol, age in freshness.symbol_ages(now).items():
+            DATA_AGE.labels(symbol).set(age)
+        for e in freshness.snapshot(now):
+            DATA_AGE_TF.labels(e['symbol'], e['timeframe']).set(e['age_seconds'])
+    gauge_sampler.add_hook(_sample_freshness)
+else:
+    REGISTRY.register(FreshnessCollector(freshness))
+gauge_sampler.bind(SYMBOLS_ACTIVE, lambda: freshness.active_symbols(FRESHNESS_ACTIVE_WINDOW))
+# Pipeline de forward
+FWD_QUEUE = Gauge('forward_queue_depth', 'Items waiting in the forward queue', ['endpoint'],
+                  multiprocess_mode='livesum')
+FWD_BATCH = Histogram('forward_batch_size', 'Items per forward request', ['endpoint'],
+                      buckets=[1, 5, 10, 25, 50, 100, 250, 500, 1000])
+FWD_LAG = Histogram('forward_lag_seconds', 'Time from enqueue to remote response for forwarded items', ['endpoint'],
+                    buckets=[0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60])
+
+# Group commit do /ingest/tick
+GROUP_FLUSH_ROWS = Histogram('group_commit_flush_rows', 'Rows written per group commit flush',
+                             buckets=[1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500])
+GROUP_FLUSH_REQS = Histogram('group_commit_flush_requests', 'Requests served per group commit flush',
+                             buckets=[1, 2, 5, 10, 25, 50, 100, 250, 500])
+GROUP_FLUSH_LAT = Histogram('group_commit_flush_seconds', 'Duration of a group commit flush (insert + commit)',
+                            buckets=[0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5])
+SHARD_PENDING = Gauge('ingest_shard_pending_rows', 'Rows queued per /ingest write shard', ['shard'],
+                      multiprocess_mode='livesum')
+SHARD_FLUSH_ROWS = Histogram('ingest_shard_flush_rows', 'Rows written per /ingest shard transaction', ['shard'],
+                             buckets=[1, 10, 50, 100, 500, 1000, 2000, 5000])
+SHARD_FLUSH_LAT = Histogram('ingest_shard_flush_seconds', 'Duration of an /ingest shard transaction', ['shard'])
+INGEST_REJECTED = Counter('ingest_backpressure_total', 'Requests refused with 429 because a write queue was full',
+                          ['endpoint'])
+RATE_LIMIT_HITS = Counter('rate_limit_hits_total', 'Requests refused by admission control (rate limit or DB busy)',
+                          ['endpoint', 'ip'])
+DB_INSERT_QUEUE = Gauge('db_insert_queue_size', 'Requests waiting for a DB write slot', multiprocess_mode='livesum')
+GROUP_PENDING = Gauge('group_commit_pending_rows', 'Rows waiting in the group commit buffer',
+                      multiprocess_mode='livesum')
+# Contadores agregados de ingestão (ingest_activity/duplicate_stats)
+ACTIVITY_PENDING = Gauge('ingest_activity_pending_keys', 'Activity counter keys waiting for the next flush',
+                         multiprocess_mode='livesum')
+# Armazenamento por tabela (storage_policy.py), atualizado a cada STORAGE_STATS_INTERVAL
+DATA_VOLUME = Gauge('data_volume_mb', 'Stored data volume in MB (hypertable size incl. indexes/compressed chunks)',
+                    ['table'], multiprocess_mode='livemax')
+TABLE_CHUNKS = Gauge('hypertable_chunks', 'Chunks per hypertable', ['table'], multiprocess_mode='livemax')
+TABLE_COMPRESSED_CHUNKS = Gauge('hypertable_compressed_chunks', 'Compressed chunks per hypertable', ['table'],
+                                multiprocess_mode='livemax')
+TABLE_COMPRESSION_RATIO = Gauge('hypertable_compression_ratio', 'Uncompressed/compressed bytes of compressed chunks',
+                                ['table'], multiprocess_mode='livemax')
+ACTIVITY_FLUSH_LAT = Histogram('ingest_activity_flush_seconds', 'Duration of an activity counter flush',
+                               buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5])
+
+# Refresher de gauges em background
+GAUGE_REFRESH_LAT = Histogram('gauge_refresh_duration_seconds', 'Duration of the background gauge refresh queries',
+                              buckets=[0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30])
+GAUGE_STALENESS = Gauge('gauge_refresh_staleness_seconds', 'Seconds since the last successful gauge refresh',
+                        multiprocess_mode='livemin')
+_gauges_state = {'refreshed_at': time.time()}
+gauge_sampler.bind(GAUGE_STALENESS, lambda: time.time() - _gauges_state['refreshed_at'])
+leader = workers.LeaderLock(LEADER_LOCK_FILE)
+
+# --- Forward hooks (rodam no worker do forwarder) ---
+async def _forward_sent(endpoint, keys, status, lag, size):
+    ok = status is not None and 200 <= status < 400
+    FWD_COUNT.labels(endpoint, str(status) if status is not None else 'error').inc()
+    FWD_BATCH.labels(endpoint).observe(size)
+    FWD_LAG.labels(endpoint).observe(lag)
+    if ok:
+        FWD_ITEMS.labels(endpoint).inc(size)
+    # audit do batch inteiro (1 statement)
+    try:
+        async with engine.begin() as conn:
+            await upsert_forward_audit(conn, endpoint, keys, 'sent' if ok else 'error', status)
+    except Exception as e:
+        log.warning("forward audit failed: %s", e)
+
+async def _forward_confirmed(endpoint, keys, status, latency):
+    CONFIRM_COUNT.labels(endpoint, str(status) if status is not None else 'error').inc()
+    CONFIRM_LAT.labels(endpoint).observe(latency)
+    if status is None or not (200 <= status < 400):
+        return
+    try:
+        async with engine.begin() as conn:
+            await confirm_forward_audit(conn, endpoint, keys, status)
+    except Exception as e:
+        log.warning("CONFIRM audit failed: %s", e)
+
+forwarder = Forwarder(token=FWD_TOKEN, timeout=FWD_TIMEOUT)
+for _ep, _url, _batch in (('/ingest', FWD_ING, FWD_MAX_BATCH), ('/ingest/tick', FWD_TICK, FWD_TICK_MAX_BATCH)):
+    if _url:
+        _ch = forwarder.add_channel(ForwardChannel(
+            _ep, _url, max_batch=_batch, max_wait=FWD_MAX_WAIT_MS / 1000.0, queue_size=FWD_QUEUE_SIZE,
+            max_retries=FWD_MAX_RETRIES, backoff=FWD_BACKOFF, confirm_url=FWD_CONFIRM,
+            on_sent=_forward_sent, on_confirm=_forward_confirmed))
+        gauge_sampler.bind(FWD_QUEUE.labels(_ep), _ch.depth)
+
+# --- Group commit (rodam no worker do buffer) ---
+async def _flush_ticks(cols):
+    async with engine.begin() as conn:
+        return await tick_store.insert_raw_ticks(conn, cols)
+
+def _ticks_flushed(rows, requests, seconds, ok):
+    GROUP_FLUSH_ROWS.observe(rows)
+    GROUP_FLUSH_REQS.observe(requests)
+    GROUP_FLUSH_LAT.observe(seconds)
+    if not ok:
+        API_ERRORS.labels(endpoint='group_commit', error_type='flush_failed').inc()
+
+# --- Filas por símbolo do /ingest (rodam nos workers dos shards) ---
+async def _write_ingest_shard(conn, batch):
+    return await insert_batches_bulk(conn, batch, ingest_log_policy.select)
+
+def _ingest_shard_flushed(shard, rows, requests, seconds, ok):
+    SHARD_FLUSH_ROWS.labels(str(shard)).observe(rows)
+    SHARD_FLUSH_LAT.labels(str(shard)).observe(seconds)
+    if not ok:
+        API_ERRORS.labels(endpoint='/ingest', error_type='shard_flush_failed').inc()
+
+# Sinais: cache do último por (symbol, timeframe) e waiters de long-poll/SSE
+SIGNAL_EVENTS = Counter('signal_events_total', 'Signal store events (published, delivered, ack_*)', ['event'])
+SIGNAL_WAITERS = Gauge('signal_waiters', 'Long-poll/SSE requests waiting for a new signal',
+                       multiprocess_mode='livesum')
+signal_cache = signal_store.SignalCache()
+gauge_sampler.bind(SIGNAL_WAITERS, lambda: signal_cache.waiters)
+_signal_sync = {'cursor': 0}
+
+# Push ao vivo (/ws/live, /live/stream)
+LIVE_SUBSCRIBERS = Gauge('live_subscribers', 'Connected live feed subscribers (WebSocket + SSE)',
+                         multiprocess_mode='livesum')
+LIVE_EVENTS = Counter('live_events_published_total', 'Committed rows fanned out to live subscribers', ['kind'])
+LIVE_DROPPED = Counter('live_events_dropped_total', 'Live events dropped or coalesced for slow subscribers')
+live_feed = live.LiveFeed(max_queue=LIVE_QUEUE_SIZE, policy=LIVE_POLICY, on_drop=LIVE_DROPPED.inc)
+gauge_sampler.bind(LIVE_SUBSCRIBERS, lambda: live_feed.subscribers)
+
+tick_group_commit = None
+if TICK_GROUP_COMMIT:
+    tick_group_commit = GroupCommitBuffer(
+        _flush_ticks, tick_store.RAW_TICK_FIELDS, key_fields=('symbol', 'time_msc'), max_rows=GROUP_COMMIT_MAX_ROWS,
+        max_delay=GROUP_COMMIT_MAX_DELAY_MS / 1000.0, on_flush=_ticks_flushed)
+    gauge_sampler.bind(GROUP_PENDING, tick_group_commit.pending_rows)
+
+ingest_writer = None
+if INGEST_WRITE_SHARDS > 0:
+    if INGEST_WRITE_SHARDS >= DB_POOL_SIZE + DB_MAX_OVERFLOW:
+        log.warning("INGEST_WRITE_SHARDS=%d holds the whole DB pool (%d+%d); raise DB_POOL_SIZE",
+                    INGEST_WRITE_SHARDS, DB_POOL_SIZE, DB_MAX_OVERFLOW)
+    ingest_writer = ShardedWriter(
+        _write_ingest_shard, shards=INGEST_WRITE_SHARDS, connect=engine.connect, max_rows=SHARD_MAX_ROWS,
+        max_pending_rows=SHARD_QUEUE_ROWS, on_flush=_ingest_shard_flushed)
+    for _i in range(ingest_writer.shards):
+        gauge_sampler.bind(SHARD_PENDING.labels(str(_i)), lambda _i=_i: ingest_writer.shard_rows(_i))
+
+# Admissão do caminho de escrita: baldes por cliente e vagas de escrita no banco
+request_limiter = admission.RateLimiter(RATE_LIMIT_RPS, RATE_LIMIT_BURST)
+row_limiter = admission.RateLimiter(RATE_LIMIT_ROWS_PER_SEC, RATE_LIMIT_ROWS_BURST)
+db_write_limiter = admission.ConcurrencyLimiter(DB_WRITE_CONCURRENCY, DB_WRITE_MAX_WAIT)
+gauge_sampler.bind(DB_INSERT_QUEUE, lambda: db_write_limiter.waiting)
+
+def throttled(endpoint: str, ip: Optional[str], e: admission.Throttled) -> HTTPException:
+    RATE_LIMIT_HITS.labels(endpoint, ip or '-').inc()
+    return HTTPException(status_code=429, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
+
+def admit(limiter: admission.RateLimiter, endpoint: str, key, cost: float = 1):
+    """429 com Retry-After se o cliente (api key, IP, terminal) passou do balde."""
+    wait = limiter.check(key, cost)
+    if wait:
+        raise throttled(endpoint, key[1], admission.Throttled("rate limit exceeded", wait))
 
 @app.get("/health")
-async def health():
-    with engine.connect() as conn:
-        conn.execute(text("SELECT 1"))
+async def health(response: Response):
+    if _drain['draining']:
+        # balanceador/relay param de mandar tráfego para este processo durante o shutdown
+        response.status_code = 503
+        return {"ok": False, "draining": True}
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
     return {"ok": True}
 
-def refresh_gauges():
-    try:
-        with engine.connect() as conn:
+_drain = {'draining': False}
+
+def begin_drain():
+    # SIGTERM/SIGINT: libera long-poll, SSE e WebSocket para o graceful shutdown não esperar por eles
+    if _drain['draining']:
+        return
+    _drain['draining'] = True
+    signal_cache.close()
+    live_feed.close_all()
+    log.info("draining | pid=%d", os.getpid())
+
+async def metrics_sampler():
+    while True:
+        gauge_sampler.sample()
+        await asyncio.sleep(METRICS_SAMPLE_INTERVAL)
+
+async def refresh_gauges():
+    with GAUGE_REFRESH_LAT.time():
+        async with engine.connect() as conn:
             # Pending forwards
-            total = conn.execute(text("SELECT count(*) FROM forward_audit WHERE status <> 'confirmed'"))
+            total = await conn.execute(text("SELECT count(*) FROM forward_audit WHERE status <> 'confirmed'"))
             total_val = list(total)[0][0]
             PENDING_FWD.set(total_val)
-            older = conn.execute(text("SELECT count(*) FROM forward_audit WHERE status <> 'confirmed' AND sent_at < now() - interval '5 minutes'"))
+            older = await conn.execute(text("SELECT count(*) FROM forward_audit WHERE status <> 'confirmed' AND sent_at < now() - interval '5 minutes'"))
             older_val = list(older)[0][0]
             PENDING_FWD_5M.set(older_val)
-            
-            # Active symbols (últimos 5 minutos)
-            symbols = conn.execute(text("SELECT count(DISTINCT symbol) FROM ticks WHERE ts > now() - interval '5 minutes'"))
-            symbols_val = list(symbols)[0][0]
-            SYMBOLS_ACTIVE.set(symbols_val)
-            
-            # Data age por símbolo (top 5 mais ativos)
-            ages = conn.execute(text("""
-                SELECT symbol, EXTRACT(EPOCH FROM (now() - MAX(ts))) as age_seconds
+    _gauges_state['refreshed_at'] = time.time()
+
+async def gauge_refresher():
+    # Roda fora do caminho do /metrics; o scrape só serializa o registry. Com vários workers só o líder consulta
+    while True:
+        try:
+            if leader.acquire():
+                await refresh_gauges()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            API_ERRORS.labels(endpoint='gauge_refresher', error_type='query_failed').inc()
+            log.warning("gauge refresh failed: %s", e)
+        await asyncio.sleep(GAUGE_REFRESH_INTERVAL)
+
+# Tentativas/duplicatas agregadas em memória; ingest_log por item só conforme INGEST_LOG_MODE
+ingest_log_policy = IngestLogPolicy()
+activity = ActivityCounters()
+gauge_sampler.bind(ACTIVITY_PENDING, activity.pending)
+log.info("ingest log | mode=%s | sample_every=%d", ingest_log_policy.mode, ingest_log_policy.sample_every)
+
+async def flush_activity_counters():
+    batch = activity.drain()
+    if not batch:
+        return
+    try:
+        with ACTIVITY_FLUSH_LAT.time():
+            async with engine.begin() as conn:
+                await flush_activity(conn, batch)
+    except Exception as e:
+        # devolve para a próxima rodada em vez de perder os contadores
+        activity.restore(batch)
+        API_ERRORS.labels(endpoint='ingest_activity', error_type='flush_failed').inc()
+        log.warning("activity flush failed | keys=%d | err=%s", len(batch), e)
+
+async def activity_flusher():
+    while True:
+        await asyncio.sleep(INGEST_ACTIVITY_FLUSH_INTERVAL)
+        await flush_activity_counters()
+
+async def refresh_storage_stats():
+    async with engine.connect() as conn:
+        stats = await storage_policy.collect_stats(conn, STORAGE_POLICIES)
+    for st in stats:
+        DATA_VOLUME.labels(st['table']).set(st['size_mb'])
+        if st['chunks'] is not None:
+            TABLE_CHUNKS.labels(st['table']).set(st['chunks'])
+            TABLE_COMPRESSED_CHUNKS.labels(st['table']).set(st['compressed_chunks'])
+        if st['compression_ratio'] is not None:
+            TABLE_COMPRESSION_RATIO.labels(st['table']).set(st['compression_ratio'])
+    return stats
+
+async def storage_refresher():
+    # hypertable_size/compression_stats percorrem os chunks: intervalo bem maior que o das gauges
+    while True:
+        try:
+            if leader.acquire():
+                await refresh_storage_stats()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            API_ERRORS.labels(endpoint='storage_refresher', error_type='query_failed').inc()
+            log.warning("storage stats refresh failed: %s", e)
+        await asyncio.sleep(STORAGE_STATS_INTERVAL)
+
+async def sync_signals():
+    # Startup: sinais ainda vigentes; depois, o que outros processos gravaram desde o último cursor
+    since = _signal_sync['cursor'] or int(time.time() * 1000) - signal_store.MAX_TTL_SEC * 1000
+    try:
+        async with engine.connect() as conn:
+            _signal_sync['cursor'] = await signal_store.sync_cache(conn, signal_cache, since)
+    except Exception as e:
+        API_ERRORS.labels(endpoint='signal_sync', error_type='query_failed').inc()
+        log.warning("signal cache sync failed: %s", e)
+
+async def signal_syncer():
+    while True:
+        await asyncio.sleep(SIGNAL_SYNC_INTERVAL)
+        await sync_signals()
+
+async def seed_freshness():
+    # Após restart o tracker começa vazio; uma consulta única recupera o último dado por símbolo/timeframe
+    if FRESHNESS_SEED_HOURS <= 0:
+        return
+    try:
+        async with engine.connect() as conn:
+            rows = (await conn.execute(text("""
+                SELECT symbol, timeframe, MAX(ts_ms)
                 FROM ticks
-                WHERE ts > now() - interval '1 hour'
+                WHERE ts > now() - make_interval(hours => CAST(:hours AS int))
+                GROUP BY symbol, timeframe
+                UNION ALL
+                SELECT symbol, 'tick', MAX(time_msc)
+                FROM raw_ticks
+                WHERE ts > now() - make_interval(hours => CAST(:hours AS int))
                 GROUP BY symbol
-                ORDER BY MAX(ts) DESC
-                LIMIT 5
-            """)).fetchall()
-            for row in ages:
-                DATA_AGE.labels(symbol=row[0]).set(row[1])
-    except Exception:
-        pass
+            """), {'hours': FRESHNESS_SEED_HOURS})).fetchall()
+        for symbol, timeframe, ts_ms in rows:
+            freshness.seed(symbol, timeframe, ts_ms)
+        log.info("freshness seeded | series=%d", len(rows))
+    except Exception as e:
+        log.warning("freshness seed failed: %s", e)
+
+@app.get('/freshness')
+async def freshness_status(stale_after: float = 300):
+    # Idade do último dado por símbolo/timeframe, direto do tracker (sem consulta ao banco)
+    entries = freshness.snapshot()
+    for e in entries:
+        e['stale'] = e['age_seconds'] > stale_after
+    return {
+        'symbols_active': freshness.active_symbols(FRESHNESS_ACTIVE_WINDOW),
+        'stale_after': stale_after,
+        'stale': sum(e['stale'] for e in entries),
+        'series': entries,
+    }
+
+@app.get('/candles')
+async def get_candles(request: Request, symbol: str, tf: str = 'M1', from_: Optional[str] = Query(None, alias='from'),
+                      to: Optional[str] = None, source: str = 'auto',
+                      limit: int = Query(candle_store.MAX_LIMIT, ge=1, le=candle_store.MAX_LIMIT)):
+    # OHLCV das continuous aggregates (migration_003_candles.sql); from/to em epoch ms ou ISO8601
+    start = time.time()
+    REQ_COUNT.labels('/candles').inc()
+    token = request.headers.get("x-api-key")
+    if ALLOWED_TOKEN and token != ALLOWED_TOKEN:
+        raise HTTPException(status_code=401, detail="invalid token")
+    tf = candle_store.normalize_timeframe(tf)
+    from_ms, to_ms = candle_store.resolve_range(tf, from_, to)
+    async with engine.connect() as conn:
+        used, rows = await candle_store.query_candles(conn, symbol, tf, from_ms, to_ms, source.lower(), limit)
+    REQ_LAT.labels('/candles').observe(time.time()-start)
+    return {'symbol': symbol, 'tf': tf, 'source': used, 'from': from_ms, 'to': to_ms, 'candles': rows}
+
+@app.get('/ticks')
+async def get_ticks(request: Request, symbol: str, from_: Optional[str] = Query(None, alias='from'),
+                    to: Optional[str] = None, tf: Optional[str] = None, after: Optional[str] = None,
+                    limit: int = Query(tick_reader.MAX_LIMIT, ge=1, le=tick_reader.MAX_LIMIT),
+                    format: str = 'ndjson'):
+    """
+    Histórico de ticks (raw_ticks) ou barras (ticks, tf=M1...) em streaming NDJSON/CSV/Arrow
+
+    symbol aceita lista separada por vírgula; ordem (symbol, tempo). Próxima página:
+    after=<symbol>:<ts> do último registro recebido.
+    """
+    REQ_COUNT.labels('/ticks').inc()
+    token = request.headers.get("x-api-key")
+    if ALLOWED_TOKEN and token != ALLOWED_TOKEN:
+        raise HTTPException(status_code=401, detail="invalid token")
+    fmt = tick_reader.check_format(format)
+    stmt, params, cols = tick_reader.build_query(symbol, from_, to, tf, after, limit)
+
+    async def body():
+        start = time.time()
+        async with engine.connect() as conn:
+            async for chunk in tick_reader.stream_rows(conn, stmt, params, cols, fmt):
+                yield chunk
+        REQ_LAT.labels('/ticks').observe(time.time()-start)
+
+    return StreamingResponse(body(), media_type=tick_reader.FORMATS[fmt], headers={'X-Columns': ','.join(cols)})
+
+def live_subscribe(symbols: Optional[str], channels: Optional[str], policy: Optional[str]) -> live.Subscriber:
+    # o LiveFeed é por processo: com vários workers cada assinante veria só as linhas do seu worker
+    if WEB_WORKERS > 1:
+        raise HTTPException(status_code=501, detail="live feed requires WEB_CONCURRENCY=1")
+    if _drain['draining']:
+        raise HTTPException(status_code=503, detail="server draining")
+    if live_feed.subscribers >= LIVE_MAX_SUBSCRIBERS:
+        raise HTTPException(status_code=503, detail="too many live subscribers")
+    try:
+        return live_feed.subscribe(live.parse_list(symbols), live.parse_channels(channels),
+                                   policy=policy.lower() if policy else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.websocket('/ws/live')
+async def live_ws(websocket: WebSocket, symbols: Optional[str] = None, channels: Optional[str] = None,
+                  policy: Optional[str] = None):
+    """
+    Barras/ticks novos assim que gravados: uma mensagem JSON por evento
+
+    symbols/channels em lista separada por vírgula ('*' ou ausente = todos); canal é
+    o timeframe (M1, H1, ...) ou 'tick'. Token em x-api-key ou ?token=.
+    """
+    token = websocket.headers.get("x-api-key") or websocket.query_params.get("token")
+    if ALLOWED_TOKEN and token != ALLOWED_TOKEN:
+        await websocket.close(code=1008)
+        return
+    try:
+        sub = live_subscribe(symbols, channels, policy)
+    except HTTPException as e:
+        await websocket.close(code={503: 1013, 501: 1011}.get(e.status_code, 1003))
+        return
+    REQ_COUNT.labels('/ws/live').inc()
+    await websocket.accept()
+
+    async def sender():
+        while not sub.closed:
+            events = await sub.get(LIVE_HEARTBEAT)
+            for e in events or [{'type': 'heartbeat'}]:
+                await websocket.send_text(payload_codec.dumps(e))
+        # fechado pelo drain: 1012 (service restart) para o cliente reconectar em outro processo
+        await websocket.close(code=1012)
+
+    async def receiver():
+        # mensagens do cliente são ignoradas; só detecta o fechamento sem esperar o próximo envio
+        while True:
+            await websocket.receive_text()
+
+    tasks = [asyncio.create_task(sender()), asyncio.create_task(receiver())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        # unsubscribe antes de qualquer await: a task pode estar sendo cancelada
+        live_feed.unsubscribe(sub)
+        for t in tasks:
+            t.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        errors = [r for r in results if isinstance(r, Exception)
+                  and not isinstance(r, (asyncio.CancelledError, WebSocketDisconnect))]
+        if errors:
+            log.warning("live websocket closed with error: %s", errors[0])
+
+@app.get('/live/stream')
+async def live_stream(request: Request, symbols: Optional[str] = None, channels: Optional[str] = None,
+                      policy: Optional[str] = None):
+    # Mesmo feed do /ws/live em Server-Sent Events (event: bar|tick|gap)
+    require_token(request)
+    REQ_COUNT.labels('/live/stream').inc()
+    sub = live_subscribe(symbols, channels, policy)
+
+    async def events():
+        try:
+            while not sub.closed and not await request.is_disconnected():
+                batch = await sub.get(LIVE_HEARTBEAT)
+                if not batch:
+                    yield ": keepalive\n\n"
+                    continue
+                yield ''.join(f"event: {e['type']}\ndata: {payload_codec.dumps(e)}\n\n" for e in batch)
+        finally:
+            live_feed.unsubscribe(sub)
+
+    return StreamingResponse(events(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+def require_admin(request: Request):
+    if ADMIN_TOKEN and request.headers.get("x-api-key") != ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="invalid token")
+
+@app.get('/admin/storage')
+async def admin_storage(request: Request):
+    # Tamanho, chunks e compressão por tabela + políticas configuradas
+    require_admin(request)
+    return {
+        'policies': [dataclasses.asdict(p) for p in STORAGE_POLICIES.values()],
+        'tables': await refresh_storage_stats(),
+    }
+
+@app.post('/admin/storage/apply')
+async def admin_storage_apply(request: Request):
+    # Aplica chunk interval, compressão e retenção (idempotente)
+    require_admin(request)
+    async with engine.begin() as conn:
+        actions = await storage_policy.apply_policies(conn, STORAGE_POLICIES)
+    log.info("storage policies applied | %s", actions)
+    return {'applied': actions}
 
 @app.get('/metrics')
 async def metrics():
-    refresh_gauges()
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(METRICS_REGISTRY), media_type=CONTENT_TYPE_LATEST)
 
 @app.get('/debug/recent')
 async def debug_recent(limit: int = 10):
     # Retorna últimas N linhas de ticks e forwards para inspeção rápida
-    with engine.connect() as conn:
-        ticks = conn.execute(text("""
+    async with engine.connect() as conn:
+        ticks = (await conn.execute(text("""
             SELECT symbol, ts_ms, timeframe, open, high, low, close, volume, kind
             FROM ticks
             ORDER BY ts DESC
             LIMIT :limit
-        """), { 'limit': limit }).mappings().all()
-        fwd = conn.execute(text("""
+        """), { 'limit': limit })).mappings().all()
+        fwd = (await conn.execute(text("""
             SELECT symbol, ts_ms, endpoint, status, sent_at, confirm_at, last_status_code
             FROM forward_audit
             ORDER BY sent_at DESC
             LIMIT :limit
-        """), { 'limit': limit }).mappings().all()
+        """), { 'limit': limit })).mappings().all()
     return { 'ticks': [dict(r) for r in ticks], 'forward': [dict(r) for r in fwd] }
 
 @app.get('/debug/pending')
 async def debug_pending(limit: int = 50):
-    with engine.connect() as conn:
-        rows = conn.execute(text("""
+    async with engine.connect() as conn:
+        rows = (await conn.execute(text("""
             SELECT symbol, ts_ms, endpoint, status, sent_at, last_status_code
             FROM forward_audit
             WHERE status <> 'confirmed'
             ORDER BY sent_at DESC
             LIMIT :limit
-        """), { 'limit': limit }).mappings().all()
+        """), { 'limit': limit })).mappings().all()
     return { 'pending': [dict(r) for r in rows] }
 
+# --- Write path ---
+# 'bulk': batch inteiro em um INSERT set-based em ticks + um em ingest_log (ver ingest_store.py)
+# 'row': caminho legado, um INSERT por item (útil para depurar linhas problemáticas)
+# Em ambos o ingest_log recebe só as linhas escolhidas por ingest_log_policy
+INGEST_WRITE_MODE = os.getenv("INGEST_WRITE_MODE", "bulk").lower()
+
+
+async def insert_rows_rowwise(conn, rows, source_ip, user_agent):
+    """Caminho legado: um INSERT por item em ticks e ingest_log; devolve (dup_flags, errors, linhas gravadas)."""
+    dup_flags = []
+    written = []
+    errors = 0
+    log_rows = ingest_log_policy.select(len(rows))
+    log_rows = None if log_rows is None else set(log_rows)
+    for idx, row in enumerate(rows):
+        # Create span per symbol (only for first few to avoid span explosion)
+        if TRACING.item_spans and idx < 5:
+            item_span = tracer.start_span(f"insert_item_{row['symbol']}")
+            item_span.set_attribute("symbol", row['symbol'])
+            item_span.set_attribute("timeframe", row['timeframe'] or '')
+        else:
+            item_span = None
+        try:
+            result = await conn.execute(
+                text("""
+                INSERT INTO ticks(symbol, ts_ms, timeframe, open, high, low, close, volume, kind, meta)
+                VALUES (:symbol, :ts_ms, :timeframe, :open, :high, :low, :close, :volume, :kind, :meta)
+                ON CONFLICT (symbol, ts_ms) DO NOTHING
+                RETURNING symbol
+                """),
+                row
+            )
+            was_duplicate = result.rowcount <= 0
+            if item_span:
+                item_span.set_attribute("inserted", not was_duplicate)
+                item_span.set_attribute("duplicate", was_duplicate)
+            # Log por item (incluindo duplicatas) conforme INGEST_LOG_MODE
+            if log_rows is None or idx in log_rows:
+                await conn.execute(
+                    text("""
+                    INSERT INTO ingest_log(symbol, ts_ms, timeframe, open, high, low, close, volume, kind, was_duplicate, source_ip, user_agent)
+                    VALUES (:symbol, :ts_ms, :timeframe, :open, :high, :low, :close, :volume, :kind, :duplicate, :ip, :ua)
+                    """),
+                    {**row, 'duplicate': was_duplicate, 'ip': source_ip, 'ua': user_agent}
+                )
+            dup_flags.append(was_duplicate)
+            written.append(row)
+        except Exception as e:
+            # ignore bad rows; EA trata dedupe como sucesso
+            errors += 1
+            API_ERRORS.labels(endpoint='/ingest', error_type='insert_failed').inc()
+            if item_span:
+                item_span.set_attribute("error", True)
+                item_span.set_attribute("error.message", str(e))
+        finally:
+            if item_span:
+                item_span.end()
+    return dup_flags, errors, written
+
 @app.post("/ingest")
 async def ingest(request: Request):
     start = time.time()
@@ -240,7 +1001,6 @@ async def ingest(request: Request):
     
     # Extract trace context from headers
     trace_id = request.headers.get("x-trace-id", "")
-    span_context = trace.get_current_span().get_span_context()
     
     # Start main span
     with tracer.start_as_current_span("ingest_request") as span:
@@ -250,225 +1010,96 @@ async def ingest(request: Request):
         span.set_attribute("ea.trace_id", trace_id)
         
         # Validate authentication
-        with tracer.start_as_current_span("validate_auth"):
+        with optional_span(tracer, TRACING.stage_spans, "validate_auth"):
             token = request.headers.get("x-api-key")
             if ALLOWED_TOKEN and token != ALLOWED_TOKEN:
                 span.set_attribute("error", True)
                 span.set_attribute("error.type", "auth_failed")
                 raise HTTPException(status_code=401, detail="invalid token")
         
-        # Parse request body
-        with tracer.start_as_current_span("parse_json") as parse_span:
+        # Admissão antes de ler o corpo: balde de requests do cliente (api key, IP, terminal do User-Agent)
+        source_ip = request.client.host if request.client else None
+        user_agent = request.headers.get("user-agent", "unknown")
+        client = admission.client_key(token, source_ip, user_agent)
+        admit(request_limiter, '/ingest', client)
+        
+        # Parse request body: JSON por item ou colunar (columnar.py), ambos aceitam Content-Encoding
+        with optional_span(tracer, TRACING.stage_spans, "parse_json") as parse_span:
             body = await request.body()
             parse_span.set_attribute("body.size_bytes", len(body))
-            try:
-                data = json.loads(body.decode('utf-8'))
-            except Exception as e:
-                parse_span.set_attribute("error", True)
-                parse_span.set_attribute("error.message", str(e))
-                raise HTTPException(status_code=400, detail="invalid json")
-
-        if isinstance(data, dict):
-            items = [data]
-        elif isinstance(data, list):
-            items = data
-        else:
-            raise HTTPException(status_code=400, detail="invalid payload type")
-
-        inserted = 0
-        duplicates = 0
+            encoding = request.headers.get("content-encoding")
+            if columnar.is_columnar(request.headers.get("content-type")):
+                parse_span.set_attribute("body.format", "columnar")
+                cols = columnar.decode(body, encoding)
+                items, rows, rejected = None, None, 0
+                total = len(cols['symbol'])
+            else:
+                try:
+                    data = payload_codec.loads(columnar.decompress(body, encoding))
+                except HTTPException:
+                    raise
+                except Exception as e:
+                    parse_span.set_attribute("error", True)
+                    parse_span.set_attribute("error.message", str(e))
+                    raise HTTPException(status_code=400, detail="invalid json")
+                items = extract_items(data)
+                rows, rejected = validate_batch(items)
+                cols = columns(rows, ROW_FIELDS + ('meta',))
+                total = len(items)
+        if rejected:
+            API_ERRORS.labels(endpoint='/ingest', error_type='invalid_item').inc(rejected)
+        admit(row_limiter, '/ingest', client, total)
         
         # Set span attributes for batch
-        span.set_attribute("ingest.batch_size", len(items))
+        span.set_attribute("ingest.batch_size", total)
         
         # observe batch size
         try:
-            INGEST_BATCH.observe(len(items))
+            INGEST_BATCH.observe(total)
         except Exception:
             pass
         
-        # Capturar info da requisição para log
-        source_ip = request.client.host if request.client else None
-        user_agent = request.headers.get("user-agent", "unknown")
         span.set_attribute("http.user_agent", user_agent)
         
         # Extract EA metadata from User-Agent
-        with tracer.start_as_current_span("extract_ea_metadata") as meta_span:
-            try:
-                # Parse: DataCollectorPRO/PDC/1.65 (Account:12345; Server:Broker-Demo; Build:3850; trace_id:xxx)
-                if "PDC/" in user_agent:
-                    parts = user_agent.split("(")
-                    if len(parts) > 1:
-                        metadata = parts[1].rstrip(")").split(";")
-                        for item in metadata:
-                            if ":" in item:
-                                key, value = item.split(":", 1)
-                                key = key.strip().lower()
-                                value = value.strip()
-                                meta_span.set_attribute(f"ea.{key}", value)
-                                span.set_attribute(f"ea.{key}", value)
-            except Exception:
-                pass
+        with optional_span(tracer, TRACING.stage_spans, "extract_ea_metadata") as meta_span:
+            # Parse: DataCollectorPRO/PDC/1.65 (Account:12345; Server:Broker-Demo; Build:3850; trace_id:xxx)
+            for key, value in admission.ea_metadata(user_agent).items():
+                meta_span.set_attribute(f"ea.{key}", value)
+                span.set_attribute(f"ea.{key}", value)
         
         # Database operations
-        with tracer.start_as_current_span("database_insert") as db_span:
-            with engine.begin() as conn:
-                for it in items:
-                    was_duplicate = False
-                    symbol = it.get('symbol', 'unknown')
-                    
-                    # Create span per symbol (only for first few to avoid span explosion)
-                    if inserted + duplicates < 5:
-                        item_span = tracer.start_span(f"insert_item_{symbol}")
-                        item_span.set_attribute("symbol", symbol)
-                        item_span.set_attribute("timeframe", it.get('timeframe', ''))
-                    else:
-                        item_span = None
-                    
-                    try:
-                        # Tentar inserir na tabela principal
-                        result = conn.execute(
-                            text("""
-                            INSERT INTO ticks(symbol, ts_ms, timeframe, open, high, low, close, volume, kind, meta)
-                            VALUES (:symbol, :ts_ms, :timeframe, :open, :high, :low, :close, :volume, :kind, :meta)
-                            ON CONFLICT (symbol, ts_ms) DO NOTHING
-                            RETURNING symbol
-                            """),
-                            {
-                                'symbol': symbol,
-                                'ts_ms': it.get('ts'),
-                                'timeframe': it.get('timeframe'),
-                                'open': it.get('open'),
-                                'high': it.get('high'),
-                                'low': it.get('low'),
-                                'close': it.get('close'),
-                                'volume': it.get('volume'),
-                                'kind': it.get('kind'),
-                                'meta': json.dumps(it.get('meta', {})),
-                            }
-                        )
-                        
-                        # Verificar se foi inserido ou foi duplicata
-                        if result.rowcount > 0:
-                            inserted += 1
-                            if item_span:
-                                item_span.set_attribute("inserted", True)
-                        else:
-                            duplicates += 1
-                            was_duplicate = True
-                            DUPLICATE_COUNT.inc()
-                            if item_span:
-                                item_span.set_attribute("inserted", False)
-                                item_span.set_attribute("duplicate", True)
-                
-                        # SEMPRE registrar no log (incluindo duplicatas)
-                        conn.execute(
-                            text("""
-                            INSERT INTO ingest_log(symbol, ts_ms, timeframe, open, high, low, close, volume, kind, was_duplicate, source_ip, user_agent)
-                            VALUES (:symbol, :ts_ms, :timeframe, :open, :high, :low, :close, :volume, :kind, :duplicate, :ip, :ua)
-                            """),
-                            {
-                                'symbol': it.get('symbol'),
-                                'ts_ms': it.get('ts'),
-                                'timeframe': it.get('timeframe'),
-                                'open': it.get('open'),
-                                'high': it.get('high'),
-                                'low': it.get('low'),
-                                'close': it.get('close'),
-                                'volume': it.get('volume'),
-                                'kind': it.get('kind'),
-                                'duplicate': was_duplicate,
-                                'ip': source_ip,
-                                'ua': user_agent
-                            }
-                        )
-                        
-                    except Exception as e:
-                        # ignore bad rows; EA trata dedupe como sucesso
-                        API_ERRORS.labels(endpoint='/ingest', error_type='insert_failed').inc()
-                        if item_span:
-                            item_span.set_attribute("error", True)
-                            item_span.set_attribute("error.message", str(e))
-                    finally:
-                        if item_span:
-                            item_span.end()
+        with optional_span(tracer, TRACING.stage_spans, "database_insert") as db_span:
+            db_span.set_attribute("db.write_mode", INGEST_WRITE_MODE)
+            dup_flags = []
+            if cols['symbol']:
+                try:
+                    dup_flags = await write_ingest(cols, rows, source_ip, user_agent, db_span)
+                except admission.Throttled as e:
+                    db_span.set_attribute("db.throttled", True)
+                    raise throttled('/ingest', source_ip, e)
+            duplicates = sum(dup_flags)
+            inserted = len(dup_flags) - duplicates
+            if duplicates:
+                DUPLICATE_COUNT.inc(duplicates)
             
             db_span.set_attribute("db.inserted", inserted)
             db_span.set_attribute("db.duplicates", duplicates)
         DB_WRITE.inc(inserted)
+        freshness.observe_columns(cols['symbol'], cols['timeframe'], cols['ts_ms'])
+        LIVE_EVENTS.labels('bar').inc(live_feed.publish_bars(cols, dup_flags))
         
-        # Forward para servidor remoto se configurado
+        # Forward para servidor remoto (fila assíncrona; não segura a resposta)
         if FWD_ING:
-            with tracer.start_as_current_span("forward_to_remote") as fwd_span:
-                fwd_span.set_attribute("forward.url", FWD_ING)
-                fwd_span.set_attribute("forward.items", len(items))
-                headers = {"Content-Type": "application/json"}
-                if FWD_TOKEN:
-                    headers["x-api-key"] = FWD_TOKEN
-                try:
-                    keys = [{"symbol": it.get('symbol'), "ts_ms": it.get('ts')} for it in items][:10]
-                    r = httpx.post(FWD_ING, json=items, headers=headers, timeout=5.0)
-                    FWD_COUNT.labels('/ingest', str(r.status_code)).inc()
-                    fwd_span.set_attribute("http.status_code", r.status_code)
-                    fwd_span.set_attribute("forward.success", 200 <= r.status_code < 400)
-            try:
-                if 200 <= r.status_code < 400:
-                    FWD_ITEMS.labels('/ingest').inc(len(items))
-            except Exception:
-                pass
-            # audit sent rows
-            try:
-                with engine.begin() as conn:
-                    for it in items:
-                        conn.execute(text("""
-                          INSERT INTO forward_audit(symbol, ts_ms, endpoint, status, last_status_code)
-                          VALUES (:symbol, :ts_ms, '/ingest', :status, :code)
-                          ON CONFLICT (symbol, ts_ms, endpoint) DO UPDATE SET status=:status, last_status_code=:code
-                        """), {
-                          'symbol': it.get('symbol'), 'ts_ms': it.get('ts'), 'status': 'sent' if 200 <= r.status_code < 400 else 'error', 'code': r.status_code
-                        })
-            except Exception:
-                pass
-            body = None
-            try:
-                body = r.json()
-            except Exception:
-                body = {"_raw": (r.text[:200] if r.text else "")}
-            log.info("FORWARD /ingest -> %s | sz=%d | status=%s | resp=%s | sample_keys=%s",
-                     FWD_ING, len(items), r.status_code, body, keys)
-            # confirmação opcional
-            if FWD_CONFIRM and isinstance(body, dict):
-                try:
-                    cstart = time.time()
-                    cr = httpx.post(FWD_CONFIRM, json={"keys": keys}, headers=headers, timeout=5.0)
-                    try:
-                        CONFIRM_COUNT.labels('/ingest', str(cr.status_code)).inc()
-                    except Exception:
-                        pass
-                    clog = None
-                    try:
-                        clog = cr.json()
-                    except Exception:
-                        clog = {"_raw": (cr.text[:200] if cr.text else "")}
-                    log.info("CONFIRM /ingest -> %s | status=%s | resp=%s", FWD_CONFIRM, cr.status_code, clog)
-                    try:
-                        CONFIRM_LAT.labels('/ingest').observe(time.time()-cstart)
-                        if cr.status_code >= 200 and cr.status_code < 400:
-                            with engine.begin() as conn:
-                                for k in keys:
-                                    conn.execute(text("""
-                                      UPDATE forward_audit
-                                      SET status='confirmed', confirm_at=now(), last_status_code=:code
-                                      WHERE symbol=:symbol AND ts_ms=:ts_ms AND endpoint='/ingest'
-                                    """), {'symbol': k['symbol'], 'ts_ms': k['ts_ms'], 'code': cr.status_code})
-                    except Exception:
-                        pass
-                    except Exception as e:
-                        log.warning("CONFIRM failed: %s", str(e))
-                except Exception as e:
-                    fwd_span.set_attribute("error", True)
-                    fwd_span.set_attribute("error.message", str(e))
-                    FWD_COUNT.labels('/ingest', 'error').inc()
+            if items is None:
+                # remoto só fala JSON por item
+                entries = [(it, (it['symbol'], it['ts'])) for it in columnar.to_items(cols)]
+            else:
+                entries = [(it, key) for it in items if (key := item_key(it))]
+            dropped = forwarder.submit('/ingest', entries)
+            if dropped:
+                FWD_COUNT.labels('/ingest', 'dropped').inc(dropped)
+            span.set_attribute("forward.queued", len(entries) - dropped)
         
         # Set final span attributes
         span.set_attribute("ingest.inserted", inserted)
@@ -476,95 +1107,191 @@ async def ingest(request: Request):
         span.set_attribute("ingest.success", True)
         
         REQ_LAT.labels('/ingest').observe(time.time()-start)
-        return {"inserted": inserted, "duplicates": duplicates, "total": len(items)}
+        return {"inserted": inserted, "duplicates": duplicates, "total": total}
 
-@app.post("/ingest/tick")
-async def ingest_tick(payload: IngestItem, request: Request):
+@app.post("/ingest/tick", openapi_extra={
+    "requestBody": {"required": True, "content": {"application/json": {"schema": IngestItem.model_json_schema()}}}})
+async def ingest_tick(request: Request):
+    """
+    Ticks brutos -> raw_ticks: tick único, {"ticks": [...]} (DataCollectorPRO) ou lista,
+    gravados em colunas numéricas estreitas com um INSERT set-based. Um objeto no
+    formato OHLC legado (sem bid/ask) continua indo para ticks.
+    """
     start = time.time()
     REQ_COUNT.labels('/ingest/tick').inc()
     token = request.headers.get("x-api-key")
     if ALLOWED_TOKEN and token != ALLOWED_TOKEN:
         raise HTTPException(status_code=401, detail="invalid token")
-    with engine.begin() as conn:
-        conn.execute(
-            text("""
-            INSERT INTO ticks(symbol, ts_ms, timeframe, open, high, low, close, volume, kind, meta)
-            VALUES (:symbol, :ts_ms, :timeframe, :open, :high, :low, :close, :volume, :kind, :meta)
-            ON CONFLICT (symbol, ts_ms) DO NOTHING
-            """),
-            {
-                'symbol': payload.symbol,
-                'ts_ms': payload.ts,
-                'timeframe': payload.timeframe,
-                'open': payload.open,
-                'high': payload.high,
-                'low': payload.low,
-                'close': payload.close,
-                'volume': payload.volume,
-                'kind': payload.kind,
-                'meta': json.dumps(payload.meta or {}),
-            }
-        )
-    DB_WRITE.inc()
+    source_ip = request.client.host if request.client else None
+    client = admission.client_key(token, source_ip, request.headers.get("user-agent"))
+    admit(request_limiter, '/ingest/tick', client)
+    try:
+        return await ingest_tick_body(request, client, start)
+    except admission.Throttled as e:
+        # sem vaga de escrita no banco (store_ticks)
+        raise throttled('/ingest/tick', source_ip, e)
+
+
+async def ingest_tick_body(request: Request, client, start):
+    # corpo do /ingest/tick depois da autenticação; cada formato passa pelo balde de linhas do cliente
+    body = await request.body()
+    encoding = request.headers.get("content-encoding")
+    if columnar.is_columnar(request.headers.get("content-type")):
+        cols = columnar.decode(body, encoding)
+        admit(row_limiter, '/ingest/tick', client, len(cols['symbol']))
+        if 'bid' in cols and 'ask' in cols:
+            tick_cols, rejected = tick_store.from_columnar(cols)
+            return await ingest_raw_ticks(tick_cols, rejected, start)
+        return await ingest_tick_columns(cols, start)
+    try:
+        data = payload_codec.loads(columnar.decompress(body, encoding))
+    except HTTPException:
+        raise
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid json")
+    if tick_store.is_raw_tick(data):
+        tick_cols, rejected = tick_store.normalize_ticks(tick_store.extract_ticks(data))
+        admit(row_limiter, '/ingest/tick', client, len(tick_cols['symbol']))
+        return await ingest_raw_ticks(tick_cols, rejected, start)
+    # Formato legado (IngestItem): mesmo decoder/validador do /ingest, grava em ticks
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=422, detail="invalid payload type")
+    rows, rejected = validate_batch([data])
+    if rejected or len(rows[0]['symbol']) < 3:
+        API_ERRORS.labels(endpoint='/ingest/tick', error_type='invalid_item').inc()
+        raise HTTPException(status_code=422, detail="invalid tick")
+    admit(row_limiter, '/ingest/tick', client, 1)
+    row = rows[0]
+    cols = columns(rows, ROW_FIELDS + ('meta',))
+    dup = await store_ticks(cols, legacy=True)
+    activity.record('/ingest/tick', (row['symbol'],), (row['timeframe'],), dup)
+    DB_WRITE.inc(dup.count(False))
+    freshness.observe(row['symbol'], row['timeframe'] or 'tick', row['ts_ms'])
+    LIVE_EVENTS.labels('bar').inc(live_feed.publish_bars(cols, dup))
     # Forward também para o endpoint de tick, se configurado
     if FWD_TICK:
-        headers = {"Content-Type": "application/json"}
-        if FWD_TOKEN:
-            headers["x-api-key"] = FWD_TOKEN
-        try:
-            forward_payload = payload.model_dump()
-            r = httpx.post(FWD_TICK, json=forward_payload, headers=headers, timeout=3.0)
-            FWD_COUNT.labels('/ingest/tick', str(r.status_code)).inc()
-            try:
-                if 200 <= r.status_code < 400:
-                    FWD_ITEMS.labels('/ingest/tick').inc()
-            except Exception:
-                pass
-            # audit tick
-            try:
-                with engine.begin() as conn:
-                    conn.execute(text("""
-                      INSERT INTO forward_audit(symbol, ts_ms, endpoint, status, last_status_code)
-                      VALUES (:symbol, :ts_ms, '/ingest/tick', :status, :code)
-                      ON CONFLICT (symbol, ts_ms, endpoint) DO UPDATE SET status=:status, last_status_code=:code
-                    """), {'symbol': payload.symbol, 'ts_ms': payload.ts, 'status': 'sent' if 200 <= r.status_code < 400 else 'error', 'code': r.status_code})
-            except Exception:
-                pass
-            body = None
-            try:
-                body = r.json()
-            except Exception:
-                body = {"_raw": (r.text[:200] if r.text else "")}
-            log.info("FORWARD /ingest/tick -> %s | status=%s | resp=%s | key=%s",
-                     FWD_TICK, r.status_code, body, {"symbol": payload.symbol, "ts_ms": payload.ts})
-            if FWD_CONFIRM:
-                try:
-                    cstart = time.time()
-                    cr = httpx.post(FWD_CONFIRM, json={"keys": [{"symbol": payload.symbol, "ts_ms": payload.ts}]}, headers=headers, timeout=5.0)
-                    try:
-                        CONFIRM_COUNT.labels('/ingest/tick', str(cr.status_code)).inc()
-                    except Exception:
-                        pass
-                    clog = None
-                    try:
-                        clog = cr.json()
-                    except Exception:
-                        clog = {"_raw": (cr.text[:200] if cr.text else "")}
-                    log.info("CONFIRM /ingest/tick -> %s | status=%s | resp=%s", FWD_CONFIRM, cr.status_code, clog)
-                    try:
-                        CONFIRM_LAT.labels('/ingest/tick').observe(time.time()-cstart)
-                        if cr.status_code >= 200 and cr.status_code < 400:
-                            with engine.begin() as conn:
-                                conn.execute(text("""
-                                  UPDATE forward_audit
-                                  SET status='confirmed', confirm_at=now(), last_status_code=:code
-                                  WHERE symbol=:symbol AND ts_ms=:ts_ms AND endpoint='/ingest/tick'
-                                """), {'symbol': payload.symbol, 'ts_ms': payload.ts, 'code': cr.status_code})
-                    except Exception:
-                        pass
-                except Exception as e:
-                    log.warning("CONFIRM failed: %s", str(e))
-        except Exception:
-            FWD_COUNT.labels('/ingest/tick', 'error').inc()
+        fwd = {k: row[k] for k in ('symbol', 'timeframe', 'open', 'high', 'low', 'close', 'volume', 'kind')}
+        fwd.update({'ts': row['ts_ms'], 'meta': data.get('meta')})
+        if forwarder.submit('/ingest/tick', [(fwd, (row['symbol'], row['ts_ms']))]):
+            FWD_COUNT.labels('/ingest/tick', 'dropped').inc()
     REQ_LAT.labels('/ingest/tick').observe(time.time()-start)
     return {"inserted": 1}
+
+
+async def write_ingest(cols, rows, source_ip, user_agent, db_span) -> List[bool]:
+    """
+    Grava o batch do /ingest: linha a linha (INGEST_WRITE_MODE=row), pelas filas por
+    símbolo (INGEST_WRITE_SHARDS) ou direto com os INSERTs set-based. Devolve as flags
+    was_duplicate por linha; fila cheia vira 429 e falha do banco vira 500.
+    Só as escritas diretas pegam vaga de escrita (DB_WRITE_CONCURRENCY; sem vaga
+    em DB_WRITE_MAX_WAIT levanta admission.Throttled): as filas por símbolo já
+    limitam as transações a uma por shard, e segurar a vaga esperando a fila
+    travaria as demais escritas.
+    """
+    if INGEST_WRITE_MODE == "row":
+        if rows is None:
+            rows = columnar.to_rows(cols)
+        async with db_write_limiter.slot():
+            async with engine.begin() as conn:
+                dup_flags, _, written = await insert_rows_rowwise(conn, rows, source_ip, user_agent)
+        # como nos outros caminhos, só depois do commit: market_activity lê os contadores
+        activity.record('/ingest', [r['symbol'] for r in written], [r['timeframe'] for r in written], dup_flags)
+        return dup_flags
+    try:
+        if ingest_writer is not None:
+            dup_flags = await ingest_writer.submit(cols, (source_ip, user_agent))
+        else:
+            async with db_write_limiter.slot():
+                async with engine.begin() as conn:
+                    dup_flags = await insert_columns_bulk(conn, cols, source_ip, user_agent,
+                                                          ingest_log_policy.select(len(cols['symbol'])))
+    except admission.Throttled:
+        raise  # 429 no handler
+    except ShardsFull as e:
+        # fila do símbolo cheia: nada foi enfileirado, o EA/relay reenvia depois do Retry-After
+        INGEST_REJECTED.labels('/ingest').inc()
+        db_span.set_attribute("db.backpressure_shard", e.shard)
+        raise HTTPException(status_code=429, detail="write queue full", headers={"Retry-After": str(e.retry_after)})
+    except Exception as e:
+        # batch inteiro falhou: devolve 5xx para o EA reenfileirar
+        API_ERRORS.labels(endpoint='/ingest', error_type='bulk_insert_failed').inc()
+        db_span.set_attribute("error", True)
+        db_span.set_attribute("error.message", str(e))
+        log.error("bulk insert failed | sz=%d | err=%s", len(cols['symbol']), e)
+        raise HTTPException(status_code=500, detail="database write failed")
+    activity.record('/ingest', cols['symbol'], cols['timeframe'], dup_flags)
+    return dup_flags
+
+
+async def store_ticks(cols, legacy: bool = False) -> List[bool]:
+    """
+    Grava ticks (colunas) em raw_ticks, ou em ticks no formato legado: direto em
+    uma transação própria ou, com TICK_GROUP_COMMIT, pelo buffer compartilhado
+    (só raw_ticks). Em ambos a resposta só sai depois do commit. Devolve as
+    flags was_duplicate por linha. Na transação própria, sem vaga de escrita
+    (DB_WRITE_CONCURRENCY) levanta admission.Throttled, que o handler devolve
+    como 429; o group commit não pega vaga (um flush por vez já limita o banco).
+    """
+    n = len(cols['symbol'])
+    try:
+        if legacy:
+            async with db_write_limiter.slot():
+                async with engine.begin() as conn:
+                    new_keys = await insert_ticks_columns(conn, cols)
+            return duplicate_flags(zip(cols['symbol'], cols['ts_ms']), new_keys)
+        if tick_group_commit is not None:
+            return await tick_group_commit.submit(cols)
+        async with db_write_limiter.slot():
+            async with engine.begin() as conn:
+                new_keys = await tick_store.insert_raw_ticks(conn, cols)
+        return duplicate_flags(zip(cols['symbol'], cols['time_msc']), new_keys)
+    except admission.Throttled:
+        raise  # 429 no handler
+    except Exception as e:
+        API_ERRORS.labels(endpoint='/ingest/tick', error_type='bulk_insert_failed').inc()
+        log.error("tick insert failed | sz=%d | err=%s", n, e)
+        raise HTTPException(status_code=500, detail="database write failed")
+
+
+async def ingest_raw_ticks(cols, rejected: int, start):
+    """Batch de ticks já em colunas RAW_TICK_FIELDS -> raw_ticks."""
+    n = len(cols['symbol'])
+    if rejected:
+        API_ERRORS.labels(endpoint='/ingest/tick', error_type='invalid_item').inc(rejected)
+        if n == 0:
+            raise HTTPException(status_code=422, detail="invalid tick")
+    dup = await store_ticks(cols) if n else []
+    activity.record('/ingest/tick', cols['symbol'], None, dup)
+    inserted = dup.count(False)
+    DB_WRITE.inc(inserted)
+    if n - inserted:
+        DUPLICATE_COUNT.inc(n - inserted)
+    freshness.observe_columns(cols['symbol'], ['tick'] * n, cols['time_msc'])
+    LIVE_EVENTS.labels('tick').inc(live_feed.publish_ticks(cols, dup))
+    if FWD_TICK and n:
+        entries = [(it, (it['symbol'], it['time_msc'])) for it in tick_store.to_items(cols)]
+        dropped = forwarder.submit('/ingest/tick', entries)
+        if dropped:
+            FWD_COUNT.labels('/ingest/tick', 'dropped').inc(dropped)
+    REQ_LAT.labels('/ingest/tick').observe(time.time()-start)
+    return {"inserted": inserted, "duplicates": n - inserted, "total": n + rejected, "rejected": rejected}
+
+
+async def ingest_tick_columns(cols, start):
+    """Batch colunar no formato OHLC (sem bid/ask): um INSERT set-based em ticks, sem dict por linha."""
+    n = len(cols['symbol'])
+    dup = await store_ticks(cols, legacy=True) if n else []
+    activity.record('/ingest/tick', cols['symbol'], cols['timeframe'], dup)
+    inserted = dup.count(False)
+    DB_WRITE.inc(inserted)
+    if n - inserted:
+        DUPLICATE_COUNT.inc(n - inserted)
+    freshness.observe_columns(cols['symbol'], [tf or 'tick' for tf in cols['timeframe']], cols['ts_ms'])
+    LIVE_EVENTS.labels('bar').inc(live_feed.publish_bars(cols, dup))
+    if FWD_TICK and n:
+        entries = [(it, (it['symbol'], it['ts'])) for it in columnar.to_items(cols)]
+        dropped = forwarder.submit('/ingest/tick', entries)
+        if dropped:
+            FWD_COUNT.labels('/ingest/tick', 'dropped').inc(dropped)
+    REQ_LAT.labels('/ingest/tick').observe(time.time()-start)
+    return {"inserted": inserted, "duplicates": n - inserted, "total": n}
@@ -1,11 +1,20 @@
 # API Lite - SQLite version for local development
-import os
+import os, sys
 from pathlib import Path
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, HTTPException, Query
 from pydantic import BaseModel
 from typing import List, Optional
-import json, time, logging, sqlite3
-from datetime import datetime
+import asyncio, time, logging
+from contextlib import asynccontextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from tick_store import RAW_TICK_FIELDS, extract_ticks, normalize_ticks
+from payload import validate_batch
+from lite_db import LiteDB
+from lite_partitions import Partitions, default_root, existing_keys, partition_files, period_start_ms
+from candles import TIMEFRAMES, normalize_timeframe
+import lite_stats
+import lite_analytics
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
 log = logging.getLogger("api-lite")
@@ -14,17 +23,50 @@ log = logging.getLogger("api-lite")
 ALLOWED_TOKEN = os.getenv("ALLOWED_TOKEN", "changeme")
 DB_PATH = Path(os.getenv("DB_PATH", "./data/ea.db")).resolve()
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+# Conexão de escrita persistente em WAL (ver lite_db.py)
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "64"))
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "256"))
+# Particionamento opcional (ver lite_partitions.py): vazio = arquivo único; day|week = um arquivo por período
+SQLITE_PARTITION = os.getenv("SQLITE_PARTITION", "").strip().lower()
+SQLITE_PARTITION_DIR = Path(os.getenv("SQLITE_PARTITION_DIR", "") or default_root(DB_PATH)).resolve()
+SQLITE_PARTITION_KEEP = int(os.getenv("SQLITE_PARTITION_KEEP", "0"))  # partições mantidas; 0 = todas
+# Modo analítico (ver lite_analytics.py): snapshots Parquet dos períodos fechados + GET /analytics/*
+ANALYTICS_MODE = os.getenv("ANALYTICS_MODE", "0").lower() in ("1", "true", "yes")
+ANALYTICS_DIR = Path(os.getenv("ANALYTICS_DIR", "") or DB_PATH.parent / f"{DB_PATH.stem}-analytics").resolve()
+ANALYTICS_REFRESH_SEC = int(os.getenv("ANALYTICS_REFRESH_SEC", "300"))
 
-app = FastAPI(title="EA Ingest API Lite", version="0.1")
+db = LiteDB(DB_PATH, cache_mb=SQLITE_CACHE_MB, mmap_mb=SQLITE_MMAP_MB)
+# Contagens por símbolo mantidas por trigger (ver lite_stats.py); /health e /stats leem daqui
+counts = lite_stats.RowCounts()
+partitions = Partitions(SQLITE_PARTITION_DIR, SQLITE_PARTITION, keep=SQLITE_PARTITION_KEEP) if SQLITE_PARTITION else None
+analytics = None
+if ANALYTICS_MODE:
+    if lite_analytics.available():
+        analytics = lite_analytics.Snapshots(ANALYTICS_DIR)
+    else:
+        log.warning("ANALYTICS_MODE=1 but pyarrow is not installed; /analytics/* disabled")
 
-# Initialize SQLite
-def init_db():
-    conn = sqlite3.connect(str(DB_PATH))
+# Statements constantes por schema (main ou p_YYYYMMDD): ficam no cache de statements preparados entre requests
+TICK_FIELDS = ('symbol', 'ts_ms', 'timeframe', 'open', 'high', 'low', 'close', 'volume', 'kind', 'meta')
+TICK_INSERT = """
+    INSERT OR IGNORE INTO {schema}.ticks(symbol, ts_ms, timeframe, open, high, low, close, volume, kind, meta)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+RAW_TICK_INSERT = f"""
+    INSERT OR IGNORE INTO {{schema}}.raw_ticks({', '.join(RAW_TICK_FIELDS)})
+    VALUES ({', '.join('?' * len(RAW_TICK_FIELDS))})
+"""
+# tabela -> (INSERT, posição do timestamp na linha, usado para escolher a partição, coluna de tempo)
+INSERTS = {'ticks': (TICK_INSERT, 1, 'ts_ms'), 'raw_ticks': (RAW_TICK_INSERT, 1, 'time_msc')}
+# Particionado: maior tempo por tabela no ea.db principal, que não recebe mais escrita (None = vazio)
+legacy_until = {}
+
+def create_schema(conn, schema='main'):
     c = conn.cursor()
-    
+
     # Ticks table
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS ticks (
+    c.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.ticks (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             symbol TEXT NOT NULL,
             ts_ms INTEGER NOT NULL,
@@ -40,15 +82,90 @@ def init_db():
             UNIQUE(symbol, ts_ms)
         )
     """)
-    
-    # Index for faster queries
-    c.execute("CREATE INDEX IF NOT EXISTS idx_symbol_ts ON ticks(symbol, ts_ms)")
-    
-    conn.commit()
-    conn.close()
+
+    # UNIQUE(symbol, ts_ms) já é um índice (symbol, ts_ms); o idx_symbol_ts antigo era cópia e só custava escrita
+    c.execute(f"DROP INDEX IF EXISTS {schema}.idx_symbol_ts")
+
+    # Raw ticks (mesmo layout de raw_ticks no Postgres): colunas numéricas, sem JSON por linha
+    c.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.raw_ticks (
+            symbol TEXT NOT NULL,
+            time_msc INTEGER NOT NULL,
+            bid REAL NOT NULL,
+            ask REAL NOT NULL,
+            last REAL,
+            volume INTEGER DEFAULT 0,
+            flags INTEGER DEFAULT 0,
+            source TEXT DEFAULT 'MT5',
+            ea_version TEXT,
+            received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (symbol, time_msc)
+        ) WITHOUT ROWID
+    """)
+
+    lite_stats.install(conn, schema)
+
+def setup_partition(schema):
+    # a cada ATTACH (thread de escrita): DDL idempotente e contadores da partição
+    with db.writer() as conn:
+        create_schema(conn, schema)
+        counts.load(conn, schema)
+
+def drop_expired(current=None):
+    """Apaga as partições além de SQLITE_PARTITION_KEEP (arquivo inteiro); current = a que está sendo gravada."""
+    for key in partitions.expired(int(time.time() * 1000)):
+        if key != current and partitions.drop(db, key):
+            counts.drop(Partitions.schema(key))
+
+# Initialize SQLite
+def init_db():
+    db.open()
+    with db.writer() as conn:
+        create_schema(conn)
+        counts.load(conn)
+    if partitions is not None:
+        with db.writer() as conn:
+            # uma varredura do índice no startup; linhas até esse tempo podem já estar no ea.db
+            for table, (_, _, time_col) in INSERTS.items():
+                legacy_until[table] = conn.execute(f"SELECT MAX({time_col}) FROM main.{table}").fetchone()[0]
+        partitions.reset()
+        for key in partitions.keys():
+            partitions.attach(db, key, setup_partition)
+        drop_expired()
+        log.info(f"SQLite partitions: {SQLITE_PARTITION} | dir={SQLITE_PARTITION_DIR} | "
+                 f"files={len(partitions.keys())} | keep={SQLITE_PARTITION_KEEP or 'all'}")
     log.info(f"Database initialized: {DB_PATH}")
 
-init_db()
+def snapshot_sources(since_ms):
+    # ea.db + partições que podem ter dados >= since_ms (mesma poda do exporter)
+    return [DB_PATH] + partition_files(SQLITE_PARTITION_DIR, since_ms)
+
+def refresh_analytics():
+    # só períodos fechados: o corrente ainda recebe escrita
+    closed_until = period_start_ms(int(time.time() * 1000), SQLITE_PARTITION or 'day')
+    return analytics.refresh(snapshot_sources, closed_until)
+
+async def analytics_refresher():
+    while True:
+        try:
+            await asyncio.to_thread(refresh_analytics)
+        except Exception as e:
+            log.error(f"Analytics refresh failed: {e}")
+        await asyncio.sleep(ANALYTICS_REFRESH_SEC)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_db()
+    refresher = None
+    if analytics is not None and ANALYTICS_REFRESH_SEC > 0:
+        refresher = asyncio.create_task(analytics_refresher())
+        log.info(f"Analytics mode: dir={ANALYTICS_DIR} | refresh={ANALYTICS_REFRESH_SEC}s")
+    yield
+    if refresher is not None:
+        refresher.cancel()
+    db.close()
+
+app = FastAPI(title="EA Ingest API Lite", version="0.1", lifespan=lifespan)
 
 class IngestItem(BaseModel):
     symbol: str
@@ -62,14 +179,52 @@ class IngestItem(BaseModel):
     kind: Optional[str] = None
     meta: Optional[dict] = None
 
+def insert_many(conn, table, schema, rows) -> int:
+    """Um executemany na transação do escritor; devolve as linhas realmente inseridas (OR IGNORE)."""
+    # rowcount (sqlite3_changes) não inclui as linhas que os triggers de row_counts tocam; total_changes incluiria
+    inserted = conn.executemany(INSERTS[table][0].format(schema=schema), rows).rowcount
+    if inserted:
+        # symbol é a primeira coluna nos dois INSERTs; relê só os contadores desses símbolos
+        counts.refresh(conn, table, (r[0] for r in rows), schema)
+    return inserted
+
+def write_rows(table, rows):
+    """
+    Grava no arquivo único ou, particionado, uma transação por partição tocada (thread de escrita)
+
+    Returns:
+        (inserted, expired); expired = linhas mais antigas que SQLITE_PARTITION_KEEP, não gravadas
+    """
+    if partitions is None:
+        with db.writer() as conn:
+            return insert_many(conn, table, 'main', rows), 0
+    _, ts_index, time_col = INSERTS[table]
+    total = len(rows)
+    # backfill além da retenção criaria um arquivo que a próxima virada apaga
+    cutoff = partitions.cutoff_ms(int(time.time() * 1000))
+    if cutoff is not None:
+        rows = [r for r in rows if r[ts_index] >= cutoff]
+    expired = total - len(rows)
+    # OR IGNORE só vale dentro do arquivo: o que já está no ea.db conta como duplicata
+    legacy = legacy_until.get(table)
+    old = [(r[0], r[ts_index]) for r in rows if legacy is not None and r[ts_index] <= legacy]
+    if old:
+        with db.writer() as conn:
+            present = existing_keys(conn, table, time_col, old)
+        if present:
+            rows = [r for r in rows if (r[0], r[ts_index]) not in present]
+    inserted = 0
+    for key, part in partitions.split(rows, ts_index).items():
+        schema, new_file = partitions.attach(db, key, setup_partition)
+        with db.writer() as conn:
+            inserted += insert_many(conn, table, schema, part)
+        if new_file:
+            drop_expired(current=key)  # virada de período
+    return inserted, expired
+
 @app.get("/health")
 async def health():
-    conn = sqlite3.connect(str(DB_PATH))
-    c = conn.cursor()
-    c.execute("SELECT COUNT(*) FROM ticks")
-    count = c.fetchone()[0]
-    conn.close()
-    return {"ok": True, "db": str(DB_PATH), "total_ticks": count}
+    return {"ok": True, "db": str(DB_PATH), "total_ticks": counts.total('ticks')}
 
 @app.post("/ingest")
 async def ingest(request: Request):
@@ -77,58 +232,23 @@ async def ingest(request: Request):
     token = request.headers.get("x-api-key")
     if ALLOWED_TOKEN and token != ALLOWED_TOKEN:
         raise HTTPException(status_code=401, detail="invalid token")
-    
+
     body = await request.json()
     items = [body] if isinstance(body, dict) else body
-    
-    inserted = 0
-    duplicates = 0
-    
-    conn = sqlite3.connect(str(DB_PATH))
-    c = conn.cursor()
-    
-    for it in items:
-        try:
-            # Convert ts to int if string
-            ts_val = it.get('ts')
-            if isinstance(ts_val, str):
-                # Try parse ISO8601 or int string
-                try:
-                    from dateutil import parser
-                    dt = parser.isoparse(ts_val)
-                    ts_val = int(dt.timestamp() * 1000)
-                except:
-                    ts_val = int(ts_val)
-            
-            c.execute("""
-                INSERT OR IGNORE INTO ticks(symbol, ts_ms, timeframe, open, high, low, close, volume, kind, meta)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                it.get('symbol'),
-                ts_val,
-                it.get('timeframe'),
-                it.get('open'),
-                it.get('high'),
-                it.get('low'),
-                it.get('close'),
-                it.get('volume'),
-                it.get('kind'),
-                json.dumps(it.get('meta', {}))
-            ))
-            
-            if c.rowcount > 0:
-                inserted += 1
-            else:
-                duplicates += 1
-                
-        except Exception as e:
-            log.warning(f"Insert error: {e}")
-    
-    conn.commit()
-    conn.close()
-    
+
+    # Normaliza o batch inteiro (ts ISO8601/epoch, preços) e grava com um executemany na thread de escrita
+    rows, rejected = validate_batch(items)
+    if rejected:
+        log.warning(f"Ingest: {rejected} invalid item(s) skipped")
+    values = [tuple(r[f] for f in TICK_FIELDS) for r in rows]
+    inserted, expired = await db.call(write_rows, 'ticks', values) if values else (0, 0)
+    duplicates = len(rows) - inserted - expired
+    if expired:
+        log.warning(f"Ingest: {expired} item(s) older than SQLITE_PARTITION_KEEP skipped")
+
     log.info(f"Ingest: {inserted} inserted, {duplicates} duplicates")
-    return {"inserted": inserted, "duplicates": duplicates, "total": len(items)}
+    return {"inserted": inserted, "duplicates": duplicates, "rejected": rejected, "expired": expired,
+            "total": len(items)}
 
 @app.post("/ingest/tick")
 async def ingest_tick(request: Request):
@@ -136,85 +256,127 @@ async def ingest_tick(request: Request):
     token = request.headers.get("x-api-key")
     if ALLOWED_TOKEN and token != ALLOWED_TOKEN:
         raise HTTPException(status_code=401, detail="invalid token")
-    
+
     body = await request.json()
-    
-    # Handle batch format {"ticks": [...]}
-    if isinstance(body, dict) and "ticks" in body:
-        items = body["ticks"]
-    elif isinstance(body, list):
-        items = body
-    else:
-        items = [body]
-    
+
+    # {"ticks": [...]}, lista ou tick único -> colunas de raw_ticks
+    items = extract_ticks(body)
+    cols, errors = normalize_ticks(items)
     log.info(f"Received {len(items)} tick(s) for ingestion")
-    inserted = 0
-    errors = 0
-    conn = sqlite3.connect(str(DB_PATH))
-    c = conn.cursor()
-    
-    for it in items:
-        try:
-            # Convert ts
-            ts_val = it.get('ts')
-            if isinstance(ts_val, str):
-                try:
-                    from dateutil import parser
-                    dt = parser.isoparse(ts_val)
-                    ts_val = int(dt.timestamp() * 1000)
-                except:
-                    ts_val = int(ts_val)
-            
-            c.execute("""
-                INSERT OR IGNORE INTO ticks(symbol, ts_ms, timeframe, open, high, low, close, volume, kind, meta)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                it.get('symbol'),
-                ts_val,
-                'tick',
-                it.get('bid') or it.get('last'),  # Use bid as open fallback
-                it.get('ask'),
-                it.get('bid'),
-                it.get('last'),
-                it.get('volume', 0),
-                'tick',
-                json.dumps(it)
-            ))
-            
-            if c.rowcount > 0:
-                inserted += 1
-                
-        except Exception as e:
-            log.error(f"Tick insert error for item {it}: {e}", exc_info=True)
-            errors += 1
-    
-    conn.commit()
-    conn.close()
-    
+
+    tick_rows = list(zip(*(cols[f] for f in RAW_TICK_FIELDS)))
+    inserted, expired = await db.call(write_rows, 'raw_ticks', tick_rows) if tick_rows else (0, 0)
+    if expired:
+        log.warning(f"Tick ingest: {expired} tick(s) older than SQLITE_PARTITION_KEEP skipped")
+
     log.info(f"Tick ingest complete: {inserted} inserted, {errors} errors")
-    return {"inserted": inserted, "errors": errors, "total": len(items)}
+    return {"inserted": inserted, "duplicates": len(cols['symbol']) - inserted - expired, "errors": errors,
+            "expired": expired, "total": len(items)}
 
 @app.get("/stats")
-async def stats():
-    conn = sqlite3.connect(str(DB_PATH))
-    c = conn.cursor()
-    
-    c.execute("SELECT COUNT(*) FROM ticks")
-    total = c.fetchone()[0]
-    
-    c.execute("SELECT COUNT(DISTINCT symbol) FROM ticks")
-    symbols = c.fetchone()[0]
-    
-    c.execute("SELECT symbol, COUNT(*) as cnt FROM ticks GROUP BY symbol ORDER BY cnt DESC LIMIT 10")
-    top_symbols = [{"symbol": row[0], "count": row[1]} for row in c.fetchall()]
-    
-    conn.close()
-    
-    return {
-        "total_ticks": total,
-        "unique_symbols": symbols,
-        "top_symbols": top_symbols
+async def stats(exact: bool = False):
+    # ?exact=1 refaz as contagens com GROUP BY (O(linhas)) e corrige o que tiver divergido
+    if exact:
+        await db.call(recount)
+    result = {
+        "total_ticks": counts.total('ticks'),
+        "total_raw_ticks": counts.total('raw_ticks'),
+        "unique_symbols": counts.symbols('ticks'),
+        "top_symbols": counts.top('ticks', 10),
+        "exact": exact
     }
+    if partitions is not None:
+        result["partitions"] = partitions.keys()
+    return result
+
+def recount():
+    with db.writer() as conn:
+        lite_stats.rebuild(conn)
+        counts.load(conn)
+    if partitions is None:
+        return
+    schemas = {'main'}
+    for key in partitions.keys():
+        schema, _ = partitions.attach(db, key, setup_partition)
+        with db.writer() as conn:
+            lite_stats.rebuild(conn, schema)
+            counts.load(conn, schema)
+        schemas.add(schema)
+    # partição apagada por fora (arquivo removido à mão) sai da soma
+    for part in set(counts.parts()) - schemas:
+        counts.drop(part)
+
+def require_analytics():
+    if analytics is None:
+        raise HTTPException(status_code=503, detail="analytics mode disabled (ANALYTICS_MODE=1, requires pyarrow)")
+
+@app.get("/analytics/status")
+async def analytics_status():
+    require_analytics()
+    return {"dir": str(ANALYTICS_DIR), "tables": analytics.state()}
+
+@app.post("/analytics/refresh")
+async def analytics_refresh(request: Request, rebuild: bool = False):
+    token = request.headers.get("x-api-key")
+    if ALLOWED_TOKEN and token != ALLOWED_TOKEN:
+        raise HTTPException(status_code=401, detail="invalid token")
+    require_analytics()
+    # rebuild=1 recopia tudo (pega ticks gravados em períodos que já tinham fechado)
+    if rebuild:
+        await asyncio.to_thread(analytics.rebuild)
+    written = await asyncio.to_thread(refresh_analytics)
+    return {"written": written, "tables": analytics.state()}
+
+@app.get("/analytics/counts")
+async def analytics_counts(table: str = 'ticks', from_: Optional[str] = Query(None, alias='from'), to: Optional[str] = None):
+    require_analytics()
+    if table not in lite_analytics.TABLES:
+        raise HTTPException(status_code=400, detail=f"invalid table (use {', '.join(lite_analytics.TABLES)})")
+    from_ms, to_ms = lite_analytics.parse_range(from_, to)
+    time_col = lite_analytics.TABLES[table][0]
+
+    def run():
+        return lite_analytics.symbol_counts(analytics.scan(table, ['symbol', time_col], None, from_ms, to_ms), time_col)
+    symbols = await asyncio.to_thread(run)
+    return {"table": table, "from": from_ms, "to": to_ms, "watermark": analytics.watermark(table),
+            "total": sum(s["count"] for s in symbols), "symbols": symbols}
+
+@app.get("/analytics/ohlc")
+async def analytics_ohlc(symbol: str, tf: str = 'M1', source: str = 'tick',
+                         from_: Optional[str] = Query(None, alias='from'), to: Optional[str] = None,
+                         limit: int = Query(lite_analytics.MAX_CANDLES, ge=1, le=lite_analytics.MAX_CANDLES)):
+    # OHLCV reamostrado dos snapshots: source=tick (bid de raw_ticks) ou bar (barras M1 de ticks)
+    require_analytics()
+    tf = normalize_timeframe(tf)
+    source = source.lower()
+    if source not in lite_analytics.SOURCES:
+        raise HTTPException(status_code=400, detail=f"invalid source (use {', '.join(lite_analytics.SOURCES)})")
+    symbols = lite_analytics.parse_symbols(symbol)
+    if not symbols:
+        raise HTTPException(status_code=400, detail="symbol required")
+    from_ms, to_ms = lite_analytics.parse_range(from_, to)
+    table = lite_analytics.SOURCES[source]
+    columns = (['symbol', 'time_msc', 'bid', 'volume'] if source == 'tick'
+               else ['symbol', 'ts_ms', 'timeframe', 'open', 'high', 'low', 'close', 'volume'])
+
+    def run():
+        data = analytics.scan(table, columns, symbols, from_ms, to_ms)
+        return lite_analytics.resample_ohlc(data, source, TIMEFRAMES[tf], limit)
+    rows = await asyncio.to_thread(run)
+    return {"symbol": symbol, "tf": tf, "source": source, "from": from_ms, "to": to_ms,
+            "watermark": analytics.watermark(table), "candles": rows}
+
+@app.get("/analytics/spread")
+async def analytics_spread(symbol: Optional[str] = None, from_: Optional[str] = Query(None, alias='from'),
+                           to: Optional[str] = None):
+    require_analytics()
+    symbols = lite_analytics.parse_symbols(symbol)
+    from_ms, to_ms = lite_analytics.parse_range(from_, to)
+
+    def run():
+        return lite_analytics.spread_stats(analytics.scan('raw_ticks', ['symbol', 'bid', 'ask'], symbols, from_ms, to_ms))
+    rows = await asyncio.to_thread(run)
+    return {"from": from_ms, "to": to_ms, "watermark": analytics.watermark('raw_ticks'), "symbols": rows}
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,137 @@
+"""
+Payload - decodificação e validação rápida dos batches do EA
+Decoder JSON plugável (orjson quando instalado, json da stdlib como fallback),
+parse de timestamp com caminho rápido para ISO8601 e validação/normalização
+do batch inteiro em uma passada.
+"""
+import json
+import os
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+import dateutil.parser
+
+try:
+    import orjson
+except ImportError:  # opcional: sem orjson usa json da stdlib
+    orjson = None
+
+# 'auto' = orjson se instalado; 'orjson' exige o pacote; 'json' força a stdlib
+JSON_DECODER = os.getenv("JSON_DECODER", "auto").lower()
+
+# faixa de epoch ms que cabe em bigint e em to_timestamp()/timestamptz (coluna gerada ts): ano 1 até 9999
+MIN_TS_MS = -62135596800000
+MAX_TS_MS = 253402300800000
+
+
+# nome -> (loads(bytes), dumps(obj) -> str)
+DECODERS: Dict[str, Tuple[Callable, Callable]] = {
+    'json': (lambda body: json.loads(body.decode('utf-8')), json.dumps),
+}
+if orjson is not None:
+    DECODERS['orjson'] = (orjson.loads, lambda obj: orjson.dumps(obj).decode('utf-8'))
+
+
+def get_codec(name: str = JSON_DECODER) -> Tuple[Callable, Callable]:
+    """Devolve (loads(bytes), dumps(obj) -> str) do decoder configurado."""
+    if name == 'auto':
+        name = 'orjson' if 'orjson' in DECODERS else 'json'
+    if name not in DECODERS:
+        raise ValueError(f"JSON decoder not available: {name}")
+    return DECODERS[name]
+
+
+loads, dumps = get_codec()
+
+
+def parse_iso_ms(v: str) -> int:
+    """ISO8601 -> epoch ms; fromisoformat (C) cobre o formato do EA, dateutil o resto."""
+    try:
+        dt = datetime.fromisoformat(v)
+    except ValueError:
+        dt = dateutil.parser.isoparse(v)
+    return int(dt.timestamp() * 1000)
+
+
+def parse_ts_ms(v) -> int:
+    """Converte ts do payload (epoch ms, string numérica ou ISO8601) para epoch ms."""
+    t = type(v)
+    if t is int:
+        return v
+    if t is float:
+        return int(v)
+    if t is str:
+        try:
+            return int(v)
+        except ValueError:
+            return parse_iso_ms(v)
+    if t is bool:
+        raise ValueError("invalid ts type")
+    if isinstance(v, (int, float)):
+        return int(v)
+    raise ValueError("invalid ts type")
+
+
+def check_ts_ms(t: int) -> int:
+    """ts_ms dentro de MIN_TS_MS..MAX_TS_MS; fora disso o INSERT falharia para o batch inteiro."""
+    if not MIN_TS_MS <= t < MAX_TS_MS:
+        raise ValueError("ts out of range")
+    return t
+
+
+def _opt_text(v):
+    # timeframe/kind vão para colunas text: só string ou ausente
+    if v is None or type(v) is str:
+        return v
+    raise ValueError("invalid text field")
+
+
+def _opt_float(v):
+    if v is None:
+        return None
+    if type(v) is float:
+        return v
+    return float(v)
+
+
+def validate_batch(items: List, dumps_meta: Callable = None) -> Tuple[List[dict], int]:
+    """
+    Valida e normaliza o batch inteiro em uma passada
+
+    Funções e chaves ficam em locais para evitar lookups por item; itens
+    inválidos (sem symbol, ts ilegível ou fora da faixa, preço não numérico,
+    timeframe/kind que não são texto) são descartados, e não derrubam o batch no INSERT.
+
+    Returns:
+        (rows, rejected): linhas prontas para o INSERT e quantidade descartada
+    """
+    dump = dumps_meta or dumps
+    ts_ms = parse_ts_ms
+    check_ts = check_ts_ms
+    flt = _opt_float
+    txt = _opt_text
+    rows: List[dict] = []
+    append = rows.append
+    rejected = 0
+    for it in items:
+        try:
+            get = it.get
+            symbol = get('symbol')
+            if not symbol or type(symbol) is not str:
+                raise ValueError("missing symbol")
+            meta = get('meta')
+            append({
+                'symbol': symbol,
+                'ts_ms': check_ts(ts_ms(get('ts'))),
+                'timeframe': txt(get('timeframe')),
+                'open': flt(get('open')),
+                'high': flt(get('high')),
+                'low': flt(get('low')),
+                'close': flt(get('close')),
+                'volume': flt(get('volume')),
+                'kind': txt(get('kind')),
+                'meta': dump(meta) if meta else '{}',
+            })
+        except Exception:
+            rejected += 1
+    return rows, rejected
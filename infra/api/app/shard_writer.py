@@ -0,0 +1,240 @@
+"""
+Shard Writer - filas de escrita por hash do símbolo para o /ingest
+Cada request é partida por shard (crc32(symbol) % N); cada shard tem um worker
+com conexão própria que grava, em uma transação, tudo que acumulou enquanto o
+flush anterior rodava. Mesmo símbolo sempre cai no mesmo shard e os batches
+saem em ordem de chegada, então a ordem por símbolo é preservada; símbolos
+diferentes são gravados em paralelo em conexões diferentes.
+
+Com a fila do shard cheia a submissão inteira é recusada (ShardsFull com
+retry_after) antes de enfileirar qualquer parte, e a API responde 429.
+Uma request que cai em vários shards pode ter parte gravada se outro shard
+falhar; o EA reenvia e o ON CONFLICT torna o reenvio idempotente.
+"""
+import asyncio
+import logging
+import math
+import time
+import zlib
+from typing import Any, AsyncContextManager, Awaitable, Callable, Dict, List, Optional, Tuple
+
+log = logging.getLogger("ea-api.shard_writer")
+
+# write_fn(conn, batch) grava [(cols, ctx), ...] na transação aberta e devolve flags was_duplicate por submissão
+WriteFn = Callable[[Any, List[Tuple[Dict[str, list], Any]]], Awaitable[List[List[bool]]]]
+# connect() -> async context manager com a conexão do shard (ex.: engine.connect)
+ConnectFn = Callable[[], AsyncContextManager]
+# on_flush(shard, rows, requests, seconds, ok)
+FlushHook = Callable[[int, int, int, float, bool], None]
+
+
+class ShardsFull(Exception):
+    """Fila do shard cheia: o cliente deve tentar de novo em retry_after segundos."""
+
+    def __init__(self, shard: int, retry_after: int):
+        super().__init__(f"write queue {shard} full")
+        self.shard = shard
+        self.retry_after = retry_after
+
+
+def shard_of(symbol: str, shards: int) -> int:
+    # crc32 e não hash(): estável entre processos/reinícios
+    return zlib.crc32(symbol.encode()) % shards
+
+
+def split_columns(cols: Dict[str, list], shards: int) -> Dict[int, List[int]]:
+    """Índices das linhas por shard, na ordem original."""
+    parts: Dict[int, List[int]] = {}
+    for i, symbol in enumerate(cols['symbol']):
+        parts.setdefault(shard_of(symbol, shards), []).append(i)
+    return parts
+
+
+def take(cols: Dict[str, list], idx: List[int]) -> Dict[str, list]:
+    if len(idx) == len(cols['symbol']):
+        return cols
+    return {f: [v[i] for i in idx] for f, v in cols.items()}
+
+
+class _Shard:
+    def __init__(self, index: int):
+        self.index = index
+        self.pending: List[Tuple[Dict[str, list], Any, asyncio.Future, int]] = []
+        self.rows = 0
+        self.rate = 0.0  # linhas/s do último flush (estimativa do Retry-After)
+        self.wake = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
+class ShardedWriter:
+    """
+    N filas de escrita, uma por conexão, roteadas pelo símbolo
+
+    Args:
+        write_fn: grava um batch de submissões na transação do shard
+        shards: número de filas/conexões
+        connect: abre a conexão dedicada do shard (None = write_fn recebe conn=None)
+        max_rows: linhas por transação (o que passar fica para o próximo flush)
+        max_pending_rows: linhas enfileiradas por shard antes de recusar com ShardsFull
+        on_flush: callback de métricas após cada flush
+
+    Usage:
+        flags = await writer.submit(cols, (source_ip, user_agent))
+    """
+
+    def __init__(self, write_fn: WriteFn, *, shards: int = 4, connect: Optional[ConnectFn] = None,
+                 max_rows: int = 2000, max_pending_rows: int = 20000, on_flush: Optional[FlushHook] = None):
+        self.write_fn = write_fn
+        self.connect = connect
+        self.max_rows = max(1, max_rows)
+        self.max_pending_rows = max(1, max_pending_rows)
+        self.on_flush = on_flush
+        self._shards = [_Shard(i) for i in range(max(1, shards))]
+        self._closing = False
+
+    @property
+    def shards(self) -> int:
+        return len(self._shards)
+
+    @property
+    def running(self) -> bool:
+        return any(s.task is not None and not s.task.done() for s in self._shards)
+
+    def pending_rows(self) -> int:
+        return sum(s.rows for s in self._shards)
+
+    def shard_rows(self, index: int) -> int:
+        return self._shards[index].rows
+
+    def retry_after(self, shard: _Shard) -> int:
+        """Segundos para o shard escoar o que está pendente na vazão do último flush (1..30)."""
+        if shard.rate <= 0:
+            return 1
+        return min(30, max(1, math.ceil(shard.rows / shard.rate)))
+
+    async def submit(self, cols: Dict[str, list], ctx: Any = None) -> List[bool]:
+        """Enfileira as linhas nos shards e aguarda os commits; devolve flags was_duplicate por linha."""
+        n = len(cols['symbol'])
+        if n == 0:
+            return []
+        if not self.running or self._closing:
+            raise RuntimeError("sharded writer not running")
+        parts = split_columns(cols, self.shards)
+        # tudo ou nada: checa todos os shards antes de enfileirar (sem await no meio)
+        for index, idx in parts.items():
+            shard = self._shards[index]
+            if shard.rows and shard.rows + len(idx) > self.max_pending_rows:
+                raise ShardsFull(index, self.retry_after(shard))
+        loop = asyncio.get_running_loop()
+        waits = []
+        for index, idx in parts.items():
+            shard = self._shards[index]
+            fut = loop.create_future()
+            shard.pending.append((take(cols, idx), ctx, fut, len(idx)))
+            shard.rows += len(idx)
+            shard.wake.set()
+            waits.append((idx, fut))
+        flags = [False] * n
+        # gather sem return_exceptions: a primeira falha vira a resposta (as outras partes seguem gravando)
+        results = await asyncio.gather(*(fut for _, fut in waits))
+        for (idx, _), part in zip(waits, results):
+            for i, flag in zip(idx, part):
+                flags[i] = flag
+        return flags
+
+    def _next_batch(self, shard: _Shard):
+        batch, rows = [], 0
+        while shard.pending and (not batch or rows + shard.pending[0][3] <= self.max_rows):
+            item = shard.pending.pop(0)
+            batch.append(item)
+            rows += item[3]
+        shard.rows -= rows
+        if not shard.pending:
+            shard.wake.clear()
+        return batch, rows
+
+    async def _flush(self, shard: _Shard, conn, batch, rows: int) -> bool:
+        start = time.perf_counter()
+        try:
+            if conn is not None:
+                async with conn.begin():
+                    results = await self.write_fn(conn, [(cols, ctx) for cols, ctx, _, _ in batch])
+            else:
+                results = await self.write_fn(conn, [(cols, ctx) for cols, ctx, _, _ in batch])
+        except Exception as e:
+            log.error("shard flush failed | shard=%d | rows=%d | requests=%d | err=%s",
+                      shard.index, rows, len(batch), e)
+            for _, _, fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            ok = False
+        else:
+            for (_, _, fut, _), flags in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(flags)
+            ok = True
+        seconds = time.perf_counter() - start
+        if ok and seconds > 0:
+            shard.rate = rows / seconds
+        if self.on_flush:
+            self.on_flush(shard.index, rows, len(batch), seconds, ok)
+        return ok
+
+    async def _run_shard(self, shard: _Shard):
+        while not self._closing or shard.pending:
+            if not shard.pending:
+                # conecta só quando há o que gravar (banco fora do ar não vira loop de reconexão)
+                await shard.wake.wait()
+                continue
+            try:
+                if self.connect is None:
+                    await self._drain(shard, None)
+                else:
+                    async with self.connect() as conn:
+                        await self._drain(shard, conn)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # sem conexão: falha o que está na fila (o EA reenvia) em vez de segurar as requests
+                log.error("shard connection failed | shard=%d | pending_rows=%d | err=%s", shard.index, shard.rows, e)
+                self._fail_pending(shard, e)
+                await asyncio.sleep(0.1)
+
+    def _fail_pending(self, shard: _Shard, exc: Exception):
+        batch, shard.pending, shard.rows = shard.pending, [], 0
+        shard.wake.clear()
+        for _, _, fut, _ in batch:
+            if not fut.done():
+                fut.set_exception(exc)
+
+    async def _drain(self, shard: _Shard, conn):
+        while not self._closing or shard.pending:
+            if not shard.pending:
+                await shard.wake.wait()
+                continue
+            batch, rows = self._next_batch(shard)
+            if not await self._flush(shard, conn, batch, rows) and conn is not None:
+                return  # descarta a conexão depois de uma falha; _run_shard abre outra
+
+    async def start(self):
+        if not self.running:
+            self._closing = False
+            for shard in self._shards:
+                shard.task = asyncio.create_task(self._run_shard(shard), name=f"shard_writer_{shard.index}")
+
+    async def stop(self, timeout: float = 10.0):
+        """Para de aceitar linhas, grava o que estiver pendente e encerra os workers."""
+        tasks = [s.task for s in self._shards if s.task is not None]
+        if not tasks:
+            return
+        self._closing = True
+        for shard in self._shards:
+            shard.wake.set()
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        if pending:
+            log.warning("shard writer stop timeout | pending_rows=%d", self.pending_rows())
+            for t in pending:
+                t.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        for shard in self._shards:
+            shard.task = None
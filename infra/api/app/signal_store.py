@@ -0,0 +1,324 @@
+"""
+Signal Store - sinais de trade persistidos (signals/signal_acks) + cache em memória
+O último sinal por (symbol, timeframe) fica no processo: o publish grava no banco
+e troca a entrada do cache, acordando quem está em long-poll/SSE. GET /signals/next
+responde do cache (sem SQL) e só bloqueia enquanto não há sinal pendente para a
+conta. Acks do Executer EA (FILLED/REJECTED) vão para signal_acks e tiram o sinal
+da fila da conta. Com vários processos, sync_cache() traz do banco o que os
+outros gravaram (ver infra/sql/migration_005_signals.sql).
+"""
+import asyncio
+import math
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from payload import parse_ts_ms
+
+SIDES = ('BUY', 'SELL')
+ACK_STATUSES = ('FILLED', 'REJECTED', 'ACKED')  # ACKED = ack sem resultado (formato antigo em lote)
+DEFAULT_TIMEFRAME = 'M1'
+DEFAULT_TTL_SEC = 60
+MAX_TTL_SEC = 86400
+# Janela relida a cada sync: cobre commits de outros processos com created_at/acked_at já passados
+SYNC_OVERLAP_MS = 5000
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def normalize_signal(item: dict, now_ms: Optional[int] = None, default_ttl: int = DEFAULT_TTL_SEC) -> dict:
+    """Valida um sinal publicado (POST /signals) -> dict do cache; inválido levanta ValueError."""
+    now_ms = now_ms if now_ms is not None else _now_ms()
+    symbol = str(item.get('symbol') or '').strip()
+    if len(symbol) < 3:
+        raise ValueError("invalid symbol")
+    side = str(item.get('side') or '').strip().upper()
+    if side not in SIDES:
+        raise ValueError("side must be BUY or SELL")
+    ttl = int(item.get('ttl_sec') or default_ttl)
+    if not 0 < ttl <= MAX_TTL_SEC:
+        raise ValueError(f"ttl_sec must be between 1 and {MAX_TTL_SEC}")
+    confidence = item.get('confidence')
+    account_id = item.get('account_id')
+    return {
+        'id': str(item.get('id') or uuid.uuid4().hex),
+        'symbol': symbol,
+        'timeframe': str(item.get('timeframe') or DEFAULT_TIMEFRAME).upper(),
+        'side': side,
+        'sl_pips': int(item['sl_pips']) if item.get('sl_pips') is not None else None,
+        'tp_pips': int(item['tp_pips']) if item.get('tp_pips') is not None else None,
+        'confidence': float(confidence) if confidence is not None else None,
+        'ttl_sec': ttl,
+        'account_id': str(account_id) if account_id not in (None, '') else None,
+        'source': item.get('source'),
+        'created_at': now_ms,
+        'expires_at': now_ms + ttl * 1000,
+    }
+
+
+def to_public(signal: dict, now_ms: Optional[int] = None) -> dict:
+    """Formato lido pelo Executer EA (objetos em "signals"); ttl_sec = segundos restantes."""
+    now_ms = now_ms if now_ms is not None else _now_ms()
+    return {
+        'id': signal['id'],
+        'symbol': signal['symbol'],
+        'timeframe': signal['timeframe'],
+        'side': signal['side'],
+        'sl_pips': signal['sl_pips'],
+        'tp_pips': signal['tp_pips'],
+        'confidence': signal['confidence'],
+        'ttl_sec': max(0, (signal['expires_at'] - now_ms) // 1000),
+        'ts': signal['created_at'],
+    }
+
+
+def parse_exec_ts(value) -> Optional[int]:
+    """ts_exec do EA ('YYYY.MM.DD HH:MM:SS', TimeGMT) ou ISO/epoch ms; inválido -> None."""
+    if value in (None, ''):
+        return None
+    try:
+        dt = datetime.strptime(str(value).strip(), '%Y.%m.%d %H:%M:%S').replace(tzinfo=timezone.utc)
+        return int(dt.timestamp() * 1000)
+    except ValueError:
+        pass
+    try:
+        return parse_ts_ms(value)
+    except Exception:
+        return None
+
+
+def parse_ticket(value) -> Optional[int]:
+    """mt5_ticket do ack: inteiro >= 0 que cabe em bigint; ausente/fora da faixa -> None, não numérico -> ValueError."""
+    if value in (None, ''):
+        return None
+    if isinstance(value, bool):
+        raise ValueError("invalid mt5_ticket")
+    ticket = int(value)
+    if isinstance(value, float) and value != ticket:
+        raise ValueError("invalid mt5_ticket")
+    return ticket if 0 <= ticket < 1 << 63 else None
+
+
+def parse_price(value) -> Optional[float]:
+    """price do ack: número finito; ausente -> None, não numérico -> ValueError."""
+    if value in (None, ''):
+        return None
+    if isinstance(value, bool):
+        raise ValueError("invalid price")
+    price = float(value)
+    if not math.isfinite(price):
+        raise ValueError("invalid price")
+    return price
+
+
+def dedupe_acks(acks: List[dict]) -> List[dict]:
+    """
+    Um ack por (signal_id, account_id), o último do batch vence
+    (ON CONFLICT DO UPDATE não pode tocar a mesma linha duas vezes no mesmo INSERT)
+    """
+    last: Dict[tuple, dict] = {}
+    for a in acks:
+        key = (a['signal_id'], a.get('account_id') or '')
+        last.pop(key, None)
+        last[key] = a
+    return list(last.values())
+
+
+class SignalCache:
+    """
+    Último sinal por (symbol, timeframe) e acks por conta, em memória do processo
+
+    Usage:
+        cache.put(signal)                       # troca a entrada e acorda os waiters
+        await cache.wait_pending('123', ['EURUSD'], 'M1', timeout=20)
+    """
+
+    def __init__(self):
+        self._latest: Dict[Tuple[str, str], dict] = {}
+        self._acks: Dict[str, Dict[str, str]] = {}  # signal id -> {account_id ('' = sem conta): status}
+        self._changed = asyncio.Event()
+        self.version = 0
+        self.waiters = 0
+        self.closed = False
+
+    def __len__(self):
+        return len(self._latest)
+
+    def _notify(self):
+        self.version += 1
+        event, self._changed = self._changed, asyncio.Event()
+        event.set()
+
+    def put(self, signal: dict) -> bool:
+        """Substitui o sinal do (symbol, timeframe) se for mais novo; False se já conhecido/antigo."""
+        key = (signal['symbol'], signal['timeframe'])
+        current = self._latest.get(key)
+        if current is not None:
+            if current['id'] == signal['id'] or current['created_at'] > signal['created_at']:
+                return False
+            self._acks.pop(current['id'], None)
+        self._latest[key] = signal
+        self._notify()
+        return True
+
+    def ack(self, signal_id: str, account_id: Optional[str], status: str) -> bool:
+        """Registra o ack; False se o sinal não está (mais) no cache."""
+        if not any(s['id'] == signal_id for s in self._latest.values()):
+            return False
+        self._acks.setdefault(signal_id, {})[account_id or ''] = status
+        return True
+
+    def acks(self, signal_id: str) -> Dict[str, str]:
+        return dict(self._acks.get(signal_id, {}))
+
+    def latest(self, symbol: str, timeframe: Optional[str] = None) -> Optional[dict]:
+        if timeframe:
+            return self._latest.get((symbol, timeframe.upper()))
+        found = [s for (sym, _), s in self._latest.items() if sym == symbol]
+        return max(found, key=lambda s: s['created_at']) if found else None
+
+    def pending(self, account_id: Optional[str], symbols: Iterable[str], timeframe: str,
+                now_ms: Optional[int] = None) -> List[dict]:
+        """Sinais vigentes para a conta: não expirados, destinados a ela (ou a todas) e sem ack."""
+        now_ms = now_ms if now_ms is not None else _now_ms()
+        account_id = account_id or ''
+        out = []
+        for symbol in symbols:
+            s = self._latest.get((symbol, timeframe))
+            if s is None or s['expires_at'] <= now_ms:
+                continue
+            if s['account_id'] and s['account_id'] != account_id:
+                continue
+            acks = self._acks.get(s['id'])
+            # ack sem account_id (contrato atual do EA) vale para todas as contas
+            if acks and (account_id in acks or '' in acks):
+                continue
+            out.append(s)
+        return out
+
+    def close(self):
+        """Drain do processo: acorda os waiters e faz os próximos wait_* retornarem na hora."""
+        self.closed = True
+        self._changed.set()
+
+    async def wait_changed(self, version: int, timeout: float) -> bool:
+        """Espera um put depois de `version`; False no timeout."""
+        if self.version != version or self.closed:
+            return self.version != version
+        self.waiters += 1
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiters -= 1
+
+    async def wait_pending(self, account_id: Optional[str], symbols: List[str], timeframe: str,
+                           timeout: float) -> List[dict]:
+        """Long-poll: devolve já se houver pendente, senão espera um put até o timeout."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            version = self.version
+            out = self.pending(account_id, symbols, timeframe)
+            remaining = deadline - loop.time()
+            if out or remaining <= 0 or self.closed:
+                return out
+            await self.wait_changed(version, remaining)
+
+
+# --- SQL ---
+SIGNAL_INSERT = text("""
+    INSERT INTO signals(id, symbol, timeframe, side, sl_pips, tp_pips, confidence, ttl_sec,
+                        account_id, source, created_at, expires_at)
+    SELECT s.id, s.symbol, s.timeframe, s.side, s.sl_pips, s.tp_pips, s.confidence, s.ttl_sec,
+           s.account_id, s.source, to_timestamp(s.created_at / 1000.0), to_timestamp(s.expires_at / 1000.0)
+    FROM unnest(
+        CAST(:id AS text[]), CAST(:symbol AS text[]), CAST(:timeframe AS text[]), CAST(:side AS text[]),
+        CAST(:sl_pips AS int[]), CAST(:tp_pips AS int[]), CAST(:confidence AS double precision[]),
+        CAST(:ttl_sec AS int[]), CAST(:account_id AS text[]), CAST(:source AS text[]),
+        CAST(:created_at AS bigint[]), CAST(:expires_at AS bigint[])
+    ) AS s(id, symbol, timeframe, side, sl_pips, tp_pips, confidence, ttl_sec,
+           account_id, source, created_at, expires_at)
+    ON CONFLICT (id) DO NOTHING
+    RETURNING id
+""")
+
+# Só registra ack de sinal existente; RETURNING diz quais ids eram conhecidos
+SIGNAL_ACK_UPSERT = text("""
+    INSERT INTO signal_acks(signal_id, account_id, status, mt5_ticket, price, ts_exec, acked_at)
+    SELECT a.signal_id, a.account_id, a.status, a.mt5_ticket, a.price,
+           to_timestamp(a.ts_exec / 1000.0), now()
+    FROM unnest(
+        CAST(:signal_id AS text[]), CAST(:account_id AS text[]), CAST(:status AS text[]),
+        CAST(:mt5_ticket AS bigint[]), CAST(:price AS double precision[]), CAST(:ts_exec AS bigint[])
+    ) AS a(signal_id, account_id, status, mt5_ticket, price, ts_exec)
+    WHERE EXISTS (SELECT 1 FROM signals s WHERE s.id = a.signal_id)
+    ON CONFLICT (signal_id, account_id) DO UPDATE SET
+        status = EXCLUDED.status, mt5_ticket = EXCLUDED.mt5_ticket, price = EXCLUDED.price,
+        ts_exec = EXCLUDED.ts_exec, acked_at = EXCLUDED.acked_at
+    RETURNING signal_id
+""")
+
+SIGNALS_SINCE = text("""
+    SELECT id, symbol, timeframe, side, sl_pips, tp_pips, confidence, ttl_sec, account_id, source,
+           (EXTRACT(EPOCH FROM created_at) * 1000)::bigint AS created_at,
+           (EXTRACT(EPOCH FROM expires_at) * 1000)::bigint AS expires_at
+    FROM signals
+    WHERE created_at >= to_timestamp(CAST(:since_ms AS bigint) / 1000.0)
+    ORDER BY created_at
+""")
+
+ACKS_SINCE = text("""
+    SELECT signal_id, account_id, status, (EXTRACT(EPOCH FROM acked_at) * 1000)::bigint AS acked_at
+    FROM signal_acks
+    WHERE acked_at >= to_timestamp(CAST(:since_ms AS bigint) / 1000.0)
+""")
+
+FEEDBACK_INSERT = text("""
+    INSERT INTO order_feedback(order_id, feedback) VALUES (:order_id, :feedback)
+""")
+
+
+def signal_columns(signals: List[dict]) -> Dict[str, list]:
+    fields = ('id', 'symbol', 'timeframe', 'side', 'sl_pips', 'tp_pips', 'confidence', 'ttl_sec',
+              'account_id', 'source', 'created_at', 'expires_at')
+    return {f: [s[f] for s in signals] for f in fields}
+
+
+async def insert_signals(conn, signals: List[dict]) -> List[str]:
+    """Grava os sinais; devolve os ids inseridos (id repetido é ignorado)."""
+    if not signals:
+        return []
+    result = await conn.execute(SIGNAL_INSERT, signal_columns(signals))
+    return [r[0] for r in result]
+
+
+async def insert_acks(conn, acks: List[dict]) -> List[str]:
+    """Grava acks (signal_id, account_id, status, mt5_ticket, price, ts_exec); devolve os ids conhecidos."""
+    if not acks:
+        return []
+    params = {f: [a.get(f) for a in acks] for f in ('signal_id', 'status', 'mt5_ticket', 'price', 'ts_exec')}
+    params['account_id'] = [a.get('account_id') or '' for a in acks]
+    result = await conn.execute(SIGNAL_ACK_UPSERT, params)
+    return [r[0] for r in result]
+
+
+async def sync_cache(conn, cache: SignalCache, since_ms: int) -> int:
+    """Carrega sinais/acks gravados desde since_ms (warm-up e outros processos); devolve o novo cursor."""
+    cursor = since_ms
+    result = await conn.execute(SIGNALS_SINCE, {'since_ms': since_ms - SYNC_OVERLAP_MS})
+    for row in result.mappings():
+        cache.put(dict(row))
+        cursor = max(cursor, row['created_at'])
+    result = await conn.execute(ACKS_SINCE, {'since_ms': since_ms - SYNC_OVERLAP_MS})
+    for row in result.mappings():
+        cache.ack(row['signal_id'], row['account_id'], row['status'])
+        cursor = max(cursor, row['acked_at'])
+    return cursor
@@ -0,0 +1,177 @@
+"""
+Storage Policy - chunking, compressão nativa e retenção das hypertables
+Define por tabela o intervalo de chunk, a compressão (segmentada por symbol e
+ordenada pelo tempo) e a retenção, aplica tudo via funções do TimescaleDB e
+coleta tamanho, chunks e taxa de compressão por tabela (admin/métricas).
+
+Overrides por env (valor 'off' desliga compressão/retenção):
+    STORAGE_<TABELA>_CHUNK_INTERVAL   ex.: STORAGE_TICKS_CHUNK_INTERVAL=1 day
+    STORAGE_<TABELA>_COMPRESS_AFTER   ex.: STORAGE_RAW_TICKS_COMPRESS_AFTER=3 days
+    STORAGE_<TABELA>_RETENTION        ex.: STORAGE_INGEST_LOG_RETENTION=30 days
+"""
+import os
+import re
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+
+_INTERVAL_RE = re.compile(r'^\d+\s*(second|minute|hour|day|week|month|year)s?$', re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class TablePolicy:
+    table: str
+    time_column: Optional[str]          # None = tabela comum (sem chunk/compressão)
+    chunk_interval: Optional[str] = None
+    compress_after: Optional[str] = None
+    retention: Optional[str] = None
+    segment_by: str = 'symbol'
+
+    @property
+    def hypertable(self) -> bool:
+        return self.time_column is not None
+
+
+# Dados de mercado não expiram por padrão; logs e auditoria ficam 30 dias
+# (mesma janela de cleanup_duplicate_stats()). compress_after deve ficar além
+# da janela em que o EA ainda reenvia dados atrasados (as refresh policies dos
+# candles em migration_003_candles.sql usam a mesma janela).
+DEFAULT_POLICIES = (
+    TablePolicy('ticks', 'ts', chunk_interval='1 day', compress_after='7 days'),
+    TablePolicy('raw_ticks', 'ts', chunk_interval='1 day', compress_after='3 days'),
+    TablePolicy('ingest_log', 'received_at', chunk_interval='1 day', compress_after='2 days', retention='30 days'),
+    TablePolicy('ingest_activity', 'minute_bucket', chunk_interval='7 days', compress_after='7 days',
+                retention='30 days'),
+    TablePolicy('forward_audit', None, retention='30 days'),
+)
+
+
+def _interval(value: Optional[str], name: str) -> Optional[str]:
+    if value is None:
+        return None
+    value = value.strip()
+    if value.lower() in ('', 'off', 'none'):
+        return None
+    if not _INTERVAL_RE.match(value):
+        raise ValueError(f"invalid interval for {name}: {value!r}")
+    return value
+
+
+def load_policies(environ=None) -> Dict[str, TablePolicy]:
+    """Políticas padrão com overrides do ambiente; intervalos inválidos levantam ValueError."""
+    env = os.environ if environ is None else environ
+    policies = {}
+    for p in DEFAULT_POLICIES:
+        prefix = f"STORAGE_{p.table.upper()}_"
+        overrides = {}
+        for field in ('chunk_interval', 'compress_after', 'retention'):
+            key = prefix + field.upper()
+            overrides[field] = _interval(env[key], key) if key in env else getattr(p, field)
+        if not p.hypertable:
+            overrides['chunk_interval'] = overrides['compress_after'] = None
+        policies[p.table] = replace(p, **overrides)
+    return policies
+
+
+# --- Aplicação ---
+_COMPRESSION_ENABLED = text("""
+    SELECT compression_enabled FROM timescaledb_information.hypertables
+    WHERE hypertable_schema = 'public' AND hypertable_name = :table
+""")
+_SET_CHUNK = text("SELECT set_chunk_time_interval(CAST(:table AS regclass), CAST(:interval AS interval))")
+_REMOVE_COMPRESSION = text("SELECT remove_compression_policy(CAST(:table AS regclass), if_exists => true)")
+_ADD_COMPRESSION = text("""
+    SELECT add_compression_policy(CAST(:table AS regclass), compress_after => CAST(:interval AS interval))
+""")
+_REMOVE_RETENTION = text("SELECT remove_retention_policy(CAST(:table AS regclass), if_exists => true)")
+_ADD_RETENTION = text("""
+    SELECT add_retention_policy(CAST(:table AS regclass), drop_after => CAST(:interval AS interval))
+""")
+# forward_audit não é hypertable: job do TimescaleDB chama a procedure da migration_004
+_REMOVE_AUDIT_JOB = text("""
+    SELECT delete_job(job_id) FROM timescaledb_information.jobs
+    WHERE proc_name = 'cleanup_forward_audit'
+""")
+_ADD_AUDIT_JOB = text("""
+    SELECT add_job('cleanup_forward_audit', CAST('1 hour' AS interval),
+                   config => jsonb_build_object('retention', CAST(:interval AS text)))
+""")
+
+
+async def apply_policy(conn, p: TablePolicy) -> List[str]:
+    """Aplica uma política (idempotente: remove e recria os jobs); devolve as ações executadas."""
+    actions = []
+    params = {'table': p.table}
+    if not p.hypertable:
+        await conn.execute(_REMOVE_AUDIT_JOB)
+        if p.retention:
+            await conn.execute(_ADD_AUDIT_JOB, {'interval': p.retention})
+            actions.append(f"retention job {p.retention}")
+        return actions
+    enabled = (await conn.execute(_COMPRESSION_ENABLED, params)).scalar()
+    if enabled is None:
+        return [f"skipped: {p.table} is not a hypertable"]
+    if p.chunk_interval:
+        await conn.execute(_SET_CHUNK, {**params, 'interval': p.chunk_interval})
+        actions.append(f"chunk_interval {p.chunk_interval}")
+    await conn.execute(_REMOVE_COMPRESSION, params)
+    if p.compress_after:
+        if not enabled:
+            # identificadores vêm de DEFAULT_POLICIES, nunca do ambiente
+            await conn.execute(text(
+                f"ALTER TABLE {p.table} SET (timescaledb.compress, "
+                f"timescaledb.compress_segmentby = '{p.segment_by}', "
+                f"timescaledb.compress_orderby = '{p.time_column} DESC')"))
+            actions.append(f"compression enabled (segmentby {p.segment_by})")
+        await conn.execute(_ADD_COMPRESSION, {**params, 'interval': p.compress_after})
+        actions.append(f"compress_after {p.compress_after}")
+    await conn.execute(_REMOVE_RETENTION, params)
+    if p.retention:
+        await conn.execute(_ADD_RETENTION, {**params, 'interval': p.retention})
+        actions.append(f"retention {p.retention}")
+    return actions
+
+
+async def apply_policies(conn, policies: Dict[str, TablePolicy]) -> Dict[str, List[str]]:
+    return {name: await apply_policy(conn, p) for name, p in policies.items()}
+
+
+# --- Estatísticas ---
+STORAGE_STATS = text("""
+    SELECT h.hypertable_name AS table_name,
+           hypertable_size(format('%I.%I', h.hypertable_schema, h.hypertable_name)::regclass) AS total_bytes,
+           h.num_chunks AS chunks,
+           h.compression_enabled,
+           c.number_compressed_chunks AS compressed_chunks,
+           c.before_compression_total_bytes AS before_bytes,
+           c.after_compression_total_bytes AS after_bytes
+    FROM timescaledb_information.hypertables h
+    LEFT JOIN LATERAL hypertable_compression_stats(
+        format('%I.%I', h.hypertable_schema, h.hypertable_name)::regclass) c ON true
+    WHERE h.hypertable_schema = 'public'
+    UNION ALL
+    SELECT t.table_name, pg_total_relation_size(format('public.%I', t.table_name)::regclass),
+           NULL, false, NULL, NULL, NULL
+    FROM unnest(CAST(:plain_tables AS text[])) AS t(table_name)
+    WHERE to_regclass(format('public.%I', t.table_name)) IS NOT NULL
+""")
+
+
+def summarize(row) -> dict:
+    """Linha de STORAGE_STATS -> dict com MB e taxa de compressão (before/after)."""
+    before, after = row['before_bytes'], row['after_bytes']
+    return {
+        'table': row['table_name'],
+        'size_mb': round((row['total_bytes'] or 0) / (1024 * 1024), 3),
+        'chunks': row['chunks'],
+        'compression_enabled': bool(row['compression_enabled']),
+        'compressed_chunks': row['compressed_chunks'] or 0,
+        'compression_ratio': round(before / after, 2) if before and after else None,
+    }
+
+
+async def collect_stats(conn, policies: Dict[str, TablePolicy]) -> List[dict]:
+    plain = [p.table for p in policies.values() if not p.hypertable]
+    result = await conn.execute(STORAGE_STATS, {'plain_tables': plain})
+    return [summarize(r) for r in result.mappings()]
@@ -0,0 +1,174 @@
+"""
+Tick Reader - leitura histórica de ticks/barras com keyset pagination e streaming
+GET /ticks percorre raw_ticks (tf ausente ou 'tick') ou ticks (tf=M1, H1, ...)
+em ordem de (symbol, tempo) via cursor do servidor, e serializa em partições
+(NDJSON, CSV ou Arrow IPC), então a memória do servidor fica limitada ao tamanho
+da partição, não ao período pedido. Páginas seguintes usam after=<symbol>:<ts>
+com o último registro recebido (keyset, sem OFFSET).
+"""
+import csv
+import io
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import text
+
+import payload
+
+try:
+    import pyarrow as pa
+except ImportError:  # opcional: sem pyarrow só NDJSON/CSV
+    pa = None
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+PARTITION_ROWS = 5000
+MAX_LIMIT = 5_000_000
+
+# (tabela, coluna de tempo, colunas de saída)
+RAW_COLUMNS = ('symbol', 'time_msc', 'bid', 'ask', 'last', 'volume', 'flags')
+BAR_COLUMNS = ('symbol', 'ts_ms', 'timeframe', 'open', 'high', 'low', 'close', 'volume')
+
+ARROW_TYPES = {
+    'symbol': 'string', 'timeframe': 'string', 'time_msc': 'int64', 'ts_ms': 'int64', 'flags': 'int32',
+}
+
+# faixa aceita por to_timestamp()/timestamptz: ano 1 até 9999
+MIN_TS_MS, MAX_TS_MS = payload.MIN_TS_MS, payload.MAX_TS_MS
+
+# PK (symbol, tempo) cobre filtro e ordenação; (symbol, tempo) > (after_symbol, after_ts) é o keyset.
+# O mesmo intervalo em ts (coluna gerada = to_timestamp(tempo/1000.0), dimensão da hypertable)
+# deixa o planner excluir os chunks fora do período; só a PK não basta para isso.
+_QUERY = """
+    SELECT {columns}
+    FROM {table}
+    WHERE symbol = ANY(CAST(:symbols AS text[]))
+      AND {time} >= :from_ms AND {time} < :to_ms
+      AND ts >= to_timestamp(CAST(:from_ms AS bigint) / 1000.0)
+      AND ts < to_timestamp(CAST(:to_ms AS bigint) / 1000.0)
+      AND ({{tf_filter}})
+      AND (symbol, {time}) > (CAST(:after_symbol AS text), CAST(:after_ts AS bigint))
+    ORDER BY symbol, {time}
+    LIMIT :limit
+"""
+RAW_QUERY = text(_QUERY.format(columns=', '.join(RAW_COLUMNS), table='raw_ticks', time='time_msc')
+                 .format(tf_filter='true'))
+BAR_QUERY = text(_QUERY.format(columns=', '.join(BAR_COLUMNS), table='ticks', time='ts_ms')
+                 .format(tf_filter='timeframe = :tf'))
+
+
+def parse_symbols(symbol: str) -> List[str]:
+    symbols = sorted({s.strip() for s in (symbol or '').split(',') if s.strip()})
+    if not symbols:
+        raise HTTPException(status_code=400, detail="symbol required")
+    return symbols
+
+
+def parse_after(after: Optional[str]) -> Tuple[str, int]:
+    """Cursor 'SYMBOL:ts_ms' (último registro da página anterior) -> chave do keyset."""
+    if not after:
+        return '', -1 << 62
+    symbol, sep, ts = after.rpartition(':')
+    try:
+        if not sep or not symbol:
+            raise ValueError(after)
+        return symbol, int(ts)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid after cursor (use SYMBOL:ts_ms)")
+
+
+def build_query(symbol: str, from_: Optional[str], to: Optional[str], tf: Optional[str], after: Optional[str],
+                limit: int):
+    """Valida os parâmetros do GET /ticks -> (statement, params, colunas)."""
+    try:
+        from_ms = payload.parse_ts_ms(from_) if from_ is not None else 0
+        to_ms = payload.parse_ts_ms(to) if to is not None else MAX_TS_MS
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid from/to")
+    from_ms = min(max(from_ms, MIN_TS_MS), MAX_TS_MS)
+    to_ms = min(max(to_ms, MIN_TS_MS), MAX_TS_MS)
+    if from_ms >= to_ms:
+        raise HTTPException(status_code=400, detail="from must be before to")
+    after_symbol, after_ts = parse_after(after)
+    params = {'symbols': parse_symbols(symbol), 'from_ms': from_ms, 'to_ms': to_ms,
+              'after_symbol': after_symbol, 'after_ts': after_ts, 'limit': min(max(1, limit), MAX_LIMIT)}
+    if not tf or tf.lower() == 'tick':
+        return RAW_QUERY, params, RAW_COLUMNS
+    params['tf'] = tf.upper()
+    return BAR_QUERY, params, BAR_COLUMNS
+
+
+def check_format(fmt: str) -> str:
+    fmt = (fmt or 'ndjson').lower()
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"invalid format (use {', '.join(FORMATS)})")
+    if fmt == 'arrow' and pa is None:
+        raise HTTPException(status_code=406, detail="arrow format not available (pyarrow not installed)")
+    return fmt
+
+
+# --- Serializadores (uma partição de linhas -> bytes) ---
+def ndjson_chunk(columns: Sequence[str], rows: Sequence[tuple]) -> bytes:
+    dumps = payload.dumps
+    return ''.join(dumps(dict(zip(columns, r))) + '\n' for r in rows).encode('utf-8')
+
+
+def csv_chunk(columns: Sequence[str], rows: Sequence[tuple], header: bool = False) -> bytes:
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator='\n')
+    if header:
+        w.writerow(columns)
+    w.writerows(rows)
+    return buf.getvalue().encode('utf-8')
+
+
+def arrow_schema(columns: Sequence[str]):
+    return pa.schema([(c, getattr(pa, ARROW_TYPES.get(c, 'float64'))()) for c in columns])
+
+
+def arrow_batch(schema, columns: Sequence[str], rows: Sequence[tuple]):
+    cols = list(zip(*rows)) if rows else [()] * len(columns)
+    return pa.record_batch([pa.array(list(values), type=schema.field(c).type) for c, values in zip(columns, cols)],
+                           schema=schema)
+
+
+class _Sink(io.RawIOBase):
+    """Buffer que o writer IPC preenche e o stream esvazia a cada partição."""
+
+    def __init__(self):
+        self.parts: List[bytes] = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.parts.append(bytes(b))
+        return len(b)
+
+    def take(self) -> bytes:
+        out, self.parts = b''.join(self.parts), []
+        return out
+
+
+async def stream_rows(conn, stmt, params: Dict, columns: Sequence[str], fmt: str,
+                      partition_rows: int = PARTITION_ROWS) -> AsyncIterator[bytes]:
+    """Executa com cursor do servidor e devolve os bytes de cada partição no formato pedido."""
+    result = await conn.stream(stmt, params)
+    if fmt == 'arrow':
+        schema = arrow_schema(columns)
+        sink = _Sink()
+        writer = pa.ipc.new_stream(sink, schema)
+        async for rows in result.partitions(partition_rows):
+            writer.write_batch(arrow_batch(schema, columns, rows))
+            yield sink.take()
+        writer.close()
+        yield sink.take()
+        return
+    if fmt == 'csv':
+        yield csv_chunk(columns, [], header=True)
+    chunk = csv_chunk if fmt == 'csv' else ndjson_chunk
+    async for rows in result.partitions(partition_rows):
+        yield chunk(columns, rows)
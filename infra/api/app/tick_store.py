@@ -0,0 +1,157 @@
+"""
+Tick Store - caminho de escrita de ticks brutos em raw_ticks
+Aceita tick único, {"ticks": [...]} ou lista pura, normaliza direto para colunas
+numéricas estreitas (sem dict nem JSON por linha) e grava tudo com um único
+INSERT set-based em raw_ticks (ver migration_001_idempotency.sql).
+"""
+from typing import Dict, List, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from payload import check_ts_ms, parse_ts_ms
+
+RAW_TICK_FIELDS = ('symbol', 'time_msc', 'bid', 'ask', 'last', 'volume', 'flags', 'source', 'ea_version')
+DEFAULT_SOURCE = 'MT5'
+
+RAW_TICKS_BULK_INSERT = text("""
+    INSERT INTO raw_ticks(symbol, time_msc, bid, ask, last, volume, flags, source, ea_version)
+    SELECT * FROM unnest(
+        CAST(:symbol AS text[]), CAST(:time_msc AS bigint[]),
+        CAST(:bid AS float8[]), CAST(:ask AS float8[]), CAST(:last AS float8[]),
+        CAST(:volume AS bigint[]), CAST(:flags AS int[]),
+        CAST(:source AS text[]), CAST(:ea_version AS text[])
+    )
+    ON CONFLICT (symbol, time_msc) DO NOTHING
+    RETURNING symbol, time_msc
+""")
+
+
+def extract_ticks(data) -> list:
+    """DataCollectorPRO envia {"ticks": [...]}; aceita também lista pura ou tick único."""
+    if isinstance(data, dict):
+        ticks = data.get('ticks')
+        return ticks if isinstance(ticks, list) else [data]
+    if isinstance(data, list):
+        return data
+    raise HTTPException(status_code=400, detail="invalid payload type")
+
+
+def is_raw_tick(data) -> bool:
+    """Payload no formato de tick (bid/ask ou wrapper "ticks"), em vez do item OHLC legado."""
+    if isinstance(data, list):
+        return bool(data) and isinstance(data[0], dict) and 'bid' in data[0]
+    return isinstance(data, dict) and ('ticks' in data or 'bid' in data)
+
+
+def _tick_time_ms(get) -> int:
+    # ts_msc/time_msc (ms do MT5) têm precedência sobre ts/time ISO com resolução de segundos
+    for key in ('ts_msc', 'time_msc'):
+        v = get(key)
+        if v is not None:
+            return parse_ts_ms(v)
+    v = get('ts')
+    return parse_ts_ms(v if v is not None else get('time'))
+
+
+def empty_columns() -> Dict[str, list]:
+    return {f: [] for f in RAW_TICK_FIELDS}
+
+
+def normalize_ticks(items: List) -> Tuple[Dict[str, list], int]:
+    """
+    Valida os ticks e monta as colunas do INSERT em uma passada
+
+    Obrigatórios: symbol, bid, ask e tempo (ts_msc, time_msc, ts ou time).
+    source/ea_version vêm do tick ou do seu meta; volume/flags ausentes viram 0.
+
+    Returns:
+        (cols, rejected): colunas RAW_TICK_FIELDS e quantidade de ticks descartados
+    """
+    cols = empty_columns()
+    symbol_c, time_c, bid_c, ask_c = cols['symbol'], cols['time_msc'], cols['bid'], cols['ask']
+    last_c, volume_c, flags_c = cols['last'], cols['volume'], cols['flags']
+    source_c, version_c = cols['source'], cols['ea_version']
+    rejected = 0
+    for it in items:
+        try:
+            get = it.get
+            symbol = get('symbol')
+            if not symbol or type(symbol) is not str:
+                raise ValueError("missing symbol")
+            t = check_ts_ms(_tick_time_ms(get))
+            bid = float(get('bid'))
+            ask = float(get('ask'))
+            last = get('last')
+            last = None if last is None else float(last)
+            volume = int(get('volume') or 0)
+            flags = int(get('flags') or 0)
+            meta = get('meta')
+            meta_get = meta.get if isinstance(meta, dict) else {}.get
+            source = get('source') or meta_get('source') or DEFAULT_SOURCE
+            ea_version = get('ea_version') or meta_get('ea_version')
+        except Exception:
+            rejected += 1
+            continue
+        symbol_c.append(symbol)
+        time_c.append(t)
+        bid_c.append(bid)
+        ask_c.append(ask)
+        last_c.append(last)
+        volume_c.append(volume)
+        flags_c.append(flags)
+        source_c.append(str(source))
+        version_c.append(None if ea_version is None else str(ea_version))
+    return cols, rejected
+
+
+def from_columnar(cols: Dict[str, list]) -> Tuple[Dict[str, list], int]:
+    """
+    Colunas do payload colunar (columnar.py) -> colunas de raw_ticks
+
+    Linhas sem bid/ask ou com volume/flags não numéricos são descartadas, como em normalize_ticks.
+    """
+    n = len(cols['symbol'])
+    bids, asks = cols.get('bid'), cols.get('ask')
+    if bids is None or asks is None:
+        return empty_columns(), n
+    lasts = cols.get('last') or [None] * n
+    volumes = cols.get('volume') or [None] * n
+    flags = cols.get('flags') or [None] * n
+    sources = cols.get('source') or [None] * n
+    versions = cols.get('ea_version') or [None] * n
+    keep, volume_c, flags_c = [], [], []
+    for i in range(n):
+        if bids[i] is None or asks[i] is None:
+            continue
+        try:
+            volume = int(volumes[i] or 0)
+            flag = int(flags[i] or 0)
+        except (TypeError, ValueError):
+            continue
+        keep.append(i)
+        volume_c.append(volume)
+        flags_c.append(flag)
+    out = {
+        'symbol': [cols['symbol'][i] for i in keep],
+        'time_msc': [cols['ts_ms'][i] for i in keep],
+        'bid': [bids[i] for i in keep],
+        'ask': [asks[i] for i in keep],
+        'last': [lasts[i] for i in keep],
+        'volume': volume_c,
+        'flags': flags_c,
+        'source': [sources[i] or DEFAULT_SOURCE for i in keep],
+        'ea_version': [versions[i] for i in keep],
+    }
+    return out, n - len(keep)
+
+
+def to_items(cols: Dict[str, list]) -> List[dict]:
+    """Colunas -> ticks no formato JSON do EA (forward para o servidor remoto)."""
+    names = RAW_TICK_FIELDS
+    return [dict(zip(names, values)) for values in zip(*(cols[k] for k in names))]
+
+
+async def insert_raw_ticks(conn, cols: Dict[str, list]) -> List[Tuple[str, int]]:
+    """Grava o batch em raw_ticks em 1 statement; devolve as chaves (symbol, time_msc) novas."""
+    return [(r[0], r[1]) for r in await conn.execute(RAW_TICKS_BULK_INSERT, cols)]
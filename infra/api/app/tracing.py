@@ -0,0 +1,175 @@
+"""
+Tracing - níveis de detalhe e amostragem do OpenTelemetry da API
+Controla quanto o tracing custa no caminho quente do /ingest: nível de spans
+(off/request/detail/full), amostragem head por ratio e tail-sampling que só
+exporta traces lentos ou com erro (mais um baseline por ratio).
+"""
+import os
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import Dict, List
+
+from opentelemetry import trace
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor, TracerProvider
+from opentelemetry.sdk.trace.sampling import ALWAYS_ON, ParentBased, TraceIdRatioBased
+from opentelemetry.trace import StatusCode
+
+# off: sem tracing | request: span do servidor + ingest_request | detail: + etapas e httpx
+# full: + spans por item e por statement SQL (comportamento original)
+TRACE_LEVELS = ('off', 'request', 'detail', 'full')
+
+_TRACE_ID_LIMIT = (1 << 64) - 1
+
+
+def _env_bool(environ, name: str, default: bool) -> bool:
+    v = environ.get(name)
+    if v is None or v == '':
+        return default
+    return v.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+class TracingOptions:
+    """
+    Configuração de tracing lida do ambiente
+
+    Env:
+        TRACE_LEVEL: off | request | detail | full (default full)
+        TRACE_SAMPLE_RATIO: fração de traces exportados por amostragem head (default 1.0)
+        TRACE_TAIL_SAMPLING: exporta sempre traces lentos/com erro, demais pelo ratio
+        TRACE_TAIL_SLOW_MS: latência mínima (ms) do span raiz para o tail-sampling manter o trace
+        TRACE_TAIL_MAX_TRACES: traces em buffer aguardando decisão
+        TRACE_STAGE_SPANS, TRACE_ITEM_SPANS, TRACE_DB_STATEMENTS, TRACE_HTTP_CLIENT:
+            sobrescrevem o default do nível para cada grupo de spans
+    """
+
+    def __init__(self, environ=None):
+        environ = os.environ if environ is None else environ
+        level = environ.get('TRACE_LEVEL', 'full').strip().lower()
+        if level not in TRACE_LEVELS:
+            raise ValueError(f"invalid TRACE_LEVEL: {level}")
+        rank = TRACE_LEVELS.index(level)
+        self.level = level
+        self.enabled = rank > 0
+        self.sample_ratio = min(1.0, max(0.0, float(environ.get('TRACE_SAMPLE_RATIO', '1.0'))))
+        self.tail_sampling = _env_bool(environ, 'TRACE_TAIL_SAMPLING', False)
+        self.tail_slow_ms = float(environ.get('TRACE_TAIL_SLOW_MS', '500'))
+        self.tail_max_traces = int(environ.get('TRACE_TAIL_MAX_TRACES', '10000'))
+        self.stage_spans = self.enabled and _env_bool(environ, 'TRACE_STAGE_SPANS', rank >= 2)
+        self.http_client = self.enabled and _env_bool(environ, 'TRACE_HTTP_CLIENT', rank >= 2)
+        self.item_spans = self.enabled and _env_bool(environ, 'TRACE_ITEM_SPANS', rank >= 3)
+        self.db_statements = self.enabled and _env_bool(environ, 'TRACE_DB_STATEMENTS', rank >= 3)
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+def _ratio_keeps(trace_id: int, ratio: float) -> bool:
+    # mesmo critério do TraceIdRatioBased: decisão determinística pelos 64 bits baixos do trace_id
+    return (trace_id & _TRACE_ID_LIMIT) < ratio * (_TRACE_ID_LIMIT + 1)
+
+
+def _has_error(span: ReadableSpan) -> bool:
+    if span.status is not None and span.status.status_code is StatusCode.ERROR:
+        return True
+    attrs = span.attributes or {}
+    if attrs.get('error') is True:
+        return True
+    code = attrs.get('http.status_code')
+    return isinstance(code, int) and code >= 500
+
+
+class TailSamplingProcessor(SpanProcessor):
+    """
+    Bufferiza os spans de cada trace até o span raiz local terminar e só então
+    decide: repassa ao processor de export se o trace foi lento, teve erro ou
+    caiu no baseline do ratio; caso contrário descarta tudo.
+
+    Args:
+        delegate: processor de export (ex.: BatchSpanProcessor)
+        slow_ms: duração mínima do span raiz para manter o trace
+        ratio: fração de traces normais mantida como baseline
+        max_traces: limite de traces em buffer; os mais antigos são descartados
+    """
+
+    def __init__(self, delegate: SpanProcessor, slow_ms: float = 500.0, ratio: float = 0.0,
+                 max_traces: int = 10000):
+        self.delegate = delegate
+        self.slow_ns = int(slow_ms * 1e6)
+        self.ratio = ratio
+        self.max_traces = max_traces
+        self._pending: "OrderedDict[int, List[ReadableSpan]]" = OrderedDict()
+        # decisões recentes, para spans que terminam depois do raiz (ex.: tasks filhas)
+        self._decided: "OrderedDict[int, bool]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {'kept': 0, 'dropped': 0, 'evicted': 0}
+
+    def on_start(self, span, parent_context=None):
+        pass
+
+    def _decide(self, root: ReadableSpan, spans: List[ReadableSpan]) -> bool:
+        if root.end_time is not None and root.start_time is not None \
+                and root.end_time - root.start_time >= self.slow_ns:
+            return True
+        if any(_has_error(s) for s in spans):
+            return True
+        return _ratio_keeps(root.context.trace_id, self.ratio)
+
+    def on_end(self, span: ReadableSpan):
+        tid = span.context.trace_id
+        is_root = span.parent is None or span.parent.is_remote
+        export: List[ReadableSpan] = []
+        with self._lock:
+            decided = self._decided.get(tid)
+            if decided is not None:
+                if decided:
+                    export = [span]
+            else:
+                buf = self._pending.setdefault(tid, [])
+                buf.append(span)
+                if is_root:
+                    spans = self._pending.pop(tid)
+                    keep = self._decide(span, spans)
+                    self._decided[tid] = keep
+                    if len(self._decided) > self.max_traces:
+                        self._decided.popitem(last=False)
+                    self.stats['kept' if keep else 'dropped'] += 1
+                    if keep:
+                        export = spans
+                elif len(self._pending) > self.max_traces:
+                    self._pending.popitem(last=False)
+                    self.stats['evicted'] += 1
+        for s in export:
+            self.delegate.on_end(s)
+
+    def shutdown(self):
+        self.delegate.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.delegate.force_flush(timeout_millis)
+
+
+def build_provider(resource, export_processor: SpanProcessor, options: TracingOptions) -> TracerProvider:
+    """
+    Monta o TracerProvider conforme as opções
+
+    Sem tail-sampling a amostragem é head (ParentBased + TraceIdRatioBased): spans
+    não amostrados nem chegam a gravar atributos. Com tail-sampling todos os spans
+    são gravados e o ratio vira o baseline de traces normais exportados.
+    """
+    if options.tail_sampling:
+        provider = TracerProvider(resource=resource, sampler=ParentBased(ALWAYS_ON))
+        provider.add_span_processor(TailSamplingProcessor(
+            export_processor, slow_ms=options.tail_slow_ms, ratio=options.sample_ratio,
+            max_traces=options.tail_max_traces))
+    else:
+        provider = TracerProvider(resource=resource, sampler=ParentBased(TraceIdRatioBased(options.sample_ratio)))
+        provider.add_span_processor(export_processor)
+    return provider
+
+
+def optional_span(tracer, enabled: bool, name: str):
+    """start_as_current_span quando enabled; senão um span no-op (set_attribute vira nada)."""
+    if enabled:
+        return tracer.start_as_current_span(name)
+    return nullcontext(trace.INVALID_SPAN)
@@ -0,0 +1,169 @@
+"""
+Workers - modo multi-processo da API (gunicorn + UvicornWorker, ver gunicorn.conf.py)
+- Métricas: com PROMETHEUS_MULTIPROC_DIR cada worker grava seus valores em arquivos
+  e o /metrics agrega todos (MultiProcessCollector); gauges calculadas por callback
+  são amostradas periodicamente (set_function não atravessa processos).
+- Pool: DB_POOL_BUDGET (conexões da API inteira) é dividido entre os WEB_CONCURRENCY workers.
+- Líder: um flock decide qual worker roda os refreshers que consultam o banco.
+- Drain: SIGTERM/SIGINT marcam o processo como drenando antes do shutdown do servidor.
+"""
+import glob
+import logging
+import os
+import signal
+from typing import Callable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows (service-run-api.ps1): sempre um processo só
+    fcntl = None
+
+from prometheus_client import CollectorRegistry, multiprocess
+
+log = logging.getLogger("ea-api.workers")
+
+
+def multiprocess_dir(environ=None) -> Optional[str]:
+    env = os.environ if environ is None else environ
+    return env.get('PROMETHEUS_MULTIPROC_DIR') or env.get('prometheus_multiproc_dir') or None
+
+
+def worker_count(environ=None) -> int:
+    env = os.environ if environ is None else environ
+    try:
+        return max(1, int(env.get('WEB_CONCURRENCY') or 1))
+    except ValueError:
+        return 1
+
+
+def pool_budget(budget: int, workers: int, pool_size: int, max_overflow: int) -> Tuple[int, int]:
+    """
+    (pool_size, max_overflow) por worker para que workers * (pool + overflow) <= budget
+
+    budget <= 0 mantém os valores configurados (um processo, comportamento antigo).
+    """
+    if budget <= 0:
+        return pool_size, max_overflow
+    per_worker = max(1, budget // max(1, workers))
+    size = max(1, min(pool_size, per_worker))
+    return size, max(0, min(max_overflow, per_worker - size))
+
+
+def metrics_registry() -> Optional[CollectorRegistry]:
+    """Registry que agrega os arquivos de todos os workers; None fora do modo multi-processo."""
+    if not multiprocess_dir():
+        return None
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def clean_multiprocess_dir(path: str):
+    """Remove os arquivos de métricas de uma execução anterior (no master, antes dos forks)."""
+    os.makedirs(path, exist_ok=True)
+    for f in glob.glob(os.path.join(path, '*.db')):
+        os.remove(f)
+
+
+class GaugeSampler:
+    """
+    Gauges alimentadas por callback: set_function em um processo, amostragem periódica em vários
+
+    Usage:
+        sampler.bind(GROUP_PENDING, buffer.pending_rows)
+        sampler.sample()   # a cada N segundos no modo multi-processo
+    """
+
+    def __init__(self, multiprocess_mode: bool):
+        self.multiprocess = multiprocess_mode
+        self._items: List[Tuple[object, Callable[[], float]]] = []
+        self._hooks: List[Callable[[], None]] = []
+
+    def bind(self, gauge, fn: Callable[[], float]):
+        if self.multiprocess:
+            self._items.append((gauge, fn))
+        else:
+            gauge.set_function(fn)
+
+    def add_hook(self, fn: Callable[[], None]):
+        """Função chamada a cada amostragem (ex.: gauges com labels dinâmicos)."""
+        self._hooks.append(fn)
+
+    def sample(self):
+        for gauge, fn in self._items:
+            try:
+                gauge.set(fn())
+            except Exception as e:
+                log.debug("gauge sample failed: %s", e)
+        for fn in self._hooks:
+            try:
+                fn()
+            except Exception as e:
+                log.debug("gauge sample hook failed: %s", e)
+
+
+class LeaderLock:
+    """
+    Lock exclusivo não bloqueante em arquivo: quem segura é o líder até o processo morrer
+
+    Sem path (um processo) ou sem fcntl, o processo é sempre líder. Os não-líderes
+    chamam acquire() a cada ciclo e assumem quando o líder sai.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        if not self.path or fcntl is None:
+            self._fd = -1
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        log.info("leader lock acquired | pid=%d | path=%s", os.getpid(), self.path)
+        return True
+
+    def release(self):
+        if self._fd is not None and self._fd >= 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        self._fd = None
+
+
+def install_drain_handler(callback: Callable[[], None], signals=(signal.SIGTERM, signal.SIGINT)) -> bool:
+    """
+    Encadeia callback antes do handler atual (o do uvicorn, instalado antes do lifespan)
+
+    O servidor continua fazendo o shutdown normal; o callback só avisa a aplicação para
+    liberar conexões longas (long-poll, SSE, WebSocket) e responder 503 no /health.
+    """
+    installed = False
+    for sig in signals:
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous):
+            try:
+                callback()
+            finally:
+                previous(signum, frame)
+        try:
+            signal.signal(sig, handler)
+            installed = True
+        except ValueError:  # fora da thread principal (ex.: TestClient)
+            return False
+    return installed
@@ -1,14 +1,21 @@
-import os, json, sqlite3, time
+import os, sys, json, sqlite3, time
 import argparse
 import requests
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+from lite_partitions import default_root, partition_files
+
 # Simple exporter: read from local SQLite (ea.db) and push to main API in batches
 # Default filter: last N minutes or by limit
+# With SQLITE_PARTITION on the lite API, the per-day/week files next to ea.db are read too (merged by ts_ms)
+
+TICK_COLUMNS = "symbol, ts_ms, timeframe, open, high, low, close, volume, kind, meta"
 
 def get_args():
     p = argparse.ArgumentParser()
     # default DB at infra/api/data/ea.db
     p.add_argument('--db', default=os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'ea.db')))
+    p.add_argument('--parts-dir', default=None, help='Partition files dir (SQLITE_PARTITION_DIR); default: <db>-parts next to --db')
     p.add_argument('--api', default='http://192.168.15.20:18001')
     p.add_argument('--token', default='mt5_trading_secure_key_2025_prod')
     p.add_argument('--limit', type=int, default=200, help='Max rows to fetch (ignored when --all)')
@@ -24,43 +31,53 @@ def get_args():
     return p.parse_args()
 
 
-def fetch_rows(db_path, limit, since_minutes=None):
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
+def db_files(db_path, parts_dir=None, since_ms=None):
+    # main file first, then partitions that may hold ts_ms > since_ms (older ones are skipped without opening)
+    root = parts_dir or default_root(db_path)
+    return [db_path] + [str(p) for p in partition_files(root, since_ms)]
+
+
+def query_files(files, sql, params):
+    rows = []
+    for path in files:
+        if not os.path.exists(path):
+            continue  # partition dropped by the API retention meanwhile
+        conn = sqlite3.connect(path)
+        try:
+            rows.extend(conn.execute(sql, params).fetchall())
+        finally:
+            conn.close()
+    return rows
+
+
+def to_item(r):
+    return {
+        'symbol': r[0],
+        'ts': int(r[1]),
+        'timeframe': r[2],
+        'open': r[3], 'high': r[4], 'low': r[5], 'close': r[6], 'volume': r[7],
+        'kind': r[8],
+        'meta': json.loads(r[9]) if r[9] else {}
+    }
+
+
+def fetch_rows(db_path, limit, since_minutes=None, parts_dir=None):
     if since_minutes:
-        c.execute("SELECT symbol, ts_ms, timeframe, open, high, low, close, volume, kind, meta FROM ticks WHERE ts_ms > strftime('%s','now','-%d minutes')*1000 ORDER BY ts_ms DESC LIMIT ?" % since_minutes, (limit,))
+        since_ms = int(time.time() * 1000) - since_minutes * 60000
+        files = db_files(db_path, parts_dir, since_ms)
+        rows = query_files(files, f"SELECT {TICK_COLUMNS} FROM ticks WHERE ts_ms > ? ORDER BY ts_ms DESC LIMIT ?", (since_ms, limit))
     else:
-        c.execute("SELECT symbol, ts_ms, timeframe, open, high, low, close, volume, kind, meta FROM ticks ORDER BY ts_ms DESC LIMIT ?", (limit,))
-    rows = c.fetchall()
-    conn.close()
-    items = []
-    for r in rows:
-        items.append({
-            'symbol': r[0],
-            'ts': int(r[1]),
-            'timeframe': r[2],
-            'open': r[3], 'high': r[4], 'low': r[5], 'close': r[6], 'volume': r[7],
-            'kind': r[8],
-            'meta': json.loads(r[9]) if r[9] else {}
-        })
-    return items
-
-def fetch_rows_paged(db_path, start_ts_ms: int, page_size: int):
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    c.execute("SELECT symbol, ts_ms, timeframe, open, high, low, close, volume, kind, meta FROM ticks WHERE ts_ms > ? ORDER BY ts_ms ASC LIMIT ?", (start_ts_ms, page_size))
-    rows = c.fetchall()
-    conn.close()
-    items = []
-    for r in rows:
-        items.append({
-            'symbol': r[0],
-            'ts': int(r[1]),
-            'timeframe': r[2],
-            'open': r[3], 'high': r[4], 'low': r[5], 'close': r[6], 'volume': r[7],
-            'kind': r[8],
-            'meta': json.loads(r[9]) if r[9] else {}
-        })
+        files = db_files(db_path, parts_dir)
+        rows = query_files(files, f"SELECT {TICK_COLUMNS} FROM ticks ORDER BY ts_ms DESC LIMIT ?", (limit,))
+    # each file returns its own top N; merge and keep the global top N
+    rows.sort(key=lambda r: r[1], reverse=True)
+    return [to_item(r) for r in rows[:limit]]
+
+def fetch_rows_paged(db_path, start_ts_ms: int, page_size: int, parts_dir=None):
+    files = db_files(db_path, parts_dir, start_ts_ms)
+    rows = query_files(files, f"SELECT {TICK_COLUMNS} FROM ticks WHERE ts_ms > ? ORDER BY ts_ms ASC LIMIT ?", (start_ts_ms, page_size))
+    rows.sort(key=lambda r: r[1])
+    items = [to_item(r) for r in rows[:page_size]]
     last_ts = items[-1]['ts'] if items else start_ts_ms
     return items, last_ts
 
@@ -174,7 +191,7 @@ def main():
         sent = 0
         cursor_ts = -1
         while True:
-            items, cursor_ts = fetch_rows_paged(db_path, cursor_ts, args.page_size)
+            items, cursor_ts = fetch_rows_paged(db_path, cursor_ts, args.page_size, args.parts_dir)
             if not items:
                 break
             for i in range(0, len(items), args.batch):
@@ -203,7 +220,7 @@ def main():
                 time.sleep(0.2)
         print(f"Done. sent={sent}")
     else:
-        items = fetch_rows(db_path, args.limit, args.since_minutes)
+        items = fetch_rows(db_path, args.limit, args.since_minutes, args.parts_dir)
         print(f"Fetched {len(items)} rows from {db_path}")
         if args.dry_run:
             print(json.dumps(items[:2], indent=2) + ('\n...' if len(items)>2 else ''))
@@ -0,0 +1,38 @@
+-- 🕯️ Candles pré-agregados (continuous aggregates)
+-- Requer infra/sql/migration_003_candles.sql
+-- candles_tick_<tf>: raw_ticks (bid) | candles_bar_<tf>: ticks (barras M1 do EA)
+-- tf: m1, m5, m15, h1, d1
+
+-- 1. Últimas 100 barras M5 de um símbolo
+SELECT bucket, open, high, low, close, volume, ticks
+FROM candles_tick_m5
+WHERE symbol = 'EURUSD'
+ORDER BY bucket DESC
+LIMIT 100;
+
+-- 2. Range diário (D1) por símbolo nos últimos 30 dias
+SELECT
+    symbol,
+    bucket::date as dia,
+    high - low as range_dia,
+    volume
+FROM candles_bar_d1
+WHERE bucket > NOW() - INTERVAL '30 days'
+ORDER BY symbol, dia DESC;
+
+-- 3. Volatilidade horária (H1) nas últimas 24h, sem agrupar os ticks
+SELECT
+    symbol,
+    AVG(high - low) as range_medio,
+    MAX(high - low) as range_maximo,
+    SUM(ticks) as ticks
+FROM candles_tick_h1
+WHERE bucket > NOW() - INTERVAL '24 hours'
+GROUP BY symbol
+ORDER BY range_medio DESC;
+
+-- 4. Estado das refresh policies
+SELECT view_name, materialization_hypertable_name
+FROM timescaledb_information.continuous_aggregates
+WHERE view_name LIKE 'candles_%'
+ORDER BY view_name;
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Administração do armazenamento das hypertables via API (/admin/storage)
+
+Uso:
+    python storage_admin.py report --api http://192.168.15.20:18001 --token <ADMIN_TOKEN>
+    python storage_admin.py apply  --api http://192.168.15.20:18001 --token <ADMIN_TOKEN>
+"""
+import argparse
+import sys
+
+import requests
+
+
+def print_report(data: dict):
+    print(f"{'tabela':<18} {'MB':>12} {'chunks':>8} {'comprimidos':>12} {'taxa':>7}")
+    print('-' * 61)
+    for t in data.get('tables', []):
+        chunks = '-' if t['chunks'] is None else t['chunks']
+        ratio = '-' if t['compression_ratio'] is None else f"{t['compression_ratio']:.1f}x"
+        print(f"{t['table']:<18} {t['size_mb']:>12,.1f} {chunks:>8} {t['compressed_chunks']:>12} {ratio:>7}")
+    print()
+    print("Políticas:")
+    for p in data.get('policies', []):
+        print(f"  {p['table']:<18} chunk={p['chunk_interval'] or '-'} compress_after={p['compress_after'] or '-'} "
+              f"retention={p['retention'] or '-'}")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Tamanho/compressão/retenção das hypertables")
+    p.add_argument('command', choices=['report', 'apply'])
+    p.add_argument('--api', default='http://192.168.15.20:18001')
+    p.add_argument('--token', default=None)
+    p.add_argument('--timeout', type=int, default=60)
+    args = p.parse_args()
+    headers = {'x-api-key': args.token} if args.token else {}
+    try:
+        if args.command == 'apply':
+            r = requests.post(f"{args.api}/admin/storage/apply", headers=headers, timeout=args.timeout)
+            r.raise_for_status()
+            for table, actions in r.json()['applied'].items():
+                print(f"{table:<18} {', '.join(actions) or '-'}")
+            print()
+        r = requests.get(f"{args.api}/admin/storage", headers=headers, timeout=args.timeout)
+        r.raise_for_status()
+        print_report(r.json())
+    except Exception as e:
+        print(f"[storage] Erro: {e}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
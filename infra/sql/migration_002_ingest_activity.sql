@@ -0,0 +1,104 @@
+-- Migration: Contadores agregados de ingestão (tentativas/duplicatas por minuto)
+-- Execution: psql -U trader -d mt5_trading -f infra/sql/migration_002_ingest_activity.sql
+--
+-- A API acumula em memória, por (endpoint, symbol, timeframe, minuto), quantas
+-- tentativas e duplicatas recebeu e grava os contadores periodicamente (ver
+-- infra/api/app/ingest_activity.py). Com isso o ingest_log por item passa a ser
+-- opcional (INGEST_LOG_MODE=full|sampled|aggregate) e market_activity,
+-- idempotency_stats e duplicate_stats leem os contadores.
+
+-- ===============================================
+-- 1. Tabela de contadores por minuto
+-- ===============================================
+CREATE TABLE IF NOT EXISTS ingest_activity (
+  endpoint TEXT NOT NULL,                -- '/ingest' or '/ingest/tick'
+  symbol TEXT NOT NULL,
+  timeframe TEXT NOT NULL DEFAULT '',    -- '' quando o item não tem timeframe (ticks)
+  minute_bucket TIMESTAMPTZ NOT NULL,    -- minuto de recebimento (received_at truncado)
+  attempts BIGINT NOT NULL DEFAULT 0,
+  duplicates BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (endpoint, symbol, timeframe, minute_bucket)
+);
+
+SELECT create_hypertable('ingest_activity', by_range('minute_bucket'), if_not_exists => TRUE);
+CREATE INDEX IF NOT EXISTS idx_ingest_activity_symbol ON ingest_activity(symbol, minute_bucket DESC);
+
+-- ===============================================
+-- 2. market_activity: contadores + ingest_log anterior a eles
+-- ===============================================
+-- Mesmas colunas da view original (init.sql). O ingest_log só entra para o
+-- período anterior ao primeiro contador, então não há dupla contagem em
+-- INGEST_LOG_MODE=full nem subcontagem em sampled/aggregate.
+-- idempotency_stats (seção 3) é construída sobre market_activity: sai antes,
+-- senão o DROP VIEW falha quando a migration roda de novo.
+DROP MATERIALIZED VIEW IF EXISTS idempotency_stats;
+DROP VIEW IF EXISTS market_activity;
+CREATE VIEW market_activity AS
+WITH activity AS (
+  SELECT symbol, minute_bucket AS received_at, attempts, duplicates
+  FROM ingest_activity
+  WHERE endpoint = '/ingest' AND minute_bucket > now() - interval '7 days'
+  UNION ALL
+  SELECT symbol, received_at, 1, CASE WHEN was_duplicate THEN 1 ELSE 0 END
+  FROM ingest_log
+  WHERE received_at > now() - interval '7 days'
+    AND received_at < COALESCE((SELECT MIN(minute_bucket) FROM ingest_activity), 'infinity')
+)
+SELECT
+  symbol,
+  DATE_TRUNC('hour', received_at) as hour,
+  SUM(attempts)::BIGINT as total_attempts,
+  SUM(duplicates)::BIGINT as duplicates,
+  SUM(attempts - duplicates)::BIGINT as new_data,
+  ROUND(100.0 * SUM(duplicates) / NULLIF(SUM(attempts), 0), 2) as duplicate_rate_pct
+FROM activity
+GROUP BY symbol, DATE_TRUNC('hour', received_at)
+ORDER BY hour DESC, symbol;
+
+-- ===============================================
+-- 3. idempotency_stats a partir de market_activity
+-- ===============================================
+CREATE MATERIALIZED VIEW idempotency_stats AS
+SELECT
+  hour,
+  SUM(total_attempts)::BIGINT as total_requests,
+  SUM(duplicates)::BIGINT as duplicates,
+  SUM(new_data)::BIGINT as new_records,
+  ROUND(100.0 * SUM(duplicates) / NULLIF(SUM(total_attempts), 0), 2) as duplicate_rate_pct
+FROM market_activity
+GROUP BY hour
+ORDER BY hour DESC;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_idempotency_stats_hour
+  ON idempotency_stats(hour);
+
+-- ===============================================
+-- 4. Retenção: contadores seguem a mesma janela de 30 dias
+-- ===============================================
+CREATE OR REPLACE FUNCTION cleanup_duplicate_stats()
+RETURNS void AS $$
+BEGIN
+  DELETE FROM duplicate_stats
+  WHERE hour_bucket < now() - interval '30 days';
+
+  DELETE FROM ingest_log
+  WHERE received_at < now() - interval '30 days';
+
+  DELETE FROM ingest_activity
+  WHERE minute_bucket < now() - interval '30 days';
+
+  RAISE NOTICE 'Cleaned up old duplicate stats, ingest logs and activity counters';
+END;
+$$ LANGUAGE plpgsql;
+
+-- ===============================================
+-- 5. Grant permissions
+-- ===============================================
+GRANT SELECT, INSERT, UPDATE, DELETE ON TABLE ingest_activity TO trader;
+GRANT SELECT ON market_activity TO trader;
+GRANT SELECT ON idempotency_stats TO trader;
+
+DO $$
+BEGIN
+  RAISE NOTICE 'Migration 002 completed: ingest_activity + market_activity/idempotency_stats sobre contadores';
+END $$;
@@ -0,0 +1,251 @@
+-- Migration: Continuous aggregates de candles (M1/M5/M15/H1/D1)
+-- Execution: psql -U trader -d mt5_trading -f infra/sql/migration_003_candles.sql
+-- Requer TimescaleDB >= 2.9 (continuous aggregates hierárquicos)
+--
+-- Duas famílias de views, servidas pelo GET /candles (infra/api/app/candles.py):
+--   candles_tick_<tf>: a partir de raw_ticks (preço = bid, como as barras do MT5 em forex)
+--   candles_bar_<tf>:  a partir de ticks (barras M1 do EA e ticks legados)
+-- M1 agrega a hypertable; M5 agrega M1, M15 agrega M5, H1 agrega M15 e D1 agrega H1.
+-- materialized_only = false: o bucket corrente (ainda não materializado) vem em tempo real.
+-- ===============================================
+-- 1. raw_ticks -> candles_tick_m1
+-- ===============================================
+CREATE MATERIALIZED VIEW IF NOT EXISTS candles_tick_m1
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+  symbol,
+  time_bucket(INTERVAL '1 minute', ts) AS bucket,
+  first(bid, ts) AS open,
+  max(bid) AS high,
+  min(bid) AS low,
+  last(bid, ts) AS close,
+  sum(volume)::DOUBLE PRECISION AS volume,
+  count(*) AS ticks
+FROM raw_ticks
+GROUP BY symbol, time_bucket(INTERVAL '1 minute', ts)
+WITH NO DATA;
+
+-- ===============================================
+-- 2. ticks -> candles_bar_m1
+-- ===============================================
+-- Só linhas de base (M1, ticks e itens sem timeframe); barras M5/H1/... enviadas
+-- pelo EA ficariam contadas em dobro.
+CREATE MATERIALIZED VIEW IF NOT EXISTS candles_bar_m1
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+  symbol,
+  time_bucket(INTERVAL '1 minute', ts) AS bucket,
+  first(COALESCE(open, close), ts) AS open,
+  max(COALESCE(high, close)) AS high,
+  min(COALESCE(low, close)) AS low,
+  last(COALESCE(close, open), ts) AS close,
+  sum(volume) AS volume,
+  count(*) AS ticks
+FROM ticks
+WHERE COALESCE(timeframe, 'M1') IN ('M1', 'tick')
+GROUP BY symbol, time_bucket(INTERVAL '1 minute', ts)
+WITH NO DATA;
+
+-- ===============================================
+-- 3. candles_tick_m5 / m15 / h1 / d1 (hierárquicos)
+-- ===============================================
+CREATE MATERIALIZED VIEW IF NOT EXISTS candles_tick_m5
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+  symbol,
+  time_bucket(INTERVAL '5 minutes', bucket) AS bucket,
+  first(open, bucket) AS open,
+  max(high) AS high,
+  min(low) AS low,
+  last(close, bucket) AS close,
+  sum(volume) AS volume,
+  sum(ticks)::BIGINT AS ticks
+FROM candles_tick_m1
+GROUP BY symbol, time_bucket(INTERVAL '5 minutes', bucket)
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS candles_tick_m15
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+  symbol,
+  time_bucket(INTERVAL '15 minutes', bucket) AS bucket,
+  first(open, bucket) AS open,
+  max(high) AS high,
+  min(low) AS low,
+  last(close, bucket) AS close,
+  sum(volume) AS volume,
+  sum(ticks)::BIGINT AS ticks
+FROM candles_tick_m5
+GROUP BY symbol, time_bucket(INTERVAL '15 minutes', bucket)
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS candles_tick_h1
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+  symbol,
+  time_bucket(INTERVAL '1 hour', bucket) AS bucket,
+  first(open, bucket) AS open,
+  max(high) AS high,
+  min(low) AS low,
+  last(close, bucket) AS close,
+  sum(volume) AS volume,
+  sum(ticks)::BIGINT AS ticks
+FROM candles_tick_m15
+GROUP BY symbol, time_bucket(INTERVAL '1 hour', bucket)
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS candles_tick_d1
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+  symbol,
+  time_bucket(INTERVAL '1 day', bucket) AS bucket,
+  first(open, bucket) AS open,
+  max(high) AS high,
+  min(low) AS low,
+  last(close, bucket) AS close,
+  sum(volume) AS volume,
+  sum(ticks)::BIGINT AS ticks
+FROM candles_tick_h1
+GROUP BY symbol, time_bucket(INTERVAL '1 day', bucket)
+WITH NO DATA;
+
+-- ===============================================
+-- 4. candles_bar_m5 / m15 / h1 / d1 (hierárquicos)
+-- ===============================================
+CREATE MATERIALIZED VIEW IF NOT EXISTS candles_bar_m5
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+  symbol,
+  time_bucket(INTERVAL '5 minutes', bucket) AS bucket,
+  first(open, bucket) AS open,
+  max(high) AS high,
+  min(low) AS low,
+  last(close, bucket) AS close,
+  sum(volume) AS volume,
+  sum(ticks)::BIGINT AS ticks
+FROM candles_bar_m1
+GROUP BY symbol, time_bucket(INTERVAL '5 minutes', bucket)
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS candles_bar_m15
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+  symbol,
+  time_bucket(INTERVAL '15 minutes', bucket) AS bucket,
+  first(open, bucket) AS open,
+  max(high) AS high,
+  min(low) AS low,
+  last(close, bucket) AS close,
+  sum(volume) AS volume,
+  sum(ticks)::BIGINT AS ticks
+FROM candles_bar_m5
+GROUP BY symbol, time_bucket(INTERVAL '15 minutes', bucket)
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS candles_bar_h1
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+  symbol,
+  time_bucket(INTERVAL '1 hour', bucket) AS bucket,
+  first(open, bucket) AS open,
+  max(high) AS high,
+  min(low) AS low,
+  last(close, bucket) AS close,
+  sum(volume) AS volume,
+  sum(ticks)::BIGINT AS ticks
+FROM candles_bar_m15
+GROUP BY symbol, time_bucket(INTERVAL '1 hour', bucket)
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS candles_bar_d1
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+  symbol,
+  time_bucket(INTERVAL '1 day', bucket) AS bucket,
+  first(open, bucket) AS open,
+  max(high) AS high,
+  min(low) AS low,
+  last(close, bucket) AS close,
+  sum(volume) AS volume,
+  sum(ticks)::BIGINT AS ticks
+FROM candles_bar_h1
+GROUP BY symbol, time_bucket(INTERVAL '1 day', bucket)
+WITH NO DATA;
+
+-- ===============================================
+-- 5. Índices e refresh policies
+-- ===============================================
+-- start_offset = janela de reenvio: ticks atrasados/reenviados pelo EA (ou pelo relay
+-- depois de uma queda) só entram nos candles se caírem dentro dela. Vai até o
+-- compress_after das hypertables (storage_policy.py: raw_ticks 3 dias, ticks 7 dias),
+-- que já é o limite em que a API aceita dados atrasados. M1 e todos os níveis acima
+-- usam pelo menos essa janela; senão a mudança em M1 não sobe para M5/.../D1.
+-- O custo é baixo: o refresh só recalcula os buckets invalidados por INSERTs, não a
+-- janela inteira. end_offset deixa o bucket corrente para a agregação em tempo real.
+-- Backfill mais antigo que a janela: CALL refresh_continuous_aggregate('candles_tick_m1',
+-- '<início>', '<fim>') e depois o mesmo em m5, m15, h1 e d1, nessa ordem.
+-- Remove e recria as policies para que instalações existentes recebam as janelas novas.
+DO $$
+DECLARE
+  v TEXT;
+BEGIN
+  FOREACH v IN ARRAY ARRAY['candles_tick_m1', 'candles_tick_m5', 'candles_tick_m15', 'candles_tick_h1',
+                           'candles_tick_d1', 'candles_bar_m1', 'candles_bar_m5', 'candles_bar_m15',
+                           'candles_bar_h1', 'candles_bar_d1'] LOOP
+    PERFORM remove_continuous_aggregate_policy(v, if_exists => TRUE);
+  END LOOP;
+END $$;
+
+CREATE INDEX IF NOT EXISTS idx_candles_tick_m1_symbol ON candles_tick_m1(symbol, bucket DESC);
+SELECT add_continuous_aggregate_policy('candles_tick_m1',
+  start_offset => INTERVAL '3 days', end_offset => INTERVAL '1 minute',
+  schedule_interval => INTERVAL '1 minute', if_not_exists => TRUE);
+CREATE INDEX IF NOT EXISTS idx_candles_tick_m5_symbol ON candles_tick_m5(symbol, bucket DESC);
+SELECT add_continuous_aggregate_policy('candles_tick_m5',
+  start_offset => INTERVAL '3 days', end_offset => INTERVAL '5 minutes',
+  schedule_interval => INTERVAL '5 minutes', if_not_exists => TRUE);
+CREATE INDEX IF NOT EXISTS idx_candles_tick_m15_symbol ON candles_tick_m15(symbol, bucket DESC);
+SELECT add_continuous_aggregate_policy('candles_tick_m15',
+  start_offset => INTERVAL '3 days', end_offset => INTERVAL '15 minutes',
+  schedule_interval => INTERVAL '15 minutes', if_not_exists => TRUE);
+CREATE INDEX IF NOT EXISTS idx_candles_tick_h1_symbol ON candles_tick_h1(symbol, bucket DESC);
+SELECT add_continuous_aggregate_policy('candles_tick_h1',
+  start_offset => INTERVAL '3 days', end_offset => INTERVAL '1 hour',
+  schedule_interval => INTERVAL '30 minutes', if_not_exists => TRUE);
+CREATE INDEX IF NOT EXISTS idx_candles_tick_d1_symbol ON candles_tick_d1(symbol, bucket DESC);
+SELECT add_continuous_aggregate_policy('candles_tick_d1',
+  start_offset => INTERVAL '7 days', end_offset => INTERVAL '1 day',
+  schedule_interval => INTERVAL '1 hour', if_not_exists => TRUE);
+
+CREATE INDEX IF NOT EXISTS idx_candles_bar_m1_symbol ON candles_bar_m1(symbol, bucket DESC);
+SELECT add_continuous_aggregate_policy('candles_bar_m1',
+  start_offset => INTERVAL '7 days', end_offset => INTERVAL '1 minute',
+  schedule_interval => INTERVAL '1 minute', if_not_exists => TRUE);
+CREATE INDEX IF NOT EXISTS idx_candles_bar_m5_symbol ON candles_bar_m5(symbol, bucket DESC);
+SELECT add_continuous_aggregate_policy('candles_bar_m5',
+  start_offset => INTERVAL '7 days', end_offset => INTERVAL '5 minutes',
+  schedule_interval => INTERVAL '5 minutes', if_not_exists => TRUE);
+CREATE INDEX IF NOT EXISTS idx_candles_bar_m15_symbol ON candles_bar_m15(symbol, bucket DESC);
+SELECT add_continuous_aggregate_policy('candles_bar_m15',
+  start_offset => INTERVAL '7 days', end_offset => INTERVAL '15 minutes',
+  schedule_interval => INTERVAL '15 minutes', if_not_exists => TRUE);
+CREATE INDEX IF NOT EXISTS idx_candles_bar_h1_symbol ON candles_bar_h1(symbol, bucket DESC);
+SELECT add_continuous_aggregate_policy('candles_bar_h1',
+  start_offset => INTERVAL '7 days', end_offset => INTERVAL '1 hour',
+  schedule_interval => INTERVAL '30 minutes', if_not_exists => TRUE);
+CREATE INDEX IF NOT EXISTS idx_candles_bar_d1_symbol ON candles_bar_d1(symbol, bucket DESC);
+SELECT add_continuous_aggregate_policy('candles_bar_d1',
+  start_offset => INTERVAL '8 days', end_offset => INTERVAL '1 day',
+  schedule_interval => INTERVAL '1 hour', if_not_exists => TRUE);
+
+-- ===============================================
+-- 6. Grant permissions
+-- ===============================================
+GRANT SELECT ON candles_tick_m1, candles_tick_m5, candles_tick_m15, candles_tick_h1, candles_tick_d1 TO trader;
+GRANT SELECT ON candles_bar_m1, candles_bar_m5, candles_bar_m15, candles_bar_h1, candles_bar_d1 TO trader;
+
+DO $$
+BEGIN
+  RAISE NOTICE 'Migration 003 completed: candles_tick_* (raw_ticks) e candles_bar_* (ticks) M1/M5/M15/H1/D1';
+  RAISE NOTICE 'Backfill do histórico: CALL refresh_continuous_aggregate(''candles_tick_m1'', NULL, NULL); (depois m5, m15, h1, d1)';
+END $$;
@@ -0,0 +1,35 @@
+-- Migration: Suporte às políticas de armazenamento (compressão/retenção)
+-- Execution: psql -U trader -d mt5_trading -f infra/sql/migration_004_storage_policies.sql
+--
+-- Chunk interval, compressão e retenção das hypertables são aplicados pela API
+-- (infra/api/app/storage_policy.py), com overrides por env STORAGE_<TABELA>_*:
+--   POST /admin/storage/apply            ou
+--   python infra/api/tools/storage_admin.py apply
+-- Esta migration só cria a procedure de retenção de forward_audit (tabela comum,
+-- sem add_retention_policy), agendada pela API com add_job().
+
+-- ===============================================
+-- 1. Retenção de forward_audit
+-- ===============================================
+CREATE OR REPLACE PROCEDURE cleanup_forward_audit(job_id INT, config JSONB)
+LANGUAGE plpgsql AS $$
+DECLARE
+  v_retention INTERVAL := COALESCE((config->>'retention')::INTERVAL, INTERVAL '30 days');
+BEGIN
+  -- pendentes/erros também expiram: depois da janela o EA já não reenvia
+  DELETE FROM forward_audit WHERE sent_at < now() - v_retention;
+END;
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_forward_audit_sent_at ON forward_audit(sent_at DESC);
+
+-- ===============================================
+-- 2. Grant permissions
+-- ===============================================
+GRANT EXECUTE ON PROCEDURE cleanup_forward_audit(INT, JSONB) TO trader;
+
+DO $$
+BEGIN
+  RAISE NOTICE 'Migration 004 completed: cleanup_forward_audit()';
+  RAISE NOTICE 'Aplique as políticas: POST /admin/storage/apply ou tools/storage_admin.py apply';
+END $$;
@@ -0,0 +1,77 @@
+-- Migration: Sinais de trade (/signals/*) e feedback de ordens
+-- Execution: psql -U trader -d mt5_trading -f infra/sql/migration_005_signals.sql
+--
+-- A API grava os sinais publicados em signals e mantém o último por
+-- (symbol, timeframe) em memória (infra/api/app/signal_store.py); o Executer EA
+-- consulta GET /signals/next e confirma com POST /signals/ack (signal_acks).
+
+-- ===============================================
+-- 1. Sinais publicados
+-- ===============================================
+CREATE TABLE IF NOT EXISTS signals (
+  id TEXT PRIMARY KEY,
+  symbol TEXT NOT NULL,
+  timeframe TEXT NOT NULL DEFAULT 'M1',
+  side TEXT NOT NULL CHECK (side IN ('BUY', 'SELL')),
+  sl_pips INTEGER,
+  tp_pips INTEGER,
+  confidence DOUBLE PRECISION,
+  ttl_sec INTEGER NOT NULL,
+  account_id TEXT,                       -- NULL = todas as contas
+  source TEXT,                           -- quem publicou (modelo/estratégia)
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  expires_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_signals_symbol_created ON signals(symbol, timeframe, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_signals_created ON signals(created_at);
+
+-- ===============================================
+-- 2. Acks de execução (um por sinal e conta)
+-- ===============================================
+CREATE TABLE IF NOT EXISTS signal_acks (
+  signal_id TEXT NOT NULL REFERENCES signals(id) ON DELETE CASCADE,
+  account_id TEXT NOT NULL DEFAULT '',   -- '' quando o EA não informa a conta
+  status TEXT NOT NULL,                  -- FILLED / REJECTED / ACKED
+  mt5_ticket BIGINT,
+  price DOUBLE PRECISION,
+  ts_exec TIMESTAMPTZ,                   -- horário de execução informado pelo EA (GMT)
+  acked_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (signal_id, account_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_signal_acks_acked_at ON signal_acks(acked_at);
+
+-- ===============================================
+-- 3. Feedback de ordens (/orders/feedback)
+-- ===============================================
+CREATE TABLE IF NOT EXISTS order_feedback (
+  id BIGSERIAL PRIMARY KEY,
+  order_id TEXT NOT NULL,
+  feedback TEXT NOT NULL,
+  received_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_order_feedback_order ON order_feedback(order_id, received_at DESC);
+
+-- ===============================================
+-- 4. Visão de execução por sinal
+-- ===============================================
+CREATE OR REPLACE VIEW signal_outcomes AS
+SELECT s.id, s.symbol, s.timeframe, s.side, s.confidence, s.created_at,
+       a.account_id, a.status, a.mt5_ticket, a.price, a.ts_exec,
+       EXTRACT(EPOCH FROM (a.acked_at - s.created_at)) AS ack_latency_seconds
+FROM signals s
+LEFT JOIN signal_acks a ON a.signal_id = s.id;
+
+-- ===============================================
+-- 5. Grant permissions
+-- ===============================================
+GRANT SELECT, INSERT, UPDATE, DELETE ON signals, signal_acks, order_feedback TO trader;
+GRANT USAGE, SELECT ON SEQUENCE order_feedback_id_seq TO trader;
+GRANT SELECT ON signal_outcomes TO trader;
+
+DO $$
+BEGIN
+  RAISE NOTICE 'Migration 005 completed: signals, signal_acks, order_feedback, signal_outcomes';
+END $$;
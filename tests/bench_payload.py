@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmark - decodificação + validação do payload do /ingest
+Compara items/s do caminho antigo (json.loads + dateutil por item + json.dumps)
+com o decoder/validador de payload.py para batches de 1, 100 e 1000 itens, e o
+JSON por item contra o payload colunar (columnar.py): bytes no fio e items/s.
+Não é coletado pelo pytest.
+
+Uso:
+    python tests/bench_payload.py
+    python tests/bench_payload.py --sizes 1 100 1000 5000 --seconds 2
+"""
+import argparse
+import json
+import os
+import sys
+import gzip
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'infra', 'api', 'app'))
+import payload  # noqa: E402
+import columnar  # noqa: E402
+
+
+def build_body(size: int, iso: bool) -> bytes:
+    base = 1760954400000
+    items = []
+    for i in range(size):
+        ts = base + i * 60000
+        items.append({
+            "ts": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(ts / 1000)) if iso else ts,
+            "symbol": "EURUSD", "timeframe": "M1",
+            "open": 1.16, "high": 1.161, "low": 1.159, "close": 1.1605, "volume": 120,
+            "kind": "candle", "meta": {"source": "DataCollectorPRO", "ea_version": "1.65"},
+        })
+    return json.dumps({"items": items}).encode()
+
+
+def legacy_decode_validate(body: bytes):
+    """Caminho anterior: json da stdlib e import/parse do dateutil por item."""
+    data = json.loads(body.decode('utf-8'))
+    rows, rejected = [], 0
+    for it in data['items']:
+        try:
+            ts = it.get('ts')
+            if isinstance(ts, str):
+                try:
+                    ts = int(ts)
+                except ValueError:
+                    import dateutil.parser as dp
+                    ts = int(dp.isoparse(ts).timestamp() * 1000)
+            rows.append({
+                'symbol': it['symbol'], 'ts_ms': int(ts), 'timeframe': it.get('timeframe'),
+                'open': None if it.get('open') is None else float(it.get('open')),
+                'high': None if it.get('high') is None else float(it.get('high')),
+                'low': None if it.get('low') is None else float(it.get('low')),
+                'close': None if it.get('close') is None else float(it.get('close')),
+                'volume': None if it.get('volume') is None else float(it.get('volume')),
+                'kind': it.get('kind'), 'meta': json.dumps(it.get('meta') or {}),
+            })
+        except Exception:
+            rejected += 1
+    return rows, rejected
+
+
+def make_fast(codec: str):
+    loads, dumps = payload.get_codec(codec)
+
+    def run(body: bytes):
+        return payload.validate_batch(loads(body)['items'], dumps)
+    return run
+
+
+def items_per_second(fn, body: bytes, size: int, seconds: float) -> float:
+    fn(body)
+    n = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        fn(body)
+        n += 1
+    return n * size / (time.perf_counter() - start)
+
+
+def build_tick_bodies(size: int):
+    """Mesmo batch de ticks em JSON por item e em colunar."""
+    symbols = ["EURUSD", "GBPUSD", "USDJPY", "XAUUSD"]
+    base = 1760954400000
+    items, idx, deltas, bids, asks = [], [], [], [], []
+    prev = base
+    for i in range(size):
+        ts = base + i * 137
+        bid = round(1.16 + (i % 50) * 1e-5, 5)
+        items.append({"symbol": symbols[i % 4], "ts": ts, "kind": "tick", "bid": bid, "ask": bid + 0.0002,
+                      "close": bid, "meta": {"source": "relay"}})
+        idx.append(i % 4)
+        deltas.append(ts - prev)
+        prev = ts
+        bids.append(bid)
+        asks.append(bid + 0.0002)
+    doc = {"v": 1, "symbols": symbols, "symbol_idx": idx, "ts0": base, "ts_delta": deltas,
+           "kind": "tick", "bid": bids, "ask": asks, "meta": {"source": "relay"}}
+    return json.dumps({"items": items}).encode(), json.dumps(doc).encode()
+
+
+def bench_columnar(sizes, seconds: float):
+    fast = make_fast('auto')
+    print()
+    print(f"{'batch':>6} {'json bytes':>11} {'col bytes':>10} {'col+gz':>8} {'json items/s':>14} {'col items/s':>13} {'speedup':>8}")
+    for size in sizes:
+        item_body, col_body = build_tick_bodies(size)
+        gz = gzip.compress(col_body)
+        r_json = items_per_second(fast, item_body, size, seconds)
+        r_col = items_per_second(columnar.decode, col_body, size, seconds)
+        print(f"{size:>6} {len(item_body):>11,} {len(col_body):>10,} {len(gz):>8,} "
+              f"{r_json:>14,.0f} {r_col:>13,.0f} {r_col / r_json:>7.1f}x")
+
+
+def main():
+    p = argparse.ArgumentParser(description="items/s de decode + validação do payload do /ingest")
+    p.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 1000])
+    p.add_argument('--seconds', type=float, default=1.0, help='Segundos por medição')
+    args = p.parse_args()
+
+    variants = [('legacy', legacy_decode_validate)]
+    variants += [(f'fast/{name}', make_fast(name)) for name in payload.DECODERS]
+    print(f"{'ts':<6} {'batch':>6} " + " ".join(f"{name:>14}" for name, _ in variants) + f" {'speedup':>8}")
+    for iso in (True, False):
+        for size in args.sizes:
+            body = build_body(size, iso)
+            rates = [items_per_second(fn, body, size, args.seconds) for _, fn in variants]
+            print(f"{'iso' if iso else 'epoch':<6} {size:>6} " + " ".join(f"{r:>14,.0f}" for r in rates)
+                  + f" {max(rates[1:]) / rates[0]:>7.1f}x")
+    bench_columnar(args.sizes, args.seconds)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark - custo de CPU do tracing por request do /ingest
+Reproduz a árvore de spans de um POST /ingest (span do servidor, ingest_request,
+etapas, spans por item e por statement SQL) para cada nível/amostragem de
+tracing.py e mede o tempo de CPU por request, com export descartado em memória.
+Não é coletado pelo pytest.
+
+Uso:
+    python tests/bench_tracing.py
+    python tests/bench_tracing.py --requests 20000 --items 100 --write-mode row
+"""
+import argparse
+import os
+import sys
+import time
+
+from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.trace import NoOpTracer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'infra', 'api', 'app'))
+from tracing import TracingOptions, build_provider, optional_span  # noqa: E402
+
+SCENARIOS = [
+    ('off', {'TRACE_LEVEL': 'off'}),
+    ('request', {'TRACE_LEVEL': 'request'}),
+    ('detail', {'TRACE_LEVEL': 'detail'}),
+    ('full', {'TRACE_LEVEL': 'full'}),
+    ('full ratio=0.1', {'TRACE_LEVEL': 'full', 'TRACE_SAMPLE_RATIO': '0.1'}),
+    ('full tail ratio=0.01', {'TRACE_LEVEL': 'full', 'TRACE_TAIL_SAMPLING': 'true', 'TRACE_SAMPLE_RATIO': '0.01'}),
+    ('detail tail ratio=0.01', {'TRACE_LEVEL': 'detail', 'TRACE_TAIL_SAMPLING': 'true', 'TRACE_SAMPLE_RATIO': '0.01'}),
+]
+
+
+class DiscardExporter(SpanExporter):
+    def __init__(self):
+        self.exported = 0
+
+    def export(self, spans):
+        self.exported += len(spans)
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+
+def simulate_request(tracer, opts: TracingOptions, items: int, statements: int):
+    """Mesma forma de spans do ingest() em main.py."""
+    with tracer.start_as_current_span("POST /ingest") as server:
+        server.set_attribute("http.method", "POST")
+        server.set_attribute("http.route", "/ingest")
+        with tracer.start_as_current_span("ingest_request") as span:
+            span.set_attribute("http.method", "POST")
+            span.set_attribute("http.client_ip", "10.0.0.1")
+            span.set_attribute("ea.trace_id", "abc")
+            with optional_span(tracer, opts.stage_spans, "validate_auth"):
+                pass
+            with optional_span(tracer, opts.stage_spans, "parse_json") as parse_span:
+                parse_span.set_attribute("body.size_bytes", 150 * items)
+            span.set_attribute("ingest.batch_size", items)
+            with optional_span(tracer, opts.stage_spans, "extract_ea_metadata") as meta_span:
+                for k in ("account", "server", "build"):
+                    meta_span.set_attribute(f"ea.{k}", "x")
+                    span.set_attribute(f"ea.{k}", "x")
+            with optional_span(tracer, opts.stage_spans, "database_insert") as db_span:
+                db_span.set_attribute("db.write_mode", "bulk")
+                if opts.item_spans:
+                    for idx in range(min(items, 5)):
+                        item_span = tracer.start_span(f"insert_item_EURUSD{idx}")
+                        item_span.set_attribute("symbol", "EURUSD")
+                        item_span.end()
+                if opts.db_statements:
+                    for _ in range(statements):
+                        with tracer.start_as_current_span("INSERT ea") as st:
+                            st.set_attribute("db.system", "postgresql")
+                            st.set_attribute("db.statement", "INSERT INTO ticks ...")
+                db_span.set_attribute("db.inserted", items)
+            span.set_attribute("ingest.success", True)
+        server.set_attribute("http.status_code", 200)
+
+
+def run_scenario(name: str, env: dict, requests: int, items: int, statements: int) -> dict:
+    opts = TracingOptions(env)
+    exporter = DiscardExporter()
+    provider = None
+    if opts.enabled:
+        resource = Resource(attributes={SERVICE_NAME: "ea-api-bench"})
+        provider = build_provider(resource, BatchSpanProcessor(exporter, max_queue_size=65536), opts)
+        tracer = provider.get_tracer("bench")
+    else:
+        tracer = NoOpTracer()
+    for _ in range(min(200, requests)):  # aquecimento
+        simulate_request(tracer, opts, items, statements)
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    for _ in range(requests):
+        simulate_request(tracer, opts, items, statements)
+    cpu = time.process_time() - cpu0
+    wall = time.perf_counter() - wall0
+    if provider:
+        provider.shutdown()  # flush do BatchSpanProcessor (fora da medição do caminho da request)
+    return {'name': name, 'cpu_us': cpu / requests * 1e6, 'wall_us': wall / requests * 1e6,
+            'exported': exporter.exported}
+
+
+def main():
+    p = argparse.ArgumentParser(description="Custo de CPU do tracing por request do /ingest")
+    p.add_argument('--requests', type=int, default=5000)
+    p.add_argument('--items', type=int, default=100, help='Items por request')
+    p.add_argument('--write-mode', choices=['bulk', 'row'], default='bulk',
+                   help='bulk: 2 statements por request; row: 2 por item')
+    args = p.parse_args()
+    statements = 2 if args.write_mode == 'bulk' else 2 * args.items
+
+    print(f"{args.requests} requests | {args.items} items | {statements} statements/request")
+    print(f"{'scenario':<24} {'cpu us/req':>11} {'wall us/req':>12} {'spans exported':>15}")
+    for name, env in SCENARIOS:
+        r = run_scenario(name, env, args.requests, args.items, statements)
+        print(f"{r['name']:<24} {r['cpu_us']:>11.1f} {r['wall_us']:>12.1f} {r['exported']:>15}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# Os módulos da API rodam como top-level (uvicorn main:app dentro de infra/api/app)
+API_APP_DIR = Path(__file__).resolve().parents[1] / "infra" / "api" / "app"
+if str(API_APP_DIR) not in sys.path:
+    sys.path.insert(0, str(API_APP_DIR))
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Load Test - throughput do /ingest e /ingest/tick por nível de concorrência
+Mede requests/s e latência (p50/p99) com N clientes simultâneos, para comparar
+o antes/depois de mudanças no caminho de escrita (ex.: engine síncrono vs async).
+
+Uso:
+    python tests/load_ingest.py --url http://localhost:18001 --out before.json
+    python tests/load_ingest.py --url http://localhost:18001 --out after.json
+    python tests/load_ingest.py --compare before.json after.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+SYMBOLS = ["EURUSD", "GBPUSD", "USDJPY", "XAUUSD", "USDCHF", "AUDUSD", "USDCAD", "NZDUSD"]
+
+# ts único por item para não medir só o caminho de duplicatas
+_ts_counter = itertools.count(int(time.time() * 1000) * 1000)
+
+
+def build_batch(size: int) -> Dict:
+    items = []
+    for _ in range(size):
+        px = round(random.uniform(1.0, 2.0), 5)
+        items.append({
+            "symbol": random.choice(SYMBOLS) + "_LT",
+            "timeframe": "M1",
+            "ts": next(_ts_counter),
+            "open": px, "high": px + 0.0005, "low": px - 0.0005, "close": px,
+            "volume": 100,
+            "kind": "candle",
+            "meta": {"src": "load_test"},
+        })
+    return {"items": items}
+
+
+def build_tick() -> Dict:
+    # mesmo formato do DataCollectorPRO (vai para raw_ticks)
+    px = round(random.uniform(1.0, 2.0), 5)
+    return {"symbol": random.choice(SYMBOLS) + "_LT", "ts_msc": next(_ts_counter),
+            "bid": px, "ask": round(px + 0.0002, 5), "last": px, "volume": 1, "flags": 6}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[idx]
+
+
+async def run_level(client: httpx.AsyncClient, url: str, endpoint: str, headers: Dict,
+                    concurrency: int, duration: float, batch: int) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            payload = build_batch(batch) if endpoint == "/ingest" else build_tick()
+            t0 = time.perf_counter()
+            try:
+                r = await client.post(url + endpoint, json=payload, headers=headers)
+                if r.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - t0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def run(args) -> List[Dict]:
+    headers = {"Content-Type": "application/json", "X-API-Key": args.token,
+               "User-Agent": "LoadTest/1.0"}
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    results = []
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        for c in args.concurrency:
+            res = await run_level(client, args.url.rstrip('/'), args.endpoint, headers, c, args.duration, args.batch)
+            print_row(res)
+            results.append(res)
+    return results
+
+
+def print_header():
+    print(f"{'conc':>6} {'reqs':>8} {'err':>6} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+
+
+def print_row(r: Dict):
+    print(f"{r['concurrency']:>6} {r['requests']:>8} {r['errors']:>6} {r['rps']:>10.1f} {r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f}")
+
+
+def compare(before_path: str, after_path: str):
+    with open(before_path, encoding='utf-8') as f:
+        before = {r['concurrency']: r for r in json.load(f)['results']}
+    with open(after_path, encoding='utf-8') as f:
+        after = {r['concurrency']: r for r in json.load(f)['results']}
+    print(f"{'conc':>6} {'before req/s':>13} {'after req/s':>12} {'speedup':>8} {'before p99':>11} {'after p99':>10}")
+    for c in sorted(set(before) & set(after)):
+        b, a = before[c], after[c]
+        speedup = a['rps'] / b['rps'] if b['rps'] else float('inf')
+        print(f"{c:>6} {b['rps']:>13.1f} {a['rps']:>12.1f} {speedup:>7.2f}x {b['p99_ms']:>10.1f} {a['p99_ms']:>10.1f}")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Load test do EA Ingest API")
+    p.add_argument('--url', default='http://localhost:18001')
+    p.add_argument('--token', default='changeme')
+    p.add_argument('--endpoint', default='/ingest', choices=['/ingest', '/ingest/tick'])
+    p.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64])
+    p.add_argument('--duration', type=float, default=10.0, help='Segundos por nível de concorrência')
+    p.add_argument('--batch', type=int, default=50, help='Items por request em /ingest')
+    p.add_argument('--timeout', type=float, default=30.0)
+    p.add_argument('--label', default='')
+    p.add_argument('--out', help='Salva resultados em JSON para --compare')
+    p.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'))
+    args = p.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    print(f"Load test {args.endpoint} @ {args.url} | batch={args.batch} | {args.duration}s por nível")
+    print_header()
+    results = asyncio.run(run(args))
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({"label": args.label, "endpoint": args.endpoint, "batch": args.batch,
+                       "results": results}, f, indent=2)
+        print(f"Resultados salvos em {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Testes do controle de admissão do caminho de escrita (admission.py)
+"""
+import asyncio
+
+import pytest
+
+import admission as adm
+
+UA = "DataCollectorPRO/PDC/1.65 (Account:12345; Server:Broker-Demo; Build:3850; trace_id:abc)"
+
+
+def test_ea_metadata_and_client_key():
+    assert adm.ea_metadata(UA) == {'account': '12345', 'server': 'Broker-Demo', 'build': '3850', 'trace_id': 'abc'}
+    assert adm.ea_metadata("curl/8.0") == {}
+    assert adm.ea_metadata(None) == {}
+    assert adm.client_key("tok", "10.0.0.1", UA) == ("tok", "10.0.0.1", "12345@Broker-Demo")
+    assert adm.client_key(None, None, "curl/8.0") == ("-", "-", "-")
+
+
+def test_rate_limiter_refills_and_isolates_keys():
+    limiter = adm.RateLimiter(rate=2, burst=2)
+    a, b = ('tok', '10.0.0.1', '1@X'), ('tok', '10.0.0.1', '2@X')
+    assert limiter.check(a, now=0) == 0
+    assert limiter.check(a, now=0) == 0
+    assert limiter.check(a, now=0) == pytest.approx(0.5)   # 1 ficha a 2/s
+    assert limiter.check(b, now=0) == 0                     # outro terminal, outro balde
+    assert limiter.check(a, now=0.5) == 0
+
+
+def test_rate_limiter_cost_above_burst_admits_with_full_bucket():
+    limiter = adm.RateLimiter(rate=100, burst=100)
+    assert limiter.check('k', cost=500, now=0) == 0         # balde cheio: entra e fica devendo
+    assert limiter.check('k', cost=1, now=1) == pytest.approx(3.01)
+    assert limiter.check('k', cost=1, now=4.01) == 0
+
+
+def test_rate_limiter_disabled_and_bounded_keys():
+    assert adm.RateLimiter(0).check('k') == 0
+    limiter = adm.RateLimiter(rate=1, max_keys=2)
+    for key in ('a', 'b', 'c'):
+        limiter.check(key, now=0)
+    assert len(limiter) == 2
+
+
+def test_throttled_retry_after_is_whole_seconds():
+    assert adm.Throttled("x", 0.2).retry_after == 1
+    assert adm.Throttled("x", 2.1).retry_after == 3
+
+
+def test_concurrency_limiter_rejects_after_max_wait():
+    async def scenario():
+        limiter = adm.ConcurrencyLimiter(1, max_wait=0.05)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(limiter.slot().__aenter__())
+        await asyncio.sleep(0.01)
+        waiting = limiter.waiting
+        with pytest.raises(adm.Throttled):
+            await waiter
+        release.set()
+        await holder
+        async with limiter.slot():
+            active = limiter.active
+        return waiting, active, limiter.waiting
+
+    assert asyncio.run(scenario()) == (1, 1, 0)
+
+
+def test_concurrency_limiter_disabled():
+    async def scenario():
+        limiter = adm.ConcurrencyLimiter(0)
+        async with limiter.slot():
+            return limiter.active
+
+    assert asyncio.run(scenario()) == 0
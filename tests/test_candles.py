@@ -0,0 +1,67 @@
+"""
+Testes da leitura de candles (candles.py)
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import candles
+
+
+class Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def mappings(self):
+        return self.rows
+
+
+class FakeConn:
+    def __init__(self, by_source):
+        self.by_source = by_source
+        self.calls = []
+
+    async def execute(self, stmt, params):
+        source = 'tick' if 'candles_tick_' in str(stmt) else 'bar'
+        self.calls.append((source, str(stmt), params))
+        return Result(self.by_source.get(source, []))
+
+
+def test_normalize_timeframe():
+    assert candles.normalize_timeframe('m15') == 'M15'
+    with pytest.raises(HTTPException):
+        candles.normalize_timeframe('M2')
+
+
+def test_resolve_range_defaults_and_iso():
+    assert candles.resolve_range('M1', None, None, now_ms=1_000_000_000) == (
+        1_000_000_000 - candles.DEFAULT_BARS * 60_000, 1_000_000_000)
+    assert candles.resolve_range('H1', '2025-10-20T00:00:00Z', '1761004800000') == (1760918400000, 1761004800000)
+    with pytest.raises(HTTPException):
+        candles.resolve_range('M1', '2000', '1000')
+    with pytest.raises(HTTPException):
+        candles.resolve_range('M1', 'ontem', None)
+
+
+def test_queries_use_whitelisted_views():
+    assert len(candles.QUERIES) == len(candles.SOURCES) * len(candles.TIMEFRAMES)
+    assert 'FROM candles_bar_h1' in str(candles.QUERIES[('bar', 'H1')])
+
+
+def test_auto_source_falls_back_to_bar():
+    bar = [{'ts': 0, 'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0, 'volume': 1.0, 'ticks': 1}]
+    conn = FakeConn({'bar': bar})
+    used, rows = asyncio.run(candles.query_candles(conn, "EURUSD", 'M5', 0, 1, 'auto', 10))
+    assert (used, rows) == ('bar', bar)
+    assert [c[0] for c in conn.calls] == ['tick', 'bar']
+    assert conn.calls[0][2] == {'symbol': "EURUSD", 'from_ms': 0, 'to_ms': 1, 'limit': 10}
+
+
+def test_auto_source_prefers_ticks_and_explicit_source():
+    tick = [{'ts': 0}]
+    conn = FakeConn({'tick': tick, 'bar': [{'ts': 1}]})
+    assert asyncio.run(candles.query_candles(conn, "EURUSD", 'M1', 0, 1)) == ('tick', tick)
+    assert asyncio.run(candles.query_candles(conn, "EURUSD", 'M1', 0, 1, 'bar'))[0] == 'bar'
+    with pytest.raises(HTTPException):
+        asyncio.run(candles.query_candles(conn, "EURUSD", 'M1', 0, 1, 'mid'))
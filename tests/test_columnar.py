@@ -0,0 +1,106 @@
+"""
+Testes do payload colunar (columnar.py)
+"""
+import gzip
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import columnar
+
+DOC = {
+    "v": 1,
+    "symbols": ["EURUSD", "GBPUSD"],
+    "symbol_idx": [0, 1, 0],
+    "ts0": 1760954400000,
+    "ts_delta": [0, 150, 20],
+    "kind": "tick",
+    "bid": [1.1601, 1.3402, None],
+    "ask": [1.1603, 1.3404, 1.1605],
+    "meta": {"src": "relay"},
+}
+
+
+@pytest.fixture(params=["numpy", "python"])
+def decoder(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(columnar, "np", None)
+    return columnar
+
+
+def test_decode_columns(decoder):
+    cols = decoder.decode_columns(DOC)
+    assert cols['symbol'] == ["EURUSD", "GBPUSD", "EURUSD"]
+    assert cols['ts_ms'] == [1760954400000, 1760954400150, 1760954400170]
+    assert cols['kind'] == ["tick"] * 3
+    assert cols['timeframe'] == [None] * 3
+    assert cols['ask'] == [1.1603, 1.3404, 1.1605]
+    assert cols['bid'][2] is None
+    assert cols['close'] == cols['bid']  # sem close, a barra segue o bid
+    assert cols['open'] == [None] * 3
+    assert all(json.loads(m) == {"src": "relay"} for m in cols['meta'])
+
+
+@pytest.mark.parametrize("bad", [
+    {**DOC, "symbol_idx": [0, 2, 0]},
+    {**DOC, "symbol_idx": [0, 1]},
+    {**DOC, "ask": [1.0]},
+    {**DOC, "symbols": []},
+    {**DOC, "v": 2},
+    {**DOC, "ts_delta": [0, 150.5, 20]},       # float: numpy truncaria, Python puro recusa
+    {**DOC, "ts_delta": [0, 1.0, 20]},
+    {**DOC, "ts_delta": [0, True, 20]},
+    {**DOC, "ts_delta": [0, 10 ** 20, 20]},
+    {**DOC, "ts0": 10 ** 17},
+    {**DOC, "timeframe": {"a": 1}},
+    {**DOC, "kind": ["tick", 7, "tick"]},
+    {**DOC, "source": 5},
+])
+def test_decode_rejects_inconsistent_columns(decoder, bad):
+    with pytest.raises(ValueError):
+        decoder.decode_columns(bad)
+
+
+def test_single_symbol_and_empty_batch():
+    cols = columnar.decode_columns({"symbol": "XAUUSD", "ts0": 1, "ts_delta": [0, 1], "close": [1, 2]})
+    assert cols['symbol'] == ["XAUUSD", "XAUUSD"] and cols['close'] == [1.0, 2.0]
+    assert columnar.decode_columns({"ts_delta": []})['symbol'] == []
+
+
+def test_decode_gzip_and_zstd():
+    raw = json.dumps(DOC).encode()
+    assert columnar.decode(gzip.compress(raw), "gzip")['ts_ms'][-1] == 1760954400170
+    zstandard = pytest.importorskip("zstandard")
+    assert columnar.decode(zstandard.ZstdCompressor().compress(raw), "zstd")['symbol'][1] == "GBPUSD"
+
+
+def test_decode_errors_are_http():
+    with pytest.raises(HTTPException) as e:
+        columnar.decode(b"{}", "br")
+    assert e.value.status_code == 415
+    with pytest.raises(HTTPException) as e:
+        columnar.decode(b"not-gzip", "gzip")
+    assert e.value.status_code == 400
+    with pytest.raises(HTTPException) as e:
+        columnar.decode(json.dumps({**DOC, "ask": [1]}).encode())
+    assert e.value.status_code == 400
+
+
+def test_content_type_negotiation_and_forward_items():
+    assert columnar.is_columnar("application/vnd.ea.columnar+json; charset=utf-8")
+    assert not columnar.is_columnar("application/json")
+    items = columnar.to_items(columnar.decode_columns(DOC))
+    assert items[0] == {"symbol": "EURUSD", "ts": 1760954400000, "kind": "tick",
+                        "close": 1.1601, "bid": 1.1601, "ask": 1.1603}
+
+
+def test_columnar_is_smaller_than_item_json():
+    n = 1000
+    items = [{"symbol": "EURUSD", "ts": 1760954400000 + i * 100, "kind": "tick",
+              "bid": 1.16 + i * 1e-5, "ask": 1.1602 + i * 1e-5} for i in range(n)]
+    doc = {"symbol": "EURUSD", "ts0": 1760954400000, "ts_delta": [0] + [100] * (n - 1), "kind": "tick",
+           "bid": [it["bid"] for it in items], "ask": [it["ask"] for it in items]}
+    assert len(json.dumps(doc)) < len(json.dumps(items)) * 0.6
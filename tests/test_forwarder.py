@@ -0,0 +1,98 @@
+import asyncio
+import json
+
+import httpx
+
+from forwarder import ForwardChannel
+
+
+def _client(handler):
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def test_micro_batches_items_and_reports_lag():
+    bodies, sent = [], []
+
+    def handler(request):
+        bodies.append(json.loads(request.content))
+        return httpx.Response(200, json={"ok": True})
+
+    async def on_sent(endpoint, keys, status, lag, size):
+        sent.append((endpoint, keys, status, size))
+        assert lag >= 0
+
+    async def scenario():
+        ch = ForwardChannel('/ingest', 'http://remote/ingest', max_batch=3, max_wait=0.05, on_sent=on_sent)
+        ch.submit([({"symbol": "EURUSD", "ts": i}, ("EURUSD", i)) for i in range(5)])
+        async with _client(handler) as client:
+            task = asyncio.create_task(ch.run(client, {}))
+            await asyncio.wait_for(ch.queue.join(), 2)
+            task.cancel()
+
+    asyncio.run(scenario())
+    assert [len(b) for b in bodies] == [3, 2]
+    assert sent[0] == ('/ingest', [("EURUSD", 0), ("EURUSD", 1), ("EURUSD", 2)], 200, 3)
+
+
+def test_single_item_channel_posts_plain_object():
+    bodies = []
+
+    def handler(request):
+        bodies.append(json.loads(request.content))
+        return httpx.Response(200)
+
+    async def scenario():
+        ch = ForwardChannel('/ingest/tick', 'http://remote/ingest/tick', max_batch=1)
+        ch.submit([({"symbol": "EURUSD", "ts": 1}, ("EURUSD", 1))])
+        async with _client(handler) as client:
+            await ch.send_batch(client, {}, [await ch.queue.get()])
+
+    asyncio.run(scenario())
+    assert bodies == [{"symbol": "EURUSD", "ts": 1}]
+
+
+def test_retries_5xx_with_backoff_then_confirms():
+    calls = []
+    confirmed = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        if request.url.path == '/ingest' and calls.count('/ingest') < 3:
+            return httpx.Response(503)
+        return httpx.Response(200)
+
+    async def on_confirm(endpoint, keys, status, latency):
+        confirmed.append((keys, status))
+
+    async def scenario():
+        ch = ForwardChannel('/ingest', 'http://remote/ingest', max_retries=3, backoff=0.001,
+                            confirm_url='http://remote/confirm', on_confirm=on_confirm)
+        async with _client(handler) as client:
+            await ch.send_batch(client, {}, [({"symbol": "EURUSD"}, ("EURUSD", 1), 0.0)])
+
+    asyncio.run(scenario())
+    assert calls == ['/ingest', '/ingest', '/ingest', '/confirm']
+    assert confirmed == [([("EURUSD", 1)], 200)]
+
+
+def test_client_error_is_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(1)
+        return httpx.Response(401)
+
+    async def scenario():
+        ch = ForwardChannel('/ingest', 'http://remote/ingest', max_retries=3, backoff=0.001)
+        async with _client(handler) as client:
+            await ch.send_batch(client, {}, [({"symbol": "EURUSD"}, ("EURUSD", 1), 0.0)])
+
+    asyncio.run(scenario())
+    assert calls == [1]
+
+
+def test_full_queue_drops_instead_of_blocking():
+    ch = ForwardChannel('/ingest', 'http://remote/ingest', queue_size=2)
+    dropped = ch.submit([({"i": i}, ("EURUSD", i)) for i in range(5)])
+    assert dropped == 3
+    assert ch.depth() == 2
@@ -0,0 +1,57 @@
+"""
+Testes do FreshnessTracker (índice em memória de último dado por símbolo)
+"""
+from prometheus_client import CollectorRegistry, generate_latest
+
+from freshness import FreshnessTracker, FreshnessCollector
+
+NOW = 1_760_000_000.0
+
+
+def test_observe_keeps_newest_ts_and_updates_seen():
+    t = FreshnessTracker()
+    t.observe("EURUSD", "M1", int((NOW - 60) * 1000), seen_at=NOW - 10)
+    t.observe("EURUSD", "M1", int((NOW - 120) * 1000), seen_at=NOW - 5)  # reenvio de barra antiga
+    snap = t.snapshot(now=NOW)
+    assert len(snap) == 1
+    assert snap[0]['age_seconds'] == 60
+    assert snap[0]['last_seen_seconds'] == 5
+
+
+def test_symbol_age_is_freshest_timeframe():
+    t = FreshnessTracker()
+    t.observe_rows([
+        {'symbol': 'EURUSD', 'timeframe': 'M1', 'ts_ms': int((NOW - 60) * 1000)},
+        {'symbol': 'EURUSD', 'timeframe': 'H1', 'ts_ms': int((NOW - 3600) * 1000)},
+        {'symbol': 'XAUUSD', 'timeframe': None, 'ts_ms': int((NOW - 900) * 1000)},
+    ], seen_at=NOW)
+    assert t.symbol_ages(now=NOW) == {'EURUSD': 60, 'XAUUSD': 900}
+    assert {(e['symbol'], e['timeframe']) for e in t.snapshot(now=NOW)} == {
+        ('EURUSD', 'M1'), ('EURUSD', 'H1'), ('XAUUSD', 'unknown')}
+
+
+def test_active_symbols_uses_data_time():
+    t = FreshnessTracker()
+    t.observe("EURUSD", "M1", int((NOW - 10) * 1000), seen_at=NOW - 1000)
+    # backfill de barra antiga recebida agora não torna o símbolo ativo
+    t.observe("GBPUSD", "M1", int((NOW - 7200) * 1000), seen_at=NOW)
+    t.seed("USDJPY", "M1", int((NOW - 7200) * 1000))
+    assert t.active_symbols(300, now=NOW) == 1
+
+
+def test_seed_does_not_override_newer_data():
+    t = FreshnessTracker()
+    t.observe("EURUSD", "M1", int(NOW * 1000), seen_at=NOW)
+    t.seed("EURUSD", "M1", int((NOW - 3600) * 1000))
+    assert t.snapshot(now=NOW)[0]['last_ts_ms'] == int(NOW * 1000)
+
+
+def test_collector_exports_every_symbol():
+    t = FreshnessTracker()
+    for i in range(8):
+        t.observe(f"SYM{i}", "M1", 0)
+    reg = CollectorRegistry()
+    reg.register(FreshnessCollector(t))
+    out = generate_latest(reg).decode()
+    assert out.count('data_age_seconds{symbol=') == 8
+    assert 'data_age_by_timeframe_seconds{symbol="SYM0",timeframe="M1"}' in out
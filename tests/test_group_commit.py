@@ -0,0 +1,118 @@
+"""
+Testes do GroupCommitBuffer (commit agrupado do /ingest/tick)
+"""
+import asyncio
+
+import pytest
+
+from group_commit import GroupCommitBuffer
+
+FIELDS = ('symbol', 'ts_ms')
+
+
+def cols(*keys):
+    return {'symbol': [k[0] for k in keys], 'ts_ms': [k[1] for k in keys]}
+
+
+class FakeStore:
+    def __init__(self, existing=(), fail=False):
+        self.existing = set(existing)
+        self.flushes = []
+        self.fail = fail
+
+    async def flush(self, merged):
+        self.flushes.append(len(merged['symbol']))
+        if self.fail:
+            raise RuntimeError("db down")
+        new = []
+        for key in zip(merged['symbol'], merged['ts_ms']):
+            if key not in self.existing:
+                self.existing.add(key)
+                new.append(key)
+        return new
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_requests_share_one_flush():
+    store = FakeStore(existing={("GBPUSD", 1)})
+    stats = []
+
+    async def scenario():
+        buf = GroupCommitBuffer(store.flush, FIELDS, max_rows=100, max_delay=0.05,
+                                on_flush=lambda *a: stats.append(a))
+        await buf.start()
+        results = await asyncio.gather(
+            buf.submit(cols(("EURUSD", 1))),
+            buf.submit(cols(("EURUSD", 1), ("EURUSD", 2))),   # repete a chave da 1ª request
+            buf.submit(cols(("GBPUSD", 1))),                   # já existia
+        )
+        await buf.stop()
+        return results
+
+    assert run(scenario()) == [[False], [True, False], [True]]
+    assert store.flushes == [4]
+    assert stats[0][:2] == (4, 3) and stats[0][3] is True
+
+
+def test_max_rows_flushes_without_waiting_delay():
+    store = FakeStore()
+
+    async def scenario():
+        buf = GroupCommitBuffer(store.flush, FIELDS, max_rows=2, max_delay=10.0)
+        await buf.start()
+        flags = await asyncio.wait_for(buf.submit(cols(("EURUSD", 1), ("EURUSD", 2))), 1.0)
+        await buf.stop()
+        return flags
+
+    assert run(scenario()) == [False, False]
+
+
+def test_flush_failure_reaches_every_waiting_request():
+    store = FakeStore(fail=True)
+
+    async def scenario():
+        buf = GroupCommitBuffer(store.flush, FIELDS, max_rows=100, max_delay=0.01)
+        await buf.start()
+        results = await asyncio.gather(buf.submit(cols(("EURUSD", 1))), buf.submit(cols(("EURUSD", 2))),
+                                       return_exceptions=True)
+        await buf.stop()
+        return results
+
+    results = run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_stop_drains_pending_and_rejects_new_rows():
+    store = FakeStore()
+
+    async def scenario():
+        buf = GroupCommitBuffer(store.flush, FIELDS, max_rows=100, max_delay=5.0)
+        await buf.start()
+        pending = asyncio.create_task(buf.submit(cols(("EURUSD", 1))))
+        await asyncio.sleep(0.01)
+        await buf.stop()
+        with pytest.raises(RuntimeError):
+            await buf.submit(cols(("EURUSD", 2)))
+        return await pending
+
+    assert run(scenario()) == [False]
+    assert store.flushes == [1]
+
+
+def test_custom_key_fields():
+    # raw_ticks usa (symbol, time_msc) como chave
+    async def flush(merged):
+        return [("EURUSD", 5)]
+
+    async def scenario():
+        buf = GroupCommitBuffer(flush, ('symbol', 'time_msc', 'bid'), key_fields=('symbol', 'time_msc'),
+                                max_delay=0.01)
+        await buf.start()
+        result = await buf.submit({'symbol': ["EURUSD", "EURUSD"], 'time_msc': [5, 5], 'bid': [1.1, 1.1]})
+        await buf.stop()
+        return result
+
+    assert run(scenario()) == [False, True]
@@ -0,0 +1,69 @@
+"""
+Testes dos contadores agregados de ingestão e do modo do ingest_log (ingest_activity.py)
+"""
+import asyncio
+
+import pytest
+
+import ingest_activity as act
+
+
+def test_policy_modes():
+    assert act.IngestLogPolicy('full').select(5) is None
+    assert act.IngestLogPolicy('aggregate').select(5) == []
+    with pytest.raises(ValueError):
+        act.IngestLogPolicy('verbose')
+
+
+def test_sampled_policy_is_one_in_n_across_batches():
+    policy = act.IngestLogPolicy('sampled', sample_every=3)
+    assert policy.select(4) == [0, 3]
+    assert policy.select(4) == [2]      # itens 4..7 globais -> 6
+    assert policy.select(1) == []       # item 8
+    assert policy.select(2) == [0]      # item 9
+    total = sum(len(policy.select(10)) for _ in range(30))
+    assert total == 100
+
+
+def test_counters_aggregate_per_minute_and_drain():
+    counters = act.ActivityCounters()
+    counters.record('/ingest', ["EURUSD", "EURUSD", "GBPUSD"], ["M1", "M1", "M1"], [False, True, True], now=120.5)
+    counters.record('/ingest', ["EURUSD"], ["M1"], [True], now=179.9)
+    counters.record('/ingest/tick', ["EURUSD"], None, [False], now=180)
+    assert counters.pending() == 3
+    batch = counters.drain()
+    assert batch[('/ingest', "EURUSD", "M1", 120)] == [3, 2]
+    assert batch[('/ingest', "GBPUSD", "M1", 120)] == [1, 1]
+    assert batch[('/ingest/tick', "EURUSD", None, 180)] == [1, 0]
+    assert counters.pending() == 0
+
+
+def test_restore_merges_failed_batch():
+    counters = act.ActivityCounters()
+    counters.record('/ingest', ["EURUSD"], ["M1"], [True], now=60)
+    batch = counters.drain()
+    counters.record('/ingest', ["EURUSD"], ["M1"], [False], now=60)
+    counters.restore(batch)
+    assert counters.drain() == {('/ingest', "EURUSD", "M1", 60): [2, 1]}
+
+
+def test_flush_activity_statements():
+    calls = []
+
+    class Conn:
+        async def execute(self, stmt, params):
+            calls.append((stmt, params))
+
+    counters = act.ActivityCounters()
+    counters.record('/ingest/tick', ["EURUSD", "EURUSD"], None, [False, False], now=60)
+    assert asyncio.run(act.flush_activity(Conn(), counters.drain())) == 1
+    # sem duplicatas: duplicate_stats não é tocada
+    assert [c[0] for c in calls] == [act.ACTIVITY_UPSERT]
+    assert calls[0][1]['timeframe'] == ['']
+    assert calls[0][1]['attempts'] == [2]
+
+    calls.clear()
+    counters.record('/ingest', ["EURUSD"], ["M1"], [True], now=60)
+    asyncio.run(act.flush_activity(Conn(), counters.drain()))
+    assert [c[0] for c in calls] == [act.ACTIVITY_UPSERT, act.DUPLICATE_STATS_UPSERT]
+    assert asyncio.run(act.flush_activity(Conn(), {})) == 0
@@ -0,0 +1,117 @@
+import asyncio
+import json
+
+import ingest_store as store
+from payload import validate_batch
+
+
+class FakeConn:
+    """Simula o INSERT ... RETURNING devolvendo apenas as chaves novas."""
+
+    def __init__(self, existing=()):
+        self.existing = set(existing)
+        self.calls = []
+
+    async def execute(self, stmt, params):
+        self.calls.append((stmt, params))
+        if stmt is store.TICKS_BULK_INSERT:
+            new = []
+            for key in zip(params['symbol'], params['ts_ms']):
+                if key not in self.existing:
+                    self.existing.add(key)
+                    new.append(key)
+            return new
+        return []
+
+
+def test_extract_items_accepts_wrapper_list_and_single():
+    assert store.extract_items({"items": [{"symbol": "EURUSD"}]}) == [{"symbol": "EURUSD"}]
+    assert store.extract_items([{"symbol": "EURUSD"}]) == [{"symbol": "EURUSD"}]
+    assert store.extract_items({"symbol": "EURUSD"}) == [{"symbol": "EURUSD"}]
+
+
+def test_validate_batch_parses_iso_and_rejects_bad_items():
+    rows, rejected = validate_batch([
+        {"symbol": "EURUSD", "ts": "2025-10-20T10:00:00Z", "open": 1, "meta": {"src": "timer"}},
+        {"symbol": "EURUSD", "ts": "1760954460000"},
+        {"ts": 1760954400000},
+        {"symbol": "GBPUSD", "ts": "not-a-date"},
+    ])
+    assert rejected == 2
+    assert [r['ts_ms'] for r in rows] == [1760954400000, 1760954460000]
+    assert rows[0]['open'] == 1.0
+    assert json.loads(rows[0]['meta']) == {"src": "timer"}
+
+
+def test_bulk_insert_uses_two_statements_and_flags_duplicates():
+    rows, _ = validate_batch([
+        {"symbol": "EURUSD", "ts": 1000},
+        {"symbol": "EURUSD", "ts": 2000},
+        {"symbol": "EURUSD", "ts": 1000},   # repetido dentro do batch
+        {"symbol": "GBPUSD", "ts": 1000},   # já existe no banco
+    ])
+    cols = store.columns(rows, store.ROW_FIELDS + ('meta',))
+    conn = FakeConn(existing={("GBPUSD", 1000)})
+    flags = asyncio.run(store.insert_columns_bulk(conn, cols, "10.0.0.1", "PDC/1.65"))
+    assert flags == [False, False, True, True]
+    assert len(conn.calls) == 2
+    log_params = conn.calls[1][1]
+    assert log_params['was_duplicate'] == flags
+    assert log_params['ip'] == "10.0.0.1"
+
+
+def test_bulk_insert_log_rows_subset_and_skip():
+    rows, _ = validate_batch([{"symbol": "EURUSD", "ts": t} for t in (1000, 2000, 3000)])
+    cols = store.columns(rows, store.ROW_FIELDS + ('meta',))
+    conn = FakeConn(existing={("EURUSD", 2000)})
+    flags = asyncio.run(store.insert_columns_bulk(conn, cols, None, "ua", log_rows=[1, 2]))
+    assert flags == [False, True, False]
+    log_params = conn.calls[1][1]
+    assert log_params['ts_ms'] == [2000, 3000]
+    assert log_params['was_duplicate'] == [True, False]
+    # modo aggregate: só o INSERT em ticks
+    conn = FakeConn()
+    asyncio.run(store.insert_columns_bulk(conn, cols, None, "ua", log_rows=[]))
+    assert len(conn.calls) == 1
+
+
+def test_batches_bulk_one_ticks_insert_and_log_per_request():
+    def cols_of(ts_list):
+        rows, _ = validate_batch([{"symbol": "EURUSD", "ts": t} for t in ts_list])
+        return store.columns(rows, store.ROW_FIELDS + ('meta',))
+
+    conn = FakeConn()
+    batch = [(cols_of([1000, 2000]), ("10.0.0.1", "PDC/1.65")), (cols_of([2000, 3000]), ("10.0.0.2", "ua"))]
+    flags = asyncio.run(store.insert_batches_bulk(conn, batch, lambda n: None))
+    assert flags == [[False, False], [True, False]]
+    assert [c[0] for c in conn.calls] == [store.TICKS_BULK_INSERT] + [store.INGEST_LOG_BULK_INSERT] * 2
+    assert conn.calls[2][1]['ip'] == "10.0.0.2" and conn.calls[2][1]['was_duplicate'] == [True, False]
+
+
+class RowcountResult:
+    def __init__(self, rowcount):
+        self.rowcount = rowcount
+
+
+def test_forward_audit_and_confirm_are_single_statements_for_whole_batch():
+    keys = [("EURUSD", i) for i in range(200)]
+    conn = FakeConn()
+
+    async def scenario():
+        await store.upsert_forward_audit(conn, '/ingest', keys, 'sent', 200)
+
+        async def execute(stmt, params):
+            conn.calls.append((stmt, params))
+            return RowcountResult(len(params['symbol']))
+        conn.execute = execute
+        return await store.confirm_forward_audit(conn, '/ingest', keys, 200)
+
+    confirmed = asyncio.run(scenario())
+    assert len(conn.calls) == 2
+    upsert, confirm = conn.calls
+    assert upsert[0] is store.FORWARD_AUDIT_UPSERT
+    assert upsert[1]['ts_ms'] == list(range(200))
+    assert upsert[1]['status'] == 'sent'
+    assert confirm[0] is store.FORWARD_AUDIT_CONFIRM
+    assert len(confirm[1]['symbol']) == 200
+    assert confirmed == 200
@@ -0,0 +1,94 @@
+"""
+Testes dos snapshots Parquet e agregações do modo analítico da API lite (lite_analytics.py)
+"""
+import sqlite3
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+import lite_analytics as la
+from fastapi import HTTPException
+
+
+def make_db(path, raw_rows=(), bar_rows=()):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE ticks (symbol TEXT, ts_ms INTEGER, timeframe TEXT, open REAL, high REAL, "
+                 "low REAL, close REAL, volume REAL)")
+    conn.execute("CREATE TABLE raw_ticks (symbol TEXT, time_msc INTEGER, bid REAL, ask REAL, last REAL, "
+                 "volume INTEGER, flags INTEGER)")
+    conn.executemany("INSERT INTO raw_ticks VALUES (?, ?, ?, ?, NULL, 0, 0)", raw_rows)
+    conn.executemany("INSERT INTO ticks VALUES (?, ?, ?, ?, ?, ?, ?, ?)", bar_rows)
+    conn.commit()
+    conn.close()
+
+
+def test_refresh_is_incremental_by_watermark(tmp_path):
+    db = tmp_path / "ea.db"
+    make_db(db, raw_rows=[('EURUSD', t, 1.0, 1.1) for t in (100, 200, 300)])
+    snaps = la.Snapshots(tmp_path / "an")
+    sources = lambda since: [db, tmp_path / "missing.db"]
+
+    assert snaps.refresh(sources, closed_until=250) == {'ticks': 0, 'raw_ticks': 2}
+    assert snaps.watermark('raw_ticks') == 250
+    # nada novo fechou: não relê
+    assert snaps.refresh(sources, closed_until=250) == {}
+    assert snaps.refresh(sources, closed_until=1000)['raw_ticks'] == 1
+    state = snaps.state()['raw_ticks']
+    assert (state['rows'], state['files']) == (3, 2)
+    assert snaps.scan('raw_ticks', ['time_msc'])['time_msc'].to_pylist() == [100, 200, 300]
+
+    snaps.rebuild()
+    assert snaps.watermark('raw_ticks') is None
+    assert snaps.scan('raw_ticks', ['symbol']).num_rows == 0
+
+
+def test_scan_filters_symbol_and_time(tmp_path):
+    db = tmp_path / "ea.db"
+    make_db(db, raw_rows=[('EURUSD', 100, 1.0, 1.1), ('GBPUSD', 150, 1.0, 1.1), ('EURUSD', 200, 1.0, 1.1)])
+    snaps = la.Snapshots(tmp_path / "an")
+    snaps.refresh(lambda since: [db], closed_until=1000)
+    t = snaps.scan('raw_ticks', ['symbol', 'time_msc'], symbols=['EURUSD'], from_ms=150, to_ms=1000)
+    assert t.to_pylist() == [{'symbol': 'EURUSD', 'time_msc': 200}]
+
+
+def test_resample_tick_ohlc():
+    t = pa.table({'symbol': ['A', 'A', 'A', 'B'], 'time_msc': [60_500, 0, 30_000, 10],
+                  'bid': [3.0, 1.0, 2.0, 9.0], 'volume': [1, 1, 1, 1]})
+    rows = la.resample_ohlc(t, 'tick', 60_000)
+    assert rows[0] == {"symbol": "A", "ts": 0, "open": 1.0, "high": 2.0, "low": 1.0, "close": 2.0,
+                       "volume": 2.0, "ticks": 2}
+    assert [(r['symbol'], r['ts']) for r in rows] == [('A', 0), ('A', 60_000), ('B', 0)]
+    assert la.resample_ohlc(t, 'tick', 60_000, limit=1) == rows[:1]
+
+
+def test_resample_bar_ohlc_skips_higher_timeframes():
+    t = pa.table({'symbol': ['A', 'A', 'A'], 'ts_ms': [0, 60_000, 0], 'timeframe': [None, 'M1', 'H1'],
+                  'open': [1.0, None, 50.0], 'high': [2.0, 4.0, 50.0], 'low': [0.5, 1.0, 50.0],
+                  'close': [1.5, 3.0, 50.0], 'volume': [10.0, 5.0, 99.0]})
+    rows = la.resample_ohlc(t, 'bar', 300_000)
+    assert rows == [{"symbol": "A", "ts": 0, "open": 1.0, "high": 4.0, "low": 0.5, "close": 3.0,
+                     "volume": 15.0, "ticks": 2}]
+
+
+def test_counts_and_spread():
+    t = pa.table({'symbol': ['A', 'B', 'A'], 'time_msc': [5, 7, 9],
+                  'bid': [1.0, 2.0, 1.0], 'ask': [1.2, 2.1, 1.4]})
+    assert la.symbol_counts(t, 'time_msc') == [
+        {"symbol": "A", "count": 2, "first_ms": 5, "last_ms": 9},
+        {"symbol": "B", "count": 1, "first_ms": 7, "last_ms": 7},
+    ]
+    stats = {r['symbol']: r for r in la.spread_stats(t)}
+    assert stats['A']['count'] == 2
+    assert stats['A']['mean'] == pytest.approx(0.3)
+    assert stats['A']['max'] == pytest.approx(0.4)
+    assert stats['B']['p50'] == pytest.approx(0.1)
+    assert la.spread_stats(t.slice(0, 0)) == []
+
+
+def test_parse_range():
+    assert la.parse_range(None, "1000") == (None, 1000)
+    with pytest.raises(HTTPException):
+        la.parse_range("2000", "1000")
+    with pytest.raises(HTTPException):
+        la.parse_range("not-a-date", None)
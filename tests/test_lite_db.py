@@ -0,0 +1,76 @@
+"""
+Testes das conexões SQLite persistentes da API lite (lite_db.py)
+"""
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from lite_db import LiteDB, connect
+
+
+@pytest.fixture
+def db(tmp_path):
+    d = LiteDB(tmp_path / "ea.db", cache_mb=8, mmap_mb=16)
+    d.open()
+    with d.writer() as conn:
+        conn.execute("CREATE TABLE t (k INTEGER PRIMARY KEY, v TEXT)")
+    yield d
+    d.close()
+
+
+def test_open_uses_wal_and_pragmas(db):
+    with db.writer() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1   # NORMAL
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == -8 * 1024
+
+
+def test_writer_commits_and_rolls_back(db):
+    with db.writer() as conn:
+        conn.executemany("INSERT INTO t VALUES (?, ?)", [(1, 'a'), (2, 'b')])
+    with pytest.raises(sqlite3.IntegrityError):
+        with db.writer() as conn:
+            conn.execute("INSERT INTO t VALUES (3, 'c')")
+            conn.execute("INSERT INTO t VALUES (1, 'dup')")
+    with db.writer() as conn:
+        assert conn.execute("SELECT k FROM t ORDER BY k").fetchall() == [(1,), (2,)]
+
+
+def test_reader_sees_commit_while_writer_holds_transaction(db):
+    with db.writer() as conn:
+        conn.execute("INSERT INTO t VALUES (1, 'a')")
+    r = connect(db.path, cache_mb=8, mmap_mb=0)   # leitor de fora (exporter, snapshots)
+    try:
+        with db.writer() as conn:
+            conn.execute("INSERT INTO t VALUES (2, 'b')")
+            # WAL: leitor não bloqueia e vê o último commit
+            assert r.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 1
+    finally:
+        r.close()
+
+
+def test_closed_db_refuses_connections(tmp_path):
+    d = LiteDB(tmp_path / "x.db")
+    with pytest.raises(RuntimeError):
+        with d.writer():
+            pass
+
+
+def test_write_runs_on_writer_thread_and_counts_changes(db):
+    def insert(conn, rows):
+        before = conn.total_changes
+        conn.executemany("INSERT OR IGNORE INTO t VALUES (?, ?)", rows)
+        return conn.total_changes - before, threading.current_thread().name
+
+    async def scenario():
+        batches = [[(i, 'a'), (i + 1, 'b')] for i in range(0, 20, 2)] + [[(0, 'dup'), (100, 'new')]]
+        results = await asyncio.gather(*(db.write(insert, rows) for rows in batches))
+        total = await db.write(lambda conn: conn.execute("SELECT COUNT(*) FROM t").fetchone()[0])
+        return results, total
+
+    results, total = asyncio.run(scenario())
+    assert [n for n, _ in results] == [2] * 10 + [1]
+    assert {name for _, name in results} == {'sqlite-writer_0'}
+    assert total == 21
@@ -0,0 +1,102 @@
+"""
+Testes do particionamento por período da API lite (lite_partitions.py)
+"""
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+
+from lite_db import LiteDB
+from lite_partitions import Partitions, default_root, existing_keys, key_start_ms, partition_files
+
+
+def ms(text: str) -> int:
+    return int(datetime.fromisoformat(text).replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def test_keys_by_day_and_week(tmp_path):
+    day = Partitions(tmp_path, 'day')
+    week = Partitions(tmp_path, 'week')
+    # 2025-01-08 é quarta-feira; a semana começa na segunda 2025-01-06
+    assert day.key_of(ms('2025-01-08T23:59:59')) == '20250108'
+    assert week.key_of(ms('2025-01-08T23:59:59')) == '20250106'
+    assert week.key_of(ms('2025-01-06T00:00:00')) == '20250106'
+    assert key_start_ms('20250106') == ms('2025-01-06T00:00:00')
+    assert default_root(tmp_path / 'ea.db') == tmp_path / 'ea-parts'
+    with pytest.raises(ValueError):
+        Partitions(tmp_path, 'month')
+
+
+def test_split_keeps_order_within_partition(tmp_path):
+    parts = Partitions(tmp_path, 'day')
+    rows = [('B', ms('2025-01-02T10:00:00')), ('A', ms('2025-01-01T10:00:00')), ('C', ms('2025-01-02T09:00:00'))]
+    split = parts.split(rows, ts_index=1)
+    assert list(split) == ['20250101', '20250102']
+    assert [r[0] for r in split['20250102']] == ['B', 'C']
+
+
+def test_expired_and_partition_files(tmp_path):
+    for key in ('20250101', '20250102', '20250103', '20250104'):
+        (tmp_path / f"ticks_{key}.db").touch()
+    (tmp_path / "other.db").touch()
+    parts = Partitions(tmp_path, 'day', keep=2)
+    assert parts.keys() == ['20250101', '20250102', '20250103', '20250104']
+    assert parts.expired(ms('2025-01-04T12:00:00')) == ['20250101', '20250102']
+    assert Partitions(tmp_path, 'day').expired(ms('2025-01-04T12:00:00')) == []
+    # partição termina onde a seguinte começa; a última sempre entra
+    names = [p.name for p in partition_files(tmp_path, since_ms=ms('2025-01-02T12:00:00'))]
+    assert names == ['ticks_20250102.db', 'ticks_20250103.db', 'ticks_20250104.db']
+
+
+def test_cutoff_ms_matches_expired(tmp_path):
+    now = ms('2025-01-04T12:00:00')
+    parts = Partitions(tmp_path, 'day', keep=2)
+    # mantém 2025-01-03 e 2025-01-04: linha de 2025-01-02 criaria uma partição já expirada
+    assert parts.cutoff_ms(now) == ms('2025-01-03T00:00:00')
+    assert parts.key_of(parts.cutoff_ms(now) - 1) == '20250102'
+    assert Partitions(tmp_path, 'week', keep=1).cutoff_ms(now) == ms('2024-12-30T00:00:00')
+    assert Partitions(tmp_path, 'day').cutoff_ms(now) is None
+
+
+def test_existing_keys_finds_rows_in_main_db():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE raw_ticks (symbol TEXT, time_msc INTEGER, PRIMARY KEY (symbol, time_msc))")
+    conn.executemany("INSERT INTO raw_ticks VALUES (?, ?)", [('EURUSD', 1), ('EURUSD', 2), ('GBPUSD', 1)])
+    keys = [('EURUSD', 2), ('EURUSD', 3), ('GBPUSD', 1), ('USDJPY', 1)]
+    assert existing_keys(conn, 'raw_ticks', 'time_msc', keys) == {('EURUSD', 2), ('GBPUSD', 1)}
+    assert existing_keys(conn, 'raw_ticks', 'time_msc', []) == set()
+
+
+def test_attach_lru_and_drop(tmp_path):
+    db = LiteDB(tmp_path / 'ea.db', cache_mb=8, mmap_mb=0)
+    db.open()
+    parts = Partitions(tmp_path / 'parts', 'day', max_attached=2)
+    setups = []
+
+    def setup(schema):
+        setups.append(schema)
+        with db.writer() as conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {schema}.t (k INTEGER PRIMARY KEY)")
+
+    try:
+        schema, new = parts.attach(db, '20250101', setup)
+        assert (schema, new) == ('p_20250101', True)
+        with db.writer() as conn:
+            conn.execute("INSERT INTO p_20250101.t VALUES (1)")
+            assert conn.execute("PRAGMA p_20250101.journal_mode").fetchone()[0] == 'wal'
+        assert parts.attach(db, '20250101', setup) == ('p_20250101', False)
+        parts.attach(db, '20250102', setup)
+        parts.attach(db, '20250103', setup)
+        assert parts.attached == ['20250102', '20250103']  # a menos usada saiu
+        # reanexa a partição existente: o arquivo não é novo e os dados continuam lá
+        assert parts.attach(db, '20250101', setup) == ('p_20250101', False)
+        with db.writer() as conn:
+            assert conn.execute("SELECT k FROM p_20250101.t").fetchall() == [(1,)]
+        assert setups.count('p_20250101') == 2
+
+        assert parts.drop(db, '20250101') is True
+        assert not parts.path('20250101').exists()
+        assert '20250101' not in parts.attached
+        assert parts.keys() == ['20250102', '20250103']
+    finally:
+        db.close()
@@ -0,0 +1,98 @@
+"""
+Testes dos contadores por símbolo da API lite (lite_stats.py)
+"""
+import sqlite3
+
+import pytest
+
+import lite_stats
+from lite_stats import RowCounts
+
+
+def make_tables(conn):
+    conn.execute("CREATE TABLE ticks (id INTEGER PRIMARY KEY AUTOINCREMENT, symbol TEXT NOT NULL, "
+                 "ts_ms INTEGER NOT NULL, UNIQUE(symbol, ts_ms))")
+    conn.execute("CREATE TABLE raw_ticks (symbol TEXT NOT NULL, time_msc INTEGER NOT NULL, "
+                 "PRIMARY KEY (symbol, time_msc)) WITHOUT ROWID")
+
+
+@pytest.fixture
+def conn():
+    c = sqlite3.connect(":memory:", isolation_level=None)
+    make_tables(c)
+    yield c
+    c.close()
+
+
+def test_triggers_count_only_inserted_rows(conn):
+    assert lite_stats.install(conn) is True
+    conn.executemany("INSERT OR IGNORE INTO ticks(symbol, ts_ms) VALUES (?, ?)",
+                     [('EURUSD', 1), ('EURUSD', 2), ('EURUSD', 1), ('GBPUSD', 1)])
+    conn.execute("INSERT INTO raw_ticks VALUES ('XAUUSD', 1)")
+    conn.execute("DELETE FROM ticks WHERE symbol = 'GBPUSD'")
+    rows = dict(((t, s), n) for t, s, n in conn.execute("SELECT tbl, symbol, n FROM row_counts"))
+    assert rows == {('ticks', 'EURUSD'): 2, ('ticks', 'GBPUSD'): 0, ('raw_ticks', 'XAUUSD'): 1}
+
+
+def test_install_backfills_existing_tables_once(conn):
+    conn.executemany("INSERT INTO ticks(symbol, ts_ms) VALUES (?, ?)", [('EURUSD', i) for i in range(5)])
+    assert lite_stats.install(conn) is True
+    assert lite_stats.install(conn) is False
+    counts = RowCounts()
+    counts.load(conn)
+    assert counts.total('ticks') == 5
+
+
+def test_refresh_and_top(conn):
+    lite_stats.install(conn)
+    counts = RowCounts()
+    counts.load(conn)
+    conn.executemany("INSERT INTO ticks(symbol, ts_ms) VALUES (?, ?)",
+                     [('EURUSD', 1), ('EURUSD', 2), ('GBPUSD', 1), ('USDJPY', 1), ('USDJPY', 2), ('USDJPY', 3)])
+    counts.refresh(conn, 'ticks', ['EURUSD', 'GBPUSD', 'USDJPY'])
+    assert counts.total('ticks') == 6
+    assert counts.symbols('ticks') == 3
+    assert counts.top('ticks', 2) == [{"symbol": "USDJPY", "count": 3}, {"symbol": "EURUSD", "count": 2}]
+
+    conn.execute("DELETE FROM ticks WHERE symbol = 'GBPUSD'")
+    counts.refresh(conn, 'ticks', ['GBPUSD'])
+    assert counts.symbols('ticks') == 2
+
+
+def test_rebuild_fixes_drift(conn):
+    lite_stats.install(conn)
+    conn.execute("INSERT INTO ticks(symbol, ts_ms) VALUES ('EURUSD', 1)")
+    conn.execute("UPDATE row_counts SET n = 99")
+    lite_stats.rebuild(conn)
+    counts = RowCounts()
+    counts.load(conn)
+    assert counts.total('ticks') == 1
+
+
+def test_parts_are_summed_and_dropped(conn):
+    conn.execute("ATTACH ':memory:' AS p_20250101")
+    make_tables_sql = [
+        "CREATE TABLE p_20250101.ticks (id INTEGER PRIMARY KEY AUTOINCREMENT, symbol TEXT NOT NULL, "
+        "ts_ms INTEGER NOT NULL, UNIQUE(symbol, ts_ms))",
+        "CREATE TABLE p_20250101.raw_ticks (symbol TEXT NOT NULL, time_msc INTEGER NOT NULL, "
+        "PRIMARY KEY (symbol, time_msc)) WITHOUT ROWID",
+    ]
+    for stmt in make_tables_sql:
+        conn.execute(stmt)
+    lite_stats.install(conn)
+    lite_stats.install(conn, 'p_20250101')
+    conn.execute("INSERT INTO ticks(symbol, ts_ms) VALUES ('EURUSD', 1)")
+    conn.executemany("INSERT INTO p_20250101.ticks(symbol, ts_ms) VALUES (?, ?)", [('EURUSD', 2), ('GBPUSD', 2)])
+
+    counts = RowCounts()
+    counts.load(conn)
+    counts.load(conn, 'p_20250101')
+    assert counts.top('ticks') == [{"symbol": "EURUSD", "count": 2}, {"symbol": "GBPUSD", "count": 1}]
+
+    conn.execute("INSERT INTO p_20250101.ticks(symbol, ts_ms) VALUES ('GBPUSD', 3)")
+    counts.refresh(conn, 'ticks', ['GBPUSD'], 'p_20250101')
+    assert counts.total('ticks') == 4
+
+    counts.drop('p_20250101')
+    assert counts.total('ticks') == 1
+    assert counts.parts() == ['main']
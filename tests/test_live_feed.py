@@ -0,0 +1,95 @@
+"""
+Testes do fan-out ao vivo (live_feed.py)
+"""
+import asyncio
+
+import pytest
+
+import live_feed as lf
+
+
+def bars(symbols, ts0=1000, timeframe='M1'):
+    n = len(symbols)
+    return {'symbol': list(symbols), 'timeframe': [timeframe] * n, 'ts_ms': [ts0 + i for i in range(n)],
+            'open': [1.0] * n, 'high': [1.0] * n, 'low': [1.0] * n, 'close': [1.0] * n, 'volume': [1.0] * n,
+            'kind': [None] * n, 'meta': ['{}'] * n}
+
+
+def ticks(symbols, t0=1000):
+    n = len(symbols)
+    return {'symbol': list(symbols), 'time_msc': [t0 + i for i in range(n)], 'bid': [1.1] * n,
+            'ask': [1.2] * n, 'last': [None] * n, 'volume': [0.0] * n, 'flags': [6] * n}
+
+
+def test_parse_channels():
+    assert lf.parse_channels('tick, m1,H1') == ['tick', 'M1', 'H1']
+    assert lf.parse_channels(None) == ['*']
+    assert lf.parse_list('') == ['*']
+
+
+def test_publish_routes_by_symbol_and_channel_and_skips_duplicates():
+    feed = lf.LiveFeed()
+    eur_m1 = feed.subscribe(['EURUSD'], ['M1'])
+    all_ticks = feed.subscribe(['*'], ['tick'])
+    assert feed.subscribers == 2
+    assert feed.publish_bars(bars(['EURUSD', 'GBPUSD', 'EURUSD']), [False, False, True]) == 1
+    assert feed.publish_ticks(ticks(['GBPUSD'])) == 1
+    assert [e['symbol'] for e in eur_m1.drain()] == ['EURUSD']
+    events = all_ticks.drain()
+    assert events == [{'type': 'tick', 'symbol': 'GBPUSD', 'time_msc': 1000, 'bid': 1.1, 'ask': 1.2,
+                       'last': None, 'volume': 0.0, 'flags': 6}]
+
+
+def test_publish_without_subscribers_or_misaligned_flags():
+    feed = lf.LiveFeed()
+    assert feed.publish_bars(bars(['EURUSD'])) == 0
+    sub = feed.subscribe(['EURUSD'], ['M1'])
+    assert feed.publish_bars(bars(['EURUSD', 'EURUSD']), [False]) == 0
+    assert sub.drain() == []
+
+
+def test_coalesce_keeps_latest_per_topic_and_reports_gap():
+    lost = []
+    feed = lf.LiveFeed(max_queue=2, policy='coalesce', on_drop=lost.append)
+    sub = feed.subscribe(['EURUSD', 'GBPUSD'], ['tick'])
+    feed.publish_ticks(ticks(['EURUSD', 'EURUSD', 'EURUSD', 'GBPUSD', 'EURUSD']))
+    events = sub.drain()
+    assert events[0] == {'type': 'gap', 'dropped': 1}
+    # 2 na fila, depois só o último EURUSD e o GBPUSD (ordem do último evento)
+    assert [(e['symbol'], e['time_msc']) for e in events[1:]] == [
+        ('EURUSD', 1000), ('EURUSD', 1001), ('GBPUSD', 1003), ('EURUSD', 1004)]
+    assert lost == [1]
+    assert sub.dropped == 1
+
+
+def test_drop_policy_discards_oldest():
+    feed = lf.LiveFeed(max_queue=2, policy='drop')
+    sub = feed.subscribe(['EURUSD'], ['tick'])
+    feed.publish_ticks(ticks(['EURUSD'] * 5))
+    events = sub.drain()
+    assert events[0] == {'type': 'gap', 'dropped': 3}
+    assert [e['time_msc'] for e in events[1:]] == [1003, 1004]
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        lf.LiveFeed().subscribe(['EURUSD'], ['tick'], policy='block')
+
+
+def test_get_wakes_on_publish_and_unsubscribe():
+    async def run():
+        feed = lf.LiveFeed()
+        sub = feed.subscribe(['EURUSD'], ['M5'])
+        waiter = asyncio.create_task(sub.get(timeout=5))
+        await asyncio.sleep(0.01)
+        feed.publish_bars(bars(['EURUSD'], timeframe='M5'))
+        events = await asyncio.wait_for(waiter, 1)
+        empty = await sub.get(timeout=0.01)
+        feed.unsubscribe(sub)
+        return events, empty, feed
+
+    events, empty, feed = asyncio.run(run())
+    assert [e['type'] for e in events] == ['bar']
+    assert empty == []
+    assert feed.subscribers == 0
+    assert feed.publish_bars(bars(['EURUSD'], timeframe='M5')) == 0
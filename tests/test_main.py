@@ -0,0 +1,136 @@
+"""
+Testes da API principal (main.py) que não dependem do PostgreSQL: caminhos de validação via TestClient e escrita com engine falso
+"""
+import asyncio
+import importlib
+import os
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+# main.py lê a configuração no import; banco inalcançável e tarefas de fundo desligadas
+os.environ["DATABASE_URL"] = "postgresql://u:p@127.0.0.1:1/x"
+os.environ["JAEGER_HOST"] = "127.0.0.1"
+os.environ["FRESHNESS_SEED_HOURS"] = "0"
+os.environ["SIGNAL_SYNC_INTERVAL"] = "0"
+os.environ["ALLOWED_TOKEN"] = ""
+os.environ["ADMIN_TOKEN"] = ""
+
+
+@pytest.fixture(scope="module")
+def main():
+    # main.py e infra/observability/prometheus_metrics.py registram os mesmos nomes no registry
+    # padrão (em produção nunca no mesmo processo): main usa um registry limpo e o original volta no fim
+    before = list(REGISTRY._collector_to_names)
+    for collector in before:
+        REGISTRY.unregister(collector)
+    try:
+        yield importlib.import_module("main")
+    finally:
+        for collector in list(REGISTRY._collector_to_names):
+            REGISTRY.unregister(collector)
+        for collector in before:
+            REGISTRY.register(collector)
+
+
+class Result:
+    def __init__(self, rowcount):
+        self.rowcount = rowcount
+
+
+class FakeConn:
+    """INSERT em ticks devolve rowcount 1 na primeira vez de cada (symbol, ts_ms) e 0 depois (ON CONFLICT)."""
+
+    def __init__(self):
+        self.keys = set()
+
+    async def execute(self, stmt, params=None):
+        if "INSERT INTO ticks" in str(stmt):
+            key = (params['symbol'], params['ts_ms'])
+            new = key not in self.keys
+            self.keys.add(key)
+            return Result(1 if new else 0)
+        return Result(1)
+
+
+class FakeEngine:
+    def __init__(self):
+        self.conn = FakeConn()
+
+    @asynccontextmanager
+    async def begin(self):
+        yield self.conn
+
+
+def test_row_mode_records_activity_after_commit(main, monkeypatch):
+    monkeypatch.setattr(main, "INGEST_WRITE_MODE", "row")
+    monkeypatch.setattr(main, "engine", FakeEngine())
+    main.activity.drain()
+    rows, _ = main.validate_batch([{"symbol": "EURUSD", "timeframe": "M1", "ts": t} for t in (1, 2, 1)])
+    flags = asyncio.run(main.write_ingest(None, rows, "127.0.0.1", "test", None))
+    assert flags == [False, False, True]
+    counts = main.activity.drain()
+    assert [c for key, c in counts.items() if key[:3] == ('/ingest', 'EURUSD', 'M1')] == [[3, 1]]
+
+
+@pytest.fixture
+def client(main):
+    # sem o context manager o lifespan não roda: nada conecta ao banco, só a validação é exercitada
+    return TestClient(main.app, raise_server_exceptions=False)
+
+
+def test_ingest_invalid_json_is_400(client):
+    for path in ("/ingest", "/ingest/tick"):
+        r = client.post(path, content=b"{not json", headers={"content-type": "application/json"})
+        assert r.status_code == 400
+        assert r.json()["detail"] == "invalid json"
+
+
+def test_ingest_tick_invalid_legacy_item_is_422(client):
+    assert client.post("/ingest/tick", json="tick").status_code == 422
+    r = client.post("/ingest/tick", json={"symbol": "EURUSD", "timeframe": "M1", "ts": 10 ** 20})
+    assert r.status_code == 422
+    assert r.json()["detail"] == "invalid tick"
+
+
+def test_ingest_rate_limited_is_429_with_retry_after(main, client, monkeypatch):
+    # balde de 1 ficha: o primeiro request passa (e falha no JSON), o segundo é barrado antes de ler o corpo
+    monkeypatch.setattr(main, "request_limiter", main.admission.RateLimiter(0.001, 1))
+    assert client.post("/ingest", content=b"{not json").status_code == 400
+    r = client.post("/ingest", content=b"{not json")
+    assert r.status_code == 429
+    assert int(r.headers["retry-after"]) > 0
+
+
+def test_signals_publish_validation(client):
+    r = client.post("/signals", content=b"{not json")
+    assert r.status_code == 400
+    r = client.post("/signals", json={"symbol": "EURUSD"})
+    assert r.status_code == 422
+    assert r.json()["detail"].startswith("invalid signal")
+
+
+@pytest.mark.parametrize("ack, detail", [
+    ({"id": "s1", "status": "LOST"}, "ack requires id and status"),
+    ({"status": "FILLED"}, "ack requires id and status"),
+    ({"id": "s1", "status": "FILLED", "mt5_ticket": "abc"}, "mt5_ticket must be an integer"),
+    ({"id": "s1", "status": "FILLED", "price": "abc"}, "price must be a number"),
+    ({"id": "s1", "status": "FILLED", "price": "nan"}, "price must be a number"),
+])
+def test_signals_ack_validation_is_422(client, ack, detail):
+    r = client.post("/signals/ack", json={"keys": [ack]})
+    assert r.status_code == 422
+    assert r.json()["detail"].startswith(detail)
+
+
+@pytest.mark.parametrize("path, params", [
+    ("/candles", {"symbol": "EURUSD", "tf": "M7"}),
+    ("/candles", {"symbol": "EURUSD", "from": "yesterday"}),
+    ("/ticks", {"symbol": "EURUSD", "format": "xml"}),
+    ("/ticks", {"symbol": "EURUSD", "from": "2025-10-21", "to": "2025-10-20"}),
+    ("/live/stream", {"symbols": "EURUSD", "policy": "keep-all"}),
+])
+def test_read_endpoints_reject_bad_params(client, path, params):
+    assert client.get(path, params=params).status_code == 400
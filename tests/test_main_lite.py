@@ -0,0 +1,131 @@
+"""
+Testes dos endpoints da API lite (main_lite.py) com TestClient e SQLite em diretório temporário
+"""
+import importlib
+import time
+from contextlib import ExitStack
+
+import pytest
+from fastapi.testclient import TestClient
+
+LITE_ENV = ("SQLITE_PARTITION", "SQLITE_PARTITION_DIR", "SQLITE_PARTITION_KEEP", "ANALYTICS_MODE",
+            "ANALYTICS_DIR", "ANALYTICS_REFRESH_SEC")
+
+
+@pytest.fixture
+def start_lite(tmp_path, monkeypatch):
+    # main_lite lê a configuração no import: recarrega o módulo com o ambiente do teste
+    stack = ExitStack()
+
+    def start(**env):
+        monkeypatch.setenv("DB_PATH", str(tmp_path / "ea.db"))
+        monkeypatch.setenv("ALLOWED_TOKEN", "")
+        for name in LITE_ENV:
+            monkeypatch.delenv(name, raising=False)
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        import main_lite
+        main_lite = importlib.reload(main_lite)
+        return stack.enter_context(TestClient(main_lite.app))
+
+    with stack:
+        yield start
+
+
+@pytest.fixture
+def lite(start_lite):
+    return start_lite()
+
+
+BAR = {"symbol": "EURUSD", "timeframe": "M1", "ts": 1760954400000, "open": 1.1, "high": 1.2, "low": 1.0,
+       "close": 1.15, "volume": 10}
+TICK = {"symbol": "EURUSD", "time_msc": 1760954400123, "bid": 1.1, "ask": 1.1002, "volume": 1}
+
+
+def test_health(lite):
+    r = lite.get("/health")
+    assert r.status_code == 200
+    assert r.json()["ok"] is True
+    assert r.json()["total_ticks"] == 0
+
+
+def test_ingest_counts_duplicates(lite):
+    assert lite.post("/ingest", json=BAR).json() == {"inserted": 1, "duplicates": 0, "rejected": 0, "expired": 0,
+                                                     "total": 1}
+    r = lite.post("/ingest", json=[BAR, {**BAR, "ts": "2025-10-20T10:01:00Z"}])
+    assert r.json() == {"inserted": 1, "duplicates": 1, "rejected": 0, "expired": 0, "total": 2}
+    assert lite.get("/health").json()["total_ticks"] == 2
+
+
+def test_ingest_skips_items_that_would_break_the_batch(lite):
+    r = lite.post("/ingest", json=[{**BAR, "timeframe": {"a": 1}}, {**BAR, "ts": 10 ** 20}, BAR])
+    assert r.status_code == 200
+    assert r.json() == {"inserted": 1, "duplicates": 0, "rejected": 2, "expired": 0, "total": 3}
+    assert lite.get("/stats").json()["total_ticks"] == 1
+
+
+def test_ingest_tick_wrapper_and_invalid_ticks(lite):
+    r = lite.post("/ingest/tick", json={"ticks": [TICK, TICK, {**TICK, "bid": "x"}, {"symbol": "EURUSD"}]})
+    assert r.status_code == 200
+    assert r.json() == {"inserted": 1, "duplicates": 1, "errors": 2, "expired": 0, "total": 4}
+    assert lite.post("/ingest/tick", json="tick").status_code == 400
+
+
+def test_stats_exact_matches_counters(lite):
+    lite.post("/ingest", json=[BAR, {**BAR, "symbol": "GBPUSD"}, {**BAR, "symbol": "GBPUSD", "ts": BAR["ts"] + 60000}])
+    lite.post("/ingest/tick", json=TICK)
+    fast = lite.get("/stats").json()
+    exact = lite.get("/stats", params={"exact": 1}).json()
+    assert exact["exact"] is True and fast["exact"] is False
+    for key in ("total_ticks", "total_raw_ticks", "unique_symbols", "top_symbols"):
+        assert fast[key] == exact[key]
+    assert exact["total_ticks"] == 3 and exact["total_raw_ticks"] == 1 and exact["unique_symbols"] == 2
+    assert "partitions" not in exact
+
+
+def test_token_required_when_configured(start_lite):
+    client = start_lite(ALLOWED_TOKEN="secret")
+    assert client.post("/ingest", json=BAR).status_code == 401
+    assert client.post("/ingest/tick", json=TICK, headers={"x-api-key": "wrong"}).status_code == 401
+    assert client.post("/ingest", json=BAR, headers={"x-api-key": "secret"}).json()["inserted"] == 1
+
+
+def test_partitioned_mode_skips_expired_rows(start_lite):
+    client = start_lite(SQLITE_PARTITION="day", SQLITE_PARTITION_KEEP="1")
+    now = int(time.time() * 1000)
+    r = client.post("/ingest", json=[BAR, {**BAR, "ts": now}])
+    assert r.json() == {"inserted": 1, "duplicates": 0, "rejected": 0, "expired": 1, "total": 2}
+    r = client.post("/ingest/tick", json=[TICK, {**TICK, "time_msc": now}])
+    assert r.json()["inserted"] == 1 and r.json()["expired"] == 1
+    stats = client.get("/stats", params={"exact": 1}).json()
+    assert len(stats["partitions"]) == 1
+    assert stats["total_ticks"] == 1 and stats["total_raw_ticks"] == 1
+
+
+def test_analytics_disabled_returns_503(lite):
+    assert lite.get("/analytics/status").status_code == 503
+    assert lite.get("/analytics/spread").status_code == 503
+
+
+def test_analytics_endpoints(start_lite):
+    pytest.importorskip("pyarrow")
+    client = start_lite(ANALYTICS_MODE="1", ANALYTICS_REFRESH_SEC="0")
+    client.post("/ingest", json=[BAR, {**BAR, "ts": BAR["ts"] + 60000, "close": 1.18}])
+    client.post("/ingest/tick", json=[TICK, {**TICK, "time_msc": TICK["time_msc"] + 1000, "bid": 1.2, "ask": 1.2004}])
+    r = client.post("/analytics/refresh")
+    assert r.status_code == 200
+    assert r.json()["written"] == {"ticks": 2, "raw_ticks": 2}
+    assert set(client.get("/analytics/status").json()["tables"]) == {"ticks", "raw_ticks"}
+
+    counts = client.get("/analytics/counts", params={"table": "raw_ticks"}).json()
+    assert counts["total"] == 2 and counts["symbols"][0]["symbol"] == "EURUSD"
+    assert client.get("/analytics/counts", params={"table": "x"}).status_code == 400
+
+    ohlc = client.get("/analytics/ohlc", params={"symbol": "EURUSD", "tf": "M5", "source": "bar"}).json()
+    assert len(ohlc["candles"]) == 1
+    assert ohlc["candles"][0]["close"] == 1.18
+    assert client.get("/analytics/ohlc", params={"symbol": "EURUSD", "source": "x"}).status_code == 400
+    assert client.get("/analytics/ohlc", params={"symbol": " "}).status_code == 400
+
+    spread = client.get("/analytics/spread", params={"symbol": "EURUSD"}).json()
+    assert [s["symbol"] for s in spread["symbols"]] == ["EURUSD"]
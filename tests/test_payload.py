@@ -0,0 +1,69 @@
+"""
+Testes de payload.py: decoder plugável, parse de ts e validação do batch
+"""
+import json
+
+import dateutil.parser
+import pytest
+
+import payload
+
+
+def test_decoders_agree():
+    body = json.dumps({"items": [{"symbol": "EURUSD", "ts": 1, "open": 1.1}]}).encode()
+    results = [loads(body) for loads, _ in payload.DECODERS.values()]
+    assert all(r == results[0] for r in results)
+    assert payload.get_codec('json') is payload.DECODERS['json']
+
+
+def test_unknown_decoder():
+    with pytest.raises(ValueError):
+        payload.get_codec('msgpack')
+
+
+@pytest.mark.parametrize("ts", [
+    "2025-10-20T10:00:00Z",
+    "2025-10-20T10:00:00+03:00",
+    "2025-10-20T10:00:00.123Z",
+    "2025-10-20T10:00:00",
+    "20251020T100000Z",
+])
+def test_fast_iso_matches_dateutil(ts):
+    assert payload.parse_ts_ms(ts) == int(dateutil.parser.isoparse(ts).timestamp() * 1000)
+
+
+def test_parse_ts_numeric_and_invalid():
+    assert payload.parse_ts_ms(1760954400000) == 1760954400000
+    assert payload.parse_ts_ms(1760954400000.0) == 1760954400000
+    assert payload.parse_ts_ms("1760954400000") == 1760954400000
+    for bad in (True, None, "not-a-date", {}):
+        with pytest.raises(ValueError):
+            payload.parse_ts_ms(bad)
+
+
+def test_validate_batch_one_pass():
+    rows, rejected = payload.validate_batch([
+        {"symbol": "EURUSD", "ts": "2025-10-20T10:00:00Z", "close": "1.1", "meta": {"a": 1}},
+        {"symbol": 123, "ts": 1},
+        {"symbol": "EURUSD", "ts": 2, "open": "abc"},
+        "not-a-dict",
+        {"symbol": "GBPUSD", "ts": 3},
+    ])
+    assert rejected == 3
+    assert [r['symbol'] for r in rows] == ["EURUSD", "GBPUSD"]
+    assert rows[0]['close'] == 1.1
+    assert json.loads(rows[0]['meta']) == {"a": 1}
+    assert rows[1]['meta'] == '{}'
+
+
+def test_validate_batch_rejects_items_that_would_break_the_insert():
+    # timeframe/kind não texto e ts fora de bigint/timestamptz derrubariam o unnest do batch inteiro
+    rows, rejected = payload.validate_batch([
+        {"symbol": "EURUSD", "ts": 1, "timeframe": {"a": 1}},
+        {"symbol": "EURUSD", "ts": 2, "kind": 7},
+        {"symbol": "EURUSD", "ts": 10 ** 20},
+        {"symbol": "EURUSD", "ts": payload.MAX_TS_MS},
+        {"symbol": "EURUSD", "ts": 4, "timeframe": "M1", "kind": "bar"},
+    ])
+    assert rejected == 4
+    assert [(r['ts_ms'], r['timeframe'], r['kind']) for r in rows] == [(4, "M1", "bar")]
@@ -0,0 +1,152 @@
+"""
+Testes das filas de escrita por símbolo do /ingest (shard_writer.py)
+"""
+import asyncio
+
+import pytest
+
+import shard_writer as sw
+from ingest_store import duplicate_flags
+
+
+def cols(*keys):
+    return {'symbol': [k[0] for k in keys], 'ts_ms': [k[1] for k in keys]}
+
+
+def symbols_in_distinct_shards(shards=2):
+    seen = {}
+    for s in ('EURUSD', 'GBPUSD', 'USDJPY', 'XAUUSD', 'AUDUSD', 'USDCAD'):
+        seen.setdefault(sw.shard_of(s, shards), s)
+    return [seen[i] for i in range(shards)]
+
+
+class FakeStore:
+    def __init__(self, existing=(), fail=False, delay=0.0):
+        self.existing = set(existing)
+        self.writes = []     # (conn, [symbols...]) por transação
+        self.fail = fail
+        self.delay = delay
+
+    async def write(self, conn, batch):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.writes.append((conn, [s for c, _ in batch for s in c['symbol']]))
+        if self.fail:
+            raise RuntimeError("db down")
+        out = []
+        for c, _ in batch:
+            keys = list(zip(c['symbol'], c['ts_ms']))
+            new = [k for k in keys if k not in self.existing]
+            self.existing.update(new)
+            out.append(duplicate_flags(keys, new))
+        return out
+
+
+def test_shard_of_is_stable_and_split_keeps_order():
+    assert sw.shard_of('EURUSD', 8) == sw.shard_of('EURUSD', 8)
+    a, b = symbols_in_distinct_shards()
+    parts = sw.split_columns(cols((a, 1), (b, 1), (a, 2)), 2)
+    assert parts[sw.shard_of(a, 2)] == [0, 2]
+    assert parts[sw.shard_of(b, 2)] == [1]
+
+
+def test_submit_merges_flags_back_in_request_order():
+    a, b = symbols_in_distinct_shards()
+    store = FakeStore(existing={(b, 1)})
+
+    async def scenario():
+        w = sw.ShardedWriter(store.write, shards=2)
+        await w.start()
+        flags = await w.submit(cols((a, 1), (b, 1), (a, 1), (b, 2)))
+        await w.stop()
+        return flags
+
+    assert asyncio.run(scenario()) == [False, True, True, False]
+    assert sorted(len(s) for _, s in store.writes) == [2, 2]
+
+
+def test_same_symbol_batches_keep_arrival_order():
+    a, _ = symbols_in_distinct_shards()
+    store = FakeStore(delay=0.01)
+
+    async def scenario():
+        w = sw.ShardedWriter(store.write, shards=2, max_rows=100)
+        await w.start()
+        first = asyncio.create_task(w.submit(cols((a, 1))))
+        await asyncio.sleep(0)  # primeiro flush em andamento
+        rest = [asyncio.create_task(w.submit(cols((a, ts)))) for ts in (2, 3)]
+        await asyncio.gather(first, *rest)
+        await w.stop()
+
+    asyncio.run(scenario())
+    # a 2ª e a 3ª request acumularam durante o 1º flush e saem juntas, na ordem
+    assert [s for _, s in store.writes] == [[a], [a, a]]
+
+
+def test_full_queue_refuses_whole_request():
+    a, b = symbols_in_distinct_shards()
+    store = FakeStore(delay=0.05)
+
+    async def scenario():
+        w = sw.ShardedWriter(store.write, shards=2, max_pending_rows=2)
+        await w.start()
+        busy = asyncio.create_task(w.submit(cols((a, 1))))
+        await asyncio.sleep(0.01)
+        queued = asyncio.create_task(w.submit(cols((a, 2), (a, 3))))
+        await asyncio.sleep(0)
+        with pytest.raises(sw.ShardsFull) as err:
+            await w.submit(cols((b, 1), (a, 4)))
+        pending_b = w.shard_rows(sw.shard_of(b, 2))
+        await asyncio.gather(busy, queued)
+        await w.stop()
+        return err.value, pending_b
+
+    err, pending_b = asyncio.run(scenario())
+    assert err.shard == sw.shard_of(a, 2) and err.retry_after >= 1
+    assert pending_b == 0  # parte do outro shard não foi enfileirada
+
+
+def test_flush_failure_reaches_caller_and_connection_is_reopened():
+    opened = []
+
+    class Conn:
+        def begin(self):
+            return Tx()
+
+    class Tx:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+    class Connect:
+        async def __aenter__(self):
+            opened.append(1)
+            return Conn()
+
+        async def __aexit__(self, *exc):
+            return False
+
+    store = FakeStore(fail=True)
+
+    async def scenario():
+        w = sw.ShardedWriter(store.write, shards=1, connect=Connect)
+        await w.start()
+        with pytest.raises(RuntimeError):
+            await w.submit(cols(('EURUSD', 1)))
+        store.fail = False
+        flags = await w.submit(cols(('EURUSD', 1)))
+        await w.stop()
+        return flags
+
+    assert asyncio.run(scenario()) == [False]
+    assert len(opened) == 2
+
+
+def test_submit_requires_running_writer():
+    async def scenario():
+        await sw.ShardedWriter(FakeStore().write).submit(cols(('EURUSD', 1)))
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(scenario())
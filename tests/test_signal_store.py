@@ -0,0 +1,164 @@
+"""
+Testes do store/cache de sinais (signal_store.py)
+"""
+import asyncio
+
+import pytest
+
+import signal_store as ss
+
+
+def make(symbol='EURUSD', side='BUY', now_ms=1_000_000, **kw):
+    return ss.normalize_signal({'symbol': symbol, 'side': side, **kw}, now_ms=now_ms)
+
+
+class Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def mappings(self):
+        return self.rows
+
+
+class FakeConn:
+    def __init__(self, signals=(), acks=()):
+        self.signals, self.acks = list(signals), list(acks)
+        self.calls = []
+
+    async def execute(self, stmt, params=None):
+        self.calls.append((stmt, params))
+        if stmt is ss.SIGNALS_SINCE:
+            return Result(self.signals)
+        if stmt is ss.ACKS_SINCE:
+            return Result(self.acks)
+        if stmt is ss.SIGNAL_ACK_UPSERT:
+            return Result([(sid,) for sid in params['signal_id'] if sid.startswith('known')])
+        return Result([(sid,) for sid in params['id']])
+
+
+def test_normalize_signal_defaults_and_validation():
+    s = make(side='sell', ttl_sec=30, sl_pips='12', account_id=123)
+    assert (s['side'], s['timeframe'], s['sl_pips'], s['account_id']) == ('SELL', 'M1', 12, '123')
+    assert s['expires_at'] - s['created_at'] == 30_000
+    assert len(s['id']) == 32
+    for bad in ({'symbol': 'EURUSD', 'side': 'HOLD'}, {'symbol': 'EU', 'side': 'BUY'},
+                {'symbol': 'EURUSD', 'side': 'BUY', 'ttl_sec': ss.MAX_TTL_SEC + 1}):
+        with pytest.raises(ValueError):
+            ss.normalize_signal(bad)
+
+
+def test_to_public_matches_executer_contract():
+    s = make(ttl_sec=60, tp_pips=18, confidence=0.7)
+    out = ss.to_public(s, now_ms=s['created_at'] + 15_500)
+    assert out['ttl_sec'] == 44
+    assert {'id', 'symbol', 'side', 'ttl_sec', 'sl_pips', 'tp_pips', 'confidence'} <= set(out)
+
+
+def test_parse_exec_ts():
+    assert ss.parse_exec_ts('2025.10.20 12:00:00') == 1760961600000
+    assert ss.parse_exec_ts('2025-10-20T12:00:00Z') == 1760961600000
+    assert ss.parse_exec_ts('ontem') is None
+    assert ss.parse_exec_ts(None) is None
+
+
+def test_cache_put_replaces_only_newer():
+    cache = ss.SignalCache()
+    old, new = make(now_ms=1_000), make(now_ms=2_000)
+    assert cache.put(new)
+    assert not cache.put(old)
+    assert not cache.put(new)
+    assert cache.latest('EURUSD') is new
+    assert cache.version == 1
+
+
+def test_pending_filters_expired_account_and_acked():
+    cache = ss.SignalCache()
+    now = 1_000_000
+    cache.put(make('EURUSD', now_ms=now))
+    cache.put(make('GBPUSD', now_ms=now, account_id='7'))
+    cache.put(make('USDJPY', now_ms=now - 120_000))  # expirado (ttl 60s)
+    ids = lambda acc: [s['symbol'] for s in cache.pending(acc, ['EURUSD', 'GBPUSD', 'USDJPY'], 'M1', now + 1)]
+    assert ids('7') == ['EURUSD', 'GBPUSD']
+    assert ids('8') == ['EURUSD']
+    assert cache.ack(cache.latest('GBPUSD')['id'], '7', 'FILLED')
+    assert ids('7') == ['EURUSD']
+    # ack sem conta (Executer EA) vale para todas
+    assert cache.ack(cache.latest('EURUSD')['id'], None, 'REJECTED')
+    assert ids('8') == []
+    assert not cache.ack('nao-existe', None, 'FILLED')
+
+
+def test_wait_pending_wakes_on_put():
+    async def run():
+        cache = ss.SignalCache()
+        waiter = asyncio.create_task(cache.wait_pending(None, ['EURUSD'], 'M1', timeout=5))
+        await asyncio.sleep(0.01)
+        assert cache.waiters == 1
+        cache.put(make('GBPUSD', now_ms=ss._now_ms()))  # outro símbolo: continua esperando
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        s = make('EURUSD', now_ms=ss._now_ms())
+        cache.put(s)
+        return await asyncio.wait_for(waiter, 1), s, cache
+
+    found, s, cache = asyncio.run(run())
+    assert found == [s]
+    assert cache.waiters == 0
+
+
+def test_wait_pending_times_out_empty():
+    async def run():
+        return await ss.SignalCache().wait_pending(None, ['EURUSD'], 'M1', timeout=0.02)
+
+    assert asyncio.run(run()) == []
+
+
+def test_insert_acks_and_sync_cache():
+    s = make(now_ms=5_000)
+    conn = FakeConn(signals=[s], acks=[{'signal_id': s['id'], 'account_id': '', 'status': 'FILLED',
+                                        'acked_at': 9_000}])
+    cache = ss.SignalCache()
+    assert asyncio.run(ss.sync_cache(conn, cache, 4_000)) == 9_000
+    assert cache.latest('EURUSD')['id'] == s['id']
+    assert cache.acks(s['id']) == {'': 'FILLED'}
+    assert conn.calls[0][1] == {'since_ms': 4_000 - ss.SYNC_OVERLAP_MS}
+
+    known = asyncio.run(ss.insert_acks(conn, [
+        {'signal_id': 'known-1', 'status': 'FILLED', 'mt5_ticket': 1, 'price': 1.1, 'ts_exec': None},
+        {'signal_id': 'other', 'account_id': '7', 'status': 'REJECTED'}]))
+    assert known == ['known-1']
+    assert conn.calls[-1][1]['account_id'] == ['', '7']
+
+
+def test_dedupe_acks_keeps_last_per_signal_and_account():
+    acks = ss.dedupe_acks([
+        {'signal_id': 'a', 'account_id': None, 'status': 'ACKED'},
+        {'signal_id': 'a', 'account_id': '7', 'status': 'ACKED'},
+        {'signal_id': 'a', 'account_id': '', 'status': 'FILLED'},
+        {'signal_id': 'b', 'account_id': '7', 'status': 'REJECTED'},
+    ])
+    assert [(a['signal_id'], a['account_id'], a['status']) for a in acks] == [
+        ('a', '7', 'ACKED'), ('a', '', 'FILLED'), ('b', '7', 'REJECTED')]
+
+
+def test_parse_ticket():
+    assert ss.parse_ticket('123') == 123
+    assert ss.parse_ticket(5.0) == 5
+    assert ss.parse_ticket(None) is None
+    assert ss.parse_ticket(-1) is None
+    assert ss.parse_ticket(1 << 63) is None
+    for bad in ('abc', 1.5, True, [1]):
+        with pytest.raises((TypeError, ValueError)):
+            ss.parse_ticket(bad)
+
+
+def test_parse_price():
+    assert ss.parse_price('1.0950') == 1.095
+    assert ss.parse_price(2) == 2.0
+    assert ss.parse_price(None) is None and ss.parse_price('') is None
+    for bad in ('abc', 'nan', float('inf'), True, {'v': 1}):
+        with pytest.raises((TypeError, ValueError)):
+            ss.parse_price(bad)
@@ -0,0 +1,86 @@
+"""
+Testes das políticas de armazenamento (storage_policy.py)
+"""
+import asyncio
+
+import pytest
+
+import storage_policy as sp
+
+
+class Result:
+    def __init__(self, value=None):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class FakeConn:
+    def __init__(self, compression_enabled=False):
+        self.compression_enabled = compression_enabled
+        self.sql = []
+
+    async def execute(self, stmt, params=None):
+        self.sql.append((str(stmt), params))
+        if stmt is sp._COMPRESSION_ENABLED:
+            return Result(self.compression_enabled)
+        return Result()
+
+
+def test_load_policies_defaults_and_overrides():
+    policies = sp.load_policies({})
+    assert policies['ingest_log'].retention == '30 days'
+    assert policies['ticks'].retention is None
+    policies = sp.load_policies({'STORAGE_TICKS_RETENTION': '2 years', 'STORAGE_INGEST_LOG_RETENTION': 'off',
+                                 'STORAGE_FORWARD_AUDIT_CHUNK_INTERVAL': '1 day'})
+    assert policies['ticks'].retention == '2 years'
+    assert policies['ingest_log'].retention is None
+    # forward_audit não é hypertable: chunk/compressão não se aplicam
+    assert policies['forward_audit'].chunk_interval is None
+
+
+def test_load_policies_rejects_invalid_interval():
+    with pytest.raises(ValueError):
+        sp.load_policies({'STORAGE_TICKS_COMPRESS_AFTER': "1 day'; DROP TABLE ticks; --"})
+
+
+def test_apply_policy_enables_compression_once():
+    p = sp.load_policies({})['raw_ticks']
+    conn = FakeConn(compression_enabled=False)
+    actions = asyncio.run(sp.apply_policy(conn, p))
+    assert actions == ['chunk_interval 1 day', 'compression enabled (segmentby symbol)', 'compress_after 3 days']
+    alter = [q for q, _ in conn.sql if q.startswith('ALTER TABLE')]
+    assert alter == ["ALTER TABLE raw_ticks SET (timescaledb.compress, timescaledb.compress_segmentby = 'symbol', "
+                     "timescaledb.compress_orderby = 'ts DESC')"]
+
+    conn = FakeConn(compression_enabled=True)
+    asyncio.run(sp.apply_policy(conn, p))
+    assert not [q for q, _ in conn.sql if q.startswith('ALTER TABLE')]
+
+
+def test_apply_policy_retention_and_plain_table():
+    policies = sp.load_policies({})
+    conn = FakeConn(compression_enabled=True)
+    actions = asyncio.run(sp.apply_policy(conn, policies['ingest_log']))
+    assert actions[-1] == 'retention 30 days'
+    assert conn.sql[-1][1] == {'table': 'ingest_log', 'interval': '30 days'}
+
+    conn = FakeConn()
+    assert asyncio.run(sp.apply_policy(conn, policies['forward_audit'])) == ['retention job 30 days']
+    assert [params for _, params in conn.sql] == [None, {'interval': '30 days'}]
+
+
+def test_apply_policy_skips_missing_hypertable():
+    conn = FakeConn(compression_enabled=None)
+    assert asyncio.run(sp.apply_policy(conn, sp.load_policies({})['ticks'])) == [
+        'skipped: ticks is not a hypertable']
+
+
+def test_summarize_ratio():
+    row = {'table_name': 'ticks', 'total_bytes': 3 * 1024 * 1024, 'chunks': 10, 'compression_enabled': True,
+           'compressed_chunks': 7, 'before_bytes': 1000, 'after_bytes': 100}
+    assert sp.summarize(row) == {'table': 'ticks', 'size_mb': 3.0, 'chunks': 10, 'compression_enabled': True,
+                                 'compressed_chunks': 7, 'compression_ratio': 10.0}
+    row.update(before_bytes=None, after_bytes=None, compressed_chunks=None)
+    assert sp.summarize(row)['compression_ratio'] is None
@@ -0,0 +1,103 @@
+"""
+Testes da leitura histórica em streaming (tick_reader.py)
+"""
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import tick_reader as tr
+
+
+class StreamResult:
+    def __init__(self, rows):
+        self.rows = rows
+        self.sizes = []
+
+    async def partitions(self, size):
+        self.sizes.append(size)
+        for i in range(0, len(self.rows), size):
+            yield self.rows[i:i + size]
+
+
+class FakeConn:
+    def __init__(self, rows):
+        self.result = StreamResult(rows)
+        self.calls = []
+
+    async def stream(self, stmt, params):
+        self.calls.append((stmt, params))
+        return self.result
+
+
+ROWS = [("EURUSD", 1000 + i, 1.1 + i / 1e4, 1.1002 + i / 1e4, None, 0, 6) for i in range(5)]
+
+
+def collect(conn, fmt, columns=tr.RAW_COLUMNS, partition_rows=2):
+    async def run():
+        return [c async for c in tr.stream_rows(conn, tr.RAW_QUERY, {}, columns, fmt, partition_rows)]
+    return asyncio.run(run())
+
+
+def test_build_query_raw_and_bar():
+    stmt, params, cols = tr.build_query("GBPUSD, EURUSD", "2025-10-20T00:00:00Z", None, None, None, 100)
+    assert stmt is tr.RAW_QUERY and cols == tr.RAW_COLUMNS
+    assert params['symbols'] == ["EURUSD", "GBPUSD"]
+    assert params['from_ms'] == 1760918400000 and params['limit'] == 100
+    stmt, params, cols = tr.build_query("EURUSD", None, None, "m1", "EURUSD:1760918400000", 10)
+    assert stmt is tr.BAR_QUERY and params['tf'] == "M1"
+    assert (params['after_symbol'], params['after_ts']) == ("EURUSD", 1760918400000)
+    assert "ORDER BY symbol, ts_ms" in str(stmt)
+    # sem to: limite dentro da faixa de timestamptz (to_timestamp não estoura)
+    assert params['to_ms'] == tr.MAX_TS_MS
+
+
+def test_query_filters_hypertable_time_column():
+    # ts em raw_ticks/ticks é a dimensão da hypertable: o filtro nela permite excluir chunks
+    for stmt in (tr.RAW_QUERY, tr.BAR_QUERY):
+        sql = str(stmt)
+        assert "ts >= to_timestamp(CAST(:from_ms AS bigint) / 1000.0)" in sql
+        assert "ts < to_timestamp(CAST(:to_ms AS bigint) / 1000.0)" in sql
+    _, params, _ = tr.build_query("EURUSD", "0", str(1 << 62), None, None, 10)
+    assert params['to_ms'] == tr.MAX_TS_MS
+
+
+@pytest.mark.parametrize("args", [
+    ("", None, None, None, None),
+    ("EURUSD", "2000", "1000", None, None),
+    ("EURUSD", None, None, None, "1760918400000"),
+    ("EURUSD", None, None, None, "EURUSD:abc"),
+])
+def test_build_query_rejects_bad_params(args):
+    with pytest.raises(HTTPException):
+        tr.build_query(*args, limit=10)
+
+
+def test_check_format():
+    assert tr.check_format(None) == 'ndjson'
+    with pytest.raises(HTTPException):
+        tr.check_format('xml')
+
+
+def test_stream_ndjson_in_partitions():
+    conn = FakeConn(ROWS)
+    chunks = collect(conn, 'ndjson')
+    assert len(chunks) == 3 and conn.result.sizes == [2]
+    lines = b''.join(chunks).decode().splitlines()
+    assert [json.loads(line)['time_msc'] for line in lines] == [1000, 1001, 1002, 1003, 1004]
+    assert json.loads(lines[0])['last'] is None
+
+
+def test_stream_csv_header_once():
+    text = b''.join(collect(FakeConn(ROWS), 'csv')).decode().splitlines()
+    assert text[0] == ','.join(tr.RAW_COLUMNS)
+    assert len(text) == 6 and text[1].startswith("EURUSD,1000,")
+
+
+def test_stream_arrow():
+    pa = pytest.importorskip("pyarrow")
+    data = b''.join(collect(FakeConn(ROWS), 'arrow'))
+    table = pa.ipc.open_stream(data).read_all()
+    assert table.num_rows == 5
+    assert table.column('time_msc').to_pylist() == [1000, 1001, 1002, 1003, 1004]
@@ -0,0 +1,110 @@
+"""
+Testes do caminho de ticks brutos (tick_store.py)
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import tick_store
+
+TICK = {
+    "ts": "2025-10-20T14:23:45", "symbol": "EURUSD", "bid": 1.095, "ask": 1.0952, "last": 0,
+    "volume": 100, "flags": 6, "ts_msc": 1760970225123, "digits": 5, "point": 0.00001,
+    "spread": 2, "meta": {"source": "DataCollectorPRO", "ea_version": "1.65"},
+}
+
+
+def test_extract_ticks_shapes():
+    assert tick_store.extract_ticks({"ticks": [TICK, TICK]}) == [TICK, TICK]
+    assert tick_store.extract_ticks([TICK]) == [TICK]
+    assert tick_store.extract_ticks(TICK) == [TICK]
+    with pytest.raises(HTTPException):
+        tick_store.extract_ticks("x")
+
+
+def test_is_raw_tick():
+    assert tick_store.is_raw_tick({"ticks": []})
+    assert tick_store.is_raw_tick(TICK)
+    assert tick_store.is_raw_tick([TICK])
+    assert not tick_store.is_raw_tick({"symbol": "EURUSD", "ts": 1, "close": 1.1})
+
+
+def test_normalize_ticks_columns():
+    cols, rejected = tick_store.normalize_ticks([TICK])
+    assert rejected == 0
+    assert set(cols) == set(tick_store.RAW_TICK_FIELDS)
+    # ts_msc tem precedência sobre o ts ISO (segundos)
+    assert cols['time_msc'] == [1760970225123]
+    assert cols['bid'] == [1.095] and cols['ask'] == [1.0952]
+    assert cols['volume'] == [100] and cols['flags'] == [6]
+    assert cols['source'] == ["DataCollectorPRO"] and cols['ea_version'] == ["1.65"]
+
+
+def test_normalize_ticks_openapi_shape_and_defaults():
+    cols, rejected = tick_store.normalize_ticks([
+        {"symbol": "GBPUSD", "time": "2025-10-20T14:23:45.123Z", "time_msc": 1729433025123,
+         "bid": "1.2650", "ask": 1.2653, "source": "E2E_TEST"},
+        {"symbol": "USDJPY", "time": "2025-10-20T14:23:45Z", "bid": 150.1, "ask": 150.12},
+    ])
+    assert rejected == 0
+    assert cols['time_msc'] == [1729433025123, 1760970225000]
+    assert cols['bid'] == [1.265, 150.1]
+    assert cols['last'] == [None, None]
+    assert cols['volume'] == [0, 0] and cols['flags'] == [0, 0]
+    assert cols['source'] == ["E2E_TEST", tick_store.DEFAULT_SOURCE]
+    assert cols['ea_version'] == [None, None]
+
+
+def test_normalize_ticks_rejects_invalid():
+    cols, rejected = tick_store.normalize_ticks([
+        {"symbol": "EURUSD", "ts_msc": 1, "ask": 1.1},          # sem bid
+        {"symbol": "", "ts_msc": 1, "bid": 1.1, "ask": 1.1},     # sem symbol
+        {"symbol": "EURUSD", "ts": "ontem", "bid": 1.1, "ask": 1.1},
+        {"symbol": "EURUSD", "ts_msc": 10 ** 20, "bid": 1.1, "ask": 1.1},  # fora de timestamptz
+        "not-a-dict",
+        TICK,
+    ])
+    assert rejected == 5
+    assert cols['symbol'] == ["EURUSD"]
+
+
+def test_from_columnar():
+    cols = {
+        'symbol': ["EURUSD", "GBPUSD", "EURUSD"], 'ts_ms': [1, 2, 3],
+        'bid': [1.1, None, 1.2], 'ask': [1.2, 1.3, 1.3], 'flags': [6, 6, 2], 'source': ["relay"] * 3,
+    }
+    out, rejected = tick_store.from_columnar(cols)
+    assert rejected == 1
+    assert out['symbol'] == ["EURUSD", "EURUSD"]
+    assert out['time_msc'] == [1, 3]
+    assert out['last'] == [None, None] and out['volume'] == [0, 0]
+    assert out['flags'] == [6, 2] and out['source'] == ["relay", "relay"]
+
+
+def test_from_columnar_rejects_non_numeric_volume_and_flags():
+    cols = {
+        'symbol': ["EURUSD", "GBPUSD", "USDJPY", "EURUSD"], 'ts_ms': [1, 2, 3, 4],
+        'bid': [1.1, 1.2, 1.3, 1.4], 'ask': [1.2, 1.3, 1.4, 1.5],
+        'volume': [5, "abc", 7, "8"], 'flags': [6, 6, [1], 2],
+    }
+    out, rejected = tick_store.from_columnar(cols)
+    assert rejected == 2
+    assert out['symbol'] == ["EURUSD", "EURUSD"]
+    assert out['volume'] == [5, 8] and out['flags'] == [6, 2]
+    assert all(len(v) == 2 for v in out.values())
+
+
+def test_insert_raw_ticks_single_statement():
+    calls = []
+
+    class Conn:
+        async def execute(self, stmt, params):
+            calls.append((stmt, params))
+            return [("EURUSD", 1760970225123)]
+
+    cols, _ = tick_store.normalize_ticks([TICK, TICK])
+    new_keys = asyncio.run(tick_store.insert_raw_ticks(Conn(), cols))
+    assert new_keys == [("EURUSD", 1760970225123)]
+    assert len(calls) == 1
+    assert "raw_ticks" in str(calls[0][0]) and calls[0][1] is cols
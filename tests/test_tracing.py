@@ -0,0 +1,81 @@
+"""
+Testes de tracing.py: níveis de span e tail-sampling
+"""
+import pytest
+from opentelemetry import trace
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from tracing import TracingOptions, TailSamplingProcessor, build_provider, optional_span
+
+
+def test_levels_enable_span_groups():
+    off = TracingOptions({'TRACE_LEVEL': 'off', 'TRACE_ITEM_SPANS': 'true'})
+    assert not off.enabled and not off.item_spans
+    req = TracingOptions({'TRACE_LEVEL': 'request'})
+    assert req.enabled and not req.stage_spans and not req.db_statements
+    full = TracingOptions({})
+    assert full.stage_spans and full.item_spans and full.db_statements and full.http_client
+
+
+def test_env_overrides_level_defaults():
+    opts = TracingOptions({'TRACE_LEVEL': 'full', 'TRACE_ITEM_SPANS': 'false', 'TRACE_DB_STATEMENTS': '0'})
+    assert opts.stage_spans and not opts.item_spans and not opts.db_statements
+
+
+def test_invalid_level():
+    with pytest.raises(ValueError):
+        TracingOptions({'TRACE_LEVEL': 'verbose'})
+
+
+def _tail_provider(slow_ms=1000.0, ratio=0.0):
+    exporter = InMemorySpanExporter()
+    opts = TracingOptions({'TRACE_TAIL_SAMPLING': 'true', 'TRACE_SAMPLE_RATIO': str(ratio),
+                           'TRACE_TAIL_SLOW_MS': str(slow_ms)})
+    provider = build_provider(None, SimpleSpanProcessor(exporter), opts)
+    return provider.get_tracer("test"), exporter, provider
+
+
+def test_tail_drops_fast_ok_traces():
+    tracer, exporter, _ = _tail_provider()
+    with tracer.start_as_current_span("POST /ingest"):
+        with optional_span(tracer, True, "database_insert"):
+            pass
+    assert exporter.get_finished_spans() == ()
+
+
+def test_tail_keeps_whole_trace_on_error():
+    tracer, exporter, _ = _tail_provider()
+    with tracer.start_as_current_span("POST /ingest"):
+        with tracer.start_as_current_span("validate_auth") as span:
+            span.set_attribute("error", True)
+        with tracer.start_as_current_span("database_insert"):
+            pass
+    assert {s.name for s in exporter.get_finished_spans()} == {"POST /ingest", "validate_auth", "database_insert"}
+
+
+def test_tail_keeps_slow_traces():
+    tracer, exporter, _ = _tail_provider(slow_ms=0.0)
+    with tracer.start_as_current_span("POST /ingest"):
+        pass
+    assert len(exporter.get_finished_spans()) == 1
+
+
+def test_tail_ratio_baseline_and_late_spans():
+    tracer, exporter, provider = _tail_provider(ratio=1.0)
+    root = tracer.start_span("POST /ingest")
+    ctx = trace.set_span_in_context(root)
+    late = tracer.start_span("forward_batch", context=ctx)
+    root.end()
+    late.end()  # termina depois do raiz: segue a decisão já tomada
+    assert [s.name for s in exporter.get_finished_spans()] == ["POST /ingest", "forward_batch"]
+    tail = next(p for p in provider._active_span_processor._span_processors if isinstance(p, TailSamplingProcessor))
+    assert tail.stats['kept'] == 1
+
+
+def test_optional_span_disabled_is_noop():
+    tracer, exporter, _ = _tail_provider(slow_ms=0.0)
+    with tracer.start_as_current_span("POST /ingest"):
+        with optional_span(tracer, False, "parse_json") as s:
+            s.set_attribute("body.size_bytes", 10)
+    assert [s.name for s in exporter.get_finished_spans()] == ["POST /ingest"]
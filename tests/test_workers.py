@@ -0,0 +1,89 @@
+"""
+Testes do modo multi-processo (workers.py)
+"""
+import asyncio
+import signal
+
+import workers as w
+import live_feed as lf
+import signal_store as ss
+
+
+class FakeGauge:
+    def __init__(self):
+        self.value = None
+        self.fn = None
+
+    def set(self, v):
+        self.value = v
+
+    def set_function(self, fn):
+        self.fn = fn
+
+
+def test_pool_budget_splits_between_workers():
+    assert w.pool_budget(0, 4, 20, 30) == (20, 30)          # sem orçamento: valores configurados
+    assert w.pool_budget(40, 4, 20, 30) == (10, 0)
+    assert w.pool_budget(100, 4, 5, 30) == (5, 20)
+    assert w.pool_budget(3, 8, 20, 30) == (1, 0)             # pelo menos 1 conexão por worker
+
+
+def test_worker_count_and_multiprocess_dir():
+    assert w.worker_count({}) == 1
+    assert w.worker_count({'WEB_CONCURRENCY': '4'}) == 4
+    assert w.worker_count({'WEB_CONCURRENCY': 'x'}) == 1
+    assert w.multiprocess_dir({'PROMETHEUS_MULTIPROC_DIR': '/tmp/m'}) == '/tmp/m'
+    assert w.multiprocess_dir({}) is None
+
+
+def test_gauge_sampler_modes():
+    single, multi = FakeGauge(), FakeGauge()
+    w.GaugeSampler(False).bind(single, lambda: 3)
+    assert single.fn() == 3 and single.value is None
+
+    sampler = w.GaugeSampler(True)
+    calls = []
+    sampler.bind(multi, lambda: 7)
+    sampler.bind(FakeGauge(), lambda: 1 / 0)  # falha de uma gauge não para as outras
+    sampler.add_hook(lambda: calls.append(1))
+    sampler.sample()
+    assert multi.value == 7 and multi.fn is None
+    assert calls == [1]
+
+
+def test_leader_lock_single_holder(tmp_path):
+    path = str(tmp_path / 'leader.lock')
+    a, b = w.LeaderLock(path), w.LeaderLock(path)
+    assert a.acquire()
+    assert not b.acquire()
+    assert a.acquire() and a.is_leader and not b.is_leader
+    a.release()
+    assert b.acquire()
+    b.release()
+    assert w.LeaderLock(None).acquire()
+
+
+def test_drain_handler_chains_previous():
+    calls = []
+    previous = signal.signal(signal.SIGUSR1, lambda signum, frame: calls.append('server'))
+    try:
+        assert w.install_drain_handler(lambda: calls.append('drain'), signals=(signal.SIGUSR1,))
+        signal.raise_signal(signal.SIGUSR1)
+        assert calls == ['drain', 'server']
+    finally:
+        signal.signal(signal.SIGUSR1, previous)
+
+
+def test_close_releases_waiters():
+    async def run():
+        cache, feed = ss.SignalCache(), lf.LiveFeed()
+        sub = feed.subscribe(['EURUSD'], ['tick'])
+        waiting = asyncio.gather(cache.wait_pending(None, ['EURUSD'], 'M1', timeout=5), sub.get(timeout=5))
+        await asyncio.sleep(0.01)
+        cache.close()
+        feed.close_all()
+        return await asyncio.wait_for(waiting, 1), sub
+
+    (found, events), sub = asyncio.run(run())
+    assert found == [] and events == []
+    assert sub.closed